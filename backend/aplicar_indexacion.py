@@ -0,0 +1,55 @@
+"""
+Compara la política de indexación de cada contenedor de CosmosDB con la versionada en
+app/db/indexacion.py y, con --aplicar, la reemplaza.
+
+Sin argumentos solo muestra las diferencias. Tras aplicar, CosmosDB reconstruye el índice en
+segundo plano (lecturas y escrituras siguen funcionando); --esperar muestra el progreso hasta terminar.
+
+Uso:
+    python aplicar_indexacion.py
+    python aplicar_indexacion.py --aplicar [--esperar]
+"""
+
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / "app"))
+
+from core.config import settings
+from db.cosmos_client import get_cosmos_db
+from db.indexacion import progreso_indexacion, sincronizar_indexacion
+
+if settings.STORAGE_MODE != "cosmosdb":
+    print("❌ Error: las políticas de indexación solo aplican con STORAGE_MODE=cosmosdb")
+    exit(1)
+
+cosmos_db = get_cosmos_db()
+if cosmos_db is None:
+    print("❌ Error: no se pudo conectar a CosmosDB")
+    exit(1)
+
+aplicar = "--aplicar" in sys.argv
+resultado = sincronizar_indexacion(cosmos_db.database, cosmos_db.contenedores, aplicar=aplicar)
+for nombre, r in resultado.items():
+    if not r["cambios"]:
+        print(f"✅ {nombre}: política v{r['version']} vigente")
+        continue
+    print(f"{'🔧' if r['aplicada'] else '📋'} {nombre}: {len(r['cambios'])} cambios para la v{r['version']}{' (aplicados)' if r['aplicada'] else ''}")
+    for cambio in r["cambios"]:
+        print(f"    {cambio}")
+
+aplicados = [n for n, r in resultado.items() if r["aplicada"]]
+if not aplicar and any(r["cambios"] for r in resultado.values()):
+    print("ℹ️ Para aplicar: python aplicar_indexacion.py --aplicar")
+elif aplicados and "--esperar" in sys.argv:
+    pendientes = set(aplicados)
+    while pendientes:
+        for nombre in sorted(pendientes):
+            progreso = progreso_indexacion(cosmos_db.database, nombre)
+            print(f"🔄 {nombre}: índice {progreso if progreso is not None else '?'}%")
+            if progreso is None or progreso >= 100:
+                pendientes.discard(nombre)
+        if pendientes:
+            time.sleep(10)
+    print("✅ Índices reconstruidos")
@@ -1,19 +1,28 @@
-from fastapi import APIRouter, HTTPException, status, Request
+from fastapi import APIRouter, HTTPException, status, Request, Response
+from fastapi.responses import JSONResponse
+from pydantic import ValidationError
 from slowapi import Limiter
 from slowapi.util import get_remote_address
 import sys
 from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent.parent))
 
-from schemas.asistente import AsistenteInternoCreate, AsistenteExternoCreate, AsistenteResponse, AsistenteUpdate
+from schemas.asistente import (
+    AsistenteInternoCreate, AsistenteExternoCreate, AsistenteResponse, AsistenteUpdate,
+    AsistenciaLoteCreate, AsistenciaLoteResponse
+)
 from schemas.sesion import SesionPublicResponse
 from services import sesiones as sesion_service
 from services import asistentes as asistente_service
+from core.config import settings
+from core.metrics import metricas
+from services.sesiones.public_cache import etag_coincide
 from core.exceptions import (
     TokenNotFoundException, 
     TokenExpiredException, 
     TokenInactiveException,
-    DuplicateRegistrationException
+    DuplicateRegistrationException,
+    StorageUnavailableException
 )
 
 router = APIRouter(prefix="/api", tags=["asistentes"])
@@ -23,7 +32,7 @@ limiter = Limiter(key_func=get_remote_address)
 @limiter.limit("60/minute")
 async def buscar_asistente(cedula: str, request: Request):
     """Buscar un asistente por su cédula para autocompletar el formulario."""
-    asistente = asistente_service.obtener_asistente_por_cedula(cedula)
+    asistente = await asistente_service.obtener_asistente_por_cedula_async(cedula)
     if not asistente:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -39,7 +48,7 @@ async def actualizar_asistente(
     request: Request
 ):
     """Actualizar datos parciales de un asistente."""
-    actualizado = asistente_service.actualizar_asistente(
+    actualizado = await asistente_service.actualizar_asistente_async(
         cedula, 
         asistente_update.dict(exclude_unset=True)
     )
@@ -55,27 +64,24 @@ async def actualizar_asistente(
 async def obtener_info_sesion(token: str, request: Request):
     """
     Obtener información pública de una capacitación por token.
+    La respuesta se cachea por token y lleva ETag/Cache-Control; If-None-Match devuelve 304.
     Rate limit: 30 intentos por minuto por IP.
     """
     try:
-        sesion = sesion_service.get_sesion_by_token(token)
-        return {
-            "tema": sesion['tema'],
-            "fecha": sesion['fecha'],
-            "facilitador_entidad": sesion.get('facilitador_entidad'),
-            "responsable": sesion.get('responsable'),
-            "cargo_responsable": sesion.get('cargo_responsable'),
-            "contenido": sesion['contenido'],
-            "hora_inicio": sesion['hora_inicio'],
-            "hora_fin": sesion['hora_fin'],
-            "actividad": sesion.get('actividad'),
-            "tipo_actividad": sesion.get('tipo_actividad'),
-            "dirigido_a": sesion.get('dirigido_a'),
-            "modalidad": sesion.get('modalidad')
-        }
+        entrada = await sesion_service.resolver_token_async(token)
     except (TokenNotFoundException, TokenExpiredException, TokenInactiveException) as e:
         raise e
 
+    headers = {
+        "ETag": entrada.etag,
+        "Cache-Control": f"public, max-age={entrada.max_age()}, must-revalidate"
+    }
+    # Recargas y navegación hacia atrás: el navegador revalida con If-None-Match y recibe 304 sin cuerpo
+    if etag_coincide(request.headers.get("if-none-match"), entrada.etag):
+        metricas.incr("cache_publico.not_modified")
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return JSONResponse(content=entrada.payload, headers=headers)
+
 @router.post("/asistencia/interna", response_model=AsistenteResponse, status_code=status.HTTP_201_CREATED)
 @limiter.limit("60/minute")
 async def registrar_asistencia_interna(
@@ -87,8 +93,9 @@ async def registrar_asistencia_interna(
     Rate limit: 60 registros por minuto por IP.
     """
     try:
-        # Validar token y obtener sesión
-        sesion = sesion_service.get_sesion_by_token(asistente_in.token)
+        # Validar token y obtener sesión: las escrituras no se autorizan desde la caché pública,
+        # que puede seguir aceptando un token desactivado o una sesión borrada en otra réplica
+        sesion = await sesion_service.get_sesion_by_token_async(asistente_in.token)
 
         # Crear registro de asistente
         asistente_data = asistente_in.dict()
@@ -98,9 +105,11 @@ async def registrar_asistencia_interna(
         if ocurrencia_id:
             asistente_data['ocurrencia_id'] = ocurrencia_id
 
-        nuevo_asistente = asistente_service.crear_asistente(
+        # La sesión ya resuelta se reutiliza: no se vuelve a buscar por token
+        nuevo_asistente = await asistente_service.crear_asistente_async(
             asistente_data,
-            sesion['id']
+            sesion['id'],
+            sesion=sesion
         )
         
         return nuevo_asistente
@@ -111,6 +120,9 @@ async def registrar_asistencia_interna(
     except DuplicateRegistrationException as e:
         print(f"⚠️ Registro duplicado: {asistente_in.cedula}")
         raise e
+    except StorageUnavailableException as e:
+        # CosmosDB saturado: 503 con Retry-After para que el cliente reintente
+        raise e
     except Exception as e:
         import traceback
         print(f"❌ ERROR CRÍTICO en registrar_asistencia_interna:")
@@ -132,8 +144,9 @@ async def registrar_asistencia_externa(
     Rate limit: 5 registros por minuto por IP.
     """
     try:
-        # Validar token y obtener sesión
-        sesion = sesion_service.get_sesion_by_token(asistente_in.token)
+        # Validar token y obtener sesión: las escrituras no se autorizan desde la caché pública,
+        # que puede seguir aceptando un token desactivado o una sesión borrada en otra réplica
+        sesion = await sesion_service.get_sesion_by_token_async(asistente_in.token)
 
         # Crear registro de asistente
         asistente_data = asistente_in.dict()
@@ -143,9 +156,11 @@ async def registrar_asistencia_externa(
         if ocurrencia_id:
             asistente_data['ocurrencia_id'] = ocurrencia_id
 
-        nuevo_asistente = asistente_service.crear_asistente(
+        # La sesión ya resuelta se reutiliza: no se vuelve a buscar por token
+        nuevo_asistente = await asistente_service.crear_asistente_async(
             asistente_data,
-            sesion['id']
+            sesion['id'],
+            sesion=sesion
         )
         
         return nuevo_asistente
@@ -154,6 +169,8 @@ async def registrar_asistencia_externa(
         raise e
     except DuplicateRegistrationException as e:
         raise e
+    except StorageUnavailableException as e:
+        raise e
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -161,3 +178,63 @@ async def registrar_asistencia_externa(
         )
 
 
+def _validar_item_lote(item: dict, token: str):
+    """Valida un elemento del lote; devuelve (datos, None) o (None, motivo)."""
+    datos = {k: v for k, v in item.items() if k != 'tipo'}
+    datos['token'] = token
+    esquema = AsistenteExternoCreate if str(item.get('tipo', 'interno')).lower() == 'externo' else AsistenteInternoCreate
+    try:
+        return esquema(**datos).dict(), None
+    except ValidationError as e:
+        motivo = "; ".join(f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors())
+        return None, motivo
+
+
+@router.post("/asistencia/lote", response_model=AsistenciaLoteResponse)
+@limiter.limit("10/minute")
+async def registrar_asistencia_lote(
+    request: Request,
+    lote_in: AsistenciaLoteCreate
+):
+    """
+    Registrar un lote de asistentes de un mismo token (kioscos que trabajan sin conexión).
+    Cada elemento se valida por separado (`tipo`: interno | externo); los inválidos no
+    detienen el lote. La respuesta informa el estado de cada elemento.
+    Rate limit: 10 lotes por minuto por IP.
+    """
+    if len(lote_in.asistentes) > settings.LOTE_MAX_ASISTENTES:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"El lote supera el máximo de {settings.LOTE_MAX_ASISTENTES} asistentes"
+        )
+
+    # Token inválido/expirado/inactivo afecta a todo el lote: se propaga como en el registro individual
+    sesion = await sesion_service.get_sesion_by_token_async(lote_in.token)
+    ocurrencia_id = sesion.get('_ocurrencia_id')
+
+    resultados = [None] * len(lote_in.asistentes)
+    validos, indices = [], []
+    for i, item in enumerate(lote_in.asistentes):
+        datos, motivo = _validar_item_lote(item, lote_in.token)
+        if motivo:
+            resultados[i] = {"indice": i, "cedula": item.get('cedula'), "estado": "invalido", "detalle": motivo}
+            continue
+        if ocurrencia_id:
+            datos['ocurrencia_id'] = ocurrencia_id
+        validos.append(datos)
+        indices.append(i)
+
+    if validos:
+        for i, r in zip(indices, await asistente_service.registrar_lote_async(validos, sesion)):
+            resultados[i] = {"indice": i, **r}
+
+    conteo = lambda estado: sum(1 for r in resultados if r['estado'] == estado)
+    return {
+        "token": lote_in.token,
+        "total": len(resultados),
+        "creados": conteo("creado"),
+        "duplicados": conteo("duplicado"),
+        "invalidos": conteo("invalido"),
+        "errores": conteo("error"),
+        "resultados": resultados
+    }
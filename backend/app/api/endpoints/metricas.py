@@ -0,0 +1,45 @@
+from fastapi import APIRouter, Depends
+from typing import Dict, Any
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from core.security import get_current_user
+from core.metrics import metricas
+from services.sesiones import agregador_contadores, token_index, cache_publico, precalentador
+from db.aio.cosmos_client import ejecutar_sync
+from db.json_escritor import escritor_json
+from services.agregados import procesador_change_feed
+from db.instrumentacion import estadisticas_cosmos
+from db.reintentos import politica_cosmos
+from .usuarios import verificar_es_administrador
+
+router = APIRouter(prefix="/api/metricas", tags=["metricas"])
+
+@router.get("", response_model=Dict[str, Any])
+async def obtener_metricas(current_user: dict = Depends(get_current_user)):
+    """
+    Métricas internas del proceso (contadores write-behind, índice de tokens, histogramas).
+    Solo administradores.
+    """
+    await ejecutar_sync(verificar_es_administrador, current_user)
+    return {
+        **metricas.snapshot(),
+        "contadores_write_behind": agregador_contadores.stats(),
+        "indice_tokens": token_index.stats(),
+        "cache_publico": cache_publico.stats(),
+        "precalentamiento": precalentador.stats(),
+        "escritor_json": escritor_json.stats(),
+        "change_feed": procesador_change_feed.stats(),
+        "reintentos_cosmos": politica_cosmos.stats()
+    }
+
+@router.get("/cosmos", response_model=Dict[str, Any])
+async def obtener_metricas_cosmos(current_user: dict = Depends(get_current_user)):
+    """
+    Consumo de CosmosDB por método de repositorio y por endpoint (RU, latencia, documentos, páginas),
+    ordenado por RU totales. Solo administradores.
+    """
+    await ejecutar_sync(verificar_es_administrador, current_user)
+    return estadisticas_cosmos.snapshot()
@@ -1,9 +1,11 @@
-from fastapi import APIRouter, HTTPException, status, Depends
-from typing import List
-from schemas.sesion import SesionResponse, SesionCreate, SesionUpdate
+from fastapi import APIRouter, HTTPException, status, Depends, Query
+from typing import List, Optional, Union
+from core.config import settings
+from schemas.sesion import SesionResponse, SesionPagina, SesionSummary, SesionResumenPagina, SesionCreate, SesionUpdate
 from services import sesiones as sesion_service
 from services.usuarios import usuario_service
 from core.security import get_current_user
+from db.aio.cosmos_client import ejecutar_sync
 
 router = APIRouter()
 
@@ -21,42 +23,67 @@ async def crear_sesion(sesion: SesionCreate, current_user: dict = Depends(get_cu
         data['created_by_id'] = user_id
         data['created_by_name'] = current_user.get('name')
         
-        nueva_sesion = sesion_service.crear_sesion(data)
+        nueva_sesion = await ejecutar_sync(sesion_service.crear_sesion, data)
         if user_id:
-            usuario_service.incrementar_formularios_creados(user_id)
+            await ejecutar_sync(usuario_service.incrementar_formularios_creados, user_id)
         return nueva_sesion
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-@router.get("/", response_model=List[SesionResponse])
-async def listar_sesiones(current_user: dict = Depends(get_current_user)):
+# Máximo de sesiones por página en el listado paginado
+MAX_PAGE_SIZE = 200
+
+@router.get("/", response_model=Union[SesionPagina, SesionResumenPagina, List[SesionResponse], List[SesionSummary]])
+async def listar_sesiones(
+    page_size: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    resumen: bool = False,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Sin page_size ni cursor devuelve la lista completa. Con ellos devuelve una página
+    {items, next_cursor}; next_cursor se envía como `cursor` para pedir la siguiente.
+    Con resumen=true los elementos son SesionSummary (sin contenido ni ocurrencias);
+    el documento completo se obtiene en GET /{sesion_id}.
+    """
     user_email = current_user.get('email')
     user_oid = current_user.get('oid') or current_user.get('sub')
     try:
-        rol = usuario_service.obtener_rol_usuario(user_oid)
+        rol = await ejecutar_sync(usuario_service.obtener_rol_usuario, user_oid)
+        if page_size is not None or cursor is not None:
+            limite = page_size or settings.SESIONES_PAGE_SIZE
+            if rol == "Administrador":
+                return await sesion_service.get_pagina_sesiones_admin_async(user_email, limite, cursor, resumen)
+            return await sesion_service.get_pagina_sesiones_async(user_email, None, limite, cursor, resumen)
+        if resumen:
+            if rol == "Administrador":
+                return await sesion_service.get_resumen_sesiones_admin_async(user_email)
+            return await sesion_service.get_resumen_sesiones_async(owner_email=user_email)
         if rol == "Administrador":
-            return sesion_service.get_sesiones_para_admin(user_email)
-        return sesion_service.get_all_sesiones(owner=user_email)
+            return await sesion_service.get_sesiones_para_admin_async(user_email)
+        return await sesion_service.get_all_sesiones_async(owner_email=user_email)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/{sesion_id}", response_model=SesionResponse)
 async def obtener_sesion(sesion_id: str, current_user: dict = Depends(get_current_user)):
-    sesion = sesion_service.get_sesion_by_id(sesion_id)
+    sesion = await sesion_service.get_sesion_by_id_async(sesion_id)
     if not sesion: raise HTTPException(status_code=404, detail="Sesión no encontrada")
     return sesion
 
 @router.put("/{sesion_id}", response_model=SesionResponse)
 async def actualizar_sesion(sesion_id: str, sesion_update: SesionUpdate, current_user: dict = Depends(get_current_user)):
     try:
-        return sesion_service.actualizar_sesion(sesion_id, sesion_update.dict(exclude_preset=True))
+        return await ejecutar_sync(sesion_service.actualizar_sesion, sesion_id, sesion_update.dict(exclude_preset=True))
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.delete("/{sesion_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def eliminar_sesion(sesion_id: str, current_user: dict = Depends(get_current_user)):
     user_id = current_user.get('oid')
-    if sesion_service.delete_sesion(sesion_id):
-        if user_id: usuario_service.decrementar_formularios_creados(user_id)
+    if await ejecutar_sync(sesion_service.delete_sesion, sesion_id):
+        if user_id: await ejecutar_sync(usuario_service.decrementar_formularios_creados, user_id)
         return
     raise HTTPException(status_code=404, detail="No se pudo eliminar")
@@ -18,6 +18,62 @@ class Settings(BaseSettings):
     TOKEN_EXPIRY_DAYS: int = int(os.getenv("TOKEN_EXPIRY_DAYS", "30"))
     MAX_FILE_SIZE: int = int(os.getenv("MAX_FILE_SIZE", "1048576"))
     TIMEZONE: str = os.getenv("TIMEZONE", "America/Bogota")
+    # Segundos que se recuerda un token inexistente antes de volver a consultarlo
+    TOKEN_NEGATIVE_CACHE_TTL: int = int(os.getenv("TOKEN_NEGATIVE_CACHE_TTL", "30"))
+    # Write-behind de contadores de asistentes: intervalo de flush y registros que fuerzan un flush
+    COUNTER_FLUSH_INTERVAL_MS: int = int(os.getenv("COUNTER_FLUSH_INTERVAL_MS", "300"))
+    COUNTER_FLUSH_MAX_PENDING: int = int(os.getenv("COUNTER_FLUSH_MAX_PENDING", "50"))
+    # Flushes fallidos tras los que un delta se descarta (queda en contadores.descartados)
+    COUNTER_FLUSH_MAX_INTENTOS: int = int(os.getenv("COUNTER_FLUSH_MAX_INTENTOS", "5"))
+    # Información pública por token (GET /api/sesion/{token}): TTL de la caché del servidor y max-age para el navegador
+    PUBLIC_INFO_CACHE_TTL: int = int(os.getenv("PUBLIC_INFO_CACHE_TTL", "60"))
+    PUBLIC_INFO_MAX_AGE: int = int(os.getenv("PUBLIC_INFO_MAX_AGE", "30"))
+    # Precalentamiento antes de cada ocurrencia: cada cuántos segundos se revisa y con cuántos minutos de anticipación
+    PREWARM_INTERVAL_S: int = int(os.getenv("PREWARM_INTERVAL_S", "60"))
+    PREWARM_WINDOW_MIN: int = int(os.getenv("PREWARM_WINDOW_MIN", "30"))
+    # Imágenes QR renderizadas que se conservan en memoria
+    QR_CACHE_SIZE: int = int(os.getenv("QR_CACHE_SIZE", "256"))
+    # Modo JSON con journal: líneas de log que disparan la compactación y fsync por escritura
+    JOURNAL_COMPACT_LINES: int = int(os.getenv("JOURNAL_COMPACT_LINES", "1000"))
+    JOURNAL_FSYNC: bool = os.getenv("JOURNAL_FSYNC", "false").lower() == "true"
+    # Escritor agrupado del modo JSON: mutaciones máximas por escritura (group commit)
+    JSON_WRITER_MAX_BATCH: int = int(os.getenv("JSON_WRITER_MAX_BATCH", "256"))
+    # Registro por lotes (kioscos): máximo de asistentes por solicitud y escrituras concurrentes
+    LOTE_MAX_ASISTENTES: int = int(os.getenv("LOTE_MAX_ASISTENTES", "500"))
+    LOTE_CONCURRENCIA: int = int(os.getenv("LOTE_CONCURRENCIA", "16"))
+    # Agregados por change feed (solo CosmosDB): contadores y resúmenes los calcula un consumidor del
+    # change feed en lugar del camino de registro; intervalo de lectura, documentos por página y vigencia del lease
+    CHANGE_FEED_AGREGADOS: bool = os.getenv("CHANGE_FEED_AGREGADOS", "false").lower() == "true"
+    CHANGE_FEED_INTERVAL_MS: int = int(os.getenv("CHANGE_FEED_INTERVAL_MS", "2000"))
+    CHANGE_FEED_MAX_ITEMS: int = int(os.getenv("CHANGE_FEED_MAX_ITEMS", "100"))
+    CHANGE_FEED_LEASE_TTL_S: int = int(os.getenv("CHANGE_FEED_LEASE_TTL_S", "30"))
+    # Instrumentación de CosmosDB: RU, latencia, documentos y páginas por método de repositorio
+    # (GET /api/metricas/cosmos) y una línea de resumen por petición HTTP que use CosmosDB
+    COSMOS_INSTRUMENTACION: bool = os.getenv("COSMOS_INSTRUMENTACION", "true").lower() == "true"
+    COSMOS_RESUMEN_PETICION: bool = os.getenv("COSMOS_RESUMEN_PETICION", "true").lower() == "true"
+    # Reintentos de CosmosDB (429, timeouts, 5xx): intentos, backoff exponencial con jitter y presupuesto
+    # total por operación; el circuito se abre tras N fallas seguidas y rechaza (503) durante el enfriamiento
+    COSMOS_RETRY_MAX_INTENTOS: int = int(os.getenv("COSMOS_RETRY_MAX_INTENTOS", "4"))
+    COSMOS_RETRY_BASE_MS: int = int(os.getenv("COSMOS_RETRY_BASE_MS", "100"))
+    COSMOS_RETRY_MAX_ESPERA_MS: int = int(os.getenv("COSMOS_RETRY_MAX_ESPERA_MS", "2000"))
+    COSMOS_RETRY_PRESUPUESTO_MS: int = int(os.getenv("COSMOS_RETRY_PRESUPUESTO_MS", "5000"))
+    COSMOS_CIRCUITO_UMBRAL: int = int(os.getenv("COSMOS_CIRCUITO_UMBRAL", "10"))
+    COSMOS_CIRCUITO_ENFRIAMIENTO_S: float = float(os.getenv("COSMOS_CIRCUITO_ENFRIAMIENTO_S", "15"))
+    # Tras migrar_particion_asistentes.py (todas las personas en la partición de su cédula) con false un
+    # 404 de read_item es definitivo: no se hace la consulta cross-partition de respaldo
+    ASISTENTES_FALLBACK_CONSULTA: bool = os.getenv("ASISTENTES_FALLBACK_CONSULTA", "true").lower() == "true"
+    # Asistencias en documentos por persona y año en lugar de una lista que crece en el documento persona
+    # (solo CosmosDB). Una vez activado no se debe volver a false: las personas ya migradas no tienen la lista
+    ASISTENCIAS_POR_ANIO: bool = os.getenv("ASISTENCIAS_POR_ANIO", "false").lower() == "true"
+    # Listar, contar y eliminar en cascada las asistencias de una sesión desde la vista asistencias_sesion
+    # (solo CosmosDB). La vista se escribe siempre; activar solo después de backend/reconstruir_asistencias_sesion.py,
+    # antes de eso no tiene las asistencias históricas
+    ASISTENCIAS_SESION_VISTA: bool = os.getenv("ASISTENCIAS_SESION_VISTA", "false").lower() == "true"
+    # Al iniciar con CosmosDB se compara la indexación de cada contenedor con db/indexacion.py; con true
+    # además se aplica (si no, solo se avisa y se aplica con backend/aplicar_indexacion.py)
+    COSMOS_INDEXACION_AL_INICIAR: bool = os.getenv("COSMOS_INDEXACION_AL_INICIAR", "false").lower() == "true"
+    # Tamaño de página por defecto de GET /api/sesiones/ cuando llega un cursor sin page_size
+    SESIONES_PAGE_SIZE: int = int(os.getenv("SESIONES_PAGE_SIZE", "50"))
 
     # Entra ID (MSAL) - Backend Authentication
     ENTRA_CLIENT_ID: str = os.getenv("ENTRA_CLIENT_ID", "")
@@ -36,8 +92,13 @@ class Settings(BaseSettings):
     COSMOS_KEY: str = os.getenv("COSMOS_KEY", "")
     COSMOS_DATABASE_NAME: str = os.getenv("COSMOS_DATABASE_NAME", "formaciones_db")
     
-    # Modo de almacenamiento: "json" o "cosmosdb"
+    # Modo de almacenamiento: "json", "cosmosdb", "sqlite" o "memory"
     STORAGE_MODE: str = os.getenv("STORAGE_MODE", "json")
+    # JSON (solo si STORAGE_MODE="json"): directorio de los archivos (por defecto app/data)
+    JSON_DATA_DIR: str = os.getenv("JSON_DATA_DIR", "")
+    # SQLite (solo si STORAGE_MODE="sqlite"): ruta del archivo (por defecto app/data/formaciones.db) y espera ante locks
+    SQLITE_PATH: str = os.getenv("SQLITE_PATH", "")
+    SQLITE_BUSY_TIMEOUT_MS: int = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
     
     # Blob Storage Mode: "local" o "azure"
     BLOB_STORAGE_MODE: str = os.getenv("BLOB_STORAGE_MODE", "local")
@@ -34,3 +34,11 @@ class InvalidEmailDomainException(HTTPException):
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="El correo debe ser del dominio @fundacionsantodomingo.org"
         )
+
+class StorageUnavailableException(HTTPException):
+    def __init__(self, reintentar_en: float = 1.0):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="El almacenamiento está saturado o no disponible, intenta de nuevo en unos segundos",
+            headers={"Retry-After": str(max(1, round(reintentar_en)))}
+        )
@@ -0,0 +1,74 @@
+import threading
+import time
+from collections import deque
+from typing import Any, Dict
+
+# Tamaño de la ventana de muestras por histograma (percentiles sobre las últimas N observaciones)
+VENTANA_HISTOGRAMA = 1024
+
+
+class Histograma:
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.maximo = 0.0
+        self.muestras = deque(maxlen=VENTANA_HISTOGRAMA)
+
+    def observar(self, valor: float):
+        self.count += 1
+        self.total += valor
+        self.maximo = max(self.maximo, valor)
+        self.muestras.append(valor)
+
+    def resumen(self) -> Dict[str, Any]:
+        ordenadas = sorted(self.muestras)
+
+        def percentil(p: float) -> float:
+            if not ordenadas:
+                return 0.0
+            return ordenadas[min(len(ordenadas) - 1, int(p * len(ordenadas)))]
+
+        return {
+            "count": self.count,
+            "sum": round(self.total, 4),
+            "avg": round(self.total / self.count, 4) if self.count else 0.0,
+            "max": round(self.maximo, 4),
+            "p50": round(percentil(0.50), 4),
+            "p95": round(percentil(0.95), 4),
+            "p99": round(percentil(0.99), 4),
+        }
+
+
+class Metricas:
+    """Registro en proceso de contadores, gauges e histogramas para el endpoint de métricas."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._contadores: Dict[str, float] = {}
+        self._gauges: Dict[str, float] = {}
+        self._histogramas: Dict[str, Histograma] = {}
+        self._inicio = time.time()
+
+    def incr(self, nombre: str, valor: float = 1):
+        with self._lock:
+            self._contadores[nombre] = self._contadores.get(nombre, 0) + valor
+
+    def gauge(self, nombre: str, valor: float):
+        with self._lock:
+            self._gauges[nombre] = valor
+
+    def observar(self, nombre: str, valor: float):
+        with self._lock:
+            self._histogramas.setdefault(nombre, Histograma()).observar(valor)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "uptime_s": round(time.time() - self._inicio, 1),
+                "contadores": dict(self._contadores),
+                "gauges": dict(self._gauges),
+                "histogramas": {k: h.resumen() for k, h in self._histogramas.items()},
+            }
+
+
+metricas = Metricas()
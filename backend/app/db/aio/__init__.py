@@ -0,0 +1 @@
+# Capa de datos asíncrona (azure.cosmos.aio) para los endpoints async
@@ -0,0 +1,84 @@
+from azure.cosmos.aio import CosmosClient
+from typing import Optional
+
+from core.config import settings
+from db.reintentos import OPCIONES_CLIENTE
+from .repositories.sesiones_repo import AsyncSesionesRepository
+from .repositories.asistentes_repo import AsyncAsistentesRepository
+from .repositories.usuarios_repo import AsyncUsuariosRepository, AsyncConfiguracionRepository
+from .repositories.tokens_repo import AsyncTokensRepository
+from .repositories.asistencias_sesion_repo import AsyncAsistenciasSesionRepository
+from .repositories.agregados_repo import AsyncAgregadosRepository
+
+class AsyncCosmosDBClient:
+    """
+    Cliente CosmosDB sobre azure.cosmos.aio. Se abre y cierra en el lifespan de FastAPI.
+    Los contenedores los crea el cliente síncrono (db/cosmos_client.py) al arrancar,
+    aquí solo se obtienen sus proxies.
+    """
+
+    def __init__(self):
+        self.client = CosmosClient(settings.COSMOS_ENDPOINT, credential=settings.COSMOS_KEY, **OPCIONES_CLIENTE)
+        self.database = self.client.get_database_client(settings.COSMOS_DATABASE_NAME)
+
+        self.sesiones_container = self.database.get_container_client("sesiones")
+        self.sesiones = AsyncSesionesRepository(self.sesiones_container)
+
+        # Contadores del change feed (None si no está activo); van antes de asistentes, que los recibe
+        self.agregados = None
+        if settings.CHANGE_FEED_AGREGADOS:
+            self.agregados = AsyncAgregadosRepository(self.database.get_container_client("agregados"))
+
+        self.asistencias_sesion_container = self.database.get_container_client("asistencias_sesion")
+        self.asistencias_sesion = AsyncAsistenciasSesionRepository(self.asistencias_sesion_container)
+
+        self.asistentes_container = self.database.get_container_client("asistentes")
+        self.asistentes = AsyncAsistentesRepository(self.asistentes_container, vista=self.asistencias_sesion, agregados=self.agregados)
+
+        self.usuarios_container = self.database.get_container_client("usuarios")
+        self.usuarios = AsyncUsuariosRepository(self.usuarios_container)
+
+        self.config_container = self.database.get_container_client("configuracion")
+        self.configuracion = AsyncConfiguracionRepository(self.config_container)
+
+        self.tokens_container = self.database.get_container_client("tokens")
+        self.tokens = AsyncTokensRepository(self.tokens_container)
+
+    async def close(self):
+        await self.client.close()
+
+_async_cosmos_db: Optional[AsyncCosmosDBClient] = None
+
+def get_async_cosmos_db() -> Optional[AsyncCosmosDBClient]:
+    """Devuelve el cliente asíncrono si está abierto (None en modo JSON, scripts o antes del arranque)."""
+    return _async_cosmos_db
+
+async def abrir_async_cosmos_db() -> Optional[AsyncCosmosDBClient]:
+    global _async_cosmos_db
+    from db.cosmos_client import cosmos_db
+    if settings.STORAGE_MODE != "cosmosdb" or cosmos_db is None or _async_cosmos_db is not None:
+        return _async_cosmos_db
+    try:
+        _async_cosmos_db = AsyncCosmosDBClient()
+        print("✅ CosmosDB asíncrono inicializado")
+    except Exception as e:
+        print(f"⚠️ No se pudo inicializar CosmosDB asíncrono, se usará el cliente síncrono: {e}")
+        _async_cosmos_db = None
+    return _async_cosmos_db
+
+async def cerrar_async_cosmos_db():
+    global _async_cosmos_db
+    if _async_cosmos_db is not None:
+        await _async_cosmos_db.close()
+        _async_cosmos_db = None
+
+async def ejecutar_sync(fn, *args, **kwargs):
+    """
+    Ejecuta una operación del camino síncrono desde un endpoint async.
+    En CosmosDB y SQLite la I/O va al threadpool para no bloquear el event loop (SQLite abre una
+    conexión por hilo); en modo JSON se ejecuta en línea para conservar la serialización de escrituras a archivo.
+    """
+    if settings.STORAGE_MODE in ("cosmosdb", "sqlite"):
+        from starlette.concurrency import run_in_threadpool
+        return await run_in_threadpool(fn, *args, **kwargs)
+    return fn(*args, **kwargs)
@@ -0,0 +1,14 @@
+from typing import List, Dict, Any
+from db.repositories.agregados_repo import QUERY_AGREGADOS_POR_IDS, id_sesion, superponer_contadores
+from .base import AsyncBaseRepository, recolectar
+
+class AsyncAgregadosRepository(AsyncBaseRepository):
+    """Lectura asíncrona de los agregados del change feed (las escrituras las hace el procesador)."""
+
+    async def superponer_sesiones(self, sesiones: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        ids = list(dict.fromkeys(id_sesion(s['id']) for s in sesiones))
+        if not ids:
+            return sesiones
+        parameters = [{"name": "@ids", "value": ids}]
+        agregados = {d['id']: d for d in await recolectar(self.container.query_items(query=QUERY_AGREGADOS_POR_IDS, parameters=parameters))}
+        return [superponer_contadores(s, agregados.get(id_sesion(s['id']))) for s in sesiones]
@@ -0,0 +1,35 @@
+from typing import List, Optional, Dict, Any
+from core.metrics import metricas
+from db.repositories.asistencias_sesion_repo import (
+    QUERY_VISTA_POR_SESION, QUERY_VISTA_CONTAR, documento_vista
+)
+from .base import AsyncBaseRepository, recolectar
+
+class AsyncAsistenciasSesionRepository(AsyncBaseRepository):
+    """Variante asíncrona de AsistenciasSesionRepository (escritura y lectura; la cascada va por el síncrono)."""
+
+    async def guardar(self, persona: Dict[str, Any], asistencia: Dict[str, Any]) -> None:
+        # Igual que AsistenciasSesionRepository.guardar: reintentos comunes y, si aun así falla, se propaga
+        try:
+            await self.container.upsert_item(body=documento_vista(persona, asistencia))
+        except Exception as e:
+            print(f"❌ [VistaAsync] No se pudo materializar la asistencia de {persona.get('id')} en {asistencia.get('sesion_id')}: {type(e).__name__}: {e}")
+            metricas.incr("vista_asistencias.errores")
+            raise
+
+    async def guardar_persona(self, persona: Dict[str, Any]) -> None:
+        for asistencia in persona.get('asistencias', []):
+            if asistencia.get('actividad_id') and asistencia.get('sesion_id'):
+                await self.guardar(persona, asistencia)
+
+    async def _consultar(self, query: str, sesion_id: str, actividad_id: Optional[str]) -> List[Any]:
+        parameters = [{"name": "@sesion_id", "value": sesion_id}]
+        return await recolectar(self.container.query_items(query=query, parameters=parameters, partition_key=actividad_id or sesion_id))
+
+    async def listar_por_sesion(self, sesion_id: str, actividad_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        items = await self._consultar(QUERY_VISTA_POR_SESION, sesion_id, actividad_id)
+        return sorted(items, key=lambda x: x.get('fecha_registro') or '')
+
+    async def contar_por_sesion(self, sesion_id: str, actividad_id: Optional[str] = None) -> int:
+        items = await self._consultar(QUERY_VISTA_CONTAR, sesion_id, actividad_id)
+        return items[0] if items else 0
@@ -0,0 +1,270 @@
+from typing import List, Optional, Dict, Any, Tuple
+from azure.core import MatchConditions
+from azure.cosmos import exceptions
+from core.config import settings
+from core.metrics import metricas
+from db.repositories.asistentes_repo import (
+    CAMPOS_CONTACTO, QUERY_PERSONA_POR_ID, QUERY_LISTAR_POR_SESION, QUERY_DUPLICADO, QUERY_CONTAR_POR_SESION,
+    preparar_asistencia, aplicar_asistencia, nueva_persona, es_no_encontrado, es_conflicto_escritura, asistencia_de
+)
+from db.repositories.asistencias_anuales import (
+    anio_de, anios_a_leer, id_anio, nuevo_anio, agrupar_por_anio, resumen_anios, es_formato_anual, perfil, componer_persona
+)
+from .base import AsyncBaseRepository, recolectar
+from .asistencias_sesion_repo import AsyncAsistenciasSesionRepository
+from .agregados_repo import AsyncAgregadosRepository
+
+class AsyncAsistentesRepository(AsyncBaseRepository):
+    """
+    Variante asíncrona de AsistentesRepository para el camino de registro y consulta.
+    Las eliminaciones en cascada siguen en el repositorio síncrono (se ejecutan en el threadpool).
+    Con `vista` materializa cada asistencia en asistencias_sesion y, con ASISTENCIAS_SESION_VISTA, lista/cuenta desde ahí.
+    `agregados` (change feed) se recibe como en AsistentesRepository, que lo usa al eliminar una persona.
+    """
+
+    def __init__(self, container, vista: Optional[AsyncAsistenciasSesionRepository] = None,
+                 agregados: Optional[AsyncAgregadosRepository] = None):
+        super().__init__(container)
+        self.vista = vista
+        self.agregados = agregados
+
+    def _leer_de_vista(self) -> bool:
+        # Igual que AsistentesRepository._leer_de_vista
+        return self.vista is not None and settings.ASISTENCIAS_SESION_VISTA
+
+    async def _materializar(self, persona: Dict[str, Any], id_especifico: str) -> None:
+        if self.vista is None:
+            return
+        asistencia = asistencia_de(persona, id_especifico)
+        if asistencia:
+            await self.vista.guardar(persona, asistencia)
+
+    async def _buscar_por_consulta(self, cedula: str) -> Optional[Dict[str, Any]]:
+        # Igual que AsistentesRepository._buscar_fuera_de_particion
+        if not settings.ASISTENTES_FALLBACK_CONSULTA:
+            return None
+        parameters = [{"name": "@cedula", "value": cedula}]
+        items = await recolectar(self.container.query_items(query=QUERY_PERSONA_POR_ID, parameters=parameters))
+        metricas.incr("asistentes.fallback_consulta")
+        if items:
+            metricas.incr("asistentes.fallback_encontrado")
+        return items[0] if items else None
+
+    async def _duplicado(self, persona: Dict[str, Any], id_especifico: str) -> Tuple[Dict[str, Any], bool]:
+        # Igual que AsistentesRepository._duplicado
+        await self._materializar(persona, id_especifico)
+        return persona, False
+
+    async def crear_o_actualizar(self, asistente_data: Dict[str, Any], sesion_id: str) -> Dict[str, Any]:
+        if settings.ASISTENCIAS_POR_ANIO:
+            return (await self.registrar_asistencia(asistente_data, sesion_id))[0]
+        persona = await self._escribir_persona(asistente_data, sesion_id)
+        await self._materializar(persona, preparar_asistencia(asistente_data, sesion_id)[1])
+        return persona
+
+    async def _escribir_persona(self, asistente_data: Dict[str, Any], sesion_id: str) -> Dict[str, Any]:
+        cedula = asistente_data['cedula']
+        nueva_asistencia, id_especifico = preparar_asistencia(asistente_data, sesion_id)
+        print(f"🔍 [RepoAsync] Procesando registro para {cedula} en sesión {id_especifico}")
+
+        try:
+            persona = await self.container.read_item(item=cedula, partition_key=cedula)
+            if not aplicar_asistencia(persona, nueva_asistencia, asistente_data):
+                return persona
+            return await self.container.replace_item(item=cedula, body=persona)
+        except (exceptions.CosmosResourceNotFoundError, exceptions.CosmosHttpResponseError) as e:
+            if not es_no_encontrado(e):
+                print(f"❌ Error inesperado en read_item (persona={cedula}): {type(e).__name__}: {e}")
+                raise
+
+        # FALLBACK: documento cuya partition key no coincide con la cédula
+        persona = await self._buscar_por_consulta(cedula)
+        if persona:
+            if not aplicar_asistencia(persona, nueva_asistencia, asistente_data):
+                return persona
+            return await self.container.replace_item(item=persona['id'], body=persona)
+
+        try:
+            return await self.container.create_item(body=nueva_persona(cedula, nueva_asistencia, asistente_data))
+        except exceptions.CosmosResourceExistsError:
+            print(f"⚠️ [RepoAsync] Conflicto de creación (ya existe {cedula}). Reintentando actualización final...")
+            persona = await self.container.read_item(item=cedula, partition_key=cedula)
+            if aplicar_asistencia(persona, nueva_asistencia, asistente_data):
+                return await self.container.replace_item(item=cedula, body=persona)
+            return persona
+
+    async def registrar_asistencia(self, asistente_data: Dict[str, Any], sesion_id: str, max_intentos: int = 3) -> Tuple[Dict[str, Any], bool]:
+        """Versión async de AsistentesRepository.registrar_asistencia."""
+        if settings.ASISTENCIAS_POR_ANIO:
+            return await self._registrar_por_anio(asistente_data, sesion_id, max_intentos)
+        cedula = asistente_data['cedula']
+        nueva_asistencia, id_especifico = preparar_asistencia(asistente_data, sesion_id)
+
+        for intento in range(max_intentos):
+            persona = await self._get_persona(cedula)
+            if persona and es_formato_anual(persona):
+                return await self._registrar_por_anio(asistente_data, sesion_id, max_intentos)
+            try:
+                if persona:
+                    if not aplicar_asistencia(persona, dict(nueva_asistencia), asistente_data):
+                        return await self._duplicado(persona, id_especifico)
+                    persona = await self.container.replace_item(
+                        item=persona['id'], body=persona,
+                        etag=persona.get('_etag'), match_condition=MatchConditions.IfNotModified
+                    )
+                else:
+                    persona = await self.container.create_item(body=nueva_persona(cedula, dict(nueva_asistencia), asistente_data))
+            except exceptions.CosmosHttpResponseError as e:
+                if es_conflicto_escritura(e) and intento < max_intentos - 1:
+                    print(f"⚠️ [RepoAsync] Conflicto de escritura para {cedula} en {id_especifico} (intento {intento + 1}), releyendo...")
+                    continue
+                raise
+            await self._materializar(persona, id_especifico)
+            return persona, True
+        raise RuntimeError(f"No se pudo registrar la asistencia de {cedula} tras {max_intentos} intentos")
+
+    async def _registrar_por_anio(self, asistente_data: Dict[str, Any], sesion_id: str, max_intentos: int) -> Tuple[Dict[str, Any], bool]:
+        """Versión async de AsistentesRepository._registrar_por_anio."""
+        cedula = asistente_data['cedula']
+        nueva_asistencia, id_especifico = preparar_asistencia(asistente_data, sesion_id)
+        anio = anio_de(nueva_asistencia['fecha_registro'])
+
+        persona = await self._get_persona(cedula)
+        if persona and not es_formato_anual(persona):
+            persona = await self.pasar_a_formato_anual(persona)
+        anterior = str(int(anio) - 1) if anio.isdigit() else None
+        if persona and anterior and persona['anios'].get(anterior):
+            previo = await self._leer_anio(cedula, anterior)
+            if previo and asistencia_de(previo, id_especifico):
+                return await self._duplicado(componer_persona(persona, [previo]), id_especifico)
+
+        doc, registrada = await self._escribir_anio(cedula, anio, nueva_asistencia, max_intentos)
+        if not registrada:
+            return await self._duplicado(componer_persona(persona or nueva_persona(cedula, nueva_asistencia, asistente_data), [doc]), id_especifico)
+        persona = componer_persona(await self._actualizar_resumen(cedula, persona, doc, nueva_asistencia, asistente_data), [doc])
+        await self._materializar(persona, id_especifico)
+        return persona, True
+
+    async def _leer_anio(self, cedula: str, anio: str) -> Optional[Dict[str, Any]]:
+        try:
+            return await self.container.read_item(item=id_anio(cedula, anio), partition_key=id_anio(cedula, anio))
+        except (exceptions.CosmosResourceNotFoundError, exceptions.CosmosHttpResponseError) as e:
+            if es_no_encontrado(e):
+                return None
+            raise
+
+    async def _leer_anios(self, persona: Dict[str, Any]) -> List[Dict[str, Any]]:
+        docs = [await self._leer_anio(persona['id'], anio) for anio in anios_a_leer(persona)]
+        return [doc for doc in docs if doc]
+
+    async def _escribir_anio(self, cedula: str, anio: str, nueva_asistencia: Dict[str, Any], max_intentos: int) -> Tuple[Dict[str, Any], bool]:
+        for intento in range(max_intentos):
+            doc = await self._leer_anio(cedula, anio)
+            try:
+                if doc is None:
+                    doc = nuevo_anio(cedula, anio)
+                    doc['asistencias'].append(dict(nueva_asistencia))
+                    return await self.container.create_item(body=doc), True
+                if not aplicar_asistencia(doc, dict(nueva_asistencia), {}):
+                    return doc, False
+                return await self.container.replace_item(
+                    item=doc['id'], body=doc, etag=doc.get('_etag'), match_condition=MatchConditions.IfNotModified
+                ), True
+            except exceptions.CosmosHttpResponseError as e:
+                if es_conflicto_escritura(e) and intento < max_intentos - 1:
+                    print(f"⚠️ [RepoAsync] Conflicto de escritura en {id_anio(cedula, anio)} (intento {intento + 1}), releyendo...")
+                    continue
+                raise
+        raise RuntimeError(f"No se pudo registrar la asistencia de {cedula} tras {max_intentos} intentos")
+
+    async def _actualizar_resumen(self, cedula: str, persona: Optional[Dict[str, Any]], doc: Dict[str, Any],
+                                  nueva_asistencia: Dict[str, Any], asistente_data: Dict[str, Any]) -> Dict[str, Any]:
+        contacto = {c: asistente_data[c] for c in CAMPOS_CONTACTO if asistente_data.get(c)}
+        if persona is None:
+            try:
+                return await self.container.create_item(body={
+                    "id": cedula, **contacto, "anios": {doc['anio']: len(doc['asistencias'])},
+                    "total_asistencias": 1, "ultima_asistencia": nueva_asistencia['fecha_registro']
+                })
+            except exceptions.CosmosResourceExistsError:
+                print(f"⚠️ [RepoAsync] Conflicto de creación (ya existe {cedula}). Actualizando resumen...")
+        operaciones = [
+            {"op": "incr", "path": "/total_asistencias", "value": 1},
+            {"op": "incr", "path": f"/anios/{doc['anio']}", "value": 1},
+            {"op": "set", "path": "/ultima_asistencia", "value": nueva_asistencia['fecha_registro']}
+        ]
+        operaciones += [{"op": "set", "path": f"/{c}", "value": v} for c, v in contacto.items() if (persona or {}).get(c) != v]
+        return await self.container.patch_item(item=cedula, partition_key=cedula, patch_operations=operaciones)
+
+    async def pasar_a_formato_anual(self, persona: Dict[str, Any], max_intentos: int = 3) -> Dict[str, Any]:
+        """Versión async de AsistentesRepository.pasar_a_formato_anual."""
+        cedula = persona['id']
+        for intento in range(max_intentos):
+            anios = {}
+            for anio, asistencias in agrupar_por_anio(persona.get('asistencias', [])).items():
+                doc = await self._leer_anio(cedula, anio) or nuevo_anio(cedula, anio)
+                doc['asistencias'] += [a for a in asistencias if not asistencia_de(doc, a.get('sesion_id'))]
+                anios[anio] = (await self.container.upsert_item(body=doc))['asistencias']
+            try:
+                return await self.container.replace_item(
+                    item=cedula, body={**perfil(persona), **resumen_anios(anios)},
+                    etag=persona.get('_etag'), match_condition=MatchConditions.IfNotModified
+                )
+            except exceptions.CosmosHttpResponseError as e:
+                if not es_conflicto_escritura(e) or intento == max_intentos - 1:
+                    raise
+            persona = await self._get_persona(cedula)
+            if persona is None or es_formato_anual(persona):
+                return persona
+        raise RuntimeError(f"No se pudo pasar a formato anual a {cedula} tras {max_intentos} intentos")
+
+    async def _get_persona(self, cedula: str) -> Optional[Dict[str, Any]]:
+        try:
+            return await self.container.read_item(item=cedula, partition_key=cedula)
+        except (exceptions.CosmosResourceNotFoundError, exceptions.CosmosHttpResponseError) as e:
+            if es_no_encontrado(e):
+                return await self._buscar_por_consulta(cedula)
+            raise
+
+    async def obtener_por_cedula(self, cedula: str) -> Optional[Dict[str, Any]]:
+        persona = await self._get_persona(cedula)
+        if persona and es_formato_anual(persona):
+            return componer_persona(persona, await self._leer_anios(persona))
+        return persona
+
+    async def actualizar_campos(self, cedula: str, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        persona = await self.obtener_por_cedula(cedula)
+        if not persona:
+            return None
+        for campo in CAMPOS_CONTACTO:
+            if campo in data and data[campo] is not None:
+                persona[campo] = data[campo]
+        if es_formato_anual(persona):
+            operaciones = [{"op": "set", "path": f"/{c}", "value": persona[c]} for c in CAMPOS_CONTACTO if data.get(c) is not None]
+            if operaciones:
+                guardada = await self.container.patch_item(item=persona['id'], partition_key=persona['id'], patch_operations=operaciones)
+                persona = {**guardada, 'asistencias': persona['asistencias']}
+        else:
+            persona = await self.container.replace_item(item=persona['id'], body=persona)
+        if self.vista is not None:
+            await self.vista.guardar_persona(persona)
+        return persona
+
+    async def listar_por_sesion(self, sesion_id: str, actividad_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        if self._leer_de_vista():
+            return await self.vista.listar_por_sesion(sesion_id, actividad_id)
+        parameters = [{"name": "@sesion_id", "value": sesion_id}]
+        items = await recolectar(self.container.query_items(query=QUERY_LISTAR_POR_SESION, parameters=parameters))
+        return sorted(items, key=lambda x: x.get('fecha_registro', ''))
+
+    async def verificar_duplicado(self, cedula: str, context_id: str) -> bool:
+        parameters = [{"name": "@cedula", "value": cedula}, {"name": "@context_id", "value": context_id}]
+        items = await recolectar(self.container.query_items(query=QUERY_DUPLICADO, parameters=parameters))
+        return len(items) > 0
+
+    async def contar_por_sesion(self, sesion_id: str, actividad_id: Optional[str] = None) -> int:
+        if self._leer_de_vista():
+            return await self.vista.contar_por_sesion(sesion_id, actividad_id)
+        parameters = [{"name": "@sesion_id", "value": sesion_id}]
+        items = await recolectar(self.container.query_items(query=QUERY_CONTAR_POR_SESION, parameters=parameters))
+        return items[0] if items else 0
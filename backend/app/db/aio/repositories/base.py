@@ -0,0 +1,15 @@
+from typing import Any, List
+from db.repositories.base import cosmos_retry_async
+from db.instrumentacion import etiquetar_metodos, instrumentar_async
+
+async def recolectar(items) -> List[Any]:
+    """Materializa un AsyncItemPaged en una lista."""
+    return [item async for item in items]
+
+class AsyncBaseRepository:
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        etiquetar_metodos(cls)
+
+    def __init__(self, container):
+        self.container = instrumentar_async(container)
@@ -0,0 +1,95 @@
+from typing import List, Optional, Dict, Any, Tuple
+from azure.cosmos import exceptions
+from db.repositories.sesiones_repo import (
+    QUERY_LISTAR_ADMIN, QUERY_LISTAR_ADMIN_RESUMEN, QUERY_POR_TOKEN, QUERY_TOKENS, QUERY_POR_FECHAS, construir_query_listar, operaciones_incremento, es_precondicion_fallida
+)
+from db.repositorio import resumen_sesion
+from .base import AsyncBaseRepository, cosmos_retry_async, recolectar
+
+class AsyncSesionesRepository(AsyncBaseRepository):
+    async def crear(self, sesion_data: Dict[str, Any]) -> Dict[str, Any]:
+        return await self.container.create_item(body=sesion_data)
+    
+    async def obtener_por_id(self, sesion_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            return await self.container.read_item(item=sesion_id, partition_key=sesion_id)
+        except (exceptions.CosmosResourceNotFoundError, exceptions.CosmosHttpResponseError) as e:
+            if getattr(e, 'status_code', 0) == 404 or isinstance(e, exceptions.CosmosResourceNotFoundError):
+                return None
+            raise
+    
+    async def listar(self, owner_email: Optional[str] = None, tipos_actividad: Optional[List[str]] = None, resumen: bool = False) -> List[Dict[str, Any]]:
+        async def _query():
+            query, parameters = construir_query_listar(owner_email, tipos_actividad, resumen)
+            return await recolectar(self.container.query_items(query=query, parameters=parameters))
+        items = await cosmos_retry_async(_query)
+        return [resumen_sesion(s) for s in items] if resumen else items
+
+    async def listar_admin(self, admin_email: str, resumen: bool = False) -> List[Dict[str, Any]]:
+        async def _query():
+            parameters = [{"name": "@admin", "value": admin_email}]
+            query = QUERY_LISTAR_ADMIN_RESUMEN if resumen else QUERY_LISTAR_ADMIN
+            return await recolectar(self.container.query_items(query=query, parameters=parameters))
+        items = await cosmos_retry_async(_query)
+        return [resumen_sesion(s) for s in items] if resumen else items
+
+    async def _pagina(self, query: str, parameters: List[Dict[str, Any]], limite: int, continuation: Optional[str]) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        async def _query():
+            paginas = self.container.query_items(query=query, parameters=parameters, max_item_count=limite).by_page(continuation)
+            try:
+                items = await recolectar(await paginas.__anext__())
+            except StopAsyncIteration:
+                items = []
+            return items, paginas.continuation_token
+        return await cosmos_retry_async(_query)
+
+    async def listar_pagina(self, owner_email: Optional[str], tipos_actividad: Optional[List[str]], limite: int, continuation: Optional[str] = None, resumen: bool = False) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        query, parameters = construir_query_listar(owner_email, tipos_actividad, resumen)
+        items, siguiente = await self._pagina(query, parameters, limite, continuation)
+        return ([resumen_sesion(s) for s in items] if resumen else items), siguiente
+
+    async def listar_admin_pagina(self, admin_email: str, limite: int, continuation: Optional[str] = None, resumen: bool = False) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        query = QUERY_LISTAR_ADMIN_RESUMEN if resumen else QUERY_LISTAR_ADMIN
+        items, siguiente = await self._pagina(query, [{"name": "@admin", "value": admin_email}], limite, continuation)
+        return ([resumen_sesion(s) for s in items] if resumen else items), siguiente
+    
+    async def obtener_por_token(self, token: str) -> Optional[Dict[str, Any]]:
+        parameters = [{"name": "@token", "value": token}]
+        items = await recolectar(self.container.query_items(query=QUERY_POR_TOKEN, parameters=parameters))
+        return items[0] if items else None
+    
+    async def listar_tokens(self) -> List[Dict[str, Any]]:
+        async def _query():
+            return await recolectar(self.container.query_items(query=QUERY_TOKENS))
+        return await cosmos_retry_async(_query)
+    
+    async def listar_por_fechas(self, desde: str, hasta: str) -> List[Dict[str, Any]]:
+        async def _query():
+            parameters = [{"name": "@desde", "value": desde}, {"name": "@hasta", "value": hasta}]
+            return await recolectar(self.container.query_items(query=QUERY_POR_FECHAS, parameters=parameters))
+        return await cosmos_retry_async(_query)
+    
+    async def incrementar_contadores(self, sesion_id: str, ocurrencia_id: Optional[str] = None, delta: int = 1, ocurrencias: Optional[List[Dict[str, Any]]] = None, max_intentos: int = 3) -> Optional[Dict[str, Any]]:
+        for intento in range(max_intentos):
+            if ocurrencias is None:
+                sesion = await self.obtener_por_id(sesion_id)
+                if not sesion:
+                    return None
+                ocurrencias = sesion.get('ocurrencias', [])
+            ops, filtro = operaciones_incremento(ocurrencias, ocurrencia_id, delta)
+            try:
+                return await self.container.patch_item(item=sesion_id, partition_key=sesion_id, patch_operations=ops, filter_predicate=filtro)
+            except exceptions.CosmosHttpResponseError as e:
+                if es_precondicion_fallida(e) and intento < max_intentos - 1:
+                    ocurrencias = None
+                    continue
+                if getattr(e, 'status_code', 0) == 404:
+                    return None
+                raise
+        return None
+    
+    async def actualizar(self, sesion_id: str, sesion_data: Dict[str, Any]) -> Dict[str, Any]:
+        return await self.container.replace_item(item=sesion_id, body=sesion_data)
+    
+    async def eliminar(self, sesion_id: str) -> None:
+        await self.container.delete_item(item=sesion_id, partition_key=sesion_id)
@@ -0,0 +1,27 @@
+from typing import List, Optional, Dict, Any
+from azure.cosmos import exceptions
+from db.repositories.tokens_repo import TokensRepository
+from .base import AsyncBaseRepository
+
+class AsyncTokensRepository(AsyncBaseRepository):
+    async def guardar(self, sesion_id: str, oc: Dict[str, Any]) -> Dict[str, Any]:
+        return await self.container.upsert_item(body=TokensRepository._documento(sesion_id, oc))
+
+    async def guardar_ocurrencias(self, sesion_id: str, ocurrencias: List[Dict[str, Any]]) -> None:
+        for oc in ocurrencias:
+            if oc.get('token'):
+                await self.guardar(sesion_id, oc)
+
+    async def obtener(self, token: str) -> Optional[Dict[str, Any]]:
+        try:
+            return await self.container.read_item(item=token, partition_key=token)
+        except (exceptions.CosmosResourceNotFoundError, exceptions.CosmosHttpResponseError) as e:
+            if getattr(e, 'status_code', 0) == 404 or isinstance(e, exceptions.CosmosResourceNotFoundError):
+                return None
+            raise
+
+    async def eliminar(self, token: str) -> None:
+        try:
+            await self.container.delete_item(item=token, partition_key=token)
+        except exceptions.CosmosResourceNotFoundError:
+            pass
@@ -0,0 +1,52 @@
+from typing import List, Optional, Dict, Any
+from azure.cosmos import exceptions
+from .base import AsyncBaseRepository, recolectar
+
+class AsyncUsuariosRepository(AsyncBaseRepository):
+    async def crear(self, usuario_data: Dict[str, Any]) -> Dict[str, Any]:
+        return await self.container.create_item(body=usuario_data)
+    
+    async def listar(self) -> List[Dict[str, Any]]:
+        query = "SELECT * FROM c ORDER BY c.fecha_ingreso DESC"
+        return await recolectar(self.container.query_items(query=query))
+    
+    async def obtener_por_id(self, usuario_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            return await self.container.read_item(item=usuario_id, partition_key=usuario_id)
+        except (exceptions.CosmosResourceNotFoundError, exceptions.CosmosHttpResponseError) as e:
+            if getattr(e, 'status_code', 0) == 404 or isinstance(e, exceptions.CosmosResourceNotFoundError):
+                return None
+            raise
+    
+    async def obtener_por_email(self, email: str) -> Optional[Dict[str, Any]]:
+        query = "SELECT * FROM c WHERE LOWER(c.email) = LOWER(@email)"
+        parameters = [{"name": "@email", "value": email}]
+        items = await recolectar(self.container.query_items(query=query, parameters=parameters))
+        return items[0] if items else None
+    
+    async def actualizar(self, usuario_id: str, usuario_data: Dict[str, Any]) -> Dict[str, Any]:
+        existing = await self.obtener_por_id(usuario_id)
+        if not existing:
+            raise exceptions.CosmosResourceNotFoundError()
+        existing.update(usuario_data)
+        return await self.container.replace_item(item=usuario_id, body=existing)
+    
+    async def eliminar(self, usuario_id: str) -> None:
+        await self.container.delete_item(item=usuario_id, partition_key=usuario_id)
+
+class AsyncConfiguracionRepository(AsyncBaseRepository):
+    async def obtener_por_id(self, config_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            return await self.container.read_item(item=config_id, partition_key=config_id)
+        except (exceptions.CosmosResourceNotFoundError, exceptions.CosmosHttpResponseError) as e:
+            if getattr(e, 'status_code', 0) == 404 or isinstance(e, exceptions.CosmosResourceNotFoundError):
+                return None
+            raise
+    
+    async def crear(self, config_id: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        data["id"] = config_id
+        return await self.container.create_item(body=data)
+    
+    async def actualizar(self, config_id: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        data["id"] = config_id
+        return await self.container.upsert_item(body=data)
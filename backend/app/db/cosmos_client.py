@@ -3,21 +3,31 @@ from typing import Optional, Dict, Any
 import time
 
 from core.config import settings
+from .indexacion import politica_indexacion, sincronizar_indexacion
+from .reintentos import OPCIONES_CLIENTE
+from .repositorio import RepositorioBase
 from .repositories.sesiones_repo import SesionesRepository
 from .repositories.asistentes_repo import AsistentesRepository
 from .repositories.usuarios_repo import UsuariosRepository, ConfiguracionRepository
+from .repositories.tokens_repo import TokensRepository
+from .repositories.asistencias_sesion_repo import AsistenciasSesionRepository
+from .repositories.agregados_repo import AgregadosRepository
 
-class CosmosDBClient:
+class CosmosDBClient(RepositorioBase):
     def __init__(self):
-        self.client = CosmosClient(settings.COSMOS_ENDPOINT, settings.COSMOS_KEY)
+        self.client = CosmosClient(settings.COSMOS_ENDPOINT, settings.COSMOS_KEY, **OPCIONES_CLIENTE)
         self.database_name = settings.COSMOS_DATABASE_NAME
         self.database = None
+        self.contenedores = []
         
         # Repositorios
         self.sesiones = None
         self.asistentes = None
         self.usuarios = None
         self.configuracion = None
+        self.tokens = None
+        self.asistencias_sesion = None
+        self.agregados = None
         
         self._initialize_database()
     
@@ -27,19 +37,34 @@ class CosmosDBClient:
         for attempt in range(max_retries):
             try:
                 self.database = self.client.create_database_if_not_exists(id=self.database_name)
+                self.contenedores = []
                 
-                self.sesiones_container = self.database.create_container_if_not_exists(id="sesiones", partition_key=PartitionKey(path="/id"))
+                self.sesiones_container = self._contenedor("sesiones", "/id")
                 self.sesiones = SesionesRepository(self.sesiones_container)
                 
-                self.asistentes_container = self.database.create_container_if_not_exists(id="asistentes", partition_key=PartitionKey(path="/id"))
-                self.asistentes = AsistentesRepository(self.asistentes_container)
+                # Contadores y resúmenes derivados del change feed (ver AgregadosRepository)
+                if settings.CHANGE_FEED_AGREGADOS:
+                    self.agregados_container = self._contenedor("agregados", "/id")
+                    self.agregados = AgregadosRepository(self.agregados_container)
+                    self.contadores_derivados = True
+
+                # Vista materializada de asistencias por sesión (ver AsistenciasSesionRepository)
+                self.asistencias_sesion_container = self._contenedor("asistencias_sesion", "/actividad_id")
+                self.asistencias_sesion = AsistenciasSesionRepository(self.asistencias_sesion_container)
+
+                self.asistentes_container = self._contenedor("asistentes", "/id")
+                self.asistentes = AsistentesRepository(self.asistentes_container, vista=self.asistencias_sesion, agregados=self.agregados)
                 
-                self.usuarios_container = self.database.create_container_if_not_exists(id="usuarios", partition_key=PartitionKey(path="/id"))
+                self.usuarios_container = self._contenedor("usuarios", "/id")
                 self.usuarios = UsuariosRepository(self.usuarios_container)
                 
-                self.config_container = self.database.create_container_if_not_exists(id="configuracion", partition_key=PartitionKey(path="/id"))
+                self.config_container = self._contenedor("configuracion", "/id")
                 self.configuracion = ConfiguracionRepository(self.config_container)
                 
+                self.tokens_container = self._contenedor("tokens", "/id")
+                self.tokens = TokensRepository(self.tokens_container)
+                
+                self._verificar_indexacion()
                 print("✅ CosmosDB inicializado correctamente con repositorios")
                 return
             except Exception as e:
@@ -49,24 +74,94 @@ class CosmosDBClient:
                 else:
                     raise
 
-    # Proxies para compatibilidad
+    def _contenedor(self, nombre: str, particion: str):
+        # Los contenedores nuevos se crean ya con la política de indexación del código (db/indexacion.py)
+        self.contenedores.append(nombre)
+        return self.database.create_container_if_not_exists(
+            id=nombre, partition_key=PartitionKey(path=particion), indexing_policy=politica_indexacion(nombre)
+        )
+
+    def _verificar_indexacion(self):
+        """Compara la indexación de los contenedores existentes con la del código; la aplica si COSMOS_INDEXACION_AL_INICIAR."""
+        try:
+            resultado = sincronizar_indexacion(self.database, self.contenedores, aplicar=settings.COSMOS_INDEXACION_AL_INICIAR)
+        except Exception as e:
+            print(f"⚠️ No se pudo verificar la política de indexación: {type(e).__name__}: {e}")
+            return
+        for nombre, r in resultado.items():
+            if r["aplicada"]:
+                print(f"🔧 Política de indexación v{r['version']} aplicada en {nombre} ({len(r['cambios'])} cambios; el índice se reconstruye en segundo plano)")
+            elif r["cambios"]:
+                print(f"⚠️ {nombre}: la política de indexación difiere de la v{r['version']} ({len(r['cambios'])} cambios). Aplicar con: python aplicar_indexacion.py --aplicar")
+
+    # Proxies: interfaz db.repositorio.Repositorio
     def crear_sesion(self, data): return self.sesiones.crear(data)
     def obtener_sesion(self, id): return self.sesiones.obtener_por_id(id)
+    def obtener_sesiones(self, ids): return self.sesiones.obtener_varias(ids)
     def listar_sesiones(self, owner=None, tipos=None): return self.sesiones.listar(owner, tipos)
     def listar_sesiones_admin(self, email): return self.sesiones.listar_admin(email)
+    def listar_sesiones_pagina(self, owner, tipos, limite, cursor=None, resumen=False): return self.sesiones.listar_pagina(owner, tipos, limite, cursor, resumen)
+    def listar_sesiones_admin_pagina(self, email, limite, cursor=None, resumen=False): return self.sesiones.listar_admin_pagina(email, limite, cursor, resumen)
+    # Proyección en la consulta: sin contenido ni ocurrencias (menos RU y menos bytes)
+    def listar_sesiones_resumen(self, owner=None, tipos=None): return self.sesiones.listar(owner, tipos, resumen=True)
+    def listar_sesiones_admin_resumen(self, email): return self.sesiones.listar_admin(email, resumen=True)
+    def listar_sesiones_por_fechas(self, desde, hasta): return self.sesiones.listar_por_fechas(desde, hasta)
     def obtener_sesion_por_token(self, token): return self.sesiones.obtener_por_token(token)
+    def listar_tokens(self): return self.sesiones.listar_tokens()
     def actualizar_sesion(self, id, data): return self.sesiones.actualizar(id, data)
-    def eliminar_sesion(self, id): return self.sesiones.eliminar(id)
+    def incrementar_contadores(self, s_id, oc_id=None, delta=1, ocurrencias=None): return self.sesiones.incrementar_contadores(s_id, oc_id, delta, ocurrencias)
+
+    def eliminar_sesion(self, id):
+        self.sesiones.eliminar(id)
+        if self.agregados is not None:
+            self.agregados.sesion_eliminada(id)
+        return True
+
+    def superponer_agregados(self, sesiones):
+        return self.agregados.superponer_sesiones(sesiones) if self.agregados is not None else sesiones
+
+    def obtener_token(self, token): return self.tokens.obtener(token)
+    def guardar_tokens(self, s_id, ocurrencias): return self.tokens.guardar_ocurrencias(s_id, ocurrencias)
+    def eliminar_tokens(self, ocurrencias): return self.tokens.eliminar_ocurrencias(ocurrencias)
     
     def crear_o_actualizar_asistente(self, data, s_id): return self.asistentes.crear_o_actualizar(data, s_id)
     def obtener_asistente(self, id, s_id): return self.asistentes.obtener_por_id(id, s_id)
-    def listar_asistentes_por_sesion(self, s_id): return self.asistentes.listar_por_sesion(s_id)
+    def registrar_asistencia(self, data, s_id): return self.asistentes.registrar_asistencia(data, s_id)
+    def obtener_persona(self, cedula): return self.asistentes.obtener_por_cedula(cedula)
+    def actualizar_asistente(self, cedula, data): return self.asistentes.actualizar_campos(cedula, data)
+    def listar_asistentes_por_sesion(self, s_id, actividad_id=None): return self.asistentes.listar_por_sesion(s_id, actividad_id)
     def verificar_asistente_duplicado(self, c, s_id): return self.asistentes.verificar_duplicado(c, s_id)
-    def eliminar_asistentes_por_sesion(self, s_id): return self.asistentes.eliminar_por_sesion(s_id)
+    def eliminar_asistentes_por_sesion(self, s_id, actividad_id=None): return self.asistentes.eliminar_por_sesion(s_id, actividad_id)
+    def listar_personas(self): return self.asistentes.listar_personas()
+    def listar_asistencias_planas(self): return self.asistentes.listar_asistencias_planas()
+
+    def resumen_participantes(self, owner_email=None):
+        # Sin filtro por creador el resumen ya está calculado en los agregados de persona
+        if self.agregados is not None and not owner_email:
+            return self.agregados.resumen_personas()
+        return super().resumen_participantes(owner_email)
+
+    def registrar_lote(self, lote, s_id):
+        """Camino síncrono (sin cliente aio): una escritura por persona; los fallos quedan como 'error'."""
+        estados = []
+        for data in lote:
+            try:
+                estados.append("creado" if self.asistentes.registrar_asistencia(data, s_id)[1] else "duplicado")
+            except Exception as e:
+                print(f"❌ [registrar_lote] Error registrando {data['cedula']}: {type(e).__name__}: {e}")
+                estados.append("error")
+        return estados
     
     def crear_usuario(self, data): return self.usuarios.crear(data)
-    def listar_usuarios(self): return self.usuarios.listar()
-    def obtener_usuario_por_id(self, id): return self.usuarios.obtener_por_id(id)
+    def listar_usuarios(self): return self._con_formularios(self.usuarios.listar())
+
+    def obtener_usuario_por_id(self, id):
+        usuario = self.usuarios.obtener_por_id(id)
+        return self._con_formularios([usuario])[0] if usuario else None
+
+    def _con_formularios(self, usuarios):
+        # formularios_creados sale del agregado por creador cuando lo mantiene el change feed
+        return self.agregados.superponer_usuarios(usuarios) if self.agregados is not None else usuarios
     def obtener_usuario_por_email(self, e): return self.usuarios.obtener_por_email(e)
     def actualizar_usuario(self, id, data): return self.usuarios.actualizar(id, data)
     def eliminar_usuario(self, id): return self.usuarios.eliminar(id)
@@ -0,0 +1,130 @@
+from typing import Any, Dict, Iterable, List, Optional
+
+from azure.cosmos import PartitionKey
+
+# Políticas de indexación por contenedor, versionadas con el código.
+# Por defecto CosmosDB indexa todas las rutas: cada escritura paga RU por indexar `contenido`, cada
+# campo de cada ocurrencia y cada asistencia. Aquí se indexa solo lo que filtran u ordenan las
+# consultas de los repositorios (db/repositories) y se excluye el resto (/*).
+# Al agregar una consulta que filtre u ordene por otra ruta hay que incluirla aquí y subir la versión:
+# un ORDER BY sobre una ruta excluida falla, y un filtro sobre ella recorre todo el contenedor.
+POLITICAS_INDEXACION: Dict[str, Dict[str, Any]] = {
+    "sesiones": {
+        "version": 1,
+        # listar / listar_admin (created_by, actividad, ORDER BY created_at), obtener_por_token, listar_por_fechas
+        "incluidas": ["/created_by/?", "/actividad/?", "/created_at/?", "/token/?", "/ocurrencias/[]/token/?", "/ocurrencias/[]/fecha/?"],
+        # Filtro por igualdad + ORDER BY c.created_at DESC (construir_query_listar)
+        "compuestos": [
+            [("/created_by", "ascending"), ("/created_at", "descending")],
+            [("/actividad", "ascending"), ("/created_at", "descending")],
+            [("/created_by", "ascending"), ("/actividad", "ascending"), ("/created_at", "descending")]
+        ]
+    },
+    "asistentes": {
+        "version": 2,
+        # JOIN a IN c.asistencias WHERE a.sesion_id / a.actividad_id (la cédula es el id);
+        # tipo y cedula distinguen los documentos por año (ASISTENCIAS_POR_ANIO)
+        "incluidas": ["/asistencias/[]/sesion_id/?", "/asistencias/[]/actividad_id/?", "/tipo/?", "/cedula/?"]
+    },
+    "asistencias_sesion": {
+        "version": 1,
+        "incluidas": ["/sesion_id/?", "/actividad_id/?"]
+    },
+    "usuarios": {
+        "version": 1,
+        # obtener_por_email y listar (ORDER BY c.fecha_ingreso DESC)
+        "incluidas": ["/email/?", "/fecha_ingreso/?"]
+    },
+    "agregados": {
+        "version": 1,
+        # resumen_participantes (tipo = 'persona' AND total_asistencias > 0); lo demás son lecturas por id
+        "incluidas": ["/tipo/?", "/total_asistencias/?"]
+    },
+    # Solo lecturas puntuales por id: no se indexa ninguna ruta
+    "configuracion": {"version": 1, "incluidas": []},
+    "tokens": {"version": 1, "incluidas": []}
+}
+
+# Ruta que CosmosDB excluye siempre y agrega a la política que devuelve
+_RUTA_ETAG = '/"_etag"/?'
+
+
+def politica_indexacion(contenedor: str) -> Dict[str, Any]:
+    """indexingPolicy de CosmosDB para `contenedor` (create_container / replace_container)."""
+    definicion = POLITICAS_INDEXACION[contenedor]
+    politica = {
+        "indexingMode": "consistent",
+        "automatic": True,
+        "includedPaths": [{"path": ruta} for ruta in definicion["incluidas"]],
+        "excludedPaths": [{"path": "/*"}, {"path": _RUTA_ETAG}]
+    }
+    if definicion.get("compuestos"):
+        politica["compositeIndexes"] = [
+            [{"path": ruta, "order": orden} for ruta, orden in compuesto]
+            for compuesto in definicion["compuestos"]
+        ]
+    return politica
+
+
+def _normalizar(politica: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Forma comparable de una política (CosmosDB agrega índices y rutas por defecto al devolverla)."""
+    politica = politica or {}
+    return {
+        "modo": (politica.get("indexingMode") or "consistent").lower(),
+        "incluidas": sorted(r["path"] for r in politica.get("includedPaths", [])),
+        "excluidas": sorted({r["path"] for r in politica.get("excludedPaths", [])} | {_RUTA_ETAG}),
+        "compuestos": sorted(
+            ", ".join(f'{c["path"]} {c.get("order", "ascending").lower()}' for c in compuesto)
+            for compuesto in politica.get("compositeIndexes", [])
+        )
+    }
+
+
+def diferencias(actual: Optional[Dict[str, Any]], deseada: Dict[str, Any]) -> List[str]:
+    """Cambios necesarios para pasar de la política `actual` a la `deseada` (vacío si coinciden)."""
+    a, d = _normalizar(actual), _normalizar(deseada)
+    cambios = []
+    if a["modo"] != d["modo"]:
+        cambios.append(f"modo: {a['modo']} -> {d['modo']}")
+    for clave, nombre in (("incluidas", "incluir"), ("excluidas", "excluir"), ("compuestos", "compuesto")):
+        cambios += [f"+ {nombre} {r}" for r in d[clave] if r not in a[clave]]
+        cambios += [f"- {nombre} {r}" for r in a[clave] if r not in d[clave]]
+    return cambios
+
+
+def sincronizar_indexacion(database, contenedores: Iterable[str], aplicar: bool) -> Dict[str, Dict[str, Any]]:
+    """
+    Compara la política vigente de cada contenedor con la del código y, con `aplicar`, la reemplaza.
+    CosmosDB reconstruye el índice en segundo plano sin cortar lecturas ni escrituras; mientras tanto
+    las consultas que dependen de rutas nuevas pueden devolver resultados incompletos.
+    Devuelve por contenedor la versión, los cambios y si se aplicaron.
+    """
+    resultado = {}
+    for nombre in contenedores:
+        container = database.get_container_client(nombre)
+        propiedades = container.read()
+        deseada = politica_indexacion(nombre)
+        cambios = diferencias(propiedades.get("indexingPolicy"), deseada)
+        if cambios and aplicar:
+            # replace_container restablece lo que no se indique: se conservan clave de partición, TTL y conflictos
+            database.replace_container(
+                container,
+                partition_key=PartitionKey(path=propiedades["partitionKey"]["paths"][0], kind=propiedades["partitionKey"].get("kind", "Hash")),
+                indexing_policy=deseada,
+                default_ttl=propiedades.get("defaultTtl"),
+                conflict_resolution_policy=propiedades.get("conflictResolutionPolicy")
+            )
+        resultado[nombre] = {
+            "version": POLITICAS_INDEXACION[nombre]["version"],
+            "cambios": cambios,
+            "aplicada": bool(cambios) and aplicar
+        }
+    return resultado
+
+
+def progreso_indexacion(database, contenedor: str) -> Optional[int]:
+    """Porcentaje de la reconstrucción del índice tras un cambio de política (100 = terminada)."""
+    cabeceras = {}
+    database.get_container_client(contenedor).read(populate_quota_info=True, response_hook=lambda h, _: cabeceras.update(h))
+    valor = cabeceras.get("x-ms-documentdb-collection-index-transformation-progress")
+    return int(valor) if valor is not None else None
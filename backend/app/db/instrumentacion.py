@@ -0,0 +1,394 @@
+import functools
+import inspect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Optional
+
+from core.config import settings
+from core.metrics import Histograma, metricas
+from db.reintentos import operacion_idempotente, politica_cosmos
+
+# Operaciones puntuales de ContainerProxy que se miden (el resto se delega sin tocar)
+OPERACIONES_PUNTUALES = {"read_item", "create_item", "upsert_item", "replace_item", "delete_item", "patch_item"}
+OPERACIONES_CONSULTA = {"query_items", "query_items_change_feed"}
+
+# Marca de consulta sin resultados
+_FIN = object()
+
+# Acumulado de la petición HTTP en curso (lo abre el middleware de main.py)
+_peticion_actual: ContextVar[Optional[Dict[str, float]]] = ContextVar("cosmos_peticion", default=None)
+
+
+# `Repositorio.metodo` en curso, al que se atribuyen las llamadas a CosmosDB: lo fijan los métodos
+# públicos de los repositorios (etiquetar_metodos) o, fuera de ellos, operacion()
+_metodo_actual: ContextVar[str] = ContextVar("cosmos_metodo", default="sin_repositorio")
+
+
+@contextmanager
+def operacion(nombre: str):
+    """Atribuye a `nombre` las llamadas a CosmosDB hechas dentro del bloque."""
+    token = _metodo_actual.set(nombre)
+    try:
+        yield
+    finally:
+        _metodo_actual.reset(token)
+
+
+def _etiquetado(nombre: str, fn: Callable) -> Callable:
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def envuelta_async(*args, **kwargs):
+            token = _metodo_actual.set(nombre)
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                _metodo_actual.reset(token)
+        return envuelta_async
+
+    @functools.wraps(fn)
+    def envuelta(*args, **kwargs):
+        token = _metodo_actual.set(nombre)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _metodo_actual.reset(token)
+    return envuelta
+
+
+def etiquetar_metodos(cls) -> None:
+    """
+    Envuelve los métodos públicos definidos en `cls` para que fijen su etiqueta `Clase.metodo`
+    (los privados, como _consultar, quedan atribuidos al método público que los llamó; un método
+    público llamado desde otro toma su propia etiqueta). Lo invocan las clases base de repositorio.
+    """
+    for nombre, fn in list(vars(cls).items()):
+        if nombre.startswith('_') or not inspect.isfunction(fn):
+            continue
+        setattr(cls, nombre, _etiquetado(f"{cls.__name__}.{nombre}", fn))
+
+
+def _ru(headers) -> float:
+    try:
+        return float((headers or {}).get('x-ms-request-charge') or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class EstadisticasCosmos:
+    """Consumo de CosmosDB (RU, latencia, documentos y páginas) por método de repositorio y por endpoint."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metodos: Dict[str, Dict[str, Any]] = {}
+        self._endpoints: Dict[str, Dict[str, Any]] = {}
+
+    @staticmethod
+    def _entrada() -> Dict[str, Any]:
+        return {"llamadas": 0, "ru_total": 0.0, "items": 0, "paginas": 0, "operaciones": {}, "ru": Histograma(), "duracion_s": Histograma()}
+
+    def registrar(self, contenedor: str, operacion: str, metodo: str, ru: float, items: int, paginas: int, duracion: float):
+        with self._lock:
+            e = self._metodos.setdefault(metodo, self._entrada())
+            e["llamadas"] += 1
+            e["ru_total"] += ru
+            e["items"] += items
+            e["paginas"] += paginas
+            clave = f"{contenedor}.{operacion}"
+            e["operaciones"][clave] = e["operaciones"].get(clave, 0) + 1
+            e["ru"].observar(ru)
+            e["duracion_s"].observar(duracion)
+        metricas.incr("cosmos.llamadas")
+        metricas.incr("cosmos.ru_total", ru)
+        metricas.observar("cosmos.duracion_s", duracion)
+        resumen = _peticion_actual.get()
+        if resumen is not None:
+            # Las llamadas en el threadpool (ejecutar_sync) comparten el mismo dict de la petición
+            with self._lock:
+                resumen["llamadas"] += 1
+                resumen["ru"] += ru
+                resumen["items"] += items
+                resumen["duracion_s"] += duracion
+
+    def registrar_peticion(self, endpoint: str, resumen: Dict[str, float]):
+        with self._lock:
+            e = self._endpoints.setdefault(endpoint, {"peticiones": 0, "llamadas": 0, "ru_total": 0.0, "ru": Histograma()})
+            e["peticiones"] += 1
+            e["llamadas"] += resumen["llamadas"]
+            e["ru_total"] += resumen["ru"]
+            e["ru"].observar(resumen["ru"])
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Métodos y endpoints ordenados por RU consumidas (mayor primero)."""
+        with self._lock:
+            metodos = {
+                k: {**{c: v for c, v in e.items() if c not in ("ru", "duracion_s")}, "ru_total": round(e["ru_total"], 2),
+                    "ru": e["ru"].resumen(), "duracion_s": e["duracion_s"].resumen()}
+                for k, e in sorted(self._metodos.items(), key=lambda kv: -kv[1]["ru_total"])
+            }
+            endpoints = {
+                k: {"peticiones": e["peticiones"], "llamadas": e["llamadas"], "ru_total": round(e["ru_total"], 2), "ru_por_peticion": e["ru"].resumen()}
+                for k, e in sorted(self._endpoints.items(), key=lambda kv: -kv[1]["ru_total"])
+            }
+        return {"habilitada": settings.COSMOS_INSTRUMENTACION, "metodos": metodos, "endpoints": endpoints}
+
+
+estadisticas_cosmos = EstadisticasCosmos()
+
+
+def iniciar_peticion():
+    """Abre el acumulado de Cosmos de una petición; devuelve el token para cerrar_peticion."""
+    return _peticion_actual.set({"llamadas": 0, "ru": 0.0, "items": 0, "duracion_s": 0.0})
+
+
+def cerrar_peticion(token) -> Dict[str, float]:
+    resumen = _peticion_actual.get()
+    _peticion_actual.reset(token)
+    return resumen
+
+
+class _Medicion:
+    """RU y páginas de una llamada, sumadas desde el response_hook del SDK (una vez por página en consultas)."""
+
+    def __init__(self, contenedor: str, operacion: str, kwargs: Dict[str, Any]):
+        self.contenedor = contenedor
+        self.operacion = operacion
+        self.habilitada = settings.COSMOS_INSTRUMENTACION
+        self.metodo = _metodo_actual.get()
+        self.ru = 0.0
+        self.paginas = 0
+        self.items = 0
+        self.inicio = time.perf_counter()
+        self.registrada = False
+        hook_original = kwargs.get('response_hook')
+
+        def hook(headers, cuerpo):
+            self.ru += _ru(headers)
+            self.paginas += 1
+            if hook_original:
+                hook_original(headers, cuerpo)
+        kwargs['response_hook'] = hook
+
+    def registrar(self):
+        if self.registrada or not self.habilitada:
+            return
+        self.registrada = True
+        estadisticas_cosmos.registrar(self.contenedor, self.operacion, self.metodo, self.ru, self.items,
+                                      self.paginas, time.perf_counter() - self.inicio)
+
+    def registrar_pagina(self):
+        """by_page(): cada página leída se registra como una llamada (quien lee una sola no agota el iterador)."""
+        if not self.habilitada or not self.paginas:
+            return
+        ahora = time.perf_counter()
+        estadisticas_cosmos.registrar(self.contenedor, self.operacion, self.metodo, self.ru, self.items,
+                                      self.paginas, ahora - self.inicio)
+        self.ru, self.items, self.paginas, self.inicio = 0.0, 0, 0, ahora
+
+
+class _ConsultaInstrumentada:
+    """
+    Envuelve el ItemPaged de una consulta: registra al agotar la iteración (o al cerrarla antes).
+    La primera página pasa por la política de reintentos (si falla se rehace la consulta); una falla
+    en páginas posteriores se propaga, porque ya se entregaron documentos.
+    """
+
+    def __init__(self, crear: Callable[[], Any], medicion: _Medicion):
+        self._crear = crear
+        self._paginado = crear()
+        self._medicion = medicion
+
+    def _primero(self):
+        if self._paginado is None:
+            self._paginado = self._crear()
+        it = iter(self._paginado)
+        try:
+            return it, next(it, _FIN)
+        except Exception:
+            self._paginado = None
+            raise
+
+    def __iter__(self):
+        try:
+            it, primero = politica_cosmos.ejecutar(self._primero)
+            if primero is _FIN:
+                return
+            self._medicion.items += 1
+            yield primero
+            for item in it:
+                self._medicion.items += 1
+                yield item
+        finally:
+            self._medicion.registrar()
+
+    def by_page(self, *args, **kwargs):
+        return _PaginasInstrumentadas(self._paginado.by_page(*args, **kwargs), self._medicion)
+
+    def __getattr__(self, nombre):
+        return getattr(self._paginado, nombre)
+
+
+class _PaginasInstrumentadas:
+    """
+    Iterador de páginas de by_page(); conserva continuation_token y demás atributos del original.
+    El consumo se registra al entregar cada página.
+    """
+
+    def __init__(self, paginas, medicion: _Medicion):
+        self._paginas = paginas
+        self._medicion = medicion
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            items = list(next(self._paginas))
+        except BaseException:
+            # También la última respuesta vacía (o fallida) consume RU
+            self._medicion.registrar_pagina()
+            raise
+        self._medicion.items += len(items)
+        self._medicion.registrar_pagina()
+        return items
+
+    def __getattr__(self, nombre):
+        return getattr(self._paginas, nombre)
+
+
+class ContenedorInstrumentado:
+    """
+    ContainerProxy que pasa cada operación por la política de reintentos y circuito (db/reintentos.py);
+    create_item y patch_item con incr solo se reintentan si CosmosDB no llegó a ejecutarlos (429/449)
+    y, con COSMOS_INSTRUMENTACION, mide RU (x-ms-request-charge), latencia, documentos y páginas,
+    atribuidos al método del repositorio que la hizo. El resto de atributos se delega.
+    """
+
+    def __init__(self, container):
+        self._container = container
+
+    def __getattr__(self, nombre):
+        atributo = getattr(self._container, nombre)
+        if nombre in OPERACIONES_PUNTUALES:
+            def medida(*args, **kwargs):
+                medicion = _Medicion(self._container.id, nombre, kwargs)
+                try:
+                    resultado = politica_cosmos.ejecutar(lambda: atributo(*args, **kwargs), operacion_idempotente(nombre, args, kwargs))
+                    medicion.items = 1 if resultado is not None else 0
+                    return resultado
+                finally:
+                    medicion.registrar()
+            return medida
+        if nombre in OPERACIONES_CONSULTA:
+            def consulta(*args, **kwargs):
+                medicion = _Medicion(self._container.id, nombre, kwargs)
+                return _ConsultaInstrumentada(lambda: atributo(*args, **kwargs), medicion)
+            return consulta
+        return atributo
+
+
+class _ConsultaAsyncInstrumentada:
+    def __init__(self, crear: Callable[[], Any], medicion: _Medicion):
+        self._crear = crear
+        self._paginado = crear()
+        self._medicion = medicion
+
+    async def _primero(self):
+        if self._paginado is None:
+            self._paginado = self._crear()
+        it = self._paginado.__aiter__()
+        try:
+            return it, await it.__anext__()
+        except StopAsyncIteration:
+            return it, _FIN
+        except Exception:
+            self._paginado = None
+            raise
+
+    async def __aiter__(self):
+        try:
+            it, primero = await politica_cosmos.ejecutar_async(self._primero)
+            if primero is _FIN:
+                return
+            self._medicion.items += 1
+            yield primero
+            async for item in it:
+                self._medicion.items += 1
+                yield item
+        finally:
+            self._medicion.registrar()
+
+    def by_page(self, *args, **kwargs):
+        return _PaginasAsyncInstrumentadas(self._paginado.by_page(*args, **kwargs), self._medicion)
+
+    def __getattr__(self, nombre):
+        return getattr(self._paginado, nombre)
+
+
+async def _iterar_async(items):
+    for item in items:
+        yield item
+
+
+class _PaginasAsyncInstrumentadas:
+    """Variante async de _PaginasInstrumentadas (cada página, ya leída, se entrega como iterable async)."""
+
+    def __init__(self, paginas, medicion: _Medicion):
+        self._paginas = paginas
+        self._medicion = medicion
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            pagina = await self._paginas.__anext__()
+            items = [item async for item in pagina]
+        except BaseException:
+            self._medicion.registrar_pagina()
+            raise
+        self._medicion.items += len(items)
+        self._medicion.registrar_pagina()
+        return _iterar_async(items)
+
+    def __getattr__(self, nombre):
+        return getattr(self._paginas, nombre)
+
+
+class AsyncContenedorInstrumentado:
+    """Variante de ContenedorInstrumentado para el ContainerProxy de azure.cosmos.aio."""
+
+    def __init__(self, container):
+        self._container = container
+
+    def __getattr__(self, nombre):
+        atributo = getattr(self._container, nombre)
+        if nombre in OPERACIONES_PUNTUALES:
+            async def medida(*args, **kwargs):
+                medicion = _Medicion(self._container.id, nombre, kwargs)
+                try:
+                    resultado = await politica_cosmos.ejecutar_async(lambda: atributo(*args, **kwargs), operacion_idempotente(nombre, args, kwargs))
+                    medicion.items = 1 if resultado is not None else 0
+                    return resultado
+                finally:
+                    medicion.registrar()
+            return medida
+        if nombre in OPERACIONES_CONSULTA:
+            def consulta(*args, **kwargs):
+                medicion = _Medicion(self._container.id, nombre, kwargs)
+                return _ConsultaAsyncInstrumentada(lambda: atributo(*args, **kwargs), medicion)
+            return consulta
+        return atributo
+
+
+def instrumentar(container):
+    if isinstance(container, ContenedorInstrumentado):
+        return container
+    return ContenedorInstrumentado(container)
+
+
+def instrumentar_async(container):
+    if isinstance(container, AsyncContenedorInstrumentado):
+        return container
+    return AsyncContenedorInstrumentado(container)
@@ -0,0 +1,244 @@
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from core.config import settings
+from .json_journal import AlmacenJournal
+from .json_escritor import escritor_json
+from .repositorio import RepositorioBase, ACTIVIDADES_ADMIN, aplicar_incremento
+
+BASE_DIR = Path(__file__).parent.parent
+DEFAULT_DATA_DIR = BASE_DIR / "data"
+
+# Índices hash de las filas de asistencia; "sesion" indexa la ocurrencia y la actividad (maestra)
+INDICES_ASISTENTES = {
+    "cedula_token": lambda a: [(a.get('cedula'), a.get('token'))],
+    "cedula": lambda a: [a.get('cedula')],
+    "sesion": lambda a: [a.get('sesion_id'), a.get('actividad_id')],
+}
+
+
+class JSONDB(RepositorioBase):
+    """
+    Almacenamiento en archivos JSON (journal + snapshot por colección, ver AlmacenJournal).
+    Las asistencias se guardan como filas planas (una por registro) y no como documento persona;
+    el duplicado se detecta por (cédula, token) como en la versión original de este modo.
+    Las búsquedas por (cédula, token), cédula y sesión usan los índices del almacén
+    (INDICES_ASISTENTES), así registrar no recorre todo el historial de asistencias.
+    """
+
+    def __init__(self, directorio: Path):
+        self.directorio = Path(directorio)
+        self.directorio.mkdir(parents=True, exist_ok=True)
+        self.sesiones = AlmacenJournal(self.directorio / "sesiones.json", compactar_cada=settings.JOURNAL_COMPACT_LINES)
+        self.asistentes = AlmacenJournal(
+            self.directorio / "asistentes.json", compactar_cada=settings.JOURNAL_COMPACT_LINES, indices=INDICES_ASISTENTES
+        )
+        self.usuarios = AlmacenJournal(self.directorio / "usuarios.json", compactar_cada=settings.JOURNAL_COMPACT_LINES)
+        self.configuracion = AlmacenJournal(self.directorio / "configuracion.json", compactar_cada=settings.JOURNAL_COMPACT_LINES)
+        self._almacenes = {
+            "sesiones": self.sesiones,
+            "asistentes": self.asistentes,
+            "usuarios": self.usuarios,
+            "configuracion": self.configuracion
+        }
+
+    async def ejecutar_escritura(self, coleccion: str, fn: Callable[[], Any]) -> Any:
+        """Con el escritor agrupado activo la escritura entra en el siguiente lote de su almacén."""
+        return await escritor_json.enviar(self._almacenes[coleccion], fn)
+
+    # ---------- sesiones ----------
+
+    def crear_sesion(self, data):
+        self.sesiones.guardar(data)
+        return data
+
+    def obtener_sesion(self, id): return self.sesiones.obtener(id)
+
+    def obtener_sesiones(self, ids: Iterable[str]) -> List[dict]:
+        return [s for s in (self.sesiones.obtener(i) for i in set(ids) if i) if s]
+
+    def listar_sesiones(self, owner=None, tipos=None):
+        sesiones = self.sesiones.listar()
+        if owner:
+            sesiones = [s for s in sesiones if s.get('created_by') == owner]
+        if tipos:
+            sesiones = [s for s in sesiones if s.get('actividad') in tipos]
+        sesiones.sort(key=lambda x: x.get('created_at', ''), reverse=True)
+        return sesiones
+
+    def listar_sesiones_admin(self, email):
+        sesiones = [
+            s for s in self.sesiones.listar()
+            if s.get('created_by') == email or s.get('actividad') in ACTIVIDADES_ADMIN
+        ]
+        sesiones.sort(key=lambda x: x.get('created_at', ''), reverse=True)
+        return sesiones
+
+    def listar_sesiones_por_fechas(self, desde, hasta):
+        return [
+            s for s in self.sesiones.listar()
+            if any(desde <= (oc.get('fecha') or '') <= hasta for oc in s.get('ocurrencias', []))
+        ]
+
+    def obtener_sesion_por_token(self, token):
+        return next((s for s in self.sesiones.listar() if any(oc.get('token') == token for oc in s.get('ocurrencias', []))), None)
+
+    def listar_tokens(self):
+        return [
+            {"token": oc.get('token'), "sesion_id": s['id'], "ocurrencia_id": oc.get('id')}
+            for s in self.sesiones.listar() for oc in s.get('ocurrencias', [])
+        ]
+
+    def actualizar_sesion(self, id, data):
+        self.sesiones.guardar({**data, 'id': id})
+        return data
+
+    def eliminar_sesion(self, id): return self.sesiones.eliminar(id)
+
+    def incrementar_contadores(self, sesion_id, ocurrencia_id=None, delta=1, ocurrencias=None):
+        # Lectura-modificación-escritura bajo el lock del almacén
+        return self.sesiones.modificar(sesion_id, lambda s: aplicar_incremento(s, ocurrencia_id, delta))
+
+    # ---------- asistencias ----------
+
+    @staticmethod
+    def _fila(asistente_data: dict, sesion_id: str) -> dict:
+        fila = {
+            "id": str(uuid.uuid4()),
+            "actividad_id": sesion_id,
+            "sesion_id": asistente_data.get('ocurrencia_id') or sesion_id,
+            "token": asistente_data['token'],
+            "cedula": asistente_data['cedula'],
+            "nombre": asistente_data['nombre'],
+            "cargo": asistente_data.get('cargo'),
+            "unidad": asistente_data.get('unidad'),
+            "empresa": asistente_data.get('empresa'),
+            "telefono": asistente_data.get('telefono'),
+            "correo": asistente_data.get('correo'),
+            "fecha_registro": asistente_data['fecha_registro']
+        }
+        if asistente_data.get('ocurrencia_id'):
+            fila['ocurrencia_id'] = asistente_data['ocurrencia_id']
+        return fila
+
+    def registrar_asistencia(self, asistente_data: dict, sesion_id: str) -> Tuple[dict, bool]:
+        with self.asistentes.lock:
+            existentes = self.asistentes.buscar("cedula_token", (asistente_data['cedula'], asistente_data['token']))
+            if existentes:
+                return existentes[0], False
+            fila = self._fila(asistente_data, sesion_id)
+            self.asistentes.guardar(fila)
+        return fila, True
+
+    def registrar_lote(self, lote: List[dict], sesion_id: str) -> List[str]:
+        """Registra el lote con un solo append al journal (duplicados por índice y dentro del lote)."""
+        with self.asistentes.lock:
+            existentes = set()
+            estados, nuevos = [], []
+            for data in lote:
+                clave = (data['cedula'], data['token'])
+                if clave in existentes or self.asistentes.ids("cedula_token", clave):
+                    estados.append("duplicado")
+                    continue
+                nuevos.append(self._fila(data, sesion_id))
+                existentes.add(clave)
+                estados.append("creado")
+            self.asistentes.guardar_varios(nuevos)
+        return estados
+
+    def obtener_persona(self, cedula):
+        """Arma el documento persona a partir de sus filas (datos de contacto de la primera)."""
+        filas = self.asistentes.buscar("cedula", cedula)
+        if not filas:
+            return None
+        persona = {"id": cedula, "cedula": cedula}
+        for campo in ('nombre', 'cargo', 'unidad', 'empresa', 'telefono', 'correo'):
+            persona[campo] = filas[0].get(campo)
+        persona['asistencias'] = [
+            {"actividad_id": f.get('actividad_id'), "sesion_id": f.get('sesion_id'), "fecha_registro": f.get('fecha_registro')}
+            for f in filas
+        ]
+        return persona
+
+    def actualizar_asistente(self, cedula, data):
+        with self.asistentes.lock:
+            filas = self.asistentes.buscar("cedula", cedula)
+            if not filas:
+                return None
+            a = filas[0]
+            for k, v in data.items():
+                if v is not None:
+                    a[k] = v
+            self.asistentes.guardar(a)
+            return a
+
+    def listar_asistentes_por_sesion(self, s_id, actividad_id=None):
+        # Igual que en CosmosDB: s_id puede ser la ocurrencia o la actividad (maestra)
+        return self.asistentes.buscar("sesion", s_id)
+
+    def eliminar_asistentes_por_sesion(self, s_id, actividad_id=None):
+        with self.asistentes.lock:
+            return self.asistentes.eliminar_varios(self.asistentes.ids("sesion", s_id))
+
+    def resumen_participantes(self, owner_email=None):
+        # Agrupación sobre las filas planas (solo personal con unidad, como en la versión original de este modo)
+        valid_sesion_ids = None
+        if owner_email:
+            valid_sesion_ids = {s['id'] for s in self.sesiones.listar() if s.get('created_by') == owner_email}
+        resumen: Dict[str, dict] = {}
+        for a in self.asistentes.listar():
+            if valid_sesion_ids is not None and a.get('actividad_id') not in valid_sesion_ids and a.get('sesion_id') not in valid_sesion_ids: continue
+            if not a.get('unidad'): continue
+            cedula = a.get('cedula')
+            if not cedula: continue
+            if cedula not in resumen:
+                resumen[cedula] = {
+                    "cedula": cedula, "nombre": a.get('nombre', 'Sin nombre'),
+                    "correo": a.get('correo', 'N/A'), "cargo": a.get('cargo', 'N/A'),
+                    "unidad": a.get('unidad') or a.get('empresa') or 'N/A',
+                    "empresa": a.get('empresa'), "telefono": a.get('telefono'),
+                    "total_asistencias": 0, "ultima_asistencia": a.get('fecha_registro', '')
+                }
+            resumen[cedula]["total_asistencias"] += 1
+            if a.get('fecha_registro', '') > resumen[cedula]["ultima_asistencia"]:
+                resumen[cedula]["ultima_asistencia"] = a.get('fecha_registro')
+        return list(resumen.values())
+
+    def listar_asistencias_planas(self): return self.asistentes.listar()
+
+    # ---------- usuarios ----------
+
+    def crear_usuario(self, data):
+        self.usuarios.guardar(data)
+        return data
+
+    def listar_usuarios(self):
+        return sorted(self.usuarios.listar(), key=lambda u: u.get('fecha_ingreso', ''), reverse=True)
+
+    def obtener_usuario_por_id(self, id): return self.usuarios.obtener(id)
+
+    def obtener_usuario_por_email(self, e):
+        email = (e or '').lower()
+        return next((u for u in self.usuarios.listar() if (u.get('email') or '').lower() == email), None)
+
+    def actualizar_usuario(self, id, data): return self.usuarios.modificar(id, lambda u: u.update(data))
+    def eliminar_usuario(self, id): return self.usuarios.eliminar(id)
+
+    # ---------- configuración ----------
+
+    def obtener_configuracion(self, config_id: str) -> Optional[dict]:
+        return self.configuracion.obtener(config_id)
+
+    def guardar_configuracion(self, config_id: str, data: dict) -> dict:
+        data["id"] = config_id
+        self.configuracion.guardar(data)
+        return data
+
+
+_json_db_instance = None
+def get_json_db() -> JSONDB:
+    global _json_db_instance
+    if _json_db_instance is None:
+        _json_db_instance = JSONDB(Path(settings.JSON_DATA_DIR) if settings.JSON_DATA_DIR else DEFAULT_DATA_DIR)
+    return _json_db_instance
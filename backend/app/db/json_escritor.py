@@ -0,0 +1,128 @@
+import asyncio
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from core.config import settings
+from core.metrics import metricas
+from .json_journal import AlmacenJournal
+
+
+class _Mutacion:
+    __slots__ = ('almacen', 'fn', 'futuro', 'resultado', 'error')
+
+    def __init__(self, almacen: AlmacenJournal, fn: Callable[[], Any], futuro: asyncio.Future):
+        self.almacen = almacen
+        self.fn = fn
+        self.futuro = futuro
+        self.resultado = None
+        self.error: Optional[BaseException] = None
+
+
+class EscritorAgrupado:
+    """
+    Escritor único del modo JSON (group commit). Los llamadores encolan mutaciones con
+    `await enviar(almacen, fn)`; la tarea toma todo lo que haya en la cola (hasta `max_lote`),
+    lo aplica en un hilo dentro de `almacen.escritura_agrupada()` y persiste una sola vez por
+    lote. Cada futuro se resuelve después de esa escritura, con el resultado de su mutación o
+    su excepción (p. ej. DuplicateRegistrationException). Mientras un lote se escribe, los
+    siguientes se acumulan en la cola: el lote crece con la concurrencia.
+    Se inicia y se detiene en el lifespan, solo con STORAGE_MODE=json.
+    """
+
+    def __init__(self, max_lote: int):
+        self.max_lote = max_lote
+        self._cola: Optional[asyncio.Queue] = None
+        self._tarea: Optional[asyncio.Task] = None
+        self._lotes = 0
+        self._mutaciones = 0
+        self._ultimo_lote = 0
+
+    @property
+    def activo(self) -> bool:
+        return self._tarea is not None and not self._tarea.done()
+
+    async def enviar(self, almacen: AlmacenJournal, fn: Callable[[], Any]) -> Any:
+        """Encola la mutación y espera a que su lote quede escrito; sin escritor activo se ejecuta en línea."""
+        if not self.activo:
+            return fn()
+        futuro = asyncio.get_running_loop().create_future()
+        self._cola.put_nowait(_Mutacion(almacen, fn, futuro))
+        return await futuro
+
+    def _aplicar_lote(self, lote: List[_Mutacion]):
+        """Corre en un hilo: una escritura agrupada por almacén, en el orden de llegada."""
+        por_almacen: Dict[int, List[_Mutacion]] = {}
+        for m in lote:
+            por_almacen.setdefault(id(m.almacen), []).append(m)
+        for mutaciones in por_almacen.values():
+            almacen = mutaciones[0].almacen
+            try:
+                with almacen.escritura_agrupada():
+                    for m in mutaciones:
+                        try:
+                            m.resultado = m.fn()
+                        except Exception as e:
+                            m.error = e
+            except Exception as e:
+                # Falló la escritura del lote: nada de este almacén quedó persistido
+                print(f"❌ Error escribiendo lote en {almacen.snapshot.name}: {type(e).__name__}: {e}")
+                metricas.incr("escritor_json.errores")
+                for m in mutaciones:
+                    if m.error is None:
+                        m.error = e
+
+    async def _bucle(self):
+        detener = False
+        while not detener:
+            m = await self._cola.get()
+            if m is None:
+                break
+            lote = [m]
+            while len(lote) < self.max_lote and not self._cola.empty():
+                siguiente = self._cola.get_nowait()
+                if siguiente is None:
+                    detener = True
+                    break
+                lote.append(siguiente)
+
+            t0 = time.time()
+            await asyncio.to_thread(self._aplicar_lote, lote)
+            for m in lote:
+                if m.futuro.done():
+                    continue
+                if m.error is not None:
+                    m.futuro.set_exception(m.error)
+                else:
+                    m.futuro.set_result(m.resultado)
+
+            self._lotes += 1
+            self._mutaciones += len(lote)
+            self._ultimo_lote = len(lote)
+            metricas.observar("escritor_json.tamano_lote", len(lote))
+            metricas.observar("escritor_json.duracion_lote_s", time.time() - t0)
+
+    def iniciar(self):
+        if self.activo or settings.STORAGE_MODE != "json":
+            return
+        self._cola = asyncio.Queue()
+        self._tarea = asyncio.create_task(self._bucle())
+
+    async def detener(self):
+        """Escribe lo que quede en la cola y termina."""
+        if self._tarea:
+            self._cola.put_nowait(None)
+            await self._tarea
+            self._tarea = None
+
+    def stats(self) -> dict:
+        return {
+            "activo": self.activo,
+            "en_cola": self._cola.qsize() if self._cola else 0,
+            "lotes": self._lotes,
+            "mutaciones": self._mutaciones,
+            "promedio_lote": round(self._mutaciones / self._lotes, 2) if self._lotes else 0.0,
+            "ultimo_lote": self._ultimo_lote
+        }
+
+
+escritor_json = EscritorAgrupado(max_lote=settings.JSON_WRITER_MAX_BATCH)
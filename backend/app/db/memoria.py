@@ -0,0 +1,286 @@
+import copy
+import threading
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from .repositorio import RepositorioBase, ACTIVIDADES_ADMIN, aplicar_incremento
+from .repositories.asistentes_repo import CAMPOS_CONTACTO, preparar_asistencia, aplicar_asistencia, nueva_persona
+
+
+def _claves_persona(persona: dict) -> Set[str]:
+    """Ids de sesión y de actividad en los que aparece la persona (claves del índice por sesión)."""
+    claves = set()
+    for a in persona.get('asistencias', []):
+        claves.add(a.get('actividad_id'))
+        claves.add(a.get('sesion_id'))
+    claves.discard(None)
+    return claves
+
+
+class MemoriaDB(RepositorioBase):
+    """
+    Almacenamiento en la memoria del proceso, sin persistencia (STORAGE_MODE=memory), para
+    perfilar la capa de servicios y hacer pruebas de carga sin Azure ni disco.
+    Usa el mismo modelo de documentos que CosmosDB (sesión con ocurrencias, persona con
+    asistencias, id = cédula) y mantiene índices secundarios en cada escritura:
+    token -> (sesión, ocurrencia), created_by -> sesiones, sesion_id/actividad_id -> cédulas y
+    email -> usuario; las personas se indexan por cédula. Los documentos se copian al entrar y
+    al salir, así las mutaciones del llamador no alteran el almacén ni dejan índices obsoletos.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._sesiones: Dict[str, dict] = {}
+        self._por_token: Dict[str, Tuple[str, str]] = {}
+        self._por_creador: Dict[str, Set[str]] = defaultdict(set)
+        self._personas: Dict[str, dict] = {}
+        self._por_sesion: Dict[str, Set[str]] = defaultdict(set)
+        self._usuarios: Dict[str, dict] = {}
+        self._usuarios_por_email: Dict[str, str] = {}
+        self._configuracion: Dict[str, dict] = {}
+        print("✅ Almacenamiento en memoria inicializado (sin persistencia)")
+
+    # ---------- índices ----------
+
+    def _indexar_sesion(self, sesion: dict):
+        self._por_creador[sesion.get('created_by')].add(sesion['id'])
+        for oc in sesion.get('ocurrencias', []):
+            if oc.get('token'):
+                self._por_token[oc['token']] = (sesion['id'], oc.get('id'))
+
+    def _desindexar_sesion(self, sesion: dict):
+        self._por_creador[sesion.get('created_by')].discard(sesion['id'])
+        for oc in sesion.get('ocurrencias', []):
+            if self._por_token.get(oc.get('token'), (None,))[0] == sesion['id']:
+                del self._por_token[oc['token']]
+
+    def _reindexar_persona(self, cedula: str, antes: Set[str], despues: Set[str]):
+        for clave in antes - despues:
+            self._por_sesion[clave].discard(cedula)
+            if not self._por_sesion[clave]:
+                del self._por_sesion[clave]
+        for clave in despues - antes:
+            self._por_sesion[clave].add(cedula)
+
+    # ---------- sesiones ----------
+
+    def _guardar_sesion(self, sesion: dict):
+        with self._lock:
+            anterior = self._sesiones.get(sesion['id'])
+            if anterior:
+                self._desindexar_sesion(anterior)
+            copia = copy.deepcopy(sesion)
+            self._sesiones[sesion['id']] = copia
+            self._indexar_sesion(copia)
+
+    def _copias(self, ids: Iterable[str]) -> List[dict]:
+        with self._lock:
+            return [copy.deepcopy(self._sesiones[i]) for i in ids if i in self._sesiones]
+
+    def crear_sesion(self, data):
+        self._guardar_sesion(data)
+        return data
+
+    def obtener_sesion(self, id):
+        with self._lock:
+            sesion = self._sesiones.get(id)
+            return copy.deepcopy(sesion) if sesion else None
+
+    def obtener_sesiones(self, ids): return self._copias(set(ids))
+
+    def listar_sesiones(self, owner=None, tipos=None):
+        with self._lock:
+            ids = list(self._por_creador.get(owner, ())) if owner else list(self._sesiones)
+            if tipos:
+                ids = [i for i in ids if self._sesiones[i].get('actividad') in tipos]
+            sesiones = self._copias(ids)
+        sesiones.sort(key=lambda x: x.get('created_at', ''), reverse=True)
+        return sesiones
+
+    def listar_sesiones_admin(self, email):
+        with self._lock:
+            ids = set(self._por_creador.get(email, ()))
+            ids.update(i for i, s in self._sesiones.items() if s.get('actividad') in ACTIVIDADES_ADMIN)
+            sesiones = self._copias(ids)
+        sesiones.sort(key=lambda x: x.get('created_at', ''), reverse=True)
+        return sesiones
+
+    def listar_sesiones_por_fechas(self, desde, hasta):
+        with self._lock:
+            return self._copias([
+                i for i, s in self._sesiones.items()
+                if any(desde <= (oc.get('fecha') or '') <= hasta for oc in s.get('ocurrencias', []))
+            ])
+
+    def obtener_sesion_por_token(self, token):
+        entrada = self._por_token.get(token)
+        return self.obtener_sesion(entrada[0]) if entrada else None
+
+    def listar_tokens(self):
+        with self._lock:
+            return [{"token": t, "sesion_id": s_id, "ocurrencia_id": oc_id} for t, (s_id, oc_id) in self._por_token.items()]
+
+    def actualizar_sesion(self, id, data):
+        self._guardar_sesion({**data, 'id': id})
+        return data
+
+    def eliminar_sesion(self, id):
+        with self._lock:
+            sesion = self._sesiones.pop(id, None)
+            if sesion:
+                self._desindexar_sesion(sesion)
+            return sesion is not None
+
+    def incrementar_contadores(self, sesion_id, ocurrencia_id=None, delta=1, ocurrencias=None):
+        # Los contadores no tocan campos indexados: se aplican sobre el documento guardado
+        with self._lock:
+            sesion = self._sesiones.get(sesion_id)
+            if not sesion:
+                return False
+            aplicar_incremento(sesion, ocurrencia_id, delta)
+            return True
+
+    # ---------- asistencias ----------
+
+    def _registrar(self, asistente_data: dict, sesion_id: str) -> Tuple[dict, bool]:
+        cedula = asistente_data['cedula']
+        nueva_asistencia, _ = preparar_asistencia(asistente_data, sesion_id)
+        persona = self._personas.get(cedula)
+        if persona is None:
+            persona = nueva_persona(cedula, nueva_asistencia, asistente_data)
+            self._personas[cedula] = persona
+        elif not aplicar_asistencia(persona, nueva_asistencia, asistente_data):
+            return persona, False
+        self._reindexar_persona(cedula, set(), _claves_persona({"asistencias": [nueva_asistencia]}))
+        return persona, True
+
+    def registrar_asistencia(self, asistente_data, sesion_id):
+        with self._lock:
+            persona, registrada = self._registrar(asistente_data, sesion_id)
+            return copy.deepcopy(persona), registrada
+
+    def registrar_lote(self, lote, sesion_id):
+        with self._lock:
+            return ["creado" if self._registrar(data, sesion_id)[1] else "duplicado" for data in lote]
+
+    def obtener_persona(self, cedula):
+        with self._lock:
+            persona = self._personas.get(cedula)
+            return copy.deepcopy(persona) if persona else None
+
+    def actualizar_asistente(self, cedula, data):
+        with self._lock:
+            persona = self._personas.get(cedula)
+            if not persona:
+                return None
+            for campo in CAMPOS_CONTACTO:
+                if data.get(campo) is not None:
+                    persona[campo] = data[campo]
+            return copy.deepcopy(persona)
+
+    def listar_asistentes_por_sesion(self, s_id, actividad_id=None):
+        # s_id puede ser el id de una ocurrencia o de una sesión única (maestra)
+        filas = []
+        with self._lock:
+            for cedula in self._por_sesion.get(s_id, ()):
+                persona = self._personas[cedula]
+                contacto = {c: persona.get(c) for c in CAMPOS_CONTACTO}
+                for a in persona.get('asistencias', []):
+                    if a.get('sesion_id') == s_id or a.get('actividad_id') == s_id:
+                        filas.append({
+                            "id": cedula, "cedula": cedula, **contacto,
+                            "actividad_id": a.get('actividad_id'), "sesion_id": a.get('sesion_id'),
+                            "fecha_registro": a.get('fecha_registro'), "ocurrencia_id": a.get('sesion_id')
+                        })
+        return sorted(filas, key=lambda x: x.get('fecha_registro') or '')
+
+    def eliminar_asistentes_por_sesion(self, s_id, actividad_id=None):
+        """Elimina las asistencias de una sesión o actividad y las personas que quedan sin asistencias."""
+        eliminadas = 0
+        with self._lock:
+            for cedula in list(self._por_sesion.get(s_id, ())):
+                persona = self._personas[cedula]
+                antes = _claves_persona(persona)
+                restantes = [a for a in persona.get('asistencias', []) if a.get('sesion_id') != s_id and a.get('actividad_id') != s_id]
+                eliminadas += len(persona.get('asistencias', [])) - len(restantes)
+                persona['asistencias'] = restantes
+                self._reindexar_persona(cedula, antes, _claves_persona(persona))
+                if not restantes:
+                    del self._personas[cedula]
+        return eliminadas
+
+    def listar_personas(self) -> List[dict]:
+        with self._lock:
+            return [copy.deepcopy(p) for p in self._personas.values()]
+
+    def listar_asistencias_planas(self):
+        with self._lock:
+            return [
+                {
+                    "cedula": cedula, "nombre": p.get('nombre'), "cargo_asistente": p.get('cargo'),
+                    "unidad": p.get('unidad'), "empresa": p.get('empresa'), "telefono": p.get('telefono'), "correo": p.get('correo'),
+                    "actividad_id": a.get('actividad_id'), "sesion_id": a.get('sesion_id'), "fecha_registro": a.get('fecha_registro')
+                }
+                for cedula, p in self._personas.items() for a in p.get('asistencias', [])
+            ]
+
+    # ---------- usuarios ----------
+
+    def _indexar_usuario(self, usuario: dict, indexar: bool = True):
+        email = (usuario.get('email') or '').lower()
+        if not email:
+            return
+        if indexar:
+            self._usuarios_por_email[email] = usuario['id']
+        elif self._usuarios_por_email.get(email) == usuario['id']:
+            del self._usuarios_por_email[email]
+
+    def crear_usuario(self, data):
+        with self._lock:
+            self._usuarios[data['id']] = copy.deepcopy(data)
+            self._indexar_usuario(data)
+        return data
+
+    def listar_usuarios(self):
+        with self._lock:
+            usuarios = [copy.deepcopy(u) for u in self._usuarios.values()]
+        return sorted(usuarios, key=lambda u: u.get('fecha_ingreso', ''), reverse=True)
+
+    def obtener_usuario_por_id(self, id):
+        with self._lock:
+            usuario = self._usuarios.get(id)
+            return copy.deepcopy(usuario) if usuario else None
+
+    def obtener_usuario_por_email(self, e):
+        usuario_id = self._usuarios_por_email.get((e or '').lower())
+        return self.obtener_usuario_por_id(usuario_id) if usuario_id else None
+
+    def actualizar_usuario(self, id, data):
+        with self._lock:
+            usuario = self._usuarios.get(id)
+            if not usuario:
+                return None
+            self._indexar_usuario(usuario, indexar=False)
+            usuario.update(copy.deepcopy(data))
+            self._indexar_usuario(usuario)
+            return copy.deepcopy(usuario)
+
+    def eliminar_usuario(self, id):
+        with self._lock:
+            usuario = self._usuarios.pop(id, None)
+            if usuario:
+                self._indexar_usuario(usuario, indexar=False)
+            return usuario is not None
+
+    # ---------- configuración ----------
+
+    def obtener_configuracion(self, config_id: str) -> Optional[dict]:
+        with self._lock:
+            doc = self._configuracion.get(config_id)
+            return copy.deepcopy(doc) if doc else None
+
+    def guardar_configuracion(self, config_id: str, data: dict) -> dict:
+        data["id"] = config_id
+        with self._lock:
+            self._configuracion[config_id] = copy.deepcopy(data)
+        return data
@@ -0,0 +1,262 @@
+import asyncio
+import random
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Optional
+
+from azure.core.exceptions import ServiceRequestError, ServiceResponseError
+from azure.cosmos import exceptions
+
+from core.config import settings
+from core.exceptions import StorageUnavailableException
+from core.metrics import metricas
+
+# Códigos que CosmosDB devuelve ante degradación o saturación pasajera (429 = RU agotadas)
+CODIGOS_TRANSITORIOS = {408, 429, 449, 500, 502, 503}
+# Con estos CosmosDB garantiza que la operación no se ejecutó; ante los demás (408, 5xx, timeouts)
+# una escritura pudo haberse aplicado aunque la respuesta se perdiera
+CODIGOS_NO_EJECUTADA = {429, 449}
+# Operaciones de patch que dan el mismo resultado si se aplican dos veces
+OPERACIONES_PATCH_IDEMPOTENTES = {"set", "replace"}
+
+# El SDK reintenta los 429 por su cuenta (hasta 9 veces / 30 s, bloqueando): se deja un solo
+# reintento corto para que la política de aquí (presupuesto, circuito) sea la que decide
+OPCIONES_CLIENTE = {"retry_throttle_total": 1, "retry_throttle_backoff_max": 1}
+
+# Dentro de una ejecución con reintentos las operaciones anidadas no vuelven a reintentar
+_en_reintento: ContextVar[bool] = ContextVar("cosmos_en_reintento", default=False)
+
+
+def _es_error_de_red(e: Exception) -> bool:
+    err_str = str(e).lower()
+    return (
+        isinstance(e, (ServiceRequestError, ServiceResponseError)) or
+        'connection' in err_str or
+        'aborted' in err_str or
+        'reset' in err_str or
+        'timeout' in err_str
+    )
+
+
+def es_transitorio(e: Exception) -> bool:
+    """Errores que vale la pena reintentar: throttling, timeouts, 5xx y fallas de red."""
+    if isinstance(e, exceptions.CosmosHttpResponseError):
+        return getattr(e, 'status_code', 0) in CODIGOS_TRANSITORIOS
+    return _es_error_de_red(e)
+
+
+def no_ejecutada(e: Exception) -> bool:
+    return isinstance(e, exceptions.CosmosHttpResponseError) and getattr(e, 'status_code', 0) in CODIGOS_NO_EJECUTADA
+
+
+def operacion_idempotente(operacion: str, args: tuple, kwargs: dict) -> bool:
+    """
+    True si repetir la operación tras una respuesta perdida no cambia el resultado.
+    create_item no lo es (un primer intento exitoso convierte el reintento en 409) ni patch_item con
+    incr/add/remove, salvo que sea condicional (ETag): el reintento de algo ya aplicado da 412.
+    replace_item y upsert_item escriben el documento completo; delete_item repetido da 404.
+    """
+    if operacion == "create_item":
+        return False
+    if operacion == "patch_item":
+        if kwargs.get('etag') and kwargs.get('match_condition'):
+            return True
+        operaciones = kwargs.get('patch_operations', args[2] if len(args) > 2 else [])
+        return all(op.get('op') in OPERACIONES_PATCH_IDEMPOTENTES for op in operaciones)
+    return True
+
+
+def retry_after_s(e: Exception) -> Optional[float]:
+    """Espera que pide el servidor (x-ms-retry-after-ms en 429), si la indica."""
+    headers = getattr(e, 'headers', None) or {}
+    valor = headers.get('x-ms-retry-after-ms')
+    try:
+        return float(valor) / 1000 if valor is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+class CircuitoCosmos:
+    """
+    Circuit breaker compartido por todas las operaciones de CosmosDB.
+    Tras `umbral` fallas transitorias seguidas se abre durante `enfriamiento_s`: las operaciones fallan
+    de inmediato con StorageUnavailableException (503) en lugar de acumular peticiones esperando.
+    Vencido el enfriamiento deja pasar una sola operación de prueba (semiabierto); si responde se cierra.
+    Quien recibe la prueba (permitir() devuelve True) la libera con fin_prueba() aunque se cancele.
+    """
+
+    def __init__(self, umbral: int, enfriamiento_s: float):
+        self.umbral = umbral
+        self.enfriamiento_s = enfriamiento_s
+        self._lock = threading.Lock()
+        self._fallas = 0
+        self._abierto_hasta = 0.0
+        self._prueba_en_curso = False
+        self.aperturas = 0
+
+    @property
+    def estado(self) -> str:
+        if self._abierto_hasta == 0.0:
+            return "cerrado"
+        return "abierto" if time.monotonic() < self._abierto_hasta else "semiabierto"
+
+    def permitir(self) -> bool:
+        """
+        Lanza StorageUnavailableException si el circuito no admite la operación.
+        Devuelve True si la operación es la prueba del estado semiabierto.
+        """
+        with self._lock:
+            if self._abierto_hasta == 0.0:
+                return False
+            restante = self._abierto_hasta - time.monotonic()
+            if restante <= 0 and not self._prueba_en_curso:
+                self._prueba_en_curso = True
+                return True
+        metricas.incr("cosmos.circuito.rechazos")
+        raise StorageUnavailableException(reintentar_en=max(restante, 1.0))
+
+    def fin_prueba(self):
+        """La prueba terminó sin exito() ni falla() (p. ej. CancelledError): deja pasar otra."""
+        with self._lock:
+            self._prueba_en_curso = False
+
+    def exito(self):
+        with self._lock:
+            if self._abierto_hasta:
+                print("✅ CosmosDB responde de nuevo: circuito cerrado")
+            self._fallas = 0
+            self._abierto_hasta = 0.0
+            self._prueba_en_curso = False
+
+    def falla(self):
+        with self._lock:
+            self._fallas += 1
+            self._prueba_en_curso = False
+            if self._fallas >= self.umbral and (self._abierto_hasta == 0.0 or time.monotonic() >= self._abierto_hasta):
+                self._abierto_hasta = time.monotonic() + self.enfriamiento_s
+                self.aperturas += 1
+                print(f"⚠️ CosmosDB degradado ({self._fallas} fallas seguidas): circuito abierto por {self.enfriamiento_s}s")
+                metricas.incr("cosmos.circuito.aperturas")
+
+    def stats(self) -> dict:
+        return {"estado": self.estado, "fallas_seguidas": self._fallas, "aperturas": self.aperturas}
+
+
+class PoliticaReintentos:
+    """
+    Política de reintentos común a todas las operaciones de los repositorios de CosmosDB (la aplica
+    ContenedorInstrumentado en cada llamada). Solo reintenta errores transitorios, respeta el
+    retry-after del servidor, usa backoff exponencial con jitter completo y un presupuesto total de
+    tiempo por operación; agotado el presupuesto o con el circuito abierto lanza
+    StorageUnavailableException. La variante async espera con asyncio.sleep.
+    """
+
+    def __init__(self, max_intentos: int, base_s: float, max_espera_s: float, presupuesto_s: float, circuito: CircuitoCosmos):
+        self.max_intentos = max_intentos
+        self.base_s = base_s
+        self.max_espera_s = max_espera_s
+        self.presupuesto_s = presupuesto_s
+        self.circuito = circuito
+
+    def _espera(self, e: Exception, intento: int, inicio: float, idempotente: bool = True) -> float:
+        """Espera antes del próximo intento; relanza si el error no se reintenta o no queda presupuesto."""
+        if not es_transitorio(e):
+            # El servidor respondió (404, 409, 412...): no es una falla del servicio
+            self.circuito.exito()
+            raise e
+        self.circuito.falla()
+        if not idempotente and not no_ejecutada(e):
+            # La escritura pudo haberse aplicado: repetirla contaría dos veces un incr o daría 409 a un create
+            print(f"❌ Escritura no idempotente sin confirmar en CosmosDB, no se reintenta: {type(e).__name__}: {e}")
+            metricas.incr("cosmos.no_reintentadas")
+            error = StorageUnavailableException(reintentar_en=1.0)
+            # Quien encola escrituras (contadores) no debe repetirla: no se sabe si se aplicó
+            error.sin_confirmar = True
+            raise error from e
+        servidor = retry_after_s(e)
+        if getattr(e, 'status_code', 0) == 429:
+            metricas.incr("cosmos.throttling")
+        espera = random.uniform(0, min(self.max_espera_s, self.base_s * (2 ** intento)))
+        if servidor is not None:
+            espera = servidor + espera / 2
+        transcurrido = time.monotonic() - inicio
+        if intento + 1 >= self.max_intentos or transcurrido + espera > self.presupuesto_s:
+            print(f"❌ CosmosDB no disponible tras {intento + 1} intentos ({transcurrido:.2f}s): {type(e).__name__}: {e}")
+            metricas.incr("cosmos.reintentos_agotados")
+            raise StorageUnavailableException(reintentar_en=max(servidor or 0, 1.0)) from e
+        metricas.incr("cosmos.reintentos")
+        return espera
+
+    def ejecutar(self, fn: Callable[[], Any], idempotente: bool = True) -> Any:
+        """Ejecuta `fn` con reintentos; con idempotente=False solo se reintenta ante 429/449."""
+        if _en_reintento.get():
+            return fn()
+        token = _en_reintento.set(True)
+        try:
+            inicio = time.monotonic()
+            intento = 0
+            while True:
+                prueba = self.circuito.permitir()
+                try:
+                    resultado = fn()
+                except StorageUnavailableException:
+                    raise
+                except Exception as e:
+                    espera = self._espera(e, intento, inicio, idempotente)
+                else:
+                    self.circuito.exito()
+                    return resultado
+                finally:
+                    if prueba:
+                        self.circuito.fin_prueba()
+                time.sleep(espera)
+                intento += 1
+        finally:
+            _en_reintento.reset(token)
+
+    async def ejecutar_async(self, fn: Callable[[], Awaitable[Any]], idempotente: bool = True) -> Any:
+        if _en_reintento.get():
+            return await fn()
+        token = _en_reintento.set(True)
+        try:
+            inicio = time.monotonic()
+            intento = 0
+            while True:
+                prueba = self.circuito.permitir()
+                try:
+                    resultado = await fn()
+                except StorageUnavailableException:
+                    raise
+                except Exception as e:
+                    espera = self._espera(e, intento, inicio, idempotente)
+                else:
+                    self.circuito.exito()
+                    return resultado
+                finally:
+                    # Una cancelación (CancelledError) no pasa por exito() ni falla()
+                    if prueba:
+                        self.circuito.fin_prueba()
+                await asyncio.sleep(espera)
+                intento += 1
+        finally:
+            _en_reintento.reset(token)
+
+    def stats(self) -> dict:
+        return {
+            "max_intentos": self.max_intentos,
+            "presupuesto_s": self.presupuesto_s,
+            "circuito": self.circuito.stats()
+        }
+
+
+politica_cosmos = PoliticaReintentos(
+    max_intentos=settings.COSMOS_RETRY_MAX_INTENTOS,
+    base_s=settings.COSMOS_RETRY_BASE_MS / 1000,
+    max_espera_s=settings.COSMOS_RETRY_MAX_ESPERA_MS / 1000,
+    presupuesto_s=settings.COSMOS_RETRY_PRESUPUESTO_MS / 1000,
+    circuito=CircuitoCosmos(
+        umbral=settings.COSMOS_CIRCUITO_UMBRAL,
+        enfriamiento_s=settings.COSMOS_CIRCUITO_ENFRIAMIENTO_S
+    )
+)
@@ -0,0 +1,264 @@
+import time
+from datetime import datetime, timezone
+from typing import List, Optional, Dict, Any, Iterable, Tuple
+from azure.core import MatchConditions
+from azure.cosmos import exceptions
+from .base import BaseRepository
+from .asistencias_anuales import TIPO_ASISTENCIAS, anio_de
+
+CAMPOS_PERSONA = ['nombre', 'cargo', 'unidad', 'empresa', 'telefono', 'correo']
+
+QUERY_AGREGADOS_POR_IDS = "SELECT * FROM c WHERE ARRAY_CONTAINS(@ids, c.id)"
+QUERY_RESUMEN_PERSONAS = """
+        SELECT c.cedula, c.nombre, c.correo, c.cargo, c.unidad, c.empresa, c.telefono, c.total_asistencias, c.ultima_asistencia
+        FROM c
+        WHERE c.tipo = 'persona' AND c.total_asistencias > 0
+        """
+
+
+def id_sesion(sesion_id: str) -> str: return f"sesion:{sesion_id}"
+def id_creador(creador_id: str) -> str: return f"creador:{creador_id}"
+def id_persona(cedula: str) -> str: return f"persona:{cedula}"
+def id_lease(fuente: str) -> str: return f"lease:{fuente}"
+
+
+def superponer_contadores(sesion: Dict[str, Any], agregado: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Copia en la sesión los contadores del agregado, con la misma forma que dejaba aplicar_incremento:
+    la primera ocurrencia suma también los registros sin ocurrencia específica (principal).
+    """
+    agregado = agregado or {}
+    principal = agregado.get('total_asistentes_principal', 0)
+    por_ocurrencia = agregado.get('ocurrencias', {})
+    sesion['total_asistentes'] = agregado.get('total_asistentes', 0)
+    sesion['total_asistentes_principal'] = principal
+    for i, oc in enumerate(sesion.get('ocurrencias', [])):
+        oc['total_asistentes'] = por_ocurrencia.get(oc.get('id'), 0) + (principal if i == 0 else 0)
+    return sesion
+
+
+def _claves_asistencias(persona: Dict[str, Any]) -> Dict[Tuple[str, str], str]:
+    """(actividad_id, sesion_id) -> fecha_registro de cada asistencia del documento persona."""
+    return {
+        (a['actividad_id'], a['sesion_id']): a.get('fecha_registro') or ''
+        for a in persona.get('asistencias', []) if a.get('actividad_id') and a.get('sesion_id')
+    }
+
+
+class AgregadosRepository(BaseRepository):
+    """
+    Contenedor `agregados` (partición /id) con los números derivados que mantiene el procesador de
+    change feed (services/agregados.py) en lugar del camino de registro:
+    - sesion:<id>   total, principal y conteo por ocurrencia; creador de la sesión
+    - creador:<id>  formularios creados por usuario (created_by_id)
+    - persona:<cc>  datos de contacto, total y última asistencia (y sus asistencias, para calcular diferencias)
+    - lease:<fuente> checkpoint (continuation token) y propietario del change feed de cada contenedor
+    El change feed entrega la última versión de cada documento, no deltas: los contadores de sesión
+    salen de comparar las asistencias de la persona con las que ya reflejaba su agregado. Tampoco
+    entrega eliminaciones, así que borrar una sesión o una persona actualiza los agregados aquí
+    (sesion_eliminada, persona_eliminada). Para recalcular todo basta con vaciar el contenedor:
+    sin lease el procesador relee los feeds desde el principio.
+    """
+
+    def _leer(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            return self.container.read_item(item=doc_id, partition_key=doc_id)
+        except exceptions.CosmosResourceNotFoundError:
+            return None
+
+    def _incrementar(self, doc_id: str, base: Dict[str, Any], operaciones: List[Dict[str, Any]], crear: bool = True) -> None:
+        """patch 'incr' sobre el agregado; si no existe se crea `base` (solo con `crear`) y se reintenta."""
+        for _ in range(2):
+            try:
+                self.container.patch_item(item=doc_id, partition_key=doc_id, patch_operations=operaciones)
+                return
+            except exceptions.CosmosResourceNotFoundError:
+                if not crear:
+                    return
+                try:
+                    self.container.create_item(body={"id": doc_id, **base})
+                except exceptions.CosmosResourceExistsError:
+                    pass
+
+    # ---------- sesiones ----------
+
+    def _base_sesion(self, sesion_id: str) -> Dict[str, Any]:
+        return {"tipo": "sesion", "sesion_id": sesion_id, "total_asistentes": 0, "total_asistentes_principal": 0, "ocurrencias": {}}
+
+    def _delta_sesion(self, actividad_id: str, sesion_id: str, delta: int) -> None:
+        # Sin ocurrencia específica (sesion_id = actividad) cuenta como principal, igual que aplicar_incremento
+        campo = "/total_asistentes_principal" if sesion_id == actividad_id else f"/ocurrencias/{sesion_id}"
+        operaciones = [{"op": "incr", "path": "/total_asistentes", "value": delta}, {"op": "incr", "path": campo, "value": delta}]
+        # Un decremento sobre una sesión ya eliminada no debe recrear su agregado
+        self._incrementar(id_sesion(actividad_id), self._base_sesion(actividad_id), operaciones, crear=delta > 0)
+
+    def aplicar_sesion(self, sesion: Dict[str, Any]) -> None:
+        """Cambio en el contenedor sesiones: cuenta la sesión para su creador una sola vez."""
+        doc_id = id_sesion(sesion['id'])
+        agregado = self._leer(doc_id)
+        if agregado and agregado.get('creador_contado'):
+            return
+        creador = sesion.get('created_by_id')
+        if agregado is None:
+            try:
+                self.container.create_item(body={"id": doc_id, **self._base_sesion(sesion['id']), "creador": creador, "creador_contado": True})
+            except exceptions.CosmosResourceExistsError:
+                return self.aplicar_sesion(sesion)
+        else:
+            self.container.patch_item(item=doc_id, partition_key=doc_id, patch_operations=[
+                {"op": "set", "path": "/creador", "value": creador},
+                {"op": "set", "path": "/creador_contado", "value": True}
+            ])
+        if creador:
+            self._incrementar(id_creador(creador), {"tipo": "creador", "formularios_creados": 0},
+                              [{"op": "incr", "path": "/formularios_creados", "value": 1}])
+
+    def sesion_eliminada(self, sesion_id: str) -> None:
+        agregado = self._leer(id_sesion(sesion_id))
+        if not agregado:
+            return
+        if agregado.get('creador_contado') and agregado.get('creador'):
+            self._incrementar(id_creador(agregado['creador']), {}, [{"op": "incr", "path": "/formularios_creados", "value": -1}], crear=False)
+        try:
+            self.container.delete_item(item=agregado['id'], partition_key=agregado['id'])
+        except exceptions.CosmosResourceNotFoundError:
+            pass
+
+    # ---------- personas ----------
+
+    def aplicar_persona(self, persona: Dict[str, Any]) -> None:
+        """
+        Cambio en el contenedor asistentes: compara las asistencias con las del agregado de la persona
+        y aplica la diferencia a los contadores de cada sesión. El agregado de la persona se escribe
+        primero: si el proceso cae entre ambas escrituras se pierde ese delta en lugar de contarlo dos
+        veces al reprocesar (recalcular lo corrige).
+        Con ASISTENCIAS_POR_ANIO llegan dos clases de documento: el documento de un año (solo cambian
+        las asistencias de ese año) y la persona sin lista de asistencias (solo datos de contacto).
+        """
+        if persona.get('tipo') == TIPO_ASISTENCIAS:
+            return self._aplicar_anio(persona)
+        cedula = persona['id']
+        anterior = self._leer(id_persona(cedula))
+        antes = {(a, s): f for a, s, f in (anterior or {}).get('asistencias', [])}
+        despues = _claves_asistencias(persona) if 'asistencias' in persona else dict(antes)
+        self._actualizar_persona(cedula, anterior, antes, despues, persona)
+
+    def _aplicar_anio(self, doc: Dict[str, Any]) -> None:
+        """
+        Documento de asistencias de un año: reemplaza en el agregado las asistencias de ese año.
+        Las agregadas se comparan contra todas las del agregado, así una asistencia que pasó de la
+        lista completa al documento del año (pasar_a_formato_anual) no se cuenta dos veces.
+        """
+        cedula = doc['cedula']
+        anterior = self._leer(id_persona(cedula))
+        antes = {(a, s): f for a, s, f in (anterior or {}).get('asistencias', [])}
+        del_anio = _claves_asistencias(doc)
+        despues = {k: f for k, f in antes.items() if anio_de(f) != doc['anio'] or k in del_anio}
+        despues.update(del_anio)
+        self._actualizar_persona(cedula, anterior, antes, despues, anterior or {})
+
+    def _actualizar_persona(self, cedula: str, anterior: Optional[Dict[str, Any]], antes: Dict[Tuple[str, str], str],
+                            despues: Dict[Tuple[str, str], str], contacto: Dict[str, Any]) -> None:
+        agregadas = [k for k in despues if k not in antes]
+        quitadas = [k for k in antes if k not in despues]
+        if anterior is not None and not agregadas and not quitadas and all(anterior.get(c) == contacto.get(c) for c in CAMPOS_PERSONA):
+            return
+
+        self.container.upsert_item(body={
+            "id": id_persona(cedula), "tipo": "persona", "cedula": cedula,
+            **{c: contacto.get(c) for c in CAMPOS_PERSONA},
+            "asistencias": [[a, s, f] for (a, s), f in despues.items()],
+            "total_asistencias": len(despues),
+            "ultima_asistencia": max(despues.values()) if despues else ''
+        })
+        for actividad_id, sesion_id in agregadas:
+            self._delta_sesion(actividad_id, sesion_id, 1)
+        for actividad_id, sesion_id in quitadas:
+            self._delta_sesion(actividad_id, sesion_id, -1)
+
+    def persona_eliminada(self, cedula: str) -> None:
+        """La persona se borró (sin asistencias): descuenta lo que su agregado aún reflejaba."""
+        anterior = self._leer(id_persona(cedula))
+        if not anterior:
+            return
+        try:
+            self.container.delete_item(item=anterior['id'], partition_key=anterior['id'])
+        except exceptions.CosmosResourceNotFoundError:
+            return
+        for actividad_id, sesion_id, _ in anterior.get('asistencias', []):
+            self._delta_sesion(actividad_id, sesion_id, -1)
+
+    # ---------- lectura ----------
+
+    def obtener_varios(self, ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+        ids = list(dict.fromkeys(ids))
+        if not ids:
+            return {}
+        if len(ids) == 1:
+            # Lectura puntual en lugar de consulta cross-partition
+            doc = self._leer(ids[0])
+            return {doc['id']: doc} if doc else {}
+        parameters = [{"name": "@ids", "value": ids}]
+        return {d['id']: d for d in self.container.query_items(query=QUERY_AGREGADOS_POR_IDS, parameters=parameters, enable_cross_partition_query=True)}
+
+    def superponer_sesiones(self, sesiones: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        agregados = self.obtener_varios(id_sesion(s['id']) for s in sesiones)
+        return [superponer_contadores(s, agregados.get(id_sesion(s['id']))) for s in sesiones]
+
+    def superponer_usuarios(self, usuarios: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        agregados = self.obtener_varios(id_creador(u['id']) for u in usuarios)
+        for u in usuarios:
+            u['formularios_creados'] = agregados.get(id_creador(u['id']), {}).get('formularios_creados', 0)
+        return usuarios
+
+    def resumen_personas(self) -> List[Dict[str, Any]]:
+        """Resumen de participantes ya calculado (mismo filtro y forma que resumir_participantes)."""
+        resumen = []
+        for p in self.container.query_items(query=QUERY_RESUMEN_PERSONAS, enable_cross_partition_query=True):
+            if not p.get('unidad') and not p.get('empresa'):
+                continue
+            resumen.append({
+                "cedula": p.get('cedula'), "nombre": p.get('nombre') or 'Sin nombre',
+                "correo": p.get('correo') or 'N/A', "cargo": p.get('cargo') or 'N/A',
+                "unidad": p.get('unidad') or p.get('empresa') or 'N/A',
+                "empresa": p.get('empresa'), "telefono": p.get('telefono'),
+                "total_asistencias": p.get('total_asistencias', 0), "ultima_asistencia": p.get('ultima_asistencia', '')
+            })
+        return resumen
+
+    # ---------- leases ----------
+
+    def tomar_lease(self, fuente: str, propietario: str, ttl_s: int) -> Optional[Dict[str, Any]]:
+        """
+        Lease del change feed de `fuente`: solo una instancia procesa cada contenedor.
+        Devuelve el documento (con su continuation) si quedó a nombre de `propietario`, o None si
+        otra instancia lo tiene vigente o ganó la carrera (ETag).
+        """
+        doc_id = id_lease(fuente)
+        ahora = time.time()
+        lease = self._leer(doc_id)
+        if lease is None:
+            try:
+                return self.container.create_item(body={
+                    "id": doc_id, "tipo": "lease", "fuente": fuente, "continuation": None,
+                    "propietario": propietario, "expira": ahora + ttl_s, "actualizado": datetime.now(timezone.utc).isoformat()
+                })
+            except exceptions.CosmosResourceExistsError:
+                return None
+        if lease.get('propietario') != propietario and lease.get('expira', 0) > ahora:
+            return None
+        return self.checkpoint(lease, lease.get('continuation'), propietario, ttl_s)
+
+    def checkpoint(self, lease: Dict[str, Any], continuation: Optional[str], propietario: str, ttl_s: int) -> Optional[Dict[str, Any]]:
+        """Guarda el avance y renueva el lease; None si otra instancia lo tomó entre tanto."""
+        nuevo = {
+            **{k: v for k, v in lease.items() if not k.startswith('_')},
+            "continuation": continuation, "propietario": propietario,
+            "expira": time.time() + ttl_s, "actualizado": datetime.now(timezone.utc).isoformat()
+        }
+        try:
+            return self.container.replace_item(item=lease['id'], body=nuevo, etag=lease.get('_etag'), match_condition=MatchConditions.IfNotModified)
+        except exceptions.CosmosHttpResponseError as e:
+            if getattr(e, 'status_code', 0) in (404, 412):
+                return None
+            raise
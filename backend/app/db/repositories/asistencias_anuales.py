@@ -0,0 +1,85 @@
+from datetime import datetime
+from typing import Any, Dict, Iterable, List
+
+import pytz
+
+from core.config import settings
+
+# Asistencias agrupadas por persona y año (ASISTENCIAS_POR_ANIO, solo CosmosDB).
+# En el contenedor asistentes conviven:
+# - persona  id = cédula: datos de contacto y un resumen (total_asistencias, ultima_asistencia y
+#            `anios`: asistencias por año); no lleva la lista de asistencias
+# - año      id = "<cédula>:<año>", tipo = "asistencias": las asistencias registradas ese año
+# Registrar lee y reescribe solo el documento del año en curso, así que el costo y el tamaño de
+# los documentos no crecen con el historial de la persona. Cada documento es su propia partición
+# (partition key /id) y se lee con una lectura puntual: los años de una persona son los de `anios`
+# más el actual y el anterior (ver anios_a_leer).
+# Las personas con la lista completa (formato anterior) se pasan a este formato al registrarles
+# una asistencia o con migrar_asistencias_por_anio.py.
+
+TIPO_ASISTENCIAS = "asistencias"
+
+
+def anio_de(fecha_registro: str) -> str:
+    """Año (YYYY) al que pertenece una asistencia según su fecha de registro ISO."""
+    return (fecha_registro or "")[:4] or "0000"
+
+
+def anio_actual() -> str:
+    """Año en curso en la zona horaria de la aplicación (la de fecha_registro)."""
+    return str(datetime.now(pytz.timezone(settings.TIMEZONE)).year)
+
+
+def anios_a_leer(persona: Dict[str, Any]) -> List[str]:
+    """
+    Años cuyos documentos forman la persona: los de su resumen más el actual y el anterior. El
+    documento del año se escribe antes del patch del resumen; si el patch falla (o el proceso cae
+    entre ambas escrituras) la asistencia no queda en `anios` pero igual se encuentra.
+    """
+    actual = anio_actual()
+    return sorted(set(persona.get('anios', {})) | {actual, str(int(actual) - 1)})
+
+
+def id_anio(cedula: str, anio: str) -> str:
+    return f"{cedula}:{anio}"
+
+
+def nuevo_anio(cedula: str, anio: str) -> Dict[str, Any]:
+    return {"id": id_anio(cedula, anio), "tipo": TIPO_ASISTENCIAS, "cedula": cedula, "anio": anio, "asistencias": []}
+
+
+def agrupar_por_anio(asistencias: Iterable[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+    grupos: Dict[str, List[Dict[str, Any]]] = {}
+    for a in asistencias:
+        grupos.setdefault(anio_de(a.get('fecha_registro')), []).append(a)
+    return grupos
+
+
+def resumen_anios(anios: Dict[str, List[Dict[str, Any]]]) -> Dict[str, Any]:
+    """Campos de resumen de la persona a partir de sus documentos por año ({año: asistencias})."""
+    fechas = [a.get('fecha_registro') or '' for lista in anios.values() for a in lista]
+    return {
+        "anios": {anio: len(lista) for anio, lista in anios.items()},
+        "total_asistencias": len(fechas),
+        "ultima_asistencia": max(fechas) if fechas else ''
+    }
+
+
+def es_formato_anual(persona: Dict[str, Any]) -> bool:
+    """True si la persona tiene sus asistencias en documentos por año (también ya compuesta)."""
+    return 'anios' in persona
+
+
+def perfil(persona: Dict[str, Any]) -> Dict[str, Any]:
+    """Documento persona sin la lista de asistencias (lo que se guarda en formato anual)."""
+    return {k: v for k, v in persona.items() if k != 'asistencias'}
+
+
+def componer_persona(persona: Dict[str, Any], anios: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """Persona con la lista completa de asistencias (forma del Repositorio) a partir de sus años."""
+    completa = dict(persona)
+    completa['asistencias'] = sorted(
+        (a for doc in anios for a in doc.get('asistencias', [])),
+        key=lambda a: a.get('fecha_registro') or ''
+    )
+    return completa
@@ -0,0 +1,84 @@
+from typing import List, Optional, Dict, Any
+from azure.cosmos import exceptions
+from core.metrics import metricas
+from .base import BaseRepository
+
+CAMPOS_VISTA = ['nombre', 'cargo', 'unidad', 'empresa', 'telefono', 'correo']
+
+# Consultas de una sola partición (actividad_id): su costo depende del tamaño de la sesión
+QUERY_VISTA_POR_SESION = """
+        SELECT
+            c.cedula as id, c.cedula, c.nombre, c.cargo, c.unidad, c.empresa, c.telefono, c.correo,
+            c.actividad_id, c.sesion_id, c.fecha_registro, c.sesion_id as ocurrencia_id
+        FROM c
+        WHERE c.sesion_id = @sesion_id OR c.actividad_id = @sesion_id
+        """
+QUERY_VISTA_CONTAR = "SELECT VALUE COUNT(1) FROM c WHERE c.sesion_id = @sesion_id OR c.actividad_id = @sesion_id"
+QUERY_VISTA_ENTRADAS = "SELECT c.id, c.cedula FROM c WHERE c.sesion_id = @sesion_id OR c.actividad_id = @sesion_id"
+
+
+def documento_vista(persona: Dict[str, Any], asistencia: Dict[str, Any]) -> Dict[str, Any]:
+    """Entrada de la vista: una asistencia con los datos de contacto de la persona desnormalizados."""
+    cedula = persona.get('cedula') or persona['id']
+    doc = {
+        "id": f"{asistencia['sesion_id']}:{cedula}",
+        "actividad_id": asistencia['actividad_id'],
+        "sesion_id": asistencia['sesion_id'],
+        "cedula": cedula,
+        "fecha_registro": asistencia.get('fecha_registro')
+    }
+    for campo in CAMPOS_VISTA:
+        doc[campo] = persona.get(campo)
+    return doc
+
+
+class AsistenciasSesionRepository(BaseRepository):
+    """
+    Vista materializada de asistencias por sesión, particionada por actividad_id (id de la sesión
+    maestra). Se escribe siempre junto con el documento persona; con ASISTENCIAS_SESION_VISTA listar,
+    contar y eliminar en cascada consultan una sola partición en lugar de hacer JOIN sobre todo el
+    contenedor de asistentes (activarlo después de reconstruir_asistencias_sesion.py).
+    `sesion_id` puede ser la actividad o una de sus ocurrencias; con una ocurrencia hay que pasar
+    `actividad_id` para ubicar la partición.
+    """
+
+    def guardar(self, persona: Dict[str, Any], asistencia: Dict[str, Any]) -> None:
+        """
+        Upsert de la entrada (idempotente: pasa por los reintentos comunes del contenedor). Si aun así
+        falla se propaga: la persona ya quedó escrita, y repetir el registro vuelve a escribir la
+        entrada (AsistentesRepository._duplicado); si no, la repara reconstruir_asistencias_sesion.py.
+        """
+        try:
+            self.container.upsert_item(body=documento_vista(persona, asistencia))
+        except Exception as e:
+            print(f"❌ [Vista] No se pudo materializar la asistencia de {persona.get('id')} en {asistencia.get('sesion_id')}: {type(e).__name__}: {e}")
+            metricas.incr("vista_asistencias.errores")
+            raise
+
+    def guardar_persona(self, persona: Dict[str, Any]) -> None:
+        """Reescribe todas las entradas de la persona (datos de contacto actualizados o reconstrucción)."""
+        for asistencia in persona.get('asistencias', []):
+            if asistencia.get('actividad_id') and asistencia.get('sesion_id'):
+                self.guardar(persona, asistencia)
+
+    def _consultar(self, query: str, sesion_id: str, actividad_id: Optional[str]) -> List[Any]:
+        parameters = [{"name": "@sesion_id", "value": sesion_id}]
+        return list(self.container.query_items(query=query, parameters=parameters, partition_key=actividad_id or sesion_id))
+
+    def listar_por_sesion(self, sesion_id: str, actividad_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        items = self._consultar(QUERY_VISTA_POR_SESION, sesion_id, actividad_id)
+        return sorted(items, key=lambda x: x.get('fecha_registro') or '')
+
+    def contar_por_sesion(self, sesion_id: str, actividad_id: Optional[str] = None) -> int:
+        items = self._consultar(QUERY_VISTA_CONTAR, sesion_id, actividad_id)
+        return items[0] if items else 0
+
+    def entradas_por_sesion(self, sesion_id: str, actividad_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        return self._consultar(QUERY_VISTA_ENTRADAS, sesion_id, actividad_id)
+
+    def eliminar_entradas(self, ids: List[str], actividad_id: str) -> None:
+        for doc_id in ids:
+            try:
+                self.container.delete_item(item=doc_id, partition_key=actividad_id)
+            except exceptions.CosmosResourceNotFoundError:
+                pass
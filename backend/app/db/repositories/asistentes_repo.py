@@ -1,111 +1,362 @@
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
+from azure.core import MatchConditions
 from azure.cosmos import exceptions
+from azure.cosmos.partition_key import NonePartitionKeyValue, NullPartitionKeyValue
+from core.config import settings
+from core.metrics import metricas
 from .base import BaseRepository
+from .asistencias_sesion_repo import AsistenciasSesionRepository
+from .agregados_repo import AgregadosRepository
+from .asistencias_anuales import (
+    TIPO_ASISTENCIAS, anio_de, anios_a_leer, id_anio, nuevo_anio, agrupar_por_anio, resumen_anios,
+    es_formato_anual, perfil, componer_persona
+)
+
+CAMPOS_CONTACTO = ['nombre', 'cargo', 'unidad', 'empresa', 'telefono', 'correo']
+
+# Consultas compartidas por el repositorio síncrono y el asíncrono (db/aio)
+QUERY_PERSONA_POR_ID = "SELECT * FROM c WHERE c.id = @cedula"
+# Documentos cuya partition key no es la cédula (solo si el contenedor no está particionado por /id)
+QUERY_FUERA_DE_PARTICION = 'SELECT * FROM c WHERE NOT IS_DEFINED(c.tipo) AND (NOT IS_DEFINED(c["{campo}"]) OR c["{campo}"] != c.id)'
+CAMPOS_SISTEMA = ('_rid', '_self', '_etag', '_attachments', '_ts')
+QUERY_LISTAR_POR_SESION = """
+        SELECT 
+            c.id as id, c.id as cedula, c.nombre, c.cargo, c.unidad, c.empresa, c.telefono, c.correo,
+            a.actividad_id, a.sesion_id, a.fecha_registro, a.sesion_id as ocurrencia_id
+        FROM c
+        JOIN a IN c.asistencias
+        WHERE a.sesion_id = @sesion_id OR a.actividad_id = @sesion_id
+        """
+# c.cedula: documentos por año (ASISTENCIAS_POR_ANIO), cuyo id es "<cédula>:<año>"
+QUERY_DUPLICADO = "SELECT TOP 1 VALUE 1 FROM c JOIN a IN c.asistencias WHERE (c.id = @cedula OR c.cedula = @cedula) AND a.sesion_id = @context_id"
+QUERY_CONTAR_POR_SESION = "SELECT VALUE COUNT(1) FROM c JOIN a IN c.asistencias WHERE a.sesion_id = @sesion_id OR a.actividad_id = @sesion_id"
+QUERY_PERSONAS = "SELECT c.id as cedula, c.nombre, c.correo, c.cargo, c.unidad, c.empresa, c.telefono, c.asistencias, c.anios FROM c WHERE NOT IS_DEFINED(c.tipo)"
+QUERY_PERSONAS_COMPLETAS = "SELECT * FROM c WHERE NOT IS_DEFINED(c.tipo)"
+QUERY_ASISTENCIAS_ANUALES = f"SELECT c.cedula, c.anio, c.asistencias FROM c WHERE c.tipo = '{TIPO_ASISTENCIAS}'"
+# Personas aún con la lista completa de asistencias (migrar_asistencias_por_anio.py)
+QUERY_PERSONAS_SIN_ANIOS = "SELECT * FROM c WHERE NOT IS_DEFINED(c.tipo) AND NOT IS_DEFINED(c.anios)"
+QUERY_ASISTENCIAS_PLANAS = """
+        SELECT 
+            c.id as cedula, c.nombre, c.cargo as cargo_asistente, c.unidad, c.empresa, c.telefono, c.correo,
+            a.actividad_id, a.sesion_id, a.fecha_registro
+        FROM c
+        JOIN a IN c.asistencias
+        """
+
+def preparar_asistencia(asistente_data: Dict[str, Any], sesion_id: str) -> Tuple[Dict[str, Any], str]:
+    """Construye la entrada de asistencia y devuelve también el id específico (ocurrencia o maestra)."""
+    id_especifico = asistente_data.get('ocurrencia_id') or sesion_id
+    nueva_asistencia = {
+        "actividad_id": sesion_id,
+        "sesion_id": id_especifico,
+        "fecha_registro": asistente_data['fecha_registro']
+    }
+    return nueva_asistencia, id_especifico
+
+def aplicar_asistencia(persona: Dict[str, Any], nueva_asistencia: Dict[str, Any], asistente_data: Dict[str, Any]) -> bool:
+    """
+    Agrega la asistencia al documento de la persona y actualiza sus datos de contacto.
+    Devuelve False si ya tenía asistencia para esa sesión/ocurrencia (no hay nada que escribir).
+    """
+    if any(a.get('sesion_id') == nueva_asistencia['sesion_id'] for a in persona.get('asistencias', [])):
+        return False
+    persona.setdefault('asistencias', []).append(nueva_asistencia)
+    for campo in CAMPOS_CONTACTO:
+        valor = asistente_data.get(campo)
+        if valor:
+            persona[campo] = valor
+    return True
+
+def nueva_persona(cedula: str, nueva_asistencia: Dict[str, Any], asistente_data: Dict[str, Any]) -> Dict[str, Any]:
+    persona = {
+        "id": cedula,
+        "asistencias": [nueva_asistencia]
+    }
+    for campo in CAMPOS_CONTACTO:
+        valor = asistente_data.get(campo)
+        if valor:
+            persona[campo] = valor
+    return persona
+
+def es_no_encontrado(e: Exception) -> bool:
+    return isinstance(e, exceptions.CosmosResourceNotFoundError) or getattr(e, 'status_code', 0) == 404
+
+def es_conflicto_escritura(e: Exception) -> bool:
+    """412 (otro registro modificó el documento entre la lectura y el replace) o 409 (creación concurrente)."""
+    return (isinstance(e, (exceptions.CosmosAccessConditionFailedError, exceptions.CosmosResourceExistsError))
+            or getattr(e, 'status_code', 0) in (409, 412))
+
+def asistencia_de(persona: Dict[str, Any], id_especifico: str) -> Optional[Dict[str, Any]]:
+    return next((a for a in persona.get('asistencias', []) if a.get('sesion_id') == id_especifico), None)
+
+def aplanar_asistencias(personas: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Filas de QUERY_ASISTENCIAS_PLANAS a partir de personas con su lista completa de asistencias."""
+    return [
+        {
+            "cedula": p.get('cedula') or p.get('id'), "nombre": p.get('nombre'), "cargo_asistente": p.get('cargo'),
+            "unidad": p.get('unidad'), "empresa": p.get('empresa'), "telefono": p.get('telefono'), "correo": p.get('correo'),
+            "actividad_id": a.get('actividad_id'), "sesion_id": a.get('sesion_id'), "fecha_registro": a.get('fecha_registro')
+        }
+        for p in personas for a in p.get('asistencias', [])
+    ]
+
+def valor_particion(doc: Dict[str, Any], campo: str) -> Any:
+    """Valor de partition key de `doc` tal como lo espera el SDK (campo ausente o null incluidos)."""
+    if campo not in doc:
+        return NonePartitionKeyValue
+    return NullPartitionKeyValue if doc[campo] is None else doc[campo]
 
 class AsistentesRepository(BaseRepository):
+    """
+    Documento persona (id = cédula) con su lista de asistencias. Con `vista` cada asistencia
+    escrita se materializa también en el contenedor asistencias_sesion (ver AsistenciasSesionRepository),
+    que con ASISTENCIAS_SESION_VISTA atiende listar, contar y eliminar por sesión (tras
+    reconstruir_asistencias_sesion.py). Con `agregados` (change feed) el borrado de una persona
+    se refleja en los agregados, porque el change feed no entrega eliminaciones.
+    Con ASISTENCIAS_POR_ANIO las asistencias van en documentos por año (ver asistencias_anuales):
+    los métodos de lectura devuelven la persona compuesta con la lista completa, como antes.
+    """
+
+    def __init__(self, container, vista: Optional[AsistenciasSesionRepository] = None, agregados: Optional[AgregadosRepository] = None):
+        super().__init__(container)
+        self.vista = vista
+        self.agregados = agregados
+
+    def _leer_de_vista(self) -> bool:
+        """La vista se escribe siempre, pero solo se consulta con ASISTENCIAS_SESION_VISTA (tras reconstruirla)."""
+        return self.vista is not None and settings.ASISTENCIAS_SESION_VISTA
+
+    def _materializar(self, persona: Dict[str, Any], id_especifico: str) -> None:
+        if self.vista is None:
+            return
+        asistencia = asistencia_de(persona, id_especifico)
+        if asistencia:
+            self.vista.guardar(persona, asistencia)
+
+    def _duplicado(self, persona: Dict[str, Any], id_especifico: str) -> Tuple[Dict[str, Any], bool]:
+        """
+        Asistencia ya registrada: se vuelve a escribir su entrada en la vista (upsert idempotente),
+        por si el registro anterior falló después de guardar la persona.
+        """
+        self._materializar(persona, id_especifico)
+        return persona, False
+
     def crear_o_actualizar(self, asistente_data: Dict[str, Any], sesion_id: str) -> Dict[str, Any]:
+        if settings.ASISTENCIAS_POR_ANIO:
+            return self.registrar_asistencia(asistente_data, sesion_id)[0]
+        persona = self._escribir_persona(asistente_data, sesion_id)
+        self._materializar(persona, preparar_asistencia(asistente_data, sesion_id)[1])
+        return persona
+
+    def _escribir_persona(self, asistente_data: Dict[str, Any], sesion_id: str) -> Dict[str, Any]:
         cedula = asistente_data['cedula']
-        id_especifico = asistente_data.get('ocurrencia_id') or sesion_id
-        
-        nueva_asistencia = {
-            "actividad_id": sesion_id,
-            "sesion_id": id_especifico,
-            "fecha_registro": asistente_data['fecha_registro']
-        }
+        nueva_asistencia, id_especifico = preparar_asistencia(asistente_data, sesion_id)
         
         print(f"🔍 [Repo] Procesando registro para {cedula} en sesión {id_especifico}")
         
         # Intentar leer primero para actualizar
         try:
-            print(f"DEBUG: [Repo] Intentando leer persona id='{cedula}' partition_key='{cedula}'")
             persona = self.container.read_item(item=cedula, partition_key=cedula)
             print(f"DEBUG: [Repo] Persona encontrada. Asistencias actuales: {len(persona.get('asistencias', []))}")
             
             # Verificar si ya tiene asistencia para esta sesión/ocurrencia específica
-            if any(a.get('sesion_id') == id_especifico for a in persona.get('asistencias', [])):
+            if not aplicar_asistencia(persona, nueva_asistencia, asistente_data):
                 print(f"🔍 [Repo] Asistencia ya registrada para {cedula} en {id_especifico}")
                 return persona
-                
-            # Agregar nueva asistencia
-            if 'asistencias' not in persona:
-                persona['asistencias'] = []
-            persona['asistencias'].append(nueva_asistencia)
-            
-            # Actualizar datos de contacto si se proporcionan
-            for campo in ['nombre', 'cargo', 'unidad', 'empresa', 'telefono', 'correo']:
-                valor = asistente_data.get(campo)
-                if valor:
-                    persona[campo] = valor
                     
             print(f"🔍 [Repo] Actualizando asistencias de {cedula}...")
             return self.container.replace_item(item=cedula, body=persona)
             
         except (exceptions.CosmosResourceNotFoundError, exceptions.CosmosHttpResponseError) as e:
             # Capturar también CosmosHttpResponseError si el status_code es 404
-            status_code = getattr(e, 'status_code', 0)
-            if not isinstance(e, exceptions.CosmosResourceNotFoundError) and status_code != 404:
+            if not es_no_encontrado(e):
                 print(f"❌ Error inesperado en read_item (persona={cedula}): {type(e).__name__}: {e}")
                 raise
             
             # FALLBACK: Si no se encontró por read_item, intentar por consulta (cross-partition)
             # Esto ayuda si el partition_key no es exactamente la cédula/id
-            print(f"⚠️ [Repo] Persona {cedula} no encontrada por read_item. Intentando búsqueda por consulta...")
-            query = "SELECT * FROM c WHERE c.id = @cedula"
-            parameters = [{"name": "@cedula", "value": cedula}]
-            items = list(self.container.query_items(query=query, parameters=parameters, enable_cross_partition_query=True))
+            persona = self._buscar_fuera_de_particion(cedula)
             
-            if items:
+            if persona:
                 print(f"✅ [Repo] Persona {cedula} encontrada mediante consulta fallback!")
-                persona = items[0]
                 # Seguir con la lógica de actualización
-                if any(a.get('sesion_id') == id_especifico for a in persona.get('asistencias', [])):
+                if not aplicar_asistencia(persona, nueva_asistencia, asistente_data):
                     return persona
-                if 'asistencias' not in persona:
-                    persona['asistencias'] = []
-                persona['asistencias'].append(nueva_asistencia)
-                for campo in ['nombre', 'cargo', 'unidad', 'empresa', 'telefono', 'correo']:
-                    valor = asistente_data.get(campo)
-                    if valor: persona[campo] = valor
                 return self.container.replace_item(item=persona['id'], body=persona)
 
             # Si realmente no existe en ninguna partición, intentar crear por primera vez
             print(f"🔍 [Repo] Persona {cedula} no existe en ninguna partición, creando registro base...")
-            nueva_persona = {
-                "id": cedula,
-                "asistencias": [nueva_asistencia]
-            }
-            # Agregar campos base
-            for campo in ['nombre', 'cargo', 'unidad', 'empresa', 'telefono', 'correo']:
-                valor = asistente_data.get(campo)
-                if valor:
-                    nueva_persona[campo] = valor
-            
             try:
-                return self.container.create_item(body=nueva_persona)
+                return self.container.create_item(body=nueva_persona(cedula, nueva_asistencia, asistente_data))
             except exceptions.CosmosResourceExistsError:
                 # Si falló porque se creó justo antes, reintentar lectura una vez
                 print(f"⚠️ [Repo] Conflicto de creación (ya existe {cedula}). Reintentando actualización final...")
                 try:
                     persona = self.container.read_item(item=cedula, partition_key=cedula)
-                    if not any(a.get('sesion_id') == id_especifico for a in persona.get('asistencias', [])):
-                        persona['asistencias'].append(nueva_asistencia)
+                    if aplicar_asistencia(persona, nueva_asistencia, asistente_data):
                         return self.container.replace_item(item=cedula, body=persona)
                     return persona
                 except Exception as ex_read:
                     print(f"❌ FALLO CRÍTICO: No se pudo leer documento que acabamos de decir que existe (id={cedula}): {ex_read}")
                     raise
 
-    def obtener_por_cedula(self, cedula: str) -> Optional[Dict[str, Any]]:
+    def registrar_asistencia(self, asistente_data: Dict[str, Any], sesion_id: str, max_intentos: int = 3) -> Tuple[Dict[str, Any], bool]:
+        """
+        Camino de registro fusionado: una lectura puntual de la persona, detección de duplicado
+        en memoria y una sola escritura (replace con ETag o create).
+        Devuelve (persona, registrada); registrada=False indica que ya tenía asistencia en esa sesión.
+        """
+        if settings.ASISTENCIAS_POR_ANIO:
+            return self._registrar_por_anio(asistente_data, sesion_id, max_intentos)
+        cedula = asistente_data['cedula']
+        nueva_asistencia, id_especifico = preparar_asistencia(asistente_data, sesion_id)
+
+        for intento in range(max_intentos):
+            persona = self._get_persona(cedula)
+            if persona and es_formato_anual(persona):
+                # Ya migrada: la lista completa no está en el documento persona
+                return self._registrar_por_anio(asistente_data, sesion_id, max_intentos)
+            try:
+                if persona:
+                    if not aplicar_asistencia(persona, dict(nueva_asistencia), asistente_data):
+                        return self._duplicado(persona, id_especifico)
+                    # Si otro registro escribió entre la lectura y el replace, Cosmos responde 412 y se reintenta
+                    persona = self.container.replace_item(
+                        item=persona['id'], body=persona,
+                        etag=persona.get('_etag'), match_condition=MatchConditions.IfNotModified
+                    )
+                else:
+                    persona = self.container.create_item(body=nueva_persona(cedula, dict(nueva_asistencia), asistente_data))
+            except exceptions.CosmosHttpResponseError as e:
+                if es_conflicto_escritura(e) and intento < max_intentos - 1:
+                    print(f"⚠️ [Repo] Conflicto de escritura para {cedula} en {id_especifico} (intento {intento + 1}), releyendo...")
+                    continue
+                raise
+            self._materializar(persona, id_especifico)
+            return persona, True
+        raise RuntimeError(f"No se pudo registrar la asistencia de {cedula} tras {max_intentos} intentos")
+
+    def _registrar_por_anio(self, asistente_data: Dict[str, Any], sesion_id: str, max_intentos: int) -> Tuple[Dict[str, Any], bool]:
+        """
+        Registro con documentos por año: lee la persona (solo perfil y resumen), escribe el documento
+        del año en curso (replace con ETag o create) y actualiza el resumen con un patch.
+        La persona devuelta lleva en `asistencias` solo las del año del registro.
+        """
+        cedula = asistente_data['cedula']
+        nueva_asistencia, id_especifico = preparar_asistencia(asistente_data, sesion_id)
+        anio = anio_de(nueva_asistencia['fecha_registro'])
+
+        persona = self._get_persona(cedula)
+        if persona and not es_formato_anual(persona):
+            persona = self.pasar_a_formato_anual(persona)
+        # Una sesión que cruza el cambio de año puede tener la asistencia en el documento del año anterior
+        anterior = str(int(anio) - 1) if anio.isdigit() else None
+        if persona and anterior and persona['anios'].get(anterior):
+            previo = self._leer_anio(cedula, anterior)
+            if previo and asistencia_de(previo, id_especifico):
+                return self._duplicado(componer_persona(persona, [previo]), id_especifico)
+
+        doc, registrada = self._escribir_anio(cedula, anio, nueva_asistencia, max_intentos)
+        if not registrada:
+            return self._duplicado(componer_persona(persona or nueva_persona(cedula, nueva_asistencia, asistente_data), [doc]), id_especifico)
+        persona = componer_persona(self._actualizar_resumen(cedula, persona, doc, nueva_asistencia, asistente_data), [doc])
+        self._materializar(persona, id_especifico)
+        return persona, True
+
+    def _leer_anio(self, cedula: str, anio: str) -> Optional[Dict[str, Any]]:
         try:
-            return self.container.read_item(item=cedula, partition_key=cedula)
+            return self.container.read_item(item=id_anio(cedula, anio), partition_key=id_anio(cedula, anio))
         except (exceptions.CosmosResourceNotFoundError, exceptions.CosmosHttpResponseError) as e:
-            if getattr(e, 'status_code', 0) == 404 or isinstance(e, exceptions.CosmosResourceNotFoundError):
-                # Fallback a consulta
-                query = "SELECT * FROM c WHERE c.id = @cedula"
-                parameters = [{"name": "@cedula", "value": cedula}]
-                items = list(self.container.query_items(query=query, parameters=parameters, enable_cross_partition_query=True))
-                return items[0] if items else None
+            if es_no_encontrado(e):
+                return None
             raise
+
+    def _leer_anios(self, persona: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """Documentos por año de la persona (una lectura puntual por cada año de anios_a_leer)."""
+        docs = (self._leer_anio(persona['id'], anio) for anio in anios_a_leer(persona))
+        return [doc for doc in docs if doc]
+
+    def _escribir_anio(self, cedula: str, anio: str, nueva_asistencia: Dict[str, Any], max_intentos: int) -> Tuple[Dict[str, Any], bool]:
+        """Agrega la asistencia al documento del año; (documento, False) si ya estaba registrada."""
+        for intento in range(max_intentos):
+            doc = self._leer_anio(cedula, anio)
+            try:
+                if doc is None:
+                    doc = nuevo_anio(cedula, anio)
+                    doc['asistencias'].append(dict(nueva_asistencia))
+                    return self.container.create_item(body=doc), True
+                if not aplicar_asistencia(doc, dict(nueva_asistencia), {}):
+                    return doc, False
+                return self.container.replace_item(
+                    item=doc['id'], body=doc, etag=doc.get('_etag'), match_condition=MatchConditions.IfNotModified
+                ), True
+            except exceptions.CosmosHttpResponseError as e:
+                if es_conflicto_escritura(e) and intento < max_intentos - 1:
+                    print(f"⚠️ [Repo] Conflicto de escritura en {id_anio(cedula, anio)} (intento {intento + 1}), releyendo...")
+                    continue
+                raise
+        raise RuntimeError(f"No se pudo registrar la asistencia de {cedula} tras {max_intentos} intentos")
+
+    def _actualizar_resumen(self, cedula: str, persona: Optional[Dict[str, Any]], doc: Dict[str, Any],
+                            nueva_asistencia: Dict[str, Any], asistente_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Crea la persona (perfil y resumen) o le aplica un patch: no se relee ni se reescribe completa."""
+        contacto = {c: asistente_data[c] for c in CAMPOS_CONTACTO if asistente_data.get(c)}
+        if persona is None:
+            try:
+                return self.container.create_item(body={
+                    "id": cedula, **contacto, "anios": {doc['anio']: len(doc['asistencias'])},
+                    "total_asistencias": 1, "ultima_asistencia": nueva_asistencia['fecha_registro']
+                })
+            except exceptions.CosmosResourceExistsError:
+                print(f"⚠️ [Repo] Conflicto de creación (ya existe {cedula}). Actualizando resumen...")
+        # incr: dos registros concurrentes (del mismo año o de años distintos) no se pisan los conteos
+        operaciones = [
+            {"op": "incr", "path": "/total_asistencias", "value": 1},
+            {"op": "incr", "path": f"/anios/{doc['anio']}", "value": 1},
+            {"op": "set", "path": "/ultima_asistencia", "value": nueva_asistencia['fecha_registro']}
+        ]
+        operaciones += [{"op": "set", "path": f"/{c}", "value": v} for c, v in contacto.items() if (persona or {}).get(c) != v]
+        return self.container.patch_item(item=cedula, partition_key=cedula, patch_operations=operaciones)
+
+    def pasar_a_formato_anual(self, persona: Dict[str, Any], max_intentos: int = 3) -> Dict[str, Any]:
+        """
+        Mueve la lista de asistencias de una persona a sus documentos por año y deja en la persona
+        solo el perfil y el resumen. Es idempotente: si se interrumpe, al repetirla fusiona lo ya escrito.
+        """
+        cedula = persona['id']
+        for intento in range(max_intentos):
+            anios = {}
+            for anio, asistencias in agrupar_por_anio(persona.get('asistencias', [])).items():
+                doc = self._leer_anio(cedula, anio) or nuevo_anio(cedula, anio)
+                doc['asistencias'] += [a for a in asistencias if not asistencia_de(doc, a.get('sesion_id'))]
+                anios[anio] = self.container.upsert_item(body=doc)['asistencias']
+            try:
+                # Con ETag: un registro concurrente con el formato anterior obliga a repetir con su asistencia
+                return self.container.replace_item(
+                    item=cedula, body={**perfil(persona), **resumen_anios(anios)},
+                    etag=persona.get('_etag'), match_condition=MatchConditions.IfNotModified
+                )
+            except exceptions.CosmosHttpResponseError as e:
+                if not es_conflicto_escritura(e) or intento == max_intentos - 1:
+                    raise
+            persona = self._get_persona(cedula)
+            if persona is None or es_formato_anual(persona):
+                return persona
+        raise RuntimeError(f"No se pudo pasar a formato anual a {cedula} tras {max_intentos} intentos")
+
+    def migrar_a_formato_anual(self) -> int:
+        """Pasa a formato anual todas las personas que aún tienen la lista completa; devuelve cuántas."""
+        total = 0
+        for persona in self.container.query_items(query=QUERY_PERSONAS_SIN_ANIOS, enable_cross_partition_query=True):
+            self.pasar_a_formato_anual(persona)
+            total += 1
+        return total
+
+    def obtener_por_cedula(self, cedula: str) -> Optional[Dict[str, Any]]:
+        persona = self._get_persona(cedula)
+        if persona and es_formato_anual(persona):
+            return componer_persona(persona, self._leer_anios(persona))
+        return persona
     
     def actualizar_campos(self, cedula: str, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
         persona = self.obtener_por_cedula(cedula)
@@ -113,25 +364,29 @@ class AsistentesRepository(BaseRepository):
             return None
             
         # Actualizar campos permitidos
-        campos_permitidos = ['nombre', 'cargo', 'unidad', 'empresa', 'telefono', 'correo']
-        for campo in campos_permitidos:
+        for campo in CAMPOS_CONTACTO:
             if campo in data and data[campo] is not None:
                 persona[campo] = data[campo]
-                
-        return self.container.replace_item(item=persona['id'], body=persona)
+
+        if es_formato_anual(persona):
+            # Patch del perfil: un replace pisaría el resumen que actualiza un registro concurrente
+            operaciones = [{"op": "set", "path": f"/{c}", "value": persona[c]} for c in CAMPOS_CONTACTO if data.get(c) is not None]
+            if operaciones:
+                guardada = self.container.patch_item(item=persona['id'], partition_key=persona['id'], patch_operations=operaciones)
+                persona = {**guardada, 'asistencias': persona['asistencias']}
+        else:
+            persona = self.container.replace_item(item=persona['id'], body=persona)
+        if self.vista is not None:
+            # Datos de contacto desnormalizados en cada entrada de la vista
+            self.vista.guardar_persona(persona)
+        return persona
     
-    def listar_por_sesion(self, sesion_id: str) -> List[Dict[str, Any]]:
+    def listar_por_sesion(self, sesion_id: str, actividad_id: Optional[str] = None) -> List[Dict[str, Any]]:
         # sesion_id aquí puede ser el id de una ocurrencia o de una sesión única (maestra)
-        query = """
-        SELECT 
-            c.id as id, c.id as cedula, c.nombre, c.cargo, c.unidad, c.empresa, c.telefono, c.correo,
-            a.actividad_id, a.sesion_id, a.fecha_registro, a.sesion_id as ocurrencia_id
-        FROM c
-        JOIN a IN c.asistencias
-        WHERE a.sesion_id = @sesion_id OR a.actividad_id = @sesion_id
-        """
+        if self._leer_de_vista():
+            return self.vista.listar_por_sesion(sesion_id, actividad_id)
         parameters = [{"name": "@sesion_id", "value": sesion_id}]
-        items = list(self.container.query_items(query=query, parameters=parameters, enable_cross_partition_query=True))
+        items = list(self.container.query_items(query=QUERY_LISTAR_POR_SESION, parameters=parameters, enable_cross_partition_query=True))
         
         # ordenar en memoria por fecha_registro ya que cosmos db no soporta ORDER BY en colecciones correlacionadas (JOIN)
         return sorted(items, key=lambda x: x.get('fecha_registro', ''))
@@ -141,21 +396,29 @@ class AsistentesRepository(BaseRepository):
         try:
             return self.container.read_item(item=cedula, partition_key=cedula)
         except (exceptions.CosmosResourceNotFoundError, exceptions.CosmosHttpResponseError) as e:
-            status_code = getattr(e, 'status_code', 0)
-            if not isinstance(e, exceptions.CosmosResourceNotFoundError) and status_code != 404:
+            if not es_no_encontrado(e):
                 raise
-            
-            # Fallback a consulta
-            query = "SELECT * FROM c WHERE c.id = @cedula"
-            parameters = [{"name": "@cedula", "value": cedula}]
-            items = list(self.container.query_items(query=query, parameters=parameters, enable_cross_partition_query=True))
-            return items[0] if items else None
+            return self._buscar_fuera_de_particion(cedula)
+
+    def _buscar_fuera_de_particion(self, cedula: str) -> Optional[Dict[str, Any]]:
+        """
+        Fallback tras un 404 de read_item: documento cuya partition key no coincide con la cédula
+        (anterior a migrar_particion_asistentes.py). Con ASISTENTES_FALLBACK_CONSULTA=false no se
+        consulta y el 404 es definitivo; el contador asistentes.fallback_encontrado indica si aún hace falta.
+        """
+        if not settings.ASISTENTES_FALLBACK_CONSULTA:
+            return None
+        parameters = [{"name": "@cedula", "value": cedula}]
+        items = list(self.container.query_items(query=QUERY_PERSONA_POR_ID, parameters=parameters, enable_cross_partition_query=True))
+        metricas.incr("asistentes.fallback_consulta")
+        if items:
+            metricas.incr("asistentes.fallback_encontrado")
+        return items[0] if items else None
 
     def verificar_duplicado(self, cedula: str, context_id: str) -> bool:
         # Optimización: Consultar solo el valor booleano o usar una consulta más ligera
-        query = "SELECT TOP 1 VALUE 1 FROM c JOIN a IN c.asistencias WHERE c.id = @cedula AND a.sesion_id = @context_id"
         parameters = [{"name": "@cedula", "value": cedula}, {"name": "@context_id", "value": context_id}]
-        items = list(self.container.query_items(query=query, parameters=parameters, enable_cross_partition_query=True))
+        items = list(self.container.query_items(query=QUERY_DUPLICADO, parameters=parameters, enable_cross_partition_query=True))
         return len(items) > 0
     
     def eliminar_asistencia_sesion(self, cedula: str, context_id: str) -> None:
@@ -170,6 +433,8 @@ class AsistentesRepository(BaseRepository):
             if not persona:
                 print(f"⚠️ [Repo] Persona {cedula} no encontrada (fallback inclusive)")
                 return
+            if es_formato_anual(persona):
+                return self._eliminar_asistencia_anual(persona, context_id)
 
             asistencias_antes = len(persona.get('asistencias', []))
             # Filtrar por sesion_id (ocurrencia) o actividad_id (maestra)
@@ -186,8 +451,10 @@ class AsistentesRepository(BaseRepository):
                 # Logs para diagnosticar la partition key real del contenedor
                 print(f"🔬 [Repo] Campos del documento: { {k: v for k, v in persona.items() if k.startswith('_') or k == 'id'} }")
                 eliminado = False
-                # Intentar distintos formatos de partition key (simple, 1 nivel, 2 niveles)
-                for pk_val in [cedula, [cedula], [cedula, cedula]]:
+                # Intentar distintos formatos de partition key (simple, 1 nivel, 2 niveles); tras la
+                # migración (ASISTENTES_FALLBACK_CONSULTA=false) la partition key es siempre la cédula
+                formatos = [cedula, [cedula], [cedula, cedula]] if settings.ASISTENTES_FALLBACK_CONSULTA else [cedula]
+                for pk_val in formatos:
                     try:
                         self.container.delete_item(item=cedula, partition_key=pk_val)
                         print(f"✅ [Repo] Eliminado con partition_key={pk_val!r}")
@@ -202,6 +469,8 @@ class AsistentesRepository(BaseRepository):
                         continue
                 if not eliminado:
                     raise RuntimeError(f"No se pudo eliminar el documento {cedula} con ningún formato de partition key")
+                if self.agregados is not None:
+                    self.agregados.persona_eliminada(cedula)
             elif asistencias_antes != asistencias_despues:
                 print(f"💾 [Repo] Actualizando persona {cedula} con asistencias filtradas.")
                 persona['asistencias'] = asistencias_restantes
@@ -214,24 +483,76 @@ class AsistentesRepository(BaseRepository):
             print(f"❌ [Repo] Error al eliminar asistencia de {cedula}: {type(e).__name__}: {str(e)}")
             raise
 
-    def contar_por_sesion(self, sesion_id: str) -> int:
+    def _eliminar_asistencia_anual(self, persona: Dict[str, Any], context_id: str) -> None:
+        """eliminar_asistencia_sesion con documentos por año: se reescriben solo los años afectados."""
+        cedula = persona['id']
+        docs = self._leer_anios(persona)
+        restantes = {
+            doc['anio']: [a for a in doc['asistencias'] if a.get('sesion_id') != context_id and a.get('actividad_id') != context_id]
+            for doc in docs
+        }
+        cambiados = [doc for doc in docs if len(restantes[doc['anio']]) != len(doc['asistencias'])]
+        if not cambiados:
+            print(f"ℹ️ [Repo] No se encontró la asistencia {context_id} en el registro de {cedula}. Nada que eliminar.")
+            return
+        if not any(restantes.values()):
+            print(f"🗑️ [Repo] Persona {cedula} sin asistencias. Eliminando registro completo.")
+            for item in [cedula] + [doc['id'] for doc in docs]:
+                try:
+                    self.container.delete_item(item=item, partition_key=item)
+                except exceptions.CosmosResourceNotFoundError:
+                    pass
+            if self.agregados is not None:
+                self.agregados.persona_eliminada(cedula)
+            return
+        print(f"💾 [Repo] Actualizando {len(cambiados)} año(s) de asistencias de {cedula}.")
+        for doc in cambiados:
+            # Un año vacío se conserva: el change feed no entrega borrados y los agregados no lo verían
+            doc['asistencias'] = restantes[doc['anio']]
+            self.container.upsert_item(body=doc)
+        resumen = resumen_anios(restantes)
+        self.container.patch_item(item=cedula, partition_key=cedula, patch_operations=[
+            {"op": "set", "path": f"/{campo}", "value": valor} for campo, valor in resumen.items()
+        ])
+
+    def listar_personas(self) -> List[Dict[str, Any]]:
+        # En este modelo los asistentes YA están agrupados por persona
+        personas = list(self.container.query_items(query=QUERY_PERSONAS, enable_cross_partition_query=True))
+        if not settings.ASISTENCIAS_POR_ANIO:
+            return personas
+        anios: Dict[str, List[Dict[str, Any]]] = {}
+        for doc in self.container.query_items(query=QUERY_ASISTENCIAS_ANUALES, enable_cross_partition_query=True):
+            anios.setdefault(doc['cedula'], []).append(doc)
+        return [componer_persona(p, anios.get(p['cedula'], [])) if es_formato_anual(p) else p for p in personas]
+
+    def listar_asistencias_planas(self) -> List[Dict[str, Any]]:
+        """Una fila por asistencia con los datos de la persona (JOIN sobre c.asistencias)."""
+        if settings.ASISTENCIAS_POR_ANIO:
+            return aplanar_asistencias(self.listar_personas())
+        return list(self.container.query_items(query=QUERY_ASISTENCIAS_PLANAS, enable_cross_partition_query=True))
+
+    def contar_por_sesion(self, sesion_id: str, actividad_id: Optional[str] = None) -> int:
         """
         Cuenta el total de asistentes únicos para una sesión o actividad.
         """
-        query = "SELECT VALUE COUNT(1) FROM c JOIN a IN c.asistencias WHERE a.sesion_id = @sesion_id OR a.actividad_id = @sesion_id"
+        if self._leer_de_vista():
+            return self.vista.contar_por_sesion(sesion_id, actividad_id)
         parameters = [{"name": "@sesion_id", "value": sesion_id}]
-        items = list(self.container.query_items(query=query, parameters=parameters, enable_cross_partition_query=True))
+        items = list(self.container.query_items(query=QUERY_CONTAR_POR_SESION, parameters=parameters, enable_cross_partition_query=True))
         return items[0] if items else 0
 
-    def eliminar_por_sesion(self, context_id: str) -> None:
+    def eliminar_por_sesion(self, context_id: str, actividad_id: Optional[str] = None) -> None:
         """
         Elimina todas las asistencias vinculadas a un id de sesión o actividad.
         Limpia los registros de personas que queden huérfanos.
         """
         print(f"🚀 [Repo] Iniciando búsqueda de asistentes para eliminar en context: {context_id}")
+        if self._leer_de_vista():
+            return self._eliminar_por_sesion_vista(context_id, actividad_id)
         
         # Usar DISTINCT para evitar procesar la misma persona múltiples veces si tiene varias asistencias que matchean
-        query = "SELECT DISTINCT VALUE c.id FROM c JOIN a IN c.asistencias WHERE a.sesion_id = @id OR a.actividad_id = @id"
+        # Los documentos por año (ASISTENCIAS_POR_ANIO) tienen la cédula en c.cedula
+        query = "SELECT DISTINCT VALUE (IS_DEFINED(c.tipo) ? c.cedula : c.id) FROM c JOIN a IN c.asistencias WHERE a.sesion_id = @id OR a.actividad_id = @id"
         parameters = [{"name": "@id", "value": context_id}]
         
         try:
@@ -247,3 +568,82 @@ class AsistentesRepository(BaseRepository):
         except Exception as e:
             print(f"❌ [Repo] Error fatal en eliminar_por_sesion (context_id={context_id}): {type(e).__name__}: {str(e)}")
             raise
+
+    def _eliminar_por_sesion_vista(self, context_id: str, actividad_id: Optional[str]) -> None:
+        """Cascada con la vista: las cédulas salen de una sola partición y luego se borran sus entradas."""
+        particion = actividad_id or context_id
+        entradas = self.vista.entradas_por_sesion(context_id, actividad_id)
+        if not entradas:
+            print(f"ℹ️ [Repo] Sin asistentes encontrados para context_id={context_id}")
+            return
+        cedulas = list(dict.fromkeys(e['cedula'] for e in entradas))
+        print(f"🔍 [Repo] Se encontraron {len(cedulas)} personas a procesar para context_id={context_id}")
+        for cedula in cedulas:
+            self.eliminar_asistencia_sesion(cedula, context_id)
+        self.vista.eliminar_entradas([e['id'] for e in entradas], particion)
+
+    def definicion_particion(self) -> Dict[str, Any]:
+        """partitionKey del contenedor ({"paths": [...], "kind": ...})."""
+        return self.container.read()['partitionKey']
+
+    def migrar_particion(self, campo: str, continuation: Optional[str], max_items: int, simular: bool = False) -> Tuple[Dict[str, int], Optional[str]]:
+        """
+        Una página de la migración de partition key (contenedor particionado por /`campo`, distinto de /id):
+        cada persona cuyo `campo` no es su cédula se reescribe en la partición de la cédula (si ya
+        existe un documento ahí se fusionan las asistencias) y se borra el original. Es idempotente:
+        los documentos ya movidos no vuelven a aparecer en la consulta. Devuelve los conteos de la
+        página y el continuation token para seguir (None al terminar).
+        """
+        if not campo.isidentifier():
+            raise ValueError(f"Partition key no soportada para migrar: /{campo}")
+        paginas = self.container.query_items(
+            query=QUERY_FUERA_DE_PARTICION.format(campo=campo), enable_cross_partition_query=True, max_item_count=max_items
+        ).by_page(continuation)
+        items = list(next(paginas, []))
+        conteo = {"encontrados": len(items), "migrados": 0, "fusionados": 0}
+        for doc in items:
+            if simular:
+                continue
+            if self._reubicar(doc, campo):
+                conteo["fusionados"] += 1
+            conteo["migrados"] += 1
+        return conteo, paginas.continuation_token
+
+    def _reubicar(self, doc: Dict[str, Any], campo: str) -> bool:
+        """Escribe `doc` en la partición de su cédula y borra el original; True si se fusionó con uno existente."""
+        cedula = doc['id']
+        persona = {k: v for k, v in doc.items() if k not in CAMPOS_SISTEMA}
+        persona[campo] = cedula
+        try:
+            destino = self.container.read_item(item=cedula, partition_key=cedula)
+        except (exceptions.CosmosResourceNotFoundError, exceptions.CosmosHttpResponseError) as e:
+            if not es_no_encontrado(e):
+                raise
+            destino = None
+        if destino is None:
+            self.container.upsert_item(body=persona)
+        else:
+            for asistencia in persona.get('asistencias', []):
+                if not asistencia_de(destino, asistencia.get('sesion_id')):
+                    destino.setdefault('asistencias', []).append(asistencia)
+            for c in CAMPOS_CONTACTO:
+                if not destino.get(c) and persona.get(c):
+                    destino[c] = persona[c]
+            self.container.replace_item(item=cedula, body=destino, etag=destino.get('_etag'), match_condition=MatchConditions.IfNotModified)
+        try:
+            self.container.delete_item(item=cedula, partition_key=valor_particion(doc, campo))
+        except exceptions.CosmosResourceNotFoundError:
+            pass
+        return destino is not None
+
+    def reconstruir_vista(self) -> int:
+        """Materializa en la vista todas las asistencias existentes (migración inicial o reparación)."""
+        if self.vista is None:
+            return 0
+        total = 0
+        for persona in self.container.query_items(query=QUERY_PERSONAS_COMPLETAS, enable_cross_partition_query=True):
+            if es_formato_anual(persona):
+                persona = componer_persona(persona, self._leer_anios(persona))
+            self.vista.guardar_persona(persona)
+            total += len(persona.get('asistencias', []))
+        return total
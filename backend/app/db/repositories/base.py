@@ -1,34 +1,41 @@
-import time
-from azure.core.exceptions import ServiceResponseError
-from azure.cosmos import exceptions
+from typing import Any, Dict, List, Optional, Tuple
+from db.instrumentacion import etiquetar_metodos, instrumentar, operacion
+from db.reintentos import politica_cosmos
 
-def cosmos_retry(fn, max_retries: int = 3, base_delay: float = 1.0):
-    """Ejecuta fn con reintentos ante errores transitorios de red."""
-    delay = base_delay
-    last_error = None
-    for attempt in range(max_retries):
-        try:
-            return fn()
-        except (ServiceResponseError, Exception) as e:
-            err_str = str(e).lower()
-            is_network_err = (
-                isinstance(e, ServiceResponseError) or
-                'connection' in err_str or
-                'aborted' in err_str or
-                'reset' in err_str or
-                'timeout' in err_str
-            )
-            if not is_network_err:
-                raise
-            last_error = e
-            if attempt < max_retries - 1:
-                print(f"⚠️ CosmosDB error transitorio (intento {attempt+1}/{max_retries}): {e}. Reintentando en {delay}s...")
-                time.sleep(delay)
-                delay *= 2
-            else:
-                print(f"❌ CosmosDB error tras {max_retries} intentos: {e}")
-    raise last_error
+def cosmos_retry(fn):
+    """Ejecuta fn (varias operaciones, p. ej. una consulta completa) bajo la política de reintentos común."""
+    return politica_cosmos.ejecutar(fn)
+
+async def cosmos_retry_async(fn):
+    """Variante asíncrona de cosmos_retry: fn devuelve un awaitable y la espera no bloquea el event loop."""
+    return await politica_cosmos.ejecutar_async(fn)
+
+def leer_change_feed(container, continuation: Optional[str], max_items: int) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Una página del change feed del contenedor (última versión de cada documento modificado) y el
+    token para continuar. Sin token se empieza desde el principio del contenedor.
+    """
+    kwargs = {"continuation": continuation} if continuation else {"start_time": "Beginning"}
+    # Cabeceras de las respuestas de esta llamada: client_connection.last_response_headers (y el
+    # continuation_token del pager, que sale de ahí) lo comparten todos los hilos del cliente, y una
+    # lectura concurrente lo pisa con el ETag de un documento. El SDK reescribe el etag de estas mismas
+    # cabeceras con el continuation completo del change feed después de invocar el hook.
+    respuestas = []
+    container = instrumentar(container)
+    with operacion("leer_change_feed"):
+        feed = container.query_items_change_feed(
+            max_item_count=max_items, response_hook=lambda headers, _: respuestas.append(headers), **kwargs
+        )
+        pagina = next(feed.by_page(), None)
+    items = list(pagina) if pagina is not None else []
+    return items, (respuestas[-1].get('etag') if respuestas else None) or continuation
 
 class BaseRepository:
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # Atribución de RU por método (db/instrumentacion.py) sin recorrer la pila
+        etiquetar_metodos(cls)
+
     def __init__(self, container):
-        self.container = container
+        # RU y latencia de cada operación (COSMOS_INSTRUMENTACION, ver db/instrumentacion.py)
+        self.container = instrumentar(container)
@@ -1,7 +1,74 @@
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from azure.cosmos import exceptions
+from db.repositorio import resumen_sesion
 from .base import BaseRepository, cosmos_retry
 
+# Consultas compartidas por el repositorio síncrono y el asíncrono (db/aio)
+QUERY_LISTAR_ADMIN = """
+                SELECT * FROM c 
+                WHERE c.created_by = @admin 
+                OR c.actividad IN ('Inducción', 'Formación', 'Capacitación') 
+                ORDER BY c.created_at DESC
+            """
+QUERY_POR_TOKEN = """
+            SELECT * FROM c 
+            WHERE c.token = @token 
+            OR EXISTS(SELECT VALUE oc FROM oc IN c.ocurrencias WHERE oc.token = @token)
+        """
+# Proyección para listados (ver resumen_sesion): sin contenido, links ni el arreglo de ocurrencias
+SELECT_RESUMEN = """
+            SELECT c.id, c.tema, c.fecha, c.actividad, c.facilitador_entidad, c.modalidad, c.created_by, c.created_at,
+                c.es_recurrente, c.total_asistentes, ARRAY_LENGTH(c.ocurrencias) AS total_ocurrencias,
+                c.ocurrencias[0].fecha AS oc_fecha, c.ocurrencias[0].tema AS oc_tema,
+                c.ocurrencias[0].actividad AS oc_actividad, c.ocurrencias[0].facilitador_entidad AS oc_facilitador_entidad,
+                c.ocurrencias[0].modalidad AS oc_modalidad
+            FROM c
+        """
+QUERY_LISTAR_ADMIN_RESUMEN = QUERY_LISTAR_ADMIN.replace("SELECT * FROM c", SELECT_RESUMEN.strip())
+QUERY_TOKENS = "SELECT oc.token, c.id AS sesion_id, oc.id AS ocurrencia_id FROM c JOIN oc IN c.ocurrencias"
+QUERY_POR_IDS = "SELECT * FROM c WHERE ARRAY_CONTAINS(@ids, c.id)"
+QUERY_POR_FECHAS = "SELECT * FROM c WHERE EXISTS(SELECT VALUE oc FROM oc IN c.ocurrencias WHERE oc.fecha >= @desde AND oc.fecha <= @hasta)"
+
+def construir_query_listar(owner_email: Optional[str] = None, tipos_actividad: Optional[List[str]] = None, resumen: bool = False) -> Tuple[str, List[Dict[str, Any]]]:
+    parameters = []
+    where_clauses = []
+    if owner_email:
+        where_clauses.append("c.created_by = @owner")
+        parameters.append({"name": "@owner", "value": owner_email})
+    if tipos_actividad:
+        placeholders = []
+        for i, tipo in enumerate(tipos_actividad):
+            p_name = f"@tipo{i}"
+            placeholders.append(p_name)
+            parameters.append({"name": p_name, "value": tipo})
+        where_clauses.append(f"c.actividad IN ({', '.join(placeholders)})")
+    query = SELECT_RESUMEN.strip() if resumen else "SELECT * FROM c"
+    if where_clauses:
+        query += " WHERE " + " AND ".join(where_clauses)
+    query += " ORDER BY c.created_at DESC"
+    return query, parameters
+
+def operaciones_incremento(ocurrencias: List[Dict[str, Any]], ocurrencia_id: Optional[str], delta: int = 1) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Construye las operaciones patch (incr) para los contadores de asistentes y el
+    filtro que garantiza que la ocurrencia sigue en la posición esperada.
+    Sigue la misma regla que repositorio.aplicar_incremento: si la ocurrencia no se encuentra
+    cuenta como principal y se sincroniza la primera ocurrencia.
+    """
+    ops = [{"op": "incr", "path": "/total_asistentes", "value": delta}]
+    indice = next((i for i, oc in enumerate(ocurrencias or []) if ocurrencia_id and oc.get('id') == ocurrencia_id), None)
+    if indice is None:
+        ops.append({"op": "incr", "path": "/total_asistentes_principal", "value": delta})
+        if not ocurrencias:
+            return ops, None
+        indice = 0
+    ops.append({"op": "incr", "path": f"/ocurrencias/{indice}/total_asistentes", "value": delta})
+    oc_id = str(ocurrencias[indice].get('id', '')).replace("'", "")
+    return ops, f"FROM c WHERE c.ocurrencias[{indice}].id = '{oc_id}'"
+
+def es_precondicion_fallida(e: Exception) -> bool:
+    return isinstance(e, exceptions.CosmosAccessConditionFailedError) or getattr(e, 'status_code', 0) == 412
+
 class SesionesRepository(BaseRepository):
     def crear(self, sesion_data: Dict[str, Any]) -> Dict[str, Any]:
         return self.container.create_item(body=sesion_data)
@@ -14,49 +81,96 @@ class SesionesRepository(BaseRepository):
                 return None
             raise
     
-    def listar(self, owner_email: Optional[str] = None, tipos_actividad: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    def obtener_varias(self, ids) -> List[Dict[str, Any]]:
+        """Varias sesiones por id en una sola consulta."""
+        ids = [i for i in set(ids) if i]
+        if not ids:
+            return []
         def _query():
-            parameters = []
-            where_clauses = []
-            if owner_email:
-                where_clauses.append("c.created_by = @owner")
-                parameters.append({"name": "@owner", "value": owner_email})
-            if tipos_actividad:
-                placeholders = []
-                for i, tipo in enumerate(tipos_actividad):
-                    p_name = f"@tipo{i}"
-                    placeholders.append(p_name)
-                    parameters.append({"name": p_name, "value": tipo})
-                where_clauses.append(f"c.actividad IN ({', '.join(placeholders)})")
-            query = "SELECT * FROM c"
-            if where_clauses:
-                query += " WHERE " + " AND ".join(where_clauses)
-            query += " ORDER BY c.created_at DESC"
-            return list(self.container.query_items(query=query, parameters=parameters, enable_cross_partition_query=True))
+            parameters = [{"name": "@ids", "value": ids}]
+            return list(self.container.query_items(query=QUERY_POR_IDS, parameters=parameters, enable_cross_partition_query=True))
         return cosmos_retry(_query)
+    
+    def listar(self, owner_email: Optional[str] = None, tipos_actividad: Optional[List[str]] = None, resumen: bool = False) -> List[Dict[str, Any]]:
+        def _query():
+            query, parameters = construir_query_listar(owner_email, tipos_actividad, resumen)
+            return list(self.container.query_items(query=query, parameters=parameters, enable_cross_partition_query=True))
+        items = cosmos_retry(_query)
+        return [resumen_sesion(s) for s in items] if resumen else items
 
-    def listar_admin(self, admin_email: str) -> List[Dict[str, Any]]:
+    def listar_admin(self, admin_email: str, resumen: bool = False) -> List[Dict[str, Any]]:
         def _query():
-            query = """
-                SELECT * FROM c 
-                WHERE c.created_by = @admin 
-                OR c.actividad IN ('Inducción', 'Formación', 'Capacitación') 
-                ORDER BY c.created_at DESC
-            """
             parameters = [{"name": "@admin", "value": admin_email}]
+            query = QUERY_LISTAR_ADMIN_RESUMEN if resumen else QUERY_LISTAR_ADMIN
             return list(self.container.query_items(query=query, parameters=parameters, enable_cross_partition_query=True))
+        items = cosmos_retry(_query)
+        return [resumen_sesion(s) for s in items] if resumen else items
+
+    def _pagina(self, query: str, parameters: List[Dict[str, Any]], limite: int, continuation: Optional[str]) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Una página de la consulta (hasta `limite` documentos) y el continuation token para la siguiente
+        (None al terminar). Solo se lee esa página: memoria y latencia no dependen del total.
+        """
+        def _query():
+            paginas = self.container.query_items(
+                query=query, parameters=parameters, enable_cross_partition_query=True, max_item_count=limite
+            ).by_page(continuation)
+            items = list(next(paginas, []))
+            return items, paginas.continuation_token
         return cosmos_retry(_query)
+
+    def listar_pagina(self, owner_email: Optional[str], tipos_actividad: Optional[List[str]], limite: int, continuation: Optional[str] = None, resumen: bool = False) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        query, parameters = construir_query_listar(owner_email, tipos_actividad, resumen)
+        items, siguiente = self._pagina(query, parameters, limite, continuation)
+        return ([resumen_sesion(s) for s in items] if resumen else items), siguiente
+
+    def listar_admin_pagina(self, admin_email: str, limite: int, continuation: Optional[str] = None, resumen: bool = False) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        query = QUERY_LISTAR_ADMIN_RESUMEN if resumen else QUERY_LISTAR_ADMIN
+        items, siguiente = self._pagina(query, [{"name": "@admin", "value": admin_email}], limite, continuation)
+        return ([resumen_sesion(s) for s in items] if resumen else items), siguiente
     
     def obtener_por_token(self, token: str) -> Optional[Dict[str, Any]]:
-        query = """
-            SELECT * FROM c 
-            WHERE c.token = @token 
-            OR EXISTS(SELECT VALUE oc FROM oc IN c.ocurrencias WHERE oc.token = @token)
-        """
         parameters = [{"name": "@token", "value": token}]
-        items = list(self.container.query_items(query=query, parameters=parameters, enable_cross_partition_query=True))
+        items = list(self.container.query_items(query=QUERY_POR_TOKEN, parameters=parameters, enable_cross_partition_query=True))
         return items[0] if items else None
     
+    def listar_tokens(self) -> List[Dict[str, Any]]:
+        """Proyección mínima token -> sesión/ocurrencia para construir el índice en memoria."""
+        def _query():
+            return list(self.container.query_items(query=QUERY_TOKENS, enable_cross_partition_query=True))
+        return cosmos_retry(_query)
+    
+    def listar_por_fechas(self, desde: str, hasta: str) -> List[Dict[str, Any]]:
+        """Sesiones con alguna ocurrencia entre dos fechas (YYYY-MM-DD, inclusive)."""
+        def _query():
+            parameters = [{"name": "@desde", "value": desde}, {"name": "@hasta", "value": hasta}]
+            return list(self.container.query_items(query=QUERY_POR_FECHAS, parameters=parameters, enable_cross_partition_query=True))
+        return cosmos_retry(_query)
+    
+    def incrementar_contadores(self, sesion_id: str, ocurrencia_id: Optional[str] = None, delta: int = 1, ocurrencias: Optional[List[Dict[str, Any]]] = None, max_intentos: int = 3) -> Optional[Dict[str, Any]]:
+        """
+        Incrementa los contadores con patch_item (operación atómica en el servidor, sin reescribir el documento).
+        `ocurrencias` evita la lectura previa si el llamador ya tiene la sesión; si el orden cambió
+        el filtro falla (412) y se relee la sesión.
+        """
+        for intento in range(max_intentos):
+            if ocurrencias is None:
+                sesion = self.obtener_por_id(sesion_id)
+                if not sesion:
+                    return None
+                ocurrencias = sesion.get('ocurrencias', [])
+            ops, filtro = operaciones_incremento(ocurrencias, ocurrencia_id, delta)
+            try:
+                return self.container.patch_item(item=sesion_id, partition_key=sesion_id, patch_operations=ops, filter_predicate=filtro)
+            except exceptions.CosmosHttpResponseError as e:
+                if es_precondicion_fallida(e) and intento < max_intentos - 1:
+                    ocurrencias = None
+                    continue
+                if getattr(e, 'status_code', 0) == 404:
+                    return None
+                raise
+        return None
+    
     def actualizar(self, sesion_id: str, sesion_data: Dict[str, Any]) -> Dict[str, Any]:
         return self.container.replace_item(item=sesion_id, body=sesion_data)
     
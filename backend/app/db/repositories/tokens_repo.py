@@ -0,0 +1,46 @@
+from typing import List, Optional, Dict, Any
+from azure.cosmos import exceptions
+from .base import BaseRepository
+
+class TokensRepository(BaseRepository):
+    """
+    Contenedor de búsqueda token -> sesión/ocurrencia, particionado por el propio token.
+    Permite resolver un QR con una lectura puntual en lugar de una consulta cross-partition.
+    """
+
+    @staticmethod
+    def _documento(sesion_id: str, oc: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "id": oc['token'],
+            "sesion_id": sesion_id,
+            "ocurrencia_id": oc.get('id'),
+            "token_active": oc.get('token_active', True),
+            "token_expiry": oc.get('token_expiry')
+        }
+
+    def guardar(self, sesion_id: str, oc: Dict[str, Any]) -> Dict[str, Any]:
+        return self.container.upsert_item(body=self._documento(sesion_id, oc))
+
+    def guardar_ocurrencias(self, sesion_id: str, ocurrencias: List[Dict[str, Any]]) -> None:
+        for oc in ocurrencias:
+            if oc.get('token'):
+                self.guardar(sesion_id, oc)
+
+    def obtener(self, token: str) -> Optional[Dict[str, Any]]:
+        try:
+            return self.container.read_item(item=token, partition_key=token)
+        except (exceptions.CosmosResourceNotFoundError, exceptions.CosmosHttpResponseError) as e:
+            if getattr(e, 'status_code', 0) == 404 or isinstance(e, exceptions.CosmosResourceNotFoundError):
+                return None
+            raise
+
+    def eliminar(self, token: str) -> None:
+        try:
+            self.container.delete_item(item=token, partition_key=token)
+        except exceptions.CosmosResourceNotFoundError:
+            pass
+
+    def eliminar_ocurrencias(self, ocurrencias: List[Dict[str, Any]]) -> None:
+        for oc in ocurrencias:
+            if oc.get('token'):
+                self.eliminar(oc['token'])
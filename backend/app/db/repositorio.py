@@ -0,0 +1,242 @@
+from typing import Any, Callable, Dict, Iterable, List, Optional, Protocol, Tuple
+
+from core.config import settings
+
+# Listado admin: sesiones propias más las de estos tipos de actividad
+ACTIVIDADES_ADMIN = ('Inducción', 'Actividad', 'Capacitación')
+
+
+def aplicar_incremento(sesion: dict, ocurrencia_id: Optional[str] = None, delta: int = 1):
+    """Aplica los contadores de la sesión y de la ocurrencia correspondiente (en memoria)."""
+    # Incrementar total global
+    sesion['total_asistentes'] = sesion.get('total_asistentes', 0) + delta
+
+    # Si hay ocurrencia_id, buscarla e incrementar
+    encontrado = False
+    if ocurrencia_id:
+        for oc in sesion.get('ocurrencias', []):
+            if oc.get('id') == ocurrencia_id:
+                oc['total_asistentes'] = oc.get('total_asistentes', 0) + delta
+                encontrado = True
+                break
+
+    # Si no se pasó ocurrencia_id o no se encontró (es la principal)
+    if not encontrado:
+        sesion['total_asistentes_principal'] = sesion.get('total_asistentes_principal', 0) + delta
+        # También sincronizar la primera ocurrencia si existe (suelen ser lo mismo)
+        if sesion.get('ocurrencias') and len(sesion['ocurrencias']) > 0:
+            oc0 = sesion['ocurrencias'][0]
+            oc0['total_asistentes'] = oc0.get('total_asistentes', 0) + delta
+
+
+# Campos del resumen que la primera ocurrencia puede sobrescribir (como en inyectar_primera_oc)
+CAMPOS_RESUMEN_HEREDADOS = ('fecha', 'tema', 'actividad', 'facilitador_entidad', 'modalidad')
+
+
+def resumen_sesion(doc: dict) -> dict:
+    """
+    Resumen de una sesión para listados (SesionSummary): sin contenido, links ni ocurrencias.
+    Acepta el documento completo o la proyección de CosmosDB, que trae la primera ocurrencia como
+    campos oc_* y el conteo en total_ocurrencias.
+    """
+    ocurrencias = doc.get('ocurrencias')
+    primera = (ocurrencias[0] if ocurrencias else {}) if ocurrencias is not None else {c: doc.get(f'oc_{c}') for c in CAMPOS_RESUMEN_HEREDADOS}
+    resumen = {
+        "id": doc['id'],
+        "created_by": doc.get('created_by'),
+        "created_at": doc.get('created_at'),
+        "es_recurrente": doc.get('es_recurrente', False),
+        "total_asistentes": doc.get('total_asistentes', 0),
+        "total_ocurrencias": len(ocurrencias) if ocurrencias is not None else doc.get('total_ocurrencias') or 0
+    }
+    for campo in CAMPOS_RESUMEN_HEREDADOS:
+        valor = primera.get(campo)
+        resumen[campo] = valor if valor is not None else doc.get(campo)
+    return resumen
+
+
+def paginar_por_offset(items: List[dict], limite: int, cursor: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+    """Página de una lista ya ordenada; el cursor es la posición de inicio (ValueError si no es válido)."""
+    inicio = int(cursor) if cursor else 0
+    if inicio < 0:
+        raise ValueError("Cursor inválido")
+    fin = inicio + limite
+    return items[inicio:fin], (str(fin) if fin < len(items) else None)
+
+
+def resumir_participantes(personas: List[dict], sesiones: List[dict], owner_email: Optional[str] = None) -> List[dict]:
+    """Participaciones por persona a partir de documentos persona (con su lista de asistencias)."""
+    valid_sesion_ids = None
+    if owner_email:
+        valid_sesion_ids = {s['id'] for s in sesiones if s.get('created_by') == owner_email}
+
+    resumen = []
+    for p in personas:
+        # Filtrar asistencias válidas
+        asistencias = p.get('asistencias', [])
+        if valid_sesion_ids is not None:
+            asistencias = [a for a in asistencias if a.get('actividad_id') in valid_sesion_ids or a.get('sesion_id') in valid_sesion_ids]
+
+        if not asistencias:
+            continue
+
+        # FILTRO: Solo personal de la fundación o empresas aliadas (identificados por tener unidad o empresa)
+        if not p.get('unidad') and not p.get('empresa'):
+            continue
+
+        resumen.append({
+            "cedula": p.get('cedula', p.get('id')),
+            "nombre": p.get('nombre', 'Sin nombre'),
+            "correo": p.get('correo', 'N/A'),
+            "cargo": p.get('cargo', 'N/A'),
+            "unidad": p.get('unidad') or p.get('empresa') or 'N/A',
+            "empresa": p.get('empresa'),
+            "telefono": p.get('telefono'),
+            "total_asistencias": len(asistencias),
+            "ultima_asistencia": max([a.get('fecha_registro', '') for a in asistencias]) if asistencias else ''
+        })
+    return resumen
+
+
+class Repositorio(Protocol):
+    """
+    Interfaz única de almacenamiento (sesiones, asistencias, usuarios y configuración).
+    La implementación se elige una sola vez al arrancar según STORAGE_MODE (get_repositorio);
+    los servicios no ramifican por modo. Los documentos tienen la forma del modelo de CosmosDB:
+    sesión con su lista de ocurrencias y persona (id = cédula) con su lista de asistencias.
+    """
+
+    # ---------- sesiones ----------
+    def crear_sesion(self, data: dict) -> dict: ...
+    def obtener_sesion(self, id: str) -> Optional[dict]: ...
+    def obtener_sesiones(self, ids: Iterable[str]) -> List[dict]: ...
+    def listar_sesiones(self, owner: Optional[str] = None, tipos: Optional[List[str]] = None) -> List[dict]: ...
+    def listar_sesiones_admin(self, email: str) -> List[dict]: ...
+    # Paginadas: (página, cursor siguiente o None); continuation token en CosmosDB, posición en el resto
+    def listar_sesiones_pagina(self, owner: Optional[str], tipos: Optional[List[str]], limite: int, cursor: Optional[str] = None, resumen: bool = False) -> Tuple[List[dict], Optional[str]]: ...
+    def listar_sesiones_admin_pagina(self, email: str, limite: int, cursor: Optional[str] = None, resumen: bool = False) -> Tuple[List[dict], Optional[str]]: ...
+    # Resúmenes para listados (ver resumen_sesion); en CosmosDB una proyección en la consulta
+    def listar_sesiones_resumen(self, owner: Optional[str] = None, tipos: Optional[List[str]] = None) -> List[dict]: ...
+    def listar_sesiones_admin_resumen(self, email: str) -> List[dict]: ...
+    def listar_sesiones_por_fechas(self, desde: str, hasta: str) -> List[dict]: ...
+    def obtener_sesion_por_token(self, token: str) -> Optional[dict]: ...
+    def listar_tokens(self) -> List[dict]: ...
+    def actualizar_sesion(self, id: str, data: dict) -> dict: ...
+    def eliminar_sesion(self, id: str) -> bool: ...
+    def incrementar_contadores(self, sesion_id: str, ocurrencia_id: Optional[str] = None, delta: int = 1, ocurrencias: Optional[List[dict]] = None): ...
+
+    # ---------- documentos de token (contenedor de búsqueda; sin efecto fuera de CosmosDB) ----------
+    def obtener_token(self, token: str) -> Optional[dict]: ...
+    def guardar_tokens(self, sesion_id: str, ocurrencias: List[dict]) -> None: ...
+    def eliminar_tokens(self, ocurrencias: List[dict]) -> None: ...
+
+    # ---------- asistencias ----------
+    def registrar_asistencia(self, asistente_data: dict, sesion_id: str) -> Tuple[dict, bool]: ...
+    def registrar_lote(self, lote: List[dict], sesion_id: str) -> List[str]: ...
+    def obtener_persona(self, cedula: str) -> Optional[dict]: ...
+    def actualizar_asistente(self, cedula: str, data: dict) -> Optional[dict]: ...
+    # s_id: actividad u ocurrencia; con una ocurrencia, actividad_id ubica la partición de la vista en CosmosDB
+    def listar_asistentes_por_sesion(self, s_id: str, actividad_id: Optional[str] = None) -> List[dict]: ...
+    def eliminar_asistentes_por_sesion(self, s_id: str, actividad_id: Optional[str] = None): ...
+    def resumen_participantes(self, owner_email: Optional[str] = None) -> List[dict]: ...
+    def listar_asistencias_planas(self) -> List[dict]: ...
+
+    # ---------- agregados derivados (change feed de CosmosDB) ----------
+    # Con contadores_derivados el camino de registro no escribe contadores: salen de los agregados
+    contadores_derivados: bool
+    def superponer_agregados(self, sesiones: List[dict]) -> List[dict]: ...
+
+    # ---------- usuarios ----------
+    def crear_usuario(self, data: dict) -> dict: ...
+    def listar_usuarios(self) -> List[dict]: ...
+    def obtener_usuario_por_id(self, id: str) -> Optional[dict]: ...
+    def obtener_usuario_por_email(self, e: str) -> Optional[dict]: ...
+    def actualizar_usuario(self, id: str, data: dict) -> Optional[dict]: ...
+    def eliminar_usuario(self, id: str): ...
+
+    # ---------- configuración ----------
+    def obtener_permisos(self) -> Optional[dict]: ...
+    def crear_permisos(self, d: dict) -> dict: ...
+    def actualizar_permisos(self, d: dict) -> dict: ...
+    def obtener_ayuda(self) -> Optional[dict]: ...
+    def crear_ayuda(self, d: dict) -> dict: ...
+    def actualizar_ayuda(self, d: dict) -> dict: ...
+
+    # ---------- escritura desde el camino async ----------
+    async def ejecutar_escritura(self, coleccion: str, fn: Callable[[], Any]) -> Any: ...
+
+
+class RepositorioBase:
+    """
+    Comportamiento por defecto de las implementaciones. Las locales (JSON, SQLite y memoria)
+    definen obtener/guardar_configuracion; CosmosDB sobrescribe los documentos de token y la configuración.
+    """
+
+    # Contadores escritos en el camino de registro (ver Repositorio.contadores_derivados)
+    contadores_derivados = False
+    def superponer_agregados(self, sesiones): return sesiones
+
+    # Sin contenedor de tokens: la resolución usa obtener_sesion_por_token
+    def obtener_token(self, token): return None
+    def guardar_tokens(self, sesion_id, ocurrencias): return None
+    def eliminar_tokens(self, ocurrencias): return None
+
+    # Paginación por posición sobre el listado completo (JSON y memoria ya lo tienen en memoria)
+    def listar_sesiones_pagina(self, owner, tipos, limite, cursor=None, resumen=False):
+        sesiones, siguiente = paginar_por_offset(self.listar_sesiones(owner, tipos), limite, cursor)
+        return ([resumen_sesion(s) for s in sesiones] if resumen else sesiones), siguiente
+
+    def listar_sesiones_admin_pagina(self, email, limite, cursor=None, resumen=False):
+        sesiones, siguiente = paginar_por_offset(self.listar_sesiones_admin(email), limite, cursor)
+        return ([resumen_sesion(s) for s in sesiones] if resumen else sesiones), siguiente
+
+    # Resumen calculado sobre los documentos completos (fuera de CosmosDB no hay RU que ahorrar)
+    def listar_sesiones_resumen(self, owner=None, tipos=None):
+        return [resumen_sesion(s) for s in self.listar_sesiones(owner, tipos)]
+
+    def listar_sesiones_admin_resumen(self, email):
+        return [resumen_sesion(s) for s in self.listar_sesiones_admin(email)]
+
+    def resumen_participantes(self, owner_email=None):
+        return resumir_participantes(self.listar_personas(), self.listar_sesiones() if owner_email else [], owner_email)
+
+    # Configuración: documentos por id sobre obtener/guardar_configuracion de cada implementación
+    def obtener_permisos(self): return self.obtener_configuracion("permisos_roles")
+    def crear_permisos(self, d): return self.guardar_configuracion("permisos_roles", d)
+    def actualizar_permisos(self, d): return self.guardar_configuracion("permisos_roles", d)
+
+    def obtener_ayuda(self): return self.obtener_configuracion("centro_ayuda")
+    def crear_ayuda(self, d): return self.guardar_configuracion("centro_ayuda", d)
+    def actualizar_ayuda(self, d): return self.guardar_configuracion("centro_ayuda", d)
+
+    async def ejecutar_escritura(self, coleccion, fn):
+        """Escritura pedida desde un endpoint async: threadpool o en línea según el modo (ejecutar_sync)."""
+        from db.aio.cosmos_client import ejecutar_sync
+        return await ejecutar_sync(fn)
+
+
+_repositorio: Optional[Repositorio] = None
+def get_repositorio() -> Repositorio:
+    """
+    Implementación única según STORAGE_MODE: cosmosdb, sqlite, memory o json (por defecto).
+    Si CosmosDB no está disponible se usa JSON, igual que antes.
+    """
+    global _repositorio
+    if _repositorio is not None:
+        return _repositorio
+    modo = settings.STORAGE_MODE
+    if modo == "cosmosdb":
+        from .cosmos_client import get_cosmos_db
+        _repositorio = get_cosmos_db()
+        if _repositorio is None:
+            print("⚠️ CosmosDB no disponible: se usará almacenamiento JSON")
+    elif modo == "sqlite":
+        from .sqlite.client import get_sqlite_db
+        _repositorio = get_sqlite_db()
+    elif modo == "memory":
+        from .memoria import MemoriaDB
+        _repositorio = MemoriaDB()
+    if _repositorio is None:
+        from .json_client import get_json_db
+        _repositorio = get_json_db()
+    return _repositorio
@@ -0,0 +1 @@
+# Capa de datos SQLite (STORAGE_MODE=sqlite): despliegues de un solo nodo y benchmarks locales
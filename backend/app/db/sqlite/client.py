@@ -0,0 +1,188 @@
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+from core.config import settings
+from db.repositorio import RepositorioBase, resumen_sesion
+from .repositories.sesiones_repo import SQLiteSesionesRepository
+from .repositories.asistentes_repo import SQLiteAsistentesRepository
+from .repositories.usuarios_repo import SQLiteUsuariosRepository, SQLiteConfiguracionRepository
+
+BASE_DIR = Path(__file__).parent.parent.parent
+DEFAULT_DB_FILE = BASE_DIR / "data" / "formaciones.db"
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS sesiones (
+    id TEXT PRIMARY KEY,
+    created_by TEXT,
+    created_at TEXT,
+    actividad TEXT,
+    total_asistentes INTEGER,
+    total_asistentes_principal INTEGER,
+    doc TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS ocurrencias (
+    id TEXT PRIMARY KEY,
+    sesion_id TEXT NOT NULL REFERENCES sesiones(id) ON DELETE CASCADE,
+    posicion INTEGER NOT NULL,
+    token TEXT,
+    fecha TEXT,
+    total_asistentes INTEGER,
+    doc TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS personas (
+    cedula TEXT PRIMARY KEY,
+    nombre TEXT,
+    cargo TEXT,
+    unidad TEXT,
+    empresa TEXT,
+    telefono TEXT,
+    correo TEXT
+);
+CREATE TABLE IF NOT EXISTS asistencias (
+    cedula TEXT NOT NULL,
+    actividad_id TEXT NOT NULL,
+    sesion_id TEXT NOT NULL,
+    token TEXT,
+    fecha_registro TEXT
+);
+CREATE TABLE IF NOT EXISTS usuarios (
+    id TEXT PRIMARY KEY,
+    email TEXT COLLATE NOCASE,
+    fecha_ingreso TEXT,
+    doc TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS configuracion (
+    id TEXT PRIMARY KEY,
+    doc TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_sesiones_owner ON sesiones(created_by, created_at);
+CREATE INDEX IF NOT EXISTS ix_sesiones_actividad ON sesiones(actividad, created_at);
+CREATE INDEX IF NOT EXISTS ix_ocurrencias_token ON ocurrencias(token);
+CREATE INDEX IF NOT EXISTS ix_ocurrencias_sesion ON ocurrencias(sesion_id, posicion);
+CREATE INDEX IF NOT EXISTS ix_ocurrencias_fecha ON ocurrencias(fecha);
+CREATE UNIQUE INDEX IF NOT EXISTS ux_asistencias_cedula_sesion ON asistencias(cedula, sesion_id);
+CREATE INDEX IF NOT EXISTS ix_asistencias_sesion ON asistencias(sesion_id);
+CREATE INDEX IF NOT EXISTS ix_asistencias_actividad ON asistencias(actividad_id);
+CREATE INDEX IF NOT EXISTS ix_usuarios_email ON usuarios(email);
+"""
+
+
+class SQLiteDB(RepositorioBase):
+    """
+    Almacenamiento en SQLite (solo stdlib) con la misma interfaz de repositorios que CosmosDBClient.
+    Una conexión por hilo (threading.local): FastAPI ejecuta los endpoints síncronos y
+    ejecutar_sync en el threadpool. La base corre en modo WAL, así las lecturas no
+    esperan a las escrituras; las escrituras se serializan con BEGIN IMMEDIATE + busy_timeout.
+    """
+
+    def __init__(self, ruta: Path):
+        self.ruta = Path(ruta)
+        self._local = threading.local()
+        self.ruta.parent.mkdir(parents=True, exist_ok=True)
+        # executescript confirma por su cuenta: el esquema va fuera de transaccion()
+        self.conexion().executescript(ESQUEMA)
+        self.sesiones = SQLiteSesionesRepository(self)
+        self.asistentes = SQLiteAsistentesRepository(self)
+        self.usuarios = SQLiteUsuariosRepository(self)
+        self.configuracion = SQLiteConfiguracionRepository(self)
+        print(f"✅ SQLite inicializado en {self.ruta}")
+
+    def conexion(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            # isolation_level=None: las transacciones se abren explícitamente en transaccion()
+            conn = sqlite3.connect(str(self.ruta), timeout=settings.SQLITE_BUSY_TIMEOUT_MS / 1000, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            conn.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def transaccion(self):
+        """Transacción de escritura: BEGIN IMMEDIATE toma el lock de escritura al inicio (sin upgrades que fallen a mitad)."""
+        conn = self.conexion()
+        if conn.in_transaction:
+            # Anidada dentro de otra transacción del mismo hilo: se une a ella
+            yield conn
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def cerrar(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    # Proxies: interfaz db.repositorio.Repositorio (mismos nombres que CosmosDBClient)
+    def crear_sesion(self, data): return self.sesiones.crear(data)
+    def obtener_sesion(self, id): return self.sesiones.obtener_por_id(id)
+    def obtener_sesiones(self, ids): return self.sesiones.obtener_varias(ids)
+    def listar_sesiones(self, owner=None, tipos=None): return self.sesiones.listar(owner, tipos)
+    def listar_sesiones_admin(self, email): return self.sesiones.listar_admin(email)
+
+    def listar_sesiones_pagina(self, owner, tipos, limite, cursor=None, resumen=False):
+        # LIMIT/OFFSET en SQLite; una fila de más indica si hay página siguiente
+        offset = int(cursor) if cursor else 0
+        filas = self.sesiones.listar(owner, tipos, limite=limite + 1, offset=offset)
+        return self._pagina(filas, limite, offset, resumen)
+
+    def listar_sesiones_admin_pagina(self, email, limite, cursor=None, resumen=False):
+        offset = int(cursor) if cursor else 0
+        filas = self.sesiones.listar_admin(email, limite=limite + 1, offset=offset)
+        return self._pagina(filas, limite, offset, resumen)
+
+    @staticmethod
+    def _pagina(filas, limite, offset, resumen):
+        sesiones = filas[:limite]
+        return ([resumen_sesion(s) for s in sesiones] if resumen else sesiones), (str(offset + limite) if len(filas) > limite else None)
+    def listar_sesiones_por_fechas(self, desde, hasta): return self.sesiones.listar_por_fechas(desde, hasta)
+    def obtener_sesion_por_token(self, token): return self.sesiones.obtener_por_token(token)
+    def listar_tokens(self): return self.sesiones.listar_tokens()
+    def actualizar_sesion(self, id, data): return self.sesiones.actualizar(id, data)
+    def eliminar_sesion(self, id): return self.sesiones.eliminar(id)
+    # UPDATE atómico sobre las columnas de contadores, sin reescribir la sesión
+    def incrementar_contadores(self, s_id, oc_id=None, delta=1, ocurrencias=None): return self.sesiones.incrementar_contadores(s_id, oc_id, delta)
+
+    def registrar_asistencia(self, data, s_id): return self.asistentes.registrar_asistencia(data, s_id)
+    def registrar_lote(self, lote, s_id): return self.asistentes.registrar_lote(lote, s_id)
+    def obtener_persona(self, cedula): return self.asistentes.obtener_por_cedula(cedula)
+    def actualizar_asistente(self, cedula, data): return self.asistentes.actualizar_campos(cedula, data)
+    def listar_asistentes_por_sesion(self, s_id, actividad_id=None): return self.asistentes.listar_por_sesion(s_id)
+    def verificar_asistente_duplicado(self, c, s_id): return self.asistentes.verificar_duplicado(c, s_id)
+    def eliminar_asistentes_por_sesion(self, s_id, actividad_id=None): return self.asistentes.eliminar_por_sesion(s_id)
+    # Agrupación, conteo y filtro por dueño resueltos en SQL
+    def resumen_participantes(self, owner_email=None): return self.asistentes.resumen_participantes(owner_email)
+    def listar_asistencias_planas(self): return self.asistentes.listar_asistencias_planas()
+
+    def crear_usuario(self, data): return self.usuarios.crear(data)
+    def listar_usuarios(self): return self.usuarios.listar()
+    def obtener_usuario_por_id(self, id): return self.usuarios.obtener_por_id(id)
+    def obtener_usuario_por_email(self, e): return self.usuarios.obtener_por_email(e)
+    def actualizar_usuario(self, id, data): return self.usuarios.actualizar(id, data)
+    def eliminar_usuario(self, id): return self.usuarios.eliminar(id)
+
+    def obtener_configuracion(self, config_id): return self.configuracion.obtener_por_id(config_id)
+    def guardar_configuracion(self, config_id, data): return self.configuracion.guardar(config_id, data)
+
+
+_sqlite_db_instance = None
+def get_sqlite_db() -> Optional[SQLiteDB]:
+    """Instancia única; None si STORAGE_MODE no es sqlite (no se crea ningún archivo)."""
+    global _sqlite_db_instance
+    if _sqlite_db_instance is None and settings.STORAGE_MODE == "sqlite":
+        _sqlite_db_instance = SQLiteDB(Path(settings.SQLITE_PATH) if settings.SQLITE_PATH else DEFAULT_DB_FILE)
+    return _sqlite_db_instance
+
+sqlite_db = get_sqlite_db()
@@ -0,0 +1,143 @@
+from typing import List, Optional, Dict, Any, Tuple
+from db.repositories.asistentes_repo import CAMPOS_CONTACTO, preparar_asistencia
+
+# Upsert de datos de contacto: igual que aplicar_asistencia, solo los valores no vacíos pisan los existentes
+UPSERT_PERSONA = (
+    f"INSERT INTO personas (cedula, {', '.join(CAMPOS_CONTACTO)}) VALUES (?{', ?' * len(CAMPOS_CONTACTO)}) "
+    "ON CONFLICT(cedula) DO UPDATE SET "
+    + ", ".join(f"{c} = COALESCE(NULLIF(excluded.{c}, ''), personas.{c})" for c in CAMPOS_CONTACTO)
+)
+QUERY_LISTAR_POR_SESION = f"""
+    SELECT p.cedula AS id, p.cedula, {', '.join('p.' + c for c in CAMPOS_CONTACTO)},
+           a.actividad_id, a.sesion_id, a.fecha_registro, a.sesion_id AS ocurrencia_id
+    FROM asistencias a JOIN personas p ON p.cedula = a.cedula
+    WHERE a.sesion_id = ? OR a.actividad_id = ?
+    ORDER BY a.fecha_registro
+"""
+
+def _fila_persona(cedula: str, asistente_data: Dict[str, Any]) -> Tuple:
+    return (cedula, *[asistente_data.get(c) or None for c in CAMPOS_CONTACTO])
+
+class SQLiteAsistentesRepository:
+    """
+    Personas y asistencias en tablas separadas. El índice único (cedula, sesion_id) hace que la
+    detección de duplicados sea el propio INSERT, sin leer el historial de la persona.
+    Los métodos devuelven las mismas formas que el repositorio de CosmosDB (persona con `asistencias`).
+    """
+
+    def __init__(self, db):
+        self.db = db
+
+    def _registrar(self, conn, asistente_data: Dict[str, Any], sesion_id: str) -> bool:
+        cedula = asistente_data['cedula']
+        nueva_asistencia, id_especifico = preparar_asistencia(asistente_data, sesion_id)
+        insertada = conn.execute(
+            "INSERT OR IGNORE INTO asistencias (cedula, actividad_id, sesion_id, token, fecha_registro) VALUES (?, ?, ?, ?, ?)",
+            (cedula, nueva_asistencia['actividad_id'], id_especifico, asistente_data.get('token'), nueva_asistencia['fecha_registro'])
+        ).rowcount > 0
+        if insertada:
+            conn.execute(UPSERT_PERSONA, _fila_persona(cedula, asistente_data))
+        return insertada
+
+    def registrar_asistencia(self, asistente_data: Dict[str, Any], sesion_id: str) -> Tuple[Dict[str, Any], bool]:
+        """Devuelve (persona, registrada); registrada=False indica que ya tenía asistencia en esa sesión."""
+        with self.db.transaccion() as conn:
+            registrada = self._registrar(conn, asistente_data, sesion_id)
+        return self.obtener_por_cedula(asistente_data['cedula'], con_asistencias=False), registrada
+
+    def registrar_lote(self, lote: List[Dict[str, Any]], sesion_id: str) -> List[str]:
+        """Registra el lote en una sola transacción; devuelve 'creado' o 'duplicado' por elemento."""
+        with self.db.transaccion() as conn:
+            return ["creado" if self._registrar(conn, data, sesion_id) else "duplicado" for data in lote]
+
+    def obtener_por_cedula(self, cedula: str, con_asistencias: bool = True) -> Optional[Dict[str, Any]]:
+        conn = self.db.conexion()
+        fila = conn.execute("SELECT * FROM personas WHERE cedula = ?", (cedula,)).fetchone()
+        if not fila:
+            return None
+        persona = {"id": cedula, **{c: fila[c] for c in CAMPOS_CONTACTO if fila[c] is not None}}
+        if con_asistencias:
+            persona['asistencias'] = [dict(a) for a in conn.execute(
+                "SELECT actividad_id, sesion_id, fecha_registro FROM asistencias WHERE cedula = ? ORDER BY fecha_registro",
+                (cedula,)
+            )]
+        return persona
+
+    def actualizar_campos(self, cedula: str, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        campos = [c for c in CAMPOS_CONTACTO if data.get(c) is not None]
+        if campos:
+            with self.db.transaccion() as conn:
+                if conn.execute(
+                    f"UPDATE personas SET {', '.join(c + ' = ?' for c in campos)} WHERE cedula = ?",
+                    (*[data[c] for c in campos], cedula)
+                ).rowcount == 0:
+                    return None
+        return self.obtener_por_cedula(cedula)
+
+    def listar_por_sesion(self, sesion_id: str) -> List[Dict[str, Any]]:
+        # sesion_id puede ser el id de una ocurrencia o de una sesión única (maestra)
+        return [dict(f) for f in self.db.conexion().execute(QUERY_LISTAR_POR_SESION, (sesion_id, sesion_id))]
+
+    def verificar_duplicado(self, cedula: str, context_id: str) -> bool:
+        return self.db.conexion().execute(
+            "SELECT 1 FROM asistencias WHERE cedula = ? AND sesion_id = ? LIMIT 1", (cedula, context_id)
+        ).fetchone() is not None
+
+    def contar_por_sesion(self, sesion_id: str) -> int:
+        return self.db.conexion().execute(
+            "SELECT COUNT(*) FROM asistencias WHERE sesion_id = ? OR actividad_id = ?", (sesion_id, sesion_id)
+        ).fetchone()[0]
+
+    def eliminar_por_sesion(self, context_id: str) -> int:
+        """Elimina las asistencias de una sesión o actividad y las personas que quedan sin asistencias."""
+        with self.db.transaccion() as conn:
+            cedulas = [f[0] for f in conn.execute(
+                "SELECT DISTINCT cedula FROM asistencias WHERE sesion_id = ? OR actividad_id = ?", (context_id, context_id)
+            )]
+            eliminadas = conn.execute(
+                "DELETE FROM asistencias WHERE sesion_id = ? OR actividad_id = ?", (context_id, context_id)
+            ).rowcount
+            conn.executemany(
+                "DELETE FROM personas WHERE cedula = ? AND NOT EXISTS (SELECT 1 FROM asistencias WHERE cedula = ?)",
+                [(c, c) for c in cedulas]
+            )
+        return eliminadas
+
+    # ---------- seguimiento ----------
+
+    def resumen_participantes(self, owner_email: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Participaciones por persona (solo personal con unidad o empresa), agregadas en SQL."""
+        filtro, params = "", []
+        if owner_email:
+            filtro = ("AND (a.actividad_id IN (SELECT id FROM sesiones WHERE created_by = ?) "
+                      "OR a.sesion_id IN (SELECT id FROM sesiones WHERE created_by = ?))")
+            params = [owner_email, owner_email]
+        filas = self.db.conexion().execute(f"""
+            SELECT p.cedula, p.nombre, p.correo, p.cargo, p.unidad, p.empresa, p.telefono,
+                   COUNT(*) AS total_asistencias, MAX(a.fecha_registro) AS ultima_asistencia
+            FROM asistencias a JOIN personas p ON p.cedula = a.cedula
+            WHERE (COALESCE(p.unidad, '') <> '' OR COALESCE(p.empresa, '') <> '') {filtro}
+            GROUP BY p.cedula
+        """, params)
+        return [
+            {
+                "cedula": f['cedula'],
+                "nombre": f['nombre'] or 'Sin nombre',
+                "correo": f['correo'] or 'N/A',
+                "cargo": f['cargo'] or 'N/A',
+                "unidad": f['unidad'] or f['empresa'] or 'N/A',
+                "empresa": f['empresa'],
+                "telefono": f['telefono'],
+                "total_asistencias": f['total_asistencias'],
+                "ultima_asistencia": f['ultima_asistencia'] or ''
+            }
+            for f in filas
+        ]
+
+    def listar_asistencias_planas(self) -> List[Dict[str, Any]]:
+        """Una fila por asistencia con los datos de la persona (equivalente al JOIN del reporte en CosmosDB)."""
+        return [dict(f) for f in self.db.conexion().execute("""
+            SELECT p.cedula, p.nombre, p.cargo AS cargo_asistente, p.unidad, p.empresa, p.telefono, p.correo,
+                   a.actividad_id, a.sesion_id, a.fecha_registro
+            FROM asistencias a JOIN personas p ON p.cedula = a.cedula
+        """)]
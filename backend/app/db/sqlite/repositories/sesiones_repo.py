@@ -0,0 +1,169 @@
+import json
+from typing import List, Optional, Dict, Any, Iterable
+from db.repositorio import ACTIVIDADES_ADMIN
+
+# Parámetros por consulta IN (...) para no acercarse al límite de variables de SQLite
+TAMANO_BLOQUE = 500
+
+def _bloques(valores: List[str]) -> Iterable[List[str]]:
+    for i in range(0, len(valores), TAMANO_BLOQUE):
+        yield valores[i:i + TAMANO_BLOQUE]
+
+def _sin_nulos(**campos) -> Dict[str, Any]:
+    return {k: v for k, v in campos.items() if v is not None}
+
+class SQLiteSesionesRepository:
+    """
+    Sesiones en dos tablas: `sesiones` (documento raíz) y `ocurrencias` (una fila por ocurrencia,
+    con token y fecha indexados). Los contadores de asistentes van en columnas propias para que
+    incrementar_contadores sea un UPDATE sin reescribir el documento. Los métodos devuelven el
+    mismo documento que el repositorio de CosmosDB (sesión con su lista de ocurrencias).
+    """
+
+    def __init__(self, db):
+        self.db = db
+
+    # ---------- (de)serialización ----------
+
+    def _documento(self, fila, ocurrencias: List[Dict[str, Any]]) -> Dict[str, Any]:
+        doc = json.loads(fila['doc'])
+        doc.update(_sin_nulos(total_asistentes=fila['total_asistentes'], total_asistentes_principal=fila['total_asistentes_principal']))
+        doc['ocurrencias'] = ocurrencias
+        return doc
+
+    def _ocurrencia(self, fila) -> Dict[str, Any]:
+        oc = json.loads(fila['doc'])
+        oc.update(_sin_nulos(total_asistentes=fila['total_asistentes']))
+        return oc
+
+    def _hidratar(self, conn, filas) -> List[Dict[str, Any]]:
+        """Arma los documentos de varias sesiones con una consulta de ocurrencias por bloque."""
+        ocurrencias: Dict[str, List[Dict[str, Any]]] = {f['id']: [] for f in filas}
+        for bloque in _bloques(list(ocurrencias)):
+            marcas = ','.join('?' * len(bloque))
+            for oc in conn.execute(f"SELECT * FROM ocurrencias WHERE sesion_id IN ({marcas}) ORDER BY sesion_id, posicion", bloque):
+                ocurrencias[oc['sesion_id']].append(self._ocurrencia(oc))
+        return [self._documento(f, ocurrencias[f['id']]) for f in filas]
+
+    def _escribir(self, conn, sesion: Dict[str, Any]):
+        raiz = {k: v for k, v in sesion.items() if k not in ('ocurrencias', 'total_asistentes', 'total_asistentes_principal')}
+        conn.execute(
+            "INSERT INTO sesiones (id, created_by, created_at, actividad, total_asistentes, total_asistentes_principal, doc) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET created_by=excluded.created_by, created_at=excluded.created_at, actividad=excluded.actividad, "
+            "total_asistentes=excluded.total_asistentes, total_asistentes_principal=excluded.total_asistentes_principal, doc=excluded.doc",
+            (sesion['id'], sesion.get('created_by'), sesion.get('created_at'), sesion.get('actividad'),
+             sesion.get('total_asistentes'), sesion.get('total_asistentes_principal'), json.dumps(raiz, ensure_ascii=False))
+        )
+        conn.execute("DELETE FROM ocurrencias WHERE sesion_id = ?", (sesion['id'],))
+        conn.executemany(
+            "INSERT INTO ocurrencias (id, sesion_id, posicion, token, fecha, total_asistentes, doc) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            [
+                (oc['id'], sesion['id'], i, oc.get('token'), oc.get('fecha'), oc.get('total_asistentes'),
+                 json.dumps({k: v for k, v in oc.items() if k != 'total_asistentes'}, ensure_ascii=False))
+                for i, oc in enumerate(sesion.get('ocurrencias', []))
+            ]
+        )
+
+    # ---------- operaciones ----------
+
+    def crear(self, sesion_data: Dict[str, Any]) -> Dict[str, Any]:
+        with self.db.transaccion() as conn:
+            self._escribir(conn, sesion_data)
+        return sesion_data
+
+    def actualizar(self, sesion_id: str, sesion_data: Dict[str, Any]) -> Dict[str, Any]:
+        with self.db.transaccion() as conn:
+            self._escribir(conn, {**sesion_data, 'id': sesion_id})
+        return sesion_data
+
+    def eliminar(self, sesion_id: str) -> bool:
+        with self.db.transaccion() as conn:
+            # Las ocurrencias caen por ON DELETE CASCADE
+            return conn.execute("DELETE FROM sesiones WHERE id = ?", (sesion_id,)).rowcount > 0
+
+    def obtener_por_id(self, sesion_id: str) -> Optional[Dict[str, Any]]:
+        conn = self.db.conexion()
+        fila = conn.execute("SELECT * FROM sesiones WHERE id = ?", (sesion_id,)).fetchone()
+        return self._hidratar(conn, [fila])[0] if fila else None
+
+    def obtener_varias(self, ids: Iterable[str]) -> List[Dict[str, Any]]:
+        conn = self.db.conexion()
+        filas = []
+        for bloque in _bloques([i for i in set(ids) if i]):
+            marcas = ','.join('?' * len(bloque))
+            filas.extend(conn.execute(f"SELECT * FROM sesiones WHERE id IN ({marcas})", bloque).fetchall())
+        return self._hidratar(conn, filas)
+
+    def listar(self, owner_email: Optional[str] = None, tipos_actividad: Optional[List[str]] = None, limite: Optional[int] = None, offset: int = 0) -> List[Dict[str, Any]]:
+        where, params = [], []
+        if owner_email:
+            where.append("created_by = ?")
+            params.append(owner_email)
+        if tipos_actividad:
+            where.append(f"actividad IN ({','.join('?' * len(tipos_actividad))})")
+            params.extend(tipos_actividad)
+        query = "SELECT * FROM sesiones"
+        if where:
+            query += " WHERE " + " AND ".join(where)
+        query += " ORDER BY created_at DESC"
+        if limite is not None:
+            query += " LIMIT ? OFFSET ?"
+            params.extend([limite, offset])
+        conn = self.db.conexion()
+        return self._hidratar(conn, conn.execute(query, params).fetchall())
+
+    def listar_admin(self, admin_email: str, limite: Optional[int] = None, offset: int = 0) -> List[Dict[str, Any]]:
+        query = f"SELECT * FROM sesiones WHERE created_by = ? OR actividad IN ({','.join('?' * len(ACTIVIDADES_ADMIN))}) ORDER BY created_at DESC"
+        params = [admin_email, *ACTIVIDADES_ADMIN]
+        if limite is not None:
+            query += " LIMIT ? OFFSET ?"
+            params.extend([limite, offset])
+        conn = self.db.conexion()
+        return self._hidratar(conn, conn.execute(query, params).fetchall())
+
+    def obtener_por_token(self, token: str) -> Optional[Dict[str, Any]]:
+        fila = self.db.conexion().execute("SELECT sesion_id FROM ocurrencias WHERE token = ? LIMIT 1", (token,)).fetchone()
+        return self.obtener_por_id(fila['sesion_id']) if fila else None
+
+    def listar_tokens(self) -> List[Dict[str, Any]]:
+        """Proyección mínima token -> sesión/ocurrencia para construir el índice en memoria."""
+        filas = self.db.conexion().execute("SELECT token, sesion_id, id AS ocurrencia_id FROM ocurrencias WHERE token IS NOT NULL")
+        return [dict(f) for f in filas]
+
+    def listar_por_fechas(self, desde: str, hasta: str) -> List[Dict[str, Any]]:
+        """Sesiones con alguna ocurrencia entre dos fechas (YYYY-MM-DD, inclusive)."""
+        conn = self.db.conexion()
+        filas = conn.execute(
+            "SELECT * FROM sesiones WHERE id IN (SELECT sesion_id FROM ocurrencias WHERE fecha BETWEEN ? AND ?)",
+            (desde, hasta)
+        ).fetchall()
+        return self._hidratar(conn, filas)
+
+    def incrementar_contadores(self, sesion_id: str, ocurrencia_id: Optional[str] = None, delta: int = 1, ocurrencias: Optional[List[Dict[str, Any]]] = None) -> bool:
+        """
+        Incrementa los contadores con UPDATE atómicos, sin leer ni reescribir el documento.
+        Misma regla que repositorio.aplicar_incremento: si la ocurrencia no se encuentra cuenta como
+        principal y se sincroniza la primera ocurrencia. `ocurrencias` se acepta por compatibilidad.
+        """
+        with self.db.transaccion() as conn:
+            encontrada = bool(ocurrencia_id) and conn.execute(
+                "UPDATE ocurrencias SET total_asistentes = COALESCE(total_asistentes, 0) + ? WHERE id = ? AND sesion_id = ?",
+                (delta, ocurrencia_id, sesion_id)
+            ).rowcount > 0
+            if encontrada:
+                actualizadas = conn.execute(
+                    "UPDATE sesiones SET total_asistentes = COALESCE(total_asistentes, 0) + ? WHERE id = ?",
+                    (delta, sesion_id)
+                ).rowcount
+            else:
+                actualizadas = conn.execute(
+                    "UPDATE sesiones SET total_asistentes = COALESCE(total_asistentes, 0) + ?, "
+                    "total_asistentes_principal = COALESCE(total_asistentes_principal, 0) + ? WHERE id = ?",
+                    (delta, delta, sesion_id)
+                ).rowcount
+                conn.execute(
+                    "UPDATE ocurrencias SET total_asistentes = COALESCE(total_asistentes, 0) + ? WHERE sesion_id = ? AND posicion = 0",
+                    (delta, sesion_id)
+                )
+            return actualizadas > 0
@@ -0,0 +1,64 @@
+import json
+from typing import List, Optional, Dict, Any
+
+
+class SQLiteUsuariosRepository:
+    """Usuarios como documento JSON con email (NOCASE) y fecha_ingreso en columnas para buscar y ordenar."""
+
+    def __init__(self, db):
+        self.db = db
+
+    def _escribir(self, conn, usuario: Dict[str, Any]):
+        conn.execute(
+            "INSERT INTO usuarios (id, email, fecha_ingreso, doc) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET email=excluded.email, fecha_ingreso=excluded.fecha_ingreso, doc=excluded.doc",
+            (usuario['id'], usuario.get('email'), usuario.get('fecha_ingreso'), json.dumps(usuario, ensure_ascii=False))
+        )
+
+    def crear(self, usuario_data: Dict[str, Any]) -> Dict[str, Any]:
+        with self.db.transaccion() as conn:
+            self._escribir(conn, usuario_data)
+        return usuario_data
+
+    def listar(self) -> List[Dict[str, Any]]:
+        filas = self.db.conexion().execute("SELECT doc FROM usuarios ORDER BY fecha_ingreso DESC")
+        return [json.loads(f['doc']) for f in filas]
+
+    def obtener_por_id(self, usuario_id: str) -> Optional[Dict[str, Any]]:
+        fila = self.db.conexion().execute("SELECT doc FROM usuarios WHERE id = ?", (usuario_id,)).fetchone()
+        return json.loads(fila['doc']) if fila else None
+
+    def obtener_por_email(self, email: str) -> Optional[Dict[str, Any]]:
+        fila = self.db.conexion().execute("SELECT doc FROM usuarios WHERE email = ? LIMIT 1", (email,)).fetchone()
+        return json.loads(fila['doc']) if fila else None
+
+    def actualizar(self, usuario_id: str, usuario_data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        with self.db.transaccion() as conn:
+            fila = conn.execute("SELECT doc FROM usuarios WHERE id = ?", (usuario_id,)).fetchone()
+            if not fila:
+                return None
+            usuario = {**json.loads(fila['doc']), **usuario_data}
+            self._escribir(conn, usuario)
+        return usuario
+
+    def eliminar(self, usuario_id: str) -> bool:
+        with self.db.transaccion() as conn:
+            return conn.execute("DELETE FROM usuarios WHERE id = ?", (usuario_id,)).rowcount > 0
+
+
+class SQLiteConfiguracionRepository:
+    def __init__(self, db):
+        self.db = db
+
+    def obtener_por_id(self, config_id: str) -> Optional[Dict[str, Any]]:
+        fila = self.db.conexion().execute("SELECT doc FROM configuracion WHERE id = ?", (config_id,)).fetchone()
+        return json.loads(fila['doc']) if fila else None
+
+    def guardar(self, config_id: str, data: Dict[str, Any]) -> Dict[str, Any]:
+        data["id"] = config_id
+        with self.db.transaccion() as conn:
+            conn.execute(
+                "INSERT INTO configuracion (id, doc) VALUES (?, ?) ON CONFLICT(id) DO UPDATE SET doc=excluded.doc",
+                (config_id, json.dumps(data, ensure_ascii=False))
+            )
+        return data
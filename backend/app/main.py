@@ -1,3 +1,4 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
@@ -8,21 +9,48 @@ import sys
 from datetime import datetime, timedelta
 from pathlib import Path
 import os
+import time
 
 # Añadir el directorio padre al path
 sys.path.append(str(Path(__file__).parent))
 
-from api.endpoints import auth, usuarios, permisos, ayuda, proxy, seguimiento, asistentes, sesiones
+from api.endpoints import auth, usuarios, permisos, ayuda, proxy, seguimiento, asistentes, sesiones, metricas
 from core.config import settings
+from db.aio.cosmos_client import abrir_async_cosmos_db, cerrar_async_cosmos_db
+from services.sesiones import agregador_contadores, precalentador
+from db.json_escritor import escritor_json
+from services.agregados import procesador_change_feed
+from db.instrumentacion import estadisticas_cosmos, iniciar_peticion, cerrar_peticion
 
 # Crear directorio de datos
 os.makedirs("data", exist_ok=True)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Cliente CosmosDB asíncrono (azure.cosmos.aio) para los endpoints async
+    await abrir_async_cosmos_db()
+    # Escritor agrupado del modo JSON (no hace nada en otros modos)
+    escritor_json.iniciar()
+    agregador_contadores.iniciar()
+    # Cachés listas antes de que empiecen las próximas ocurrencias
+    precalentador.iniciar()
+    # Contadores derivados del change feed (solo CosmosDB con CHANGE_FEED_AGREGADOS)
+    procesador_change_feed.iniciar()
+    yield
+    await procesador_change_feed.detener()
+    await precalentador.detener()
+    # Aplicar contadores pendientes antes de cerrar el cliente
+    await agregador_contadores.detener()
+    # Después del agregador: su último flush también pasa por el escritor
+    await escritor_json.detener()
+    await cerrar_async_cosmos_db()
+
 # Inicializar FastAPI
 app = FastAPI(
     title="Sistema de Registro de Capacitaciones",
     description="API para gestionar capacitaciones y registrar asistencia",
-    version="2.0.0"
+    version="2.0.0",
+    lifespan=lifespan
 )
 
 # Rate limiting - configuración más permisiva
@@ -64,6 +92,25 @@ app.add_middleware(
 # Middleware para manejar cabeceras de proxy (X-Forwarded-Proto) en Azure
 app.add_middleware(ProxyHeadersMiddleware, trusted_hosts="*")
 
+# Consumo de CosmosDB por petición (RU, llamadas, documentos): por endpoint en /api/metricas/cosmos y en el log
+if settings.STORAGE_MODE == "cosmosdb" and settings.COSMOS_INSTRUMENTACION:
+    @app.middleware("http")
+    async def resumen_cosmos_por_peticion(request: Request, call_next):
+        token = iniciar_peticion()
+        t0 = time.perf_counter()
+        try:
+            response = await call_next(request)
+        finally:
+            resumen = cerrar_peticion(token)
+        if resumen["llamadas"]:
+            ruta = request.scope.get("route")
+            endpoint = f"{request.method} {ruta.path if ruta else request.url.path}"
+            estadisticas_cosmos.registrar_peticion(endpoint, resumen)
+            if settings.COSMOS_RESUMEN_PETICION:
+                print(f"📊 {endpoint} {response.status_code} {(time.perf_counter() - t0) * 1000:.0f}ms · "
+                      f"CosmosDB: {resumen['llamadas']} llamadas, {resumen['ru']:.2f} RU, {resumen['items']} docs, {resumen['duracion_s'] * 1000:.0f}ms")
+        return response
+
 # Incluir routers
 app.include_router(sesiones.router)
 app.include_router(asistentes.router)
@@ -73,6 +120,7 @@ app.include_router(permisos.router, prefix="/api/permisos", tags=["permisos"])
 app.include_router(ayuda.router, prefix="/api/ayuda", tags=["ayuda"])
 app.include_router(proxy.router)
 app.include_router(seguimiento.router)
+app.include_router(metricas.router)
 
 # Servir archivos estáticos (uploads: QR y firmas)
 from fastapi.staticfiles import StaticFiles
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, validator
-from typing import Optional, List
+from typing import Optional, List, Dict, Any
 import re
 
 class AsistenteInternoCreate(BaseModel):
@@ -41,6 +41,29 @@ class AsistenteExternoCreate(BaseModel):
             return v.strip()
         return v
 
+class AsistenciaLoteCreate(BaseModel):
+    """
+    Lote de registros de un kiosco para un mismo token. Cada elemento se valida por separado
+    contra AsistenteInternoCreate o AsistenteExternoCreate según su campo `tipo` (por defecto interno).
+    """
+    token: str = Field(..., pattern=r'^[0-9A-Fa-f]{8}$')
+    asistentes: List[Dict[str, Any]] = Field(..., min_length=1)
+
+class ResultadoLoteItem(BaseModel):
+    indice: int
+    cedula: Optional[str] = None
+    estado: str  # creado | duplicado | invalido | error
+    detalle: Optional[str] = None
+
+class AsistenciaLoteResponse(BaseModel):
+    token: str
+    total: int
+    creados: int
+    duplicados: int
+    invalidos: int
+    errores: int
+    resultados: List[ResultadoLoteItem]
+
 class AsistenciaRecord(BaseModel):
     actividad_id: str
     sesion_id: str
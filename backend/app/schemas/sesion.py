@@ -145,6 +145,30 @@ class SesionResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class SesionPagina(BaseModel):
+    """Página del listado de sesiones; next_cursor es None en la última."""
+    items: List[SesionResponse]
+    next_cursor: Optional[str] = None
+
+class SesionSummary(BaseModel):
+    """Sesión para listados: datos de la primera ocurrencia y contadores, sin contenido ni ocurrencias."""
+    id: str
+    tema: Optional[str] = None
+    fecha: Optional[str] = None
+    actividad: Optional[str] = None
+    facilitador_entidad: Optional[str] = None
+    modalidad: Optional[str] = None
+    created_by: Optional[str] = None
+    created_at: Optional[str] = None
+    es_recurrente: bool = False
+    total_asistentes: Optional[int] = 0
+    total_ocurrencias: int = 0
+
+class SesionResumenPagina(BaseModel):
+    """Página del listado en modo resumen."""
+    items: List[SesionSummary]
+    next_cursor: Optional[str] = None
+
 class SesionUpdate(BaseModel):
     tema: Optional[str] = Field(None, min_length=3, max_length=200)
     fecha: Optional[str] = Field(None, pattern=r'^\d{4}-\d{2}-\d{2}$')
@@ -0,0 +1,115 @@
+import asyncio
+import os
+import socket
+import time
+from typing import Callable, Optional
+
+from core.config import settings
+from core.metrics import metricas
+from db.repositorio import get_repositorio
+from db.repositories.base import leer_change_feed
+
+# Páginas máximas por fuente en una pasada: con mucho atraso se cede el turno a la otra fuente
+MAX_PAGINAS_POR_PASADA = 20
+
+
+class ProcesadorChangeFeed:
+    """
+    Consumidor del change feed de los contenedores `asistentes` y `sesiones` (CHANGE_FEED_AGREGADOS,
+    solo CosmosDB). Cada `intervalo_ms` toma el lease de cada fuente en el contenedor `agregados`,
+    lee las páginas nuevas desde su continuation, aplica cada documento a los agregados
+    (AgregadosRepository.aplicar_persona / aplicar_sesion) y guarda el checkpoint en el lease.
+    Con varias réplicas solo procesa la que tiene el lease vigente; si cae, otra lo toma al
+    vencer (`lease_ttl_s`) y sigue desde el último checkpoint (entrega al menos una vez).
+    Se inicia y se detiene en el lifespan.
+    """
+
+    def __init__(self, intervalo_ms: int, max_items: int, lease_ttl_s: int):
+        self.intervalo = intervalo_ms / 1000
+        self.max_items = max_items
+        self.lease_ttl_s = lease_ttl_s
+        self.propietario = f"{socket.gethostname()}:{os.getpid()}"
+        self._evento: Optional[asyncio.Event] = None
+        self._tarea: Optional[asyncio.Task] = None
+        self._detener = False
+        self._ultima: dict = {}
+
+    @property
+    def activo(self) -> bool:
+        return self._tarea is not None and not self._tarea.done()
+
+    def _procesar_fuente(self, fuente: str, container, aplicar: Callable[[dict], None]) -> int:
+        agregados = get_repositorio().agregados
+        lease = agregados.tomar_lease(fuente, self.propietario, self.lease_ttl_s)
+        if lease is None:
+            return 0
+        procesados = 0
+        for _ in range(MAX_PAGINAS_POR_PASADA):
+            items, continuation = leer_change_feed(container, lease.get('continuation'), self.max_items)
+            for doc in items:
+                aplicar(doc)
+            procesados += len(items)
+            lease = agregados.checkpoint(lease, continuation, self.propietario, self.lease_ttl_s)
+            if lease is None:
+                print(f"⚠️ Lease de {fuente} tomado por otra instancia")
+                metricas.incr("change_feed.leases_perdidos")
+                break
+            if not items:
+                break
+        if procesados:
+            metricas.incr(f"change_feed.{fuente}.documentos", procesados)
+        return procesados
+
+    def procesar(self) -> dict:
+        """Una pasada sobre ambas fuentes (en un hilo: usa el cliente síncrono)."""
+        db = get_repositorio()
+        t0 = time.time()
+        resultado = {
+            "asistentes": self._procesar_fuente("asistentes", db.asistentes_container, db.agregados.aplicar_persona),
+            "sesiones": self._procesar_fuente("sesiones", db.sesiones_container, db.agregados.aplicar_sesion)
+        }
+        duracion = time.time() - t0
+        self._ultima = {**resultado, "ejecutada": time.strftime("%Y-%m-%dT%H:%M:%S"), "duracion_s": round(duracion, 4)}
+        metricas.observar("change_feed.duracion_pasada_s", duracion)
+        return resultado
+
+    async def _bucle(self):
+        while not self._detener:
+            try:
+                await asyncio.to_thread(self.procesar)
+            except Exception as e:
+                print(f"⚠️ Error procesando change feed: {type(e).__name__}: {e}")
+                metricas.incr("change_feed.errores")
+            try:
+                await asyncio.wait_for(self._evento.wait(), timeout=self.intervalo)
+            except asyncio.TimeoutError:
+                pass
+
+    def iniciar(self):
+        if self.activo or not get_repositorio().contadores_derivados:
+            return
+        self._detener = False
+        self._evento = asyncio.Event()
+        self._tarea = asyncio.create_task(self._bucle())
+        print(f"✅ Procesador de change feed iniciado ({self.propietario})")
+
+    async def detener(self):
+        if self._tarea:
+            self._detener = True
+            self._evento.set()
+            await self._tarea
+            self._tarea = None
+
+    def stats(self) -> dict:
+        return {
+            "activo": self.activo,
+            "propietario": self.propietario,
+            "ultima_pasada": self._ultima
+        }
+
+
+procesador_change_feed = ProcesadorChangeFeed(
+    intervalo_ms=settings.CHANGE_FEED_INTERVAL_MS,
+    max_items=settings.CHANGE_FEED_MAX_ITEMS,
+    lease_ttl_s=settings.CHANGE_FEED_LEASE_TTL_S
+)
@@ -1,8 +1,5 @@
-import json
-import os
 from typing import List, Optional, Dict, Any
 from datetime import datetime
-import uuid
 import sys
 from pathlib import Path
 import pytz
@@ -12,179 +9,221 @@ sys.path.append(str(Path(__file__).parent.parent))
 from core.config import settings
 from core.exceptions import DuplicateRegistrationException
 from storage import get_storage_adapter
+from db.repositorio import get_repositorio
+from db.aio.cosmos_client import get_async_cosmos_db
 
-# Importar cliente CosmosDB
-try:
-    from db.cosmos_client import cosmos_db
-    COSMOS_AVAILABLE = cosmos_db is not None
-    if not COSMOS_AVAILABLE:
-        print("⚠️ CosmosDB no disponible: No se pudo crear la instancia")
-except Exception as e:
-    print(f"⚠️ CosmosDB no disponible: {e}")
-    COSMOS_AVAILABLE = False
-    cosmos_db = None
-
-# Configuración de archivos JSON (fallback)
-BASE_DIR = Path(__file__).parent.parent
-DATA_DIR = BASE_DIR / "data"
-DATA_FILE = DATA_DIR / "asistentes.json"
-
-def ensure_data_file():
-    os.makedirs(DATA_DIR, exist_ok=True)
-    if not os.path.exists(DATA_FILE):
-        with open(DATA_FILE, 'w', encoding='utf-8') as f:
-            json.dump([], f)
-
-def load_asistentes() -> List[dict]:
-    ensure_data_file()
-    try:
-        with open(DATA_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except:
-        return []
-
-def save_asistentes(asistentes: List[dict]):
-    ensure_data_file()
-    with open(DATA_FILE, 'w', encoding='utf-8') as f:
-        json.dump(asistentes, f, ensure_ascii=False, indent=2)
+repositorio = get_repositorio()
 
 # ========== FUNCIONES PRINCIPALES ==========
 
-def crear_asistente(asistente_data: dict, sesion_id: str, ip_address: Optional[str] = None) -> dict:
-    """Crear asistente en CosmosDB o JSON según configuración."""
-    
-    # Import sesiones service to get session info
+def _respuesta_registro(cedula: str, id_actividad: str, id_especifico: str, persona: dict, fecha_registro: str) -> dict:
+    """Devuelve el formato aplanado para compatibilidad con el frontend."""
+    return {
+        "id": cedula,
+        "actividad_id": id_actividad,
+        "sesion_id": id_especifico,
+        "cedula": cedula,
+        "nombre": persona.get('nombre'),
+        "cargo": persona.get('cargo'),
+        "unidad": persona.get('unidad'),
+        "empresa": persona.get('empresa'),
+        "telefono": persona.get('telefono'),
+        "correo": persona.get('correo'),
+        "fecha_registro": fecha_registro
+    }
+
+def _contexto_registro(sesion: dict, asistente_data: dict):
+    """Devuelve (id_actividad, id_especifico) a partir de la sesión ya resuelta por token."""
+    # ID específico de la sesión (ocurrencia o maestro)
+    id_especifico = asistente_data.get('ocurrencia_id') or sesion['id']
+    # ID de la actividad principal (maestro)
+    id_actividad = sesion.get('_actividad_id', sesion['id'])
+    return id_actividad, id_especifico
+
+def _incrementar_contador(id_actividad: str, asistente_data: dict, sesion: dict, delta: int = 1):
+    from services import sesiones as sesion_service
+    # Incrementar contador de asistentes en la sesión/ocurrencia (write-behind, no se espera la escritura)
+    try:
+        # Usar id_actividad para encontrar el documento maestro de la sesión
+        # y pasar asistente_data.get('ocurrencia_id') para el contador de la sesión específica
+        sesion_service.registrar_incremento(id_actividad, asistente_data.get('ocurrencia_id'), delta, ocurrencias=sesion.get('ocurrencias'))
+    except Exception as e:
+        print(f"⚠️ No se pudo incrementar el contador de asistentes: {e}")
+
+def crear_asistente(asistente_data: dict, sesion_id: str, ip_address: Optional[str] = None, sesion: Optional[dict] = None) -> dict:
+    """
+    Crear asistente en el almacenamiento configurado (db.repositorio).
+    `sesion` es la sesión ya resuelta por token en el endpoint; si no se pasa se resuelve aquí.
+    """
     from services import sesiones as sesion_service
+    import time
 
     cedula = asistente_data['cedula']
-    
-    if settings.STORAGE_MODE == "cosmosdb" and COSMOS_AVAILABLE:
-        import time
-        t0 = time.time()
-        # Obtener sesión completa para tener acceso a _actividad_id y metadatos
+    t0 = time.time()
+    if sesion is None:
         sesion = sesion_service.get_sesion_by_token(asistente_data['token'])
-        t1 = time.time()
-        print(f"⏱️ [crear_asistente] Obtener sesión: {t1-t0:.4f}s")
-        
-        # ID específico de la sesión (ocurrencia o maestro)
-        id_especifico = asistente_data.get('ocurrencia_id') or sesion['id']
-        # ID de la actividad principal (maestro)
-        id_actividad = sesion.get('_actividad_id', sesion['id'])
-
-        # Verificar duplicados en CosmosDB (por cédula y sesión específica)
-        t2 = time.time()
-        if cosmos_db.asistentes.verificar_duplicado(cedula, id_especifico):
-            print(f"⏱️ [crear_asistente] Verificar duplicado tardó {time.time()-t2:.4f}s (ENCONTRADO)")
-            raise DuplicateRegistrationException()
-        t3 = time.time()
-        print(f"⏱️ [crear_asistente] Verificar duplicado tardó {t3-t2:.4f}s (NO encontrado)")
-        
-        # Preparar datos para el registro
-        asistente_data['fecha_registro'] = datetime.now(pytz.timezone(settings.TIMEZONE)).isoformat()
-
-        # Crear/Actualizar registro en base de datos
-        t4 = time.time()
-        nuevo_asistente = cosmos_db.asistentes.crear_o_actualizar(
-            asistente_data,
-            id_actividad
-        )
-        t5 = time.time()
-        print(f"⏱️ [crear_asistente] Crear/Actualizar persona tardó {t5-t4:.4f}s")
-        
-        # Incrementar contador de asistentes en la sesión/ocurrencia
-        try:
-            # Usar id_actividad para encontrar el documento maestro de la sesión
-            # y pasar asistente_data.get('ocurrencia_id') para el contador de la sesión específica
-            sesion_service.increment_asistentes(id_actividad, asistente_data.get('ocurrencia_id'))
-        except Exception as e:
-            print(f"⚠️ No se pudo incrementar el contador de asistentes: {e}")
-
-        print(f"⏱️ [crear_asistente] TOTAL: {time.time()-t0:.4f}s")
-        
-        # Devolver el formato aplanado para compatibilidad con el frontend
-        return {
-            "id": cedula,
-            "actividad_id": id_actividad,
-            "sesion_id": id_especifico,
-            "cedula": cedula,
-            "nombre": nuevo_asistente.get('nombre'),
-            "cargo": nuevo_asistente.get('cargo'),
-            "unidad": nuevo_asistente.get('unidad'),
-            "empresa": nuevo_asistente.get('empresa'),
-            "telefono": nuevo_asistente.get('telefono'),
-            "correo": nuevo_asistente.get('correo'),
-            "fecha_registro": asistente_data['fecha_registro']
-        }
-    else:
-        # Modo JSON (original)
-        asistentes = load_asistentes()
-        
-        # Verificar duplicados
-        for a in asistentes:
-            if a['cedula'] == asistente_data['cedula'] and a['token'] == asistente_data['token']:
-                raise DuplicateRegistrationException()
-        
-        nuevo_asistente = {
-            "id": str(uuid.uuid4()),
-            "sesion_id": sesion_id,
-            "token": asistente_data['token'],
-            "cedula": asistente_data['cedula'],
-            "nombre": asistente_data['nombre'],
-            "cargo": asistente_data.get('cargo'),
-            "unidad": asistente_data.get('unidad'),
-            "empresa": asistente_data.get('empresa'),
-            "telefono": asistente_data.get('telefono'),
-            "correo": asistente_data.get('correo'),
-            "fecha_registro": datetime.now(pytz.timezone(settings.TIMEZONE)).isoformat()
-        }
-        if asistente_data.get('ocurrencia_id'):
-            nuevo_asistente['ocurrencia_id'] = asistente_data['ocurrencia_id']
-        
-        asistentes.append(nuevo_asistente)
-        save_asistentes(asistentes)
-        
-        return nuevo_asistente
-
-def get_asistentes_by_sesion(sesion_id: str) -> List[dict]:
-    """Obtener asistentes por sesión"""
-    if settings.STORAGE_MODE == "cosmosdb" and COSMOS_AVAILABLE:
-        return cosmos_db.listar_asistentes_por_sesion(sesion_id)
-    else:
-        asistentes = load_asistentes()
-        return [a for a in asistentes if a['sesion_id'] == sesion_id]
-
-def delete_asistentes_by_sesion(sesion_id: str):
+    t1 = time.time()
+    print(f"⏱️ [crear_asistente] Obtener sesión: {t1-t0:.4f}s")
+
+    id_actividad, id_especifico = _contexto_registro(sesion, asistente_data)
+    asistente_data['fecha_registro'] = datetime.now(pytz.timezone(settings.TIMEZONE)).isoformat()
+
+    # Registro + detección de duplicado en una sola operación del repositorio
+    t2 = time.time()
+    persona, registrada = repositorio.registrar_asistencia(asistente_data, id_actividad)
+    t3 = time.time()
+    print(f"⏱️ [crear_asistente] Registrar persona tardó {t3-t2:.4f}s ({'OK' if registrada else 'DUPLICADO'})")
+    if not registrada:
+        raise DuplicateRegistrationException()
+    respuesta = _respuesta_registro(cedula, id_actividad, id_especifico, persona, asistente_data['fecha_registro'])
+
+    _incrementar_contador(id_actividad, asistente_data, sesion)
+    print(f"⏱️ [crear_asistente] TOTAL: {time.time()-t0:.4f}s")
+    return respuesta
+
+def get_asistentes_by_sesion(sesion_id: str, actividad_id: Optional[str] = None) -> List[dict]:
+    """Obtener asistentes por sesión (id de ocurrencia o de la actividad maestra; con ocurrencia, pasar actividad_id)"""
+    return repositorio.listar_asistentes_por_sesion(sesion_id, actividad_id)
+
+def delete_asistentes_by_sesion(sesion_id: str, actividad_id: Optional[str] = None):
     """Eliminar asistentes por sesión"""
-    if settings.STORAGE_MODE == "cosmosdb" and COSMOS_AVAILABLE:
-        cosmos_db.eliminar_asistentes_por_sesion(sesion_id)
-    else:
-        asistentes = load_asistentes()
-        new_asistentes = [a for a in asistentes if a['sesion_id'] != sesion_id]
-        save_asistentes(new_asistentes)
+    repositorio.eliminar_asistentes_por_sesion(sesion_id, actividad_id)
 
 def obtener_asistente_por_cedula(cedula: str) -> Optional[dict]:
     """Buscar un asistente por su cédula"""
-    if settings.STORAGE_MODE == "cosmosdb" and COSMOS_AVAILABLE:
-        return cosmos_db.asistentes.obtener_por_cedula(cedula)
-    else:
-        asistentes = load_asistentes()
-        for a in asistentes:
-            if a['cedula'] == cedula:
-                return a
-    return None
+    return repositorio.obtener_persona(cedula)
 
 def actualizar_asistente(cedula: str, asistente_data: dict) -> Optional[dict]:
     """Actualizar datos de un asistente"""
-    if settings.STORAGE_MODE == "cosmosdb" and COSMOS_AVAILABLE:
-        return cosmos_db.asistentes.actualizar_campos(cedula, asistente_data)
+    return repositorio.actualizar_asistente(cedula, asistente_data)
+
+# ========== VARIANTES ASYNC (azure.cosmos.aio) ==========
+# Sin cliente asíncrono abierto (almacenamiento local o scripts) delegan en la versión síncrona.
+
+async def crear_asistente_async(asistente_data: dict, sesion_id: str, ip_address: Optional[str] = None, sesion: Optional[dict] = None) -> dict:
+    """Versión async de crear_asistente: las llamadas a CosmosDB no bloquean el event loop."""
+    from services import sesiones as sesion_service
+
+    adb = get_async_cosmos_db()
+    if not adb:
+        return await _crear_asistente_local(asistente_data, sesion)
+
+    import time
+    cedula = asistente_data['cedula']
+    t0 = time.time()
+    if sesion is None:
+        sesion = await sesion_service.get_sesion_by_token_async(asistente_data['token'])
+    t1 = time.time()
+    print(f"⏱️ [crear_asistente_async] Obtener sesión: {t1-t0:.4f}s")
+
+    id_actividad, id_especifico = _contexto_registro(sesion, asistente_data)
+    asistente_data['fecha_registro'] = datetime.now(pytz.timezone(settings.TIMEZONE)).isoformat()
+
+    t2 = time.time()
+    persona, registrada = await adb.asistentes.registrar_asistencia(asistente_data, id_actividad)
+    t3 = time.time()
+    print(f"⏱️ [crear_asistente_async] Registrar persona tardó {t3-t2:.4f}s ({'OK' if registrada else 'DUPLICADO'})")
+    if not registrada:
+        raise DuplicateRegistrationException()
+
+    _incrementar_contador(id_actividad, asistente_data, sesion)
+    print(f"⏱️ [crear_asistente_async] TOTAL: {time.time()-t0:.4f}s")
+    return _respuesta_registro(cedula, id_actividad, id_especifico, persona, asistente_data['fecha_registro'])
+
+async def _crear_asistente_local(asistente_data: dict, sesion: Optional[dict]) -> dict:
+    """
+    Sin cliente aio: el registro pasa por repositorio.ejecutar_escritura (en modo JSON se encola
+    en el escritor agrupado y se responde cuando su lote quedó escrito).
+    """
+    from services import sesiones as sesion_service
+    import time
+
+    t0 = time.time()
+    if sesion is None:
+        sesion = await sesion_service.get_sesion_by_token_async(asistente_data['token'])
+    id_actividad, id_especifico = _contexto_registro(sesion, asistente_data)
+    asistente_data['fecha_registro'] = datetime.now(pytz.timezone(settings.TIMEZONE)).isoformat()
+
+    persona, registrada = await repositorio.ejecutar_escritura("asistentes", lambda: repositorio.registrar_asistencia(asistente_data, id_actividad))
+    if not registrada:
+        raise DuplicateRegistrationException()
+
+    _incrementar_contador(id_actividad, asistente_data, sesion)
+    print(f"⏱️ [crear_asistente_local] TOTAL: {time.time()-t0:.4f}s")
+    return _respuesta_registro(asistente_data['cedula'], id_actividad, id_especifico, persona, asistente_data['fecha_registro'])
+
+async def registrar_lote_async(lote: List[dict], sesion: dict) -> List[dict]:
+    """
+    Registra un lote de asistentes ya validados para la misma sesión (kioscos sin conexión).
+    La sesión llega resuelta; las personas se escriben con concurrencia acotada
+    (LOTE_CONCURRENCIA) y el contador recibe un único delta con el total de creados.
+    Devuelve un resultado por elemento, en el mismo orden: creado, duplicado o error.
+    """
+    import asyncio
+    import time
+
+    t0 = time.time()
+    fecha_registro = datetime.now(pytz.timezone(settings.TIMEZONE)).isoformat()
+    resultados: List[Optional[dict]] = [None] * len(lote)
+
+    # Cédulas repetidas dentro del mismo lote: solo la primera se escribe
+    pendientes = []
+    vistas = set()
+    for i, data in enumerate(lote):
+        data['fecha_registro'] = fecha_registro
+        if data['cedula'] in vistas:
+            resultados[i] = {"cedula": data['cedula'], "estado": "duplicado"}
+            continue
+        vistas.add(data['cedula'])
+        pendientes.append((i, data))
+
+    if not pendientes:
+        return resultados
+
+    id_actividad, id_especifico = _contexto_registro(sesion, pendientes[0][1])
+
+    adb = get_async_cosmos_db()
+    if adb:
+        semaforo = asyncio.Semaphore(settings.LOTE_CONCURRENCIA)
+
+        async def _registrar(i: int, data: dict):
+            async with semaforo:
+                try:
+                    _, registrada = await adb.asistentes.registrar_asistencia(data, id_actividad)
+                    resultados[i] = {"cedula": data['cedula'], "estado": "creado" if registrada else "duplicado"}
+                except Exception as e:
+                    print(f"❌ [registrar_lote] Error registrando {data['cedula']}: {type(e).__name__}: {e}")
+                    resultados[i] = {"cedula": data['cedula'], "estado": "error", "detalle": str(e)}
+
+        await asyncio.gather(*(_registrar(i, data) for i, data in pendientes))
     else:
-        asistentes = load_asistentes()
-        for i, a in enumerate(asistentes):
-            if a['cedula'] == cedula:
-                # Actualizar campos
-                for k, v in asistente_data.items():
-                    if v is not None:
-                        asistentes[i][k] = v
-                save_asistentes(asistentes)
-                return asistentes[i]
-    return None
+        # Todo el lote en una escritura (transacción en SQLite, un append al journal en JSON)
+        datos_lote = [data for _, data in pendientes]
+        estados = await repositorio.ejecutar_escritura("asistentes", lambda: repositorio.registrar_lote(datos_lote, id_actividad))
+        for (i, data), estado in zip(pendientes, estados):
+            resultados[i] = {"cedula": data['cedula'], "estado": estado}
+
+    creados = sum(1 for r in resultados if r and r['estado'] == "creado")
+    if creados:
+        _incrementar_contador(id_actividad, pendientes[0][1], sesion, delta=creados)
+
+    print(f"⏱️ [registrar_lote] {len(lote)} asistentes ({creados} creados) en {time.time()-t0:.4f}s")
+    return resultados
+
+async def get_asistentes_by_sesion_async(sesion_id: str, actividad_id: Optional[str] = None) -> List[dict]:
+    adb = get_async_cosmos_db()
+    if not adb:
+        return get_asistentes_by_sesion(sesion_id, actividad_id)
+    return await adb.asistentes.listar_por_sesion(sesion_id, actividad_id)
+
+async def obtener_asistente_por_cedula_async(cedula: str) -> Optional[dict]:
+    adb = get_async_cosmos_db()
+    if not adb:
+        return obtener_asistente_por_cedula(cedula)
+    return await adb.asistentes.obtener_por_cedula(cedula)
+
+async def actualizar_asistente_async(cedula: str, asistente_data: dict) -> Optional[dict]:
+    adb = get_async_cosmos_db()
+    if not adb:
+        return actualizar_asistente(cedula, asistente_data)
+    return await adb.asistentes.actualizar_campos(cedula, asistente_data)
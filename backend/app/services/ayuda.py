@@ -1,13 +1,13 @@
 from typing import Dict, Any, List
 from datetime import datetime
-from db.cosmos_client import cosmos_db, get_cosmos_db
+from db.repositorio import get_repositorio
 
 
 class AyudaService:
     """Servicio para gestionar el centro de ayuda del sistema"""
     
     def __init__(self):
-        self.cosmos_db = get_cosmos_db()
+        self.repositorio = get_repositorio()
         self.ayuda_id = "centro_ayuda"
         
     def obtener_ayuda(self) -> Dict[str, Any]:
@@ -19,10 +19,10 @@ class AyudaService:
             Diccionario con las categorías y tarjetas de ayuda
         """
         try:
-            if not self.cosmos_db:
+            if not self.repositorio:
                 return self._ayuda_por_defecto()
                 
-            ayuda_doc = self.cosmos_db.obtener_ayuda()
+            ayuda_doc = self.repositorio.obtener_ayuda()
             
             if ayuda_doc:
                 return ayuda_doc
@@ -48,7 +48,7 @@ class AyudaService:
         Raises:
             Exception: Si la base de datos no está disponible
         """
-        if not self.cosmos_db:
+        if not self.repositorio:
             raise Exception("Base de datos no disponible")
             
         ayuda_doc = {
@@ -59,7 +59,7 @@ class AyudaService:
             "modificado_por": user_id
         }
         
-        return self.cosmos_db.actualizar_ayuda(ayuda_doc)
+        return self.repositorio.actualizar_ayuda(ayuda_doc)
     
     def _crear_ayuda_inicial(self) -> Dict[str, Any]:
         """
@@ -70,11 +70,11 @@ class AyudaService:
         """
         ayuda_default = self._ayuda_por_defecto()
         
-        if not self.cosmos_db:
+        if not self.repositorio:
             return ayuda_default
         
         try:
-            self.cosmos_db.crear_ayuda(ayuda_default)
+            self.repositorio.crear_ayuda(ayuda_default)
         except Exception as e:
             print(f"Error creando centro de ayuda inicial: {e}")
             
@@ -1,7 +1,7 @@
 from typing import Dict, Any
 from datetime import datetime
 from fastapi import HTTPException
-from db.cosmos_client import cosmos_db, get_cosmos_db
+from db.repositorio import get_repositorio
 from core.config import settings
 
 
@@ -21,10 +21,10 @@ async def verificar_permiso(user_email: str, permiso: str) -> bool:
         HTTPException: 403 si no tiene permiso, 404 si usuario no existe
     """
     try:
-        cosmos_db = get_cosmos_db()
+        repositorio = get_repositorio()
         
         # Obtener usuario
-        usuario = cosmos_db.obtener_usuario_por_email(user_email)
+        usuario = repositorio.obtener_usuario_por_email(user_email)
         if not usuario:
             raise HTTPException(
                 status_code=404,
@@ -62,7 +62,7 @@ class PermisosService:
     """Servicio para gestionar permisos y roles del sistema"""
     
     def __init__(self):
-        self.cosmos_db = get_cosmos_db()
+        self.repositorio = get_repositorio()
         self.permisos_id = "permisos_roles"
         
     def obtener_permisos(self) -> Dict[str, Dict[str, bool]]:
@@ -74,10 +74,10 @@ class PermisosService:
             Diccionario con permisos por rol
         """
         try:
-            if not self.cosmos_db:
+            if not self.repositorio:
                 return self._permisos_por_defecto()
                 
-            permisos_doc = self.cosmos_db.obtener_permisos()
+            permisos_doc = self.repositorio.obtener_permisos()
             
             if permisos_doc:
                 return permisos_doc.get("permisos", self._permisos_por_defecto())
@@ -105,7 +105,7 @@ class PermisosService:
             Exception: Si la base de datos no está disponible
             ValueError: Si se intenta desactivar permisos críticos
         """
-        if not self.cosmos_db:
+        if not self.repositorio:
             raise Exception("Base de datos no disponible")
         
         # Validación de seguridad: NO permitir desactivar permisos críticos para Administrador
@@ -126,7 +126,7 @@ class PermisosService:
             "modificado_por": user_email
         }
         
-        return self.cosmos_db.actualizar_permisos(permisos_doc)
+        return self.repositorio.actualizar_permisos(permisos_doc)
     
     def restablecer_permisos_defecto(self, user_email: str) -> Dict[str, Any]:
         """
@@ -153,7 +153,7 @@ class PermisosService:
         """
         permisos_default = self._permisos_por_defecto()
         
-        if not self.cosmos_db:
+        if not self.repositorio:
             return permisos_default
         
         permisos_doc = {
@@ -165,7 +165,7 @@ class PermisosService:
         }
         
         try:
-            self.cosmos_db.crear_permisos(permisos_doc)
+            self.repositorio.crear_permisos(permisos_doc)
         except Exception as e:
             print(f"Error creando permisos iniciales: {e}")
             
@@ -234,10 +234,10 @@ class PermisosService:
             Diccionario con los permisos del usuario
         """
         try:
-            if not self.cosmos_db:
+            if not self.repositorio:
                 return {}
                 
-            usuario = self.cosmos_db.obtener_usuario_por_email(user_email)
+            usuario = self.repositorio.obtener_usuario_por_email(user_email)
             if not usuario:
                 return {}
             
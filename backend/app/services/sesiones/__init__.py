@@ -1,32 +1,103 @@
 from .crud import crear, list_all as listar, list_admin as get_sesiones_para_admin, get_by_id as get_sesion_by_id, delete as delete_sesion, increment_asistentes
+from .crud import list_all_async as get_all_sesiones_async, list_admin_async as get_sesiones_para_admin_async, get_by_id_async as get_sesion_by_id_async, increment_asistentes_async
+from .crud import list_pagina_async as get_pagina_sesiones_async, list_admin_pagina_async as get_pagina_sesiones_admin_async
+from .crud import list_resumen_async as get_resumen_sesiones_async, list_admin_resumen_async as get_resumen_sesiones_admin_async
 from .utils import generar_qr_dinamico, get_colombia_now
 from .recurrence import resolver_herencia, inyectar_primera_oc
-from .crud import preparar_respuesta
-from db.cosmos_client import cosmos_db
+from .crud import preparar_respuesta, repositorio
+from db.aio.cosmos_client import get_async_cosmos_db, ejecutar_sync
 from core.config import settings
 from core.exceptions import TokenNotFoundException, TokenExpiredException, TokenInactiveException
 from datetime import datetime, timedelta
-from .storage_json import load_sesiones, save_sesiones
 from .recurrence import generar_ocurrencia_dict
+from .token_index import token_index, persistir_tokens, eliminar_tokens
+from .contadores import agregador_contadores, registrar_incremento
+from .public_cache import cache_publico
+from .precalentamiento import precalentador
 
 # Re-exportar funciones para mantener compatibilidad
 __all__ = [
     'crear_sesion', 'get_all_sesiones', 'get_sesiones_para_admin', 'get_sesion_by_id',
     'get_sesion_by_token', 'actualizar_sesion', 'agregar_ocurrencia', 'eliminar_ocurrencia',
-    'actualizar_ocurrencia', 'delete_sesion', 'generar_qr_dinamico', 'increment_asistentes'
+    'actualizar_ocurrencia', 'delete_sesion', 'generar_qr_dinamico', 'increment_asistentes',
+    'get_sesion_by_token_async', 'get_all_sesiones_async', 'get_sesiones_para_admin_async',
+    'get_pagina_sesiones_async', 'get_pagina_sesiones_admin_async',
+    'get_resumen_sesiones_async', 'get_resumen_sesiones_admin_async',
+    'get_sesion_by_id_async', 'increment_asistentes_async', 'agregador_contadores', 'registrar_incremento', 'cache_publico',
+    'resolver_token_async', 'precalentador'
 ]
 
 def crear_sesion(data): return crear(data)
 def get_all_sesiones(owner=None, tipos=None): return listar(owner, tipos)
 
-def get_sesion_by_token(token: str) -> dict:
-    import time
-    start_time = time.time()
-    if settings.STORAGE_MODE == "cosmosdb" and cosmos_db:
-        sesion = cosmos_db.obtener_sesion_por_token(token)
+def _token_expirado(token_expiry_raw) -> bool:
+    # Fix date parsing: handle 'Z' suffix correctly
+    if not isinstance(token_expiry_raw, str):
+        print(f"⚠️ token_expiry no es string ({type(token_expiry_raw)}): {token_expiry_raw}")
+        token_expiry_str = str(token_expiry_raw) if token_expiry_raw else ""
     else:
-        sesion = next((s for s in load_sesiones() if any(oc.get('token') == token for oc in s.get('ocurrencias', []))), None)
+        token_expiry_str = token_expiry_raw
+
+    if token_expiry_str.endswith('Z'):
+        token_expiry_str = token_expiry_str.replace('Z', '+00:00')
+    
+    try:
+        expiry = datetime.fromisoformat(token_expiry_str)
+    except Exception as e:
+        print(f"❌ Error al parsear fecha de expiración '{token_expiry_str}': {e}")
+        # Si falla el parseo, asumimos que no ha expirado para evitar bloqueo total
+        return False
+
+    return get_colombia_now() > expiry
 
+def _buscar_por_documento_token(token: str):
+    """
+    Resuelve el token con una lectura puntual al contenedor de tokens (solo CosmosDB; el resto
+    de implementaciones no tiene documentos de token y devuelve None).
+    Rechaza tokens inactivos o expirados sin cargar la sesión completa.
+    """
+    doc = repositorio.obtener_token(token)
+    if not doc:
+        return None
+    if not doc.get('token_active', True): raise TokenInactiveException()
+    if _token_expirado(doc.get('token_expiry')):
+        print(f"❌ Token expirado: {token} (exp: {doc.get('token_expiry')})")
+        raise TokenExpiredException()
+    sesion = repositorio.obtener_sesion(doc['sesion_id'])
+    if sesion and any(oc.get('token') == token for oc in sesion.get('ocurrencias', [])):
+        return sesion
+    # Documento huérfano: la sesión u ocurrencia ya no existe
+    eliminar_tokens([{"token": token}])
+    return None
+
+def _buscar_sesion_por_token(token: str):
+    """Resuelve el token con el índice en memoria; solo consulta el almacenamiento completo si no lo conoce."""
+    token_index.asegurar_construido()
+    entrada = token_index.buscar(token)
+    if entrada:
+        sesion = repositorio.obtener_sesion(entrada[0])
+        if sesion and any(oc.get('token') == token for oc in sesion.get('ocurrencias', [])):
+            return sesion
+        # Entrada obsoleta (p. ej. modificada desde otra réplica)
+        token_index.eliminar(token)
+    elif token_index.es_negativo(token):
+        return None
+
+    sesion = _buscar_por_documento_token(token)
+    if not sesion:
+        # Búsqueda por token en las sesiones; en CosmosDB (tokens anteriores al contenedor de tokens) se rellena el documento
+        sesion = repositorio.obtener_sesion_por_token(token)
+        if sesion:
+            persistir_tokens(sesion['id'], sesion.get('ocurrencias', []))
+
+    if sesion:
+        token_index.registrar_sesion(sesion)
+    else:
+        token_index.marcar_negativo(token)
+    return sesion
+
+def _resolver_token(sesion, token: str) -> dict:
+    """Combina sesión y ocurrencia del token y valida que siga activo y vigente."""
     if not sesion: 
         print(f"❌ Token no encontrado: {token}")
         raise TokenNotFoundException()
@@ -42,72 +113,107 @@ def get_sesion_by_token(token: str) -> dict:
             merged[k] = sesion.get(k, '')
     
     merged['_ocurrencia_id'] = oc_match['id']
+    # Versión para el ETag de la información pública: cambia con cualquier edición de la sesión o la ocurrencia
+    merged['_version'] = f"{sesion.get('updated_at', '')}|{oc_match.get('updated_at', '')}"
     if not merged.get('token_active', True): raise TokenInactiveException()
     
-    # Fix date parsing: handle 'Z' suffix correctly
-    token_expiry_raw = merged.get('token_expiry')
-    if not isinstance(token_expiry_raw, str):
-        print(f"⚠️ token_expiry no es string ({type(token_expiry_raw)}): {token_expiry_raw}")
-        token_expiry_str = str(token_expiry_raw) if token_expiry_raw else ""
-    else:
-        token_expiry_str = token_expiry_raw
-
-    if token_expiry_str.endswith('Z'):
-        token_expiry_str = token_expiry_str.replace('Z', '+00:00')
-    
-    try:
-        expiry = datetime.fromisoformat(token_expiry_str)
-    except Exception as e:
-        print(f"❌ Error al parsear fecha de expiración '{token_expiry_str}': {e}")
-        # Si falla el parseo, asumimos que no ha expirado para evitar bloqueo total
-        expiry = get_colombia_now() + timedelta(days=1)
-
-    if get_colombia_now() > expiry: 
-        print(f"❌ Token expirado: {token} (exp: {expiry})")
+    if _token_expirado(merged.get('token_expiry')): 
+        print(f"❌ Token expirado: {token} (exp: {merged.get('token_expiry')})")
         raise TokenExpiredException()
-    
+    return merged
+
+def get_sesion_by_token(token: str) -> dict:
+    import time
+    start_time = time.time()
+    merged = _resolver_token(_buscar_sesion_por_token(token), token)
     end_time = time.time()
     print(f"⏱️ get_sesion_by_token tardó {end_time - start_time:.4f}s")
     return merged
 
+async def _buscar_sesion_por_token_async(adb, token: str):
+    """Igual que _buscar_sesion_por_token pero con el cliente azure.cosmos.aio."""
+    if not token_index.construido:
+        await ejecutar_sync(token_index.asegurar_construido)
+    entrada = token_index.buscar(token)
+    if entrada:
+        sesion = await adb.sesiones.obtener_por_id(entrada[0])
+        if sesion and any(oc.get('token') == token for oc in sesion.get('ocurrencias', [])):
+            return sesion
+        token_index.eliminar(token)
+    elif token_index.es_negativo(token):
+        return None
+
+    sesion = None
+    doc = await adb.tokens.obtener(token)
+    if doc:
+        if not doc.get('token_active', True): raise TokenInactiveException()
+        if _token_expirado(doc.get('token_expiry')):
+            print(f"❌ Token expirado: {token} (exp: {doc.get('token_expiry')})")
+            raise TokenExpiredException()
+        sesion = await adb.sesiones.obtener_por_id(doc['sesion_id'])
+        if not (sesion and any(oc.get('token') == token for oc in sesion.get('ocurrencias', []))):
+            sesion = None
+            await adb.tokens.eliminar(token)
+    if not sesion:
+        sesion = await adb.sesiones.obtener_por_token(token)
+        if sesion:
+            try:
+                await adb.tokens.guardar_ocurrencias(sesion['id'], sesion.get('ocurrencias', []))
+            except Exception as e:
+                print(f"⚠️ No se pudo persistir tokens de la sesión {sesion['id']}: {e}")
+
+    if sesion:
+        token_index.registrar_sesion(sesion)
+    else:
+        token_index.marcar_negativo(token)
+    return sesion
+
+async def get_sesion_by_token_async(token: str) -> dict:
+    """Versión async de get_sesion_by_token; usa azure.cosmos.aio si el cliente está abierto."""
+    adb = get_async_cosmos_db()
+    if not adb:
+        return get_sesion_by_token(token)
+    import time
+    start_time = time.time()
+    merged = _resolver_token(await _buscar_sesion_por_token_async(adb, token), token)
+    print(f"⏱️ get_sesion_by_token_async tardó {time.time() - start_time:.4f}s")
+    return merged
+
+async def resolver_token_async(token: str):
+    """
+    Entrada de caché del token (vista resuelta, payload público y ETag), solo para la lectura pública.
+    Si no está (o venció) se resuelve con get_sesion_by_token_async y se guarda; las
+    ocurrencias próximas ya llegan cargadas por el precalentador.
+    """
+    entrada = cache_publico.obtener(token)
+    if entrada is None:
+        marca = cache_publico.marca()
+        entrada = cache_publico.guardar(token, await get_sesion_by_token_async(token), desde=marca)
+    return entrada
+
 def actualizar_sesion(sesion_id: str, datos: dict) -> dict:
     now_col = get_colombia_now().isoformat()
     datos['updated_at'] = now_col
     campos_oc = ['fecha', 'hora_inicio', 'hora_fin', 'facilitador_entidad', 'tipo_actividad', 'contenido', 'actividad', 'actividad_custom', 'dirigido_a', 'modalidad', 'responsable', 'cargo_responsable', 'tema', 'token_active']
     
-    if settings.STORAGE_MODE == "cosmosdb" and cosmos_db:
-        actual = cosmos_db.obtener_sesion(sesion_id)
-        if not actual: raise ValueError("Sesión no encontrada")
-        actual.update(datos)
-        if actual.get('ocurrencias'):
-            oc = actual['ocurrencias'][0]
-            for c in campos_oc:
-                if c in datos:
-                    val = datos[c]
-                    oc[c] = None if c in ['facilitador_entidad', 'tipo_actividad', 'contenido', 'actividad', 'actividad_custom', 'dirigido_a', 'modalidad', 'responsable', 'cargo_responsable', 'tema'] and val == actual.get(c) else val
-            oc['updated_at'] = now_col
-        res = cosmos_db.actualizar_sesion(sesion_id, actual)
-    else:
-        sesiones = load_sesiones()
-        match = next((s for s in sesiones if s['id'] == sesion_id), None)
-        if not match: raise ValueError("Sesión no encontrada")
-        match.update(datos)
-        if match.get('ocurrencias'):
-            oc = match['ocurrencias'][0]
-            for c in campos_oc:
-                if c in datos:
-                    val = datos[c]
-                    oc[c] = None if c in ['facilitador_entidad', 'tipo_actividad', 'contenido', 'actividad', 'actividad_custom', 'dirigido_a', 'modalidad', 'responsable', 'cargo_responsable', 'tema'] and val == match.get(c) else val
-            oc['updated_at'] = now_col
-        save_sesiones(sesiones)
-        res = match
+    actual = repositorio.obtener_sesion(sesion_id)
+    if not actual: raise ValueError("Sesión no encontrada")
+    actual.update(datos)
+    if actual.get('ocurrencias'):
+        oc = actual['ocurrencias'][0]
+        for c in campos_oc:
+            if c in datos:
+                val = datos[c]
+                oc[c] = None if c in ['facilitador_entidad', 'tipo_actividad', 'contenido', 'actividad', 'actividad_custom', 'dirigido_a', 'modalidad', 'responsable', 'cargo_responsable', 'tema'] and val == actual.get(c) else val
+        oc['updated_at'] = now_col
+    res = repositorio.actualizar_sesion(sesion_id, actual)
+    if 'token_active' in datos and actual.get('ocurrencias'):
+        persistir_tokens(sesion_id, actual['ocurrencias'][:1])
+    cache_publico.invalidar_sesion(sesion_id)
     return preparar_respuesta([res])[0]
 
 def agregar_ocurrencia(sesion_id: str, **kwargs) -> dict:
-    if settings.STORAGE_MODE == "cosmosdb" and cosmos_db:
-        sesion = cosmos_db.obtener_sesion(sesion_id)
-    else:
-        sesion = next((s for s in load_sesiones() if s['id'] == sesion_id), None)
+    sesion = repositorio.obtener_sesion(sesion_id)
     if not sesion: raise ValueError("Sesión no encontrada")
     
     def clean(f, v): return None if v == sesion.get(f) else v
@@ -118,18 +224,13 @@ def agregar_ocurrencia(sesion_id: str, **kwargs) -> dict:
         **{c: clean(c, kwargs.get(c)) for c in ['facilitador_entidad', 'tipo_actividad', 'contenido', 'actividad', 'dirigido_a', 'modalidad', 'responsable', 'cargo_responsable', 'tema']}
     )
     
-    if settings.STORAGE_MODE == "cosmosdb" and cosmos_db:
-        sesion.setdefault('ocurrencias', []).append(nueva_oc)
-        sesion['es_recurrente'] = True
-        sesion['updated_at'] = get_colombia_now().isoformat()
-        cosmos_db.actualizar_sesion(sesion_id, sesion)
-    else:
-        sesiones = load_sesiones()
-        s = next((s for s in sesiones if s['id'] == sesion_id), None)
-        s.setdefault('ocurrencias', []).append(nueva_oc)
-        s['es_recurrente'] = True
-        s['updated_at'] = get_colombia_now().isoformat()
-        save_sesiones(sesiones)
+    sesion.setdefault('ocurrencias', []).append(nueva_oc)
+    sesion['es_recurrente'] = True
+    sesion['updated_at'] = get_colombia_now().isoformat()
+    repositorio.actualizar_sesion(sesion_id, sesion)
+    persistir_tokens(sesion_id, [nueva_oc])
+    token_index.registrar(nueva_oc['token'], sesion_id, nueva_oc['id'])
+    cache_publico.invalidar_sesion(sesion_id)
     
     # Resolver herencia para respuesta
     for c in ['facilitador_entidad', 'tipo_actividad', 'contenido', 'actividad', 'dirigido_a', 'modalidad', 'responsable', 'cargo_responsable', 'tema']:
@@ -138,40 +239,25 @@ def agregar_ocurrencia(sesion_id: str, **kwargs) -> dict:
 
 def eliminar_ocurrencia(sesion_id: str, oc_id: str) -> bool:
     from services.asistentes import delete_asistentes_by_sesion
-    if settings.STORAGE_MODE == "cosmosdb" and cosmos_db:
-        s = cosmos_db.obtener_sesion(sesion_id)
-        if not s: return False
-        
-        orig_len = len(s.get('ocurrencias', []))
-        s['ocurrencias'] = [o for o in s.get('ocurrencias', []) if o['id'] != oc_id]
-        if len(s['ocurrencias']) == orig_len: return False
-        
-        # Eliminar asistentes de esta ocurrencia
-        delete_asistentes_by_sesion(oc_id)
-        
-        s['updated_at'] = get_colombia_now().isoformat()
-        cosmos_db.actualizar_sesion(sesion_id, s)
-        return True
-    else:
-        sesiones = load_sesiones()
-        s = next((s for s in sesiones if s['id'] == sesion_id), None)
-        if not s: return False
-        orig_len = len(s.get('ocurrencias', []))
-        s['ocurrencias'] = [o for o in s.get('ocurrencias', []) if o['id'] != oc_id]
-        if len(s['ocurrencias']) == orig_len: return False
-        
-        # Eliminar asistentes de esta ocurrencia
-        delete_asistentes_by_sesion(oc_id)
-        
-        s['updated_at'] = get_colombia_now().isoformat()
-        save_sesiones(sesiones)
-        return True
+    s = repositorio.obtener_sesion(sesion_id)
+    if not s: return False
+    
+    eliminada = next((o for o in s.get('ocurrencias', []) if o['id'] == oc_id), None)
+    if not eliminada: return False
+    s['ocurrencias'] = [o for o in s.get('ocurrencias', []) if o['id'] != oc_id]
+    
+    # Eliminar asistentes de esta ocurrencia
+    delete_asistentes_by_sesion(oc_id, actividad_id=sesion_id)
+    
+    s['updated_at'] = get_colombia_now().isoformat()
+    repositorio.actualizar_sesion(sesion_id, s)
+    eliminar_tokens([eliminada])
+    token_index.eliminar(eliminada.get('token'))
+    cache_publico.invalidar_sesion(sesion_id)
+    return True
 
 def actualizar_ocurrencia(sesion_id: str, oc_id: str, data: dict) -> dict:
-    if settings.STORAGE_MODE == "cosmosdb" and cosmos_db:
-        s = cosmos_db.obtener_sesion(sesion_id)
-    else:
-        s = next((s for s in load_sesiones() if s['id'] == sesion_id), None)
+    s = repositorio.obtener_sesion(sesion_id)
     if not s: raise ValueError("Sesión no encontrada")
     
     oc = next((o for o in s.get('ocurrencias', []) if o['id'] == oc_id), None)
@@ -185,10 +271,10 @@ def actualizar_ocurrencia(sesion_id: str, oc_id: str, data: dict) -> dict:
     if 'tema' in data: s['tema'] = data['tema']
     s['updated_at'] = get_colombia_now().isoformat()
     
-    if settings.STORAGE_MODE == "cosmosdb" and cosmos_db:
-        cosmos_db.actualizar_sesion(sesion_id, s)
-    else:
-        save_sesiones(load_sesiones()) # s ya está modificado en la lista si cargamos todas
+    repositorio.actualizar_sesion(sesion_id, s)
+    persistir_tokens(sesion_id, [oc])
+    token_index.registrar(oc.get('token'), sesion_id, oc_id)
+    cache_publico.invalidar_sesion(sesion_id)
         
     for c in campos_herencia:
         if oc.get(c) is None: oc[c] = s.get(c)
@@ -0,0 +1,159 @@
+import asyncio
+import time
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+from core.config import settings
+from core.metrics import metricas
+from .crud import repositorio, increment_asistentes, increment_asistentes_async
+
+
+class AgregadorContadores:
+    """
+    Write-behind de los contadores de asistentes.
+    Acumula deltas por (sesion_id, ocurrencia_id) en memoria y los aplica en una sola
+    actualización cada `intervalo_ms` o al llegar a `max_pendientes` registros.
+    Corre como tarea del event loop (se inicia y se detiene en el lifespan); en modo JSON
+    los deltas de un flush pasan por el escritor agrupado y se persisten en un solo lote.
+    Un delta que falla vuelve a la cola hasta `max_intentos` flushes; se descarta antes si la sesión
+    ya no existe (404) o si la escritura pudo haberse aplicado (repetirla lo contaría dos veces).
+    Los descartados quedan en `descartados` (últimos DESCARTADOS_MAX) y en la métrica contadores.descartados.
+    """
+
+    DESCARTADOS_MAX = 100
+
+    def __init__(self, intervalo_ms: int, max_pendientes: int, max_intentos: int = 5):
+        self.intervalo = intervalo_ms / 1000
+        self.max_pendientes = max_pendientes
+        self.max_intentos = max_intentos
+        self._intentos: Dict[Tuple[str, Optional[str]], int] = {}
+        self.descartados = deque(maxlen=self.DESCARTADOS_MAX)
+        self._pendientes: Dict[Tuple[str, Optional[str]], int] = {}
+        self._ocurrencias: Dict[str, List[dict]] = {}
+        self._total_pendiente = 0
+        self._mas_antiguo: Optional[float] = None
+        self._evento: Optional[asyncio.Event] = None
+        self._tarea: Optional[asyncio.Task] = None
+        self._detener = False
+
+    @property
+    def activo(self) -> bool:
+        return self._tarea is not None and not self._tarea.done()
+
+    def stats(self) -> dict:
+        return {
+            "activo": self.activo,
+            "pendientes": self._total_pendiente,
+            "descartados": len(self.descartados),
+            "lag_actual_s": round(time.monotonic() - self._mas_antiguo, 4) if self._mas_antiguo else 0.0
+        }
+
+    def registrar(self, sesion_id: str, ocurrencia_id: Optional[str] = None, delta: int = 1, ocurrencias: Optional[List[dict]] = None):
+        """Encola el incremento; no espera la escritura."""
+        clave = (sesion_id, ocurrencia_id)
+        self._pendientes[clave] = self._pendientes.get(clave, 0) + delta
+        if ocurrencias is not None:
+            self._ocurrencias[sesion_id] = ocurrencias
+        self._total_pendiente += delta
+        if self._mas_antiguo is None:
+            self._mas_antiguo = time.monotonic()
+        metricas.gauge("contadores.pendientes", self._total_pendiente)
+        if self._total_pendiente >= self.max_pendientes and self._evento:
+            self._evento.set()
+
+    def _descartar(self, clave: Tuple[str, Optional[str]], delta: int, motivo: str, error: Exception):
+        self._intentos.pop(clave, None)
+        self.descartados.append({
+            "sesion_id": clave[0], "ocurrencia_id": clave[1], "delta": delta, "motivo": motivo,
+            "error": f"{type(error).__name__}: {error}", "momento": time.time()
+        })
+        print(f"🗑️ Delta de contadores descartado ({clave[0]}, {clave[1]}, +{delta}): {motivo}")
+        metricas.incr("contadores.descartados", delta)
+
+    def _fallo(self, clave: Tuple[str, Optional[str]], delta: int, error: Exception):
+        if getattr(error, 'status_code', 0) == 404:
+            return self._descartar(clave, delta, "sesion_inexistente", error)
+        if getattr(error, 'sin_confirmar', False):
+            return self._descartar(clave, delta, "sin_confirmar", error)
+        intentos = self._intentos.get(clave, 0) + 1
+        if intentos >= self.max_intentos:
+            return self._descartar(clave, delta, "max_intentos", error)
+        self._intentos[clave] = intentos
+        # Se devuelve a la cola para el próximo flush
+        self.registrar(clave[0], clave[1], delta)
+
+    async def flush(self):
+        if not self._pendientes:
+            return
+        pendientes, self._pendientes = self._pendientes, {}
+        ocurrencias, self._ocurrencias = self._ocurrencias, {}
+        mas_antiguo, self._mas_antiguo = self._mas_antiguo, None
+        self._total_pendiente = 0
+
+        # Concurrentes: en modo JSON el escritor agrupado los persiste en una sola escritura
+        claves = list(pendientes.items())
+        resultados = await asyncio.gather(
+            *(increment_asistentes_async(sesion_id, ocurrencia_id, delta, ocurrencias.get(sesion_id)) for (sesion_id, ocurrencia_id), delta in claves),
+            return_exceptions=True
+        )
+        for ((sesion_id, ocurrencia_id), delta), resultado in zip(claves, resultados):
+            if isinstance(resultado, Exception):
+                print(f"⚠️ No se pudo aplicar delta de contadores ({sesion_id}, {ocurrencia_id}, +{delta}): {resultado}")
+                metricas.incr("contadores.errores_flush")
+                self._fallo((sesion_id, ocurrencia_id), delta, resultado)
+                continue
+            self._intentos.pop((sesion_id, ocurrencia_id), None)
+            metricas.incr("contadores.deltas_aplicados", delta)
+
+        if mas_antiguo is not None:
+            lag = time.monotonic() - mas_antiguo
+            metricas.observar("contadores.flush_lag_s", lag)
+            metricas.gauge("contadores.ultimo_flush_lag_s", round(lag, 4))
+        metricas.incr("contadores.flushes")
+        metricas.gauge("contadores.pendientes", self._total_pendiente)
+
+    async def _bucle(self):
+        while not self._detener:
+            try:
+                await asyncio.wait_for(self._evento.wait(), timeout=self.intervalo)
+            except asyncio.TimeoutError:
+                pass
+            self._evento.clear()
+            await self.flush()
+
+    def iniciar(self):
+        if self.activo:
+            return
+        self._detener = False
+        self._evento = asyncio.Event()
+        self._tarea = asyncio.create_task(self._bucle())
+
+    async def detener(self):
+        """Detiene el bucle y aplica todo lo pendiente (apagado ordenado)."""
+        if self._tarea:
+            self._detener = True
+            self._evento.set()
+            await self._tarea
+            self._tarea = None
+        await self.flush()
+
+
+agregador_contadores = AgregadorContadores(
+    intervalo_ms=settings.COUNTER_FLUSH_INTERVAL_MS,
+    max_pendientes=settings.COUNTER_FLUSH_MAX_PENDING,
+    max_intentos=settings.COUNTER_FLUSH_MAX_INTENTOS
+)
+
+
+def registrar_incremento(sesion_id: str, ocurrencia_id: Optional[str] = None, delta: int = 1, ocurrencias: Optional[List[dict]] = None):
+    """
+    Incremento de contadores desde el camino de registro.
+    Con el agregador activo (API en marcha) solo se encola; en scripts se escribe directamente.
+    Con contadores derivados del change feed no se escribe nada: el consumidor los calcula.
+    """
+    if repositorio.contadores_derivados:
+        return
+    if agregador_contadores.activo:
+        agregador_contadores.registrar(sesion_id, ocurrencia_id, delta, ocurrencias)
+    else:
+        increment_asistentes(sesion_id, ocurrencia_id, delta, ocurrencias)
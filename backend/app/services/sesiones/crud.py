@@ -1,12 +1,16 @@
+import base64
+import json
 import uuid
 from typing import List, Optional
 from core.config import settings
-from db.cosmos_client import cosmos_db
-from .storage_json import load_sesiones, save_sesiones
+from db.repositorio import get_repositorio
+from db.aio.cosmos_client import get_async_cosmos_db
 from .utils import get_colombia_now
 from .recurrence import generar_ocurrencia_dict, resolver_herencia, inyectar_primera_oc
+from .token_index import token_index, persistir_tokens, eliminar_tokens
+from .public_cache import cache_publico
 
-COSMOS_AVAILABLE = cosmos_db is not None
+repositorio = get_repositorio()
 
 def preparar_respuesta(sesiones: List[dict]) -> List[dict]:
     """Prepara las sesiones para la API (herencia e inyección)."""
@@ -63,69 +67,80 @@ def crear(sesion_data: dict) -> dict:
             )
         )
         
-    if settings.STORAGE_MODE == "cosmosdb" and COSMOS_AVAILABLE:
-        result = cosmos_db.crear_sesion(nueva_sesion)
-    else:
-        sesiones = load_sesiones()
-        sesiones.append(nueva_sesion)
-        save_sesiones(sesiones)
-        result = nueva_sesion
+    result = repositorio.crear_sesion(nueva_sesion)
+    persistir_tokens(sesion_id, result.get('ocurrencias', []))
+    token_index.registrar_sesion(result)
         
     return preparar_respuesta([result])[0]
 
 def list_all(owner_email: Optional[str] = None, tipos: Optional[List[str]] = None) -> List[dict]:
-    if settings.STORAGE_MODE == "cosmosdb" and COSMOS_AVAILABLE:
-        sesiones = cosmos_db.listar_sesiones(owner_email, tipos)
-    else:
-        sesiones = load_sesiones()
-        if owner_email:
-            sesiones = [s for s in sesiones if s.get('created_by') == owner_email]
-        if tipos:
-            sesiones = [s for s in sesiones if s.get('actividad') in tipos]
-        sesiones.sort(key=lambda x: x.get('created_at', ''), reverse=True)
-    return preparar_respuesta(sesiones)
+    return preparar_respuesta(repositorio.superponer_agregados(repositorio.listar_sesiones(owner_email, tipos)))
 
 def list_admin(admin_email: str) -> List[dict]:
-    if settings.STORAGE_MODE == "cosmosdb" and COSMOS_AVAILABLE:
-        sesiones = cosmos_db.listar_sesiones_admin(admin_email)
-    else:
-        sesiones = load_sesiones()
-        sesiones = [
-            s for s in sesiones 
-            if s.get('created_by') == admin_email or s.get('actividad') in ['Inducción', 'Actividad', 'Capacitación']
-        ]
-        sesiones.sort(key=lambda x: x.get('created_at', ''), reverse=True)
-    return preparar_respuesta(sesiones)
+    return preparar_respuesta(repositorio.superponer_agregados(repositorio.listar_sesiones_admin(admin_email)))
+
+def list_resumen(owner_email: Optional[str] = None, tipos: Optional[List[str]] = None) -> List[dict]:
+    """Listado liviano (SesionSummary): el documento completo solo se sirve en el detalle."""
+    return repositorio.superponer_agregados(repositorio.listar_sesiones_resumen(owner_email, tipos))
+
+def list_admin_resumen(admin_email: str) -> List[dict]:
+    return repositorio.superponer_agregados(repositorio.listar_sesiones_admin_resumen(admin_email))
 
 def get_by_id(sesion_id: str) -> Optional[dict]:
-    if settings.STORAGE_MODE == "cosmosdb" and COSMOS_AVAILABLE:
-        sesion = cosmos_db.obtener_sesion(sesion_id)
-    else:
-        sesion = next((s for s in load_sesiones() if s['id'] == sesion_id), None)
-    return preparar_respuesta([sesion])[0] if sesion else None
+    sesion = repositorio.obtener_sesion(sesion_id)
+    return preparar_respuesta(repositorio.superponer_agregados([sesion]))[0] if sesion else None
+
+def codificar_cursor(token: Optional[str]) -> Optional[str]:
+    """Cursor opaco para el cliente: modo de almacenamiento + token del repositorio (continuation u offset)."""
+    if token is None:
+        return None
+    return base64.urlsafe_b64encode(json.dumps({"m": settings.STORAGE_MODE, "t": token}).encode()).decode()
+
+def decodificar_cursor(cursor: Optional[str]) -> Optional[str]:
+    """Token del repositorio a partir del cursor recibido; ValueError si no es válido o es de otro modo."""
+    if not cursor:
+        return None
+    try:
+        datos = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (ValueError, TypeError):
+        raise ValueError("Cursor inválido")
+    if not isinstance(datos, dict) or datos.get("m") != settings.STORAGE_MODE or not isinstance(datos.get("t"), str):
+        raise ValueError("Cursor inválido")
+    return datos["t"]
+
+def _respuesta_pagina(sesiones: List[dict], siguiente: Optional[str], resumen: bool = False) -> dict:
+    # Los resúmenes ya vienen con la primera ocurrencia resuelta (resumen_sesion)
+    return {"items": sesiones if resumen else preparar_respuesta(sesiones), "next_cursor": codificar_cursor(siguiente)}
+
+def list_pagina(owner_email: Optional[str], tipos: Optional[List[str]], limite: int, cursor: Optional[str] = None, resumen: bool = False) -> dict:
+    """Una página del listado (más recientes primero) y el cursor de la siguiente (None al final)."""
+    sesiones, siguiente = repositorio.listar_sesiones_pagina(owner_email, tipos, limite, decodificar_cursor(cursor), resumen)
+    return _respuesta_pagina(repositorio.superponer_agregados(sesiones), siguiente, resumen)
+
+def list_admin_pagina(admin_email: str, limite: int, cursor: Optional[str] = None, resumen: bool = False) -> dict:
+    sesiones, siguiente = repositorio.listar_sesiones_admin_pagina(admin_email, limite, decodificar_cursor(cursor), resumen)
+    return _respuesta_pagina(repositorio.superponer_agregados(sesiones), siguiente, resumen)
+
+def list_por_fechas(desde: str, hasta: str) -> List[dict]:
+    """Sesiones (documento crudo, sin herencia resuelta) con alguna ocurrencia entre `desde` y `hasta` (YYYY-MM-DD)."""
+    return repositorio.listar_sesiones_por_fechas(desde, hasta)
 
 def delete(sesion_id: str) -> bool:
     from storage import get_storage_adapter
     sesion = get_by_id(sesion_id)
     if not sesion: return False
     
-    if settings.STORAGE_MODE == "cosmosdb" and COSMOS_AVAILABLE:
-        # Limpiar por actividad_id = sesion_id (registros donde no hay ocurrencia específica)
-        cosmos_db.eliminar_asistentes_por_sesion(sesion_id)
-        # Limpiar también por cada ocurrencia individualmente (sesion_id = oc_id)
-        for oc in sesion.get('ocurrencias', []):
-            oc_id = oc.get('id')
-            if oc_id:
-                cosmos_db.eliminar_asistentes_por_sesion(oc_id)
-        cosmos_db.eliminar_sesion(sesion_id)
-    else:
-        from services.asistentes import delete_asistentes_by_sesion
-        delete_asistentes_by_sesion(sesion_id)
-        
-        sesiones = load_sesiones()
-        new_sesiones = [s for s in sesiones if s['id'] != sesion_id]
-        if len(new_sesiones) == len(sesiones): return False
-        save_sesiones(new_sesiones)
+    # Limpiar por actividad_id = sesion_id (registros donde no hay ocurrencia específica)
+    repositorio.eliminar_asistentes_por_sesion(sesion_id)
+    # Limpiar también por cada ocurrencia individualmente (sesion_id = oc_id)
+    for oc in sesion.get('ocurrencias', []):
+        oc_id = oc.get('id')
+        if oc_id:
+            repositorio.eliminar_asistentes_por_sesion(oc_id, actividad_id=sesion_id)
+    if not repositorio.eliminar_sesion(sesion_id): return False
+    eliminar_tokens(sesion.get('ocurrencias', []))
+    token_index.eliminar_sesion(sesion)
+    cache_publico.invalidar_sesion(sesion_id)
         
     if settings.BLOB_STORAGE_MODE == "azure":
         storage = get_storage_adapter()
@@ -133,52 +148,77 @@ def delete(sesion_id: str) -> bool:
             storage.delete_training_folder(sesion.get('created_by', ''), sesion.get('tema', ''))
     return True
 
-def increment_asistentes(sesion_id: str, ocurrencia_id: Optional[str] = None):
-    """Incrementa el contador de asistentes de una sesión y/o ocurrencia específica"""
-    if settings.STORAGE_MODE == "cosmosdb" and COSMOS_AVAILABLE:
-        sesion = cosmos_db.obtener_sesion(sesion_id)
-        if not sesion: return
-        
-        # Incrementar total global
-        sesion['total_asistentes'] = sesion.get('total_asistentes', 0) + 1
-        
-        # Si hay ocurrencia_id, buscarla e incrementar
-        encontrado = False
-        if ocurrencia_id:
-            for oc in sesion.get('ocurrencias', []):
-                if oc.get('id') == ocurrencia_id:
-                    oc['total_asistentes'] = oc.get('total_asistentes', 0) + 1
-                    encontrado = True
-                    break
-                    
-        # Si no se pasó ocurrencia_id o no se encontró (es la principal)
-        if not encontrado:
-            sesion['total_asistentes_principal'] = sesion.get('total_asistentes_principal', 0) + 1
-            # También sincronizar la primera ocurrencia si existe (suelen ser lo mismo)
-            if sesion.get('ocurrencias') and len(sesion['ocurrencias']) > 0:
-                oc0 = sesion['ocurrencias'][0]
-                oc0['total_asistentes'] = oc0.get('total_asistentes', 0) + 1
-                    
-        cosmos_db.actualizar_sesion(sesion_id, sesion)
-    else:
-        # Modo JSON
-        sesiones = load_sesiones()
-        for s in sesiones:
-            if s['id'] == sesion_id:
-                s['total_asistentes'] = s.get('total_asistentes', 0) + 1
-                
-                encontrado = False
-                if ocurrencia_id:
-                    for oc in s.get('ocurrencias', []):
-                        if oc.get('id') == ocurrencia_id:
-                            oc['total_asistentes'] = oc.get('total_asistentes', 0) + 1
-                            encontrado = True
-                            break
-                
-                if not encontrado:
-                    s['total_asistentes_principal'] = s.get('total_asistentes_principal', 0) + 1
-                    if s.get('ocurrencias') and len(s['ocurrencias']) > 0:
-                        s['ocurrencias'][0]['total_asistentes'] = s['ocurrencias'][0].get('total_asistentes', 0) + 1
-                        
-                save_sesiones(sesiones)
-                break
+def increment_asistentes(sesion_id: str, ocurrencia_id: Optional[str] = None, delta: int = 1, ocurrencias: Optional[List[dict]] = None):
+    """
+    Incrementa el contador de asistentes de una sesión y/o ocurrencia específica.
+    Cada implementación lo aplica sin carreras (patch_item en CosmosDB, UPDATE en SQLite, bajo lock
+    en JSON y memoria); `ocurrencias` evita releer la sesión en CosmosDB.
+    """
+    repositorio.incrementar_contadores(sesion_id, ocurrencia_id, delta, ocurrencias)
+
+# ========== VARIANTES ASYNC (azure.cosmos.aio) ==========
+# Sin cliente asíncrono abierto (almacenamiento local o scripts) delegan en la versión síncrona.
+
+async def _superponer_agregados_async(adb, sesiones: List[dict]) -> List[dict]:
+    # Contadores del change feed (CHANGE_FEED_AGREGADOS) sobre los documentos de sesión
+    if adb.agregados is None:
+        return sesiones
+    return await adb.agregados.superponer_sesiones(sesiones)
+
+async def list_all_async(owner_email: Optional[str] = None, tipos: Optional[List[str]] = None) -> List[dict]:
+    adb = get_async_cosmos_db()
+    if not adb:
+        return list_all(owner_email, tipos)
+    return preparar_respuesta(await _superponer_agregados_async(adb, await adb.sesiones.listar(owner_email, tipos)))
+
+async def list_admin_async(admin_email: str) -> List[dict]:
+    adb = get_async_cosmos_db()
+    if not adb:
+        return list_admin(admin_email)
+    return preparar_respuesta(await _superponer_agregados_async(adb, await adb.sesiones.listar_admin(admin_email)))
+
+async def list_resumen_async(owner_email: Optional[str] = None, tipos: Optional[List[str]] = None) -> List[dict]:
+    adb = get_async_cosmos_db()
+    if not adb:
+        return list_resumen(owner_email, tipos)
+    return await _superponer_agregados_async(adb, await adb.sesiones.listar(owner_email, tipos, resumen=True))
+
+async def list_admin_resumen_async(admin_email: str) -> List[dict]:
+    adb = get_async_cosmos_db()
+    if not adb:
+        return list_admin_resumen(admin_email)
+    return await _superponer_agregados_async(adb, await adb.sesiones.listar_admin(admin_email, resumen=True))
+
+async def list_pagina_async(owner_email: Optional[str], tipos: Optional[List[str]], limite: int, cursor: Optional[str] = None, resumen: bool = False) -> dict:
+    adb = get_async_cosmos_db()
+    if not adb:
+        return list_pagina(owner_email, tipos, limite, cursor, resumen)
+    sesiones, siguiente = await adb.sesiones.listar_pagina(owner_email, tipos, limite, decodificar_cursor(cursor), resumen)
+    return _respuesta_pagina(await _superponer_agregados_async(adb, sesiones), siguiente, resumen)
+
+async def list_admin_pagina_async(admin_email: str, limite: int, cursor: Optional[str] = None, resumen: bool = False) -> dict:
+    adb = get_async_cosmos_db()
+    if not adb:
+        return list_admin_pagina(admin_email, limite, cursor, resumen)
+    sesiones, siguiente = await adb.sesiones.listar_admin_pagina(admin_email, limite, decodificar_cursor(cursor), resumen)
+    return _respuesta_pagina(await _superponer_agregados_async(adb, sesiones), siguiente, resumen)
+
+async def list_por_fechas_async(desde: str, hasta: str) -> List[dict]:
+    adb = get_async_cosmos_db()
+    if not adb:
+        return list_por_fechas(desde, hasta)
+    return await adb.sesiones.listar_por_fechas(desde, hasta)
+
+async def get_by_id_async(sesion_id: str) -> Optional[dict]:
+    adb = get_async_cosmos_db()
+    if not adb:
+        return get_by_id(sesion_id)
+    sesion = await adb.sesiones.obtener_por_id(sesion_id)
+    return preparar_respuesta(await _superponer_agregados_async(adb, [sesion]))[0] if sesion else None
+
+async def increment_asistentes_async(sesion_id: str, ocurrencia_id: Optional[str] = None, delta: int = 1, ocurrencias: Optional[List[dict]] = None):
+    adb = get_async_cosmos_db()
+    if not adb:
+        # En modo JSON los deltas de un flush del agregador se escriben en el mismo lote
+        return await repositorio.ejecutar_escritura("sesiones", lambda: increment_asistentes(sesion_id, ocurrencia_id, delta, ocurrencias))
+    await adb.sesiones.incrementar_contadores(sesion_id, ocurrencia_id, delta, ocurrencias)
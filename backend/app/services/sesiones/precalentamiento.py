@@ -0,0 +1,154 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+from fastapi import HTTPException
+
+from core.config import settings
+from core.metrics import metricas
+from db.aio.cosmos_client import ejecutar_sync
+from .crud import list_por_fechas_async
+from .public_cache import cache_publico
+from .token_index import token_index
+from .utils import generar_qr_dinamico, get_colombia_now
+
+# Duración asumida cuando la ocurrencia no tiene hora_fin
+DURACION_POR_DEFECTO = timedelta(hours=2)
+
+
+def ventana_ocurrencia(oc: dict, sesion: dict, tz) -> Optional[Tuple[datetime, datetime]]:
+    """Inicio y fin (hora Colombia) de la ocurrencia; None si no tiene fecha/hora válidas."""
+    fecha = oc.get('fecha')
+    hora_inicio = oc.get('hora_inicio') or sesion.get('hora_inicio')
+    if not fecha or not hora_inicio:
+        return None
+    try:
+        inicio = datetime.strptime(f"{fecha} {hora_inicio[:5]}", "%Y-%m-%d %H:%M").replace(tzinfo=tz)
+    except ValueError:
+        return None
+    hora_fin = oc.get('hora_fin') or sesion.get('hora_fin')
+    try:
+        fin = datetime.strptime(f"{fecha} {hora_fin[:5]}", "%Y-%m-%d %H:%M").replace(tzinfo=tz) if hora_fin else inicio + DURACION_POR_DEFECTO
+    except ValueError:
+        fin = inicio + DURACION_POR_DEFECTO
+    if fin <= inicio:
+        fin += timedelta(days=1)
+    return inicio, fin
+
+
+class Precalentador:
+    """
+    Tarea de fondo que, cada `intervalo_s`, busca las ocurrencias que empiezan en los próximos
+    `ventana_min` minutos (o que están en curso) y deja listas sus entradas en el índice de tokens,
+    la caché pública (vista resuelta + payload + ETag) y la caché de imágenes QR, para que la primera
+    ola de escaneos no pase por el camino frío. Se inicia y se detiene en el lifespan.
+    """
+
+    def __init__(self, intervalo_s: int, ventana_min: int):
+        self.intervalo = intervalo_s
+        self.ventana = timedelta(minutes=ventana_min)
+        self._evento: Optional[asyncio.Event] = None
+        self._tarea: Optional[asyncio.Task] = None
+        self._detener = False
+        self._ultima: dict = {}
+        self._marca_anterior = 0
+
+    @property
+    def activo(self) -> bool:
+        return self._tarea is not None and not self._tarea.done()
+
+    async def precalentar(self) -> int:
+        """Ejecuta una pasada; devuelve cuántas ocurrencias quedaron precalentadas."""
+        from . import _resolver_token
+
+        t0 = time.time()
+        ahora = get_colombia_now()
+        # Desde ayer para cubrir ocurrencias que cruzan la medianoche
+        desde = (ahora - timedelta(days=1)).strftime("%Y-%m-%d")
+        hasta = (ahora + self.ventana).strftime("%Y-%m-%d")
+        # Una sesión modificada o borrada mientras se lee la lista no se repone con la versión leída
+        marca = cache_publico.marca()
+        sesiones = await list_por_fechas_async(desde, hasta)
+
+        if not token_index.construido:
+            await ejecutar_sync(token_index.asegurar_construido)
+
+        vigentes = set()
+        ocurrencias = 0
+        for sesion in sesiones:
+            for oc in sesion.get('ocurrencias', []):
+                token = oc.get('token')
+                ventana = ventana_ocurrencia(oc, sesion, ahora.tzinfo)
+                if not token or not ventana or not (ventana[0] - self.ventana <= ahora <= ventana[1]):
+                    continue
+                try:
+                    merged = _resolver_token(sesion, token)
+                except HTTPException:
+                    # Inactiva o expirada: no hay nada que servir desde caché
+                    continue
+                token_index.registrar(token, sesion['id'], oc.get('id'))
+                # Se refresca en cada pasada: el TTL cubre dos intervalos para no dejar huecos fríos
+                cache_publico.guardar(token, merged, ttl=max(cache_publico.ttl, 2 * self.intervalo), desde=marca)
+                if oc.get('link'):
+                    generar_qr_dinamico(oc['link'])
+                cache_publico.marcar_precalentada(sesion['id'], token)
+                vigentes.add(sesion['id'])
+                ocurrencias += 1
+
+        cache_publico.olvidar_precalentadas(vigentes)
+        # Se conservan las de la última pasada: una lectura pública en curso puede tener una marca anterior
+        cache_publico.olvidar_invalidaciones(self._marca_anterior)
+        self._marca_anterior = marca
+        duracion = time.time() - t0
+        self._ultima = {
+            "ejecutada": ahora.isoformat(),
+            "ocurrencias": ocurrencias,
+            "sesiones": len(vigentes),
+            "duracion_s": round(duracion, 4)
+        }
+        metricas.observar("precalentamiento.duracion_s", duracion)
+        metricas.gauge("precalentamiento.ocurrencias", ocurrencias)
+        if ocurrencias:
+            print(f"🔥 Precalentadas {ocurrencias} ocurrencias de {len(vigentes)} sesiones en {duracion:.4f}s")
+        return ocurrencias
+
+    async def _bucle(self):
+        while not self._detener:
+            try:
+                await self.precalentar()
+            except Exception as e:
+                print(f"⚠️ Error en precalentamiento: {type(e).__name__}: {e}")
+                metricas.incr("precalentamiento.errores")
+            try:
+                await asyncio.wait_for(self._evento.wait(), timeout=self.intervalo)
+            except asyncio.TimeoutError:
+                pass
+
+    def iniciar(self):
+        if self.activo or self.intervalo <= 0:
+            return
+        self._detener = False
+        self._evento = asyncio.Event()
+        self._tarea = asyncio.create_task(self._bucle())
+
+    async def detener(self):
+        if self._tarea:
+            self._detener = True
+            self._evento.set()
+            await self._tarea
+            self._tarea = None
+
+    def stats(self) -> dict:
+        return {
+            "activo": self.activo,
+            "ventana_min": int(self.ventana.total_seconds() // 60),
+            "ultima_pasada": self._ultima,
+            "sesiones": cache_publico.uso_precalentadas()
+        }
+
+
+precalentador = Precalentador(
+    intervalo_s=settings.PREWARM_INTERVAL_S,
+    ventana_min=settings.PREWARM_WINDOW_MIN
+)
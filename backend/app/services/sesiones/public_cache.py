@@ -0,0 +1,169 @@
+import hashlib
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Optional
+
+from core.config import settings
+from core.metrics import metricas
+
+# Campos que ve el asistente al escanear el QR (SesionPublicResponse)
+CAMPOS_PUBLICOS = [
+    'tema', 'fecha', 'facilitador_entidad', 'responsable', 'cargo_responsable', 'contenido',
+    'hora_inicio', 'hora_fin', 'actividad', 'tipo_actividad', 'dirigido_a', 'modalidad'
+]
+
+
+class EntradaPublica:
+    __slots__ = ('sesion', 'payload', 'etag', 'sesion_id', 'expira', 'expiry_token')
+
+    def __init__(self, sesion: dict, payload: dict, etag: str, sesion_id: str, expira: float, expiry_token: Optional[datetime]):
+        # Vista combinada sesión+ocurrencia ya validada (la que devuelve get_sesion_by_token)
+        self.sesion = sesion
+        self.payload = payload
+        self.etag = etag
+        self.sesion_id = sesion_id
+        self.expira = expira
+        self.expiry_token = expiry_token
+
+    def max_age(self) -> int:
+        """Segundos que el navegador puede reutilizar la respuesta sin revalidar (nunca más allá de la expiración del token)."""
+        max_age = settings.PUBLIC_INFO_MAX_AGE
+        if self.expiry_token:
+            restante = int((self.expiry_token - datetime.now(self.expiry_token.tzinfo)).total_seconds())
+            max_age = min(max_age, max(0, restante))
+        return max_age
+
+
+def _parsear_expiry(raw) -> Optional[datetime]:
+    if not isinstance(raw, str) or not raw:
+        return None
+    try:
+        return datetime.fromisoformat(raw.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+
+
+def calcular_etag(token: str, version: str) -> str:
+    return '"' + hashlib.sha256(f"{token}|{version}".encode()).hexdigest()[:32] + '"'
+
+
+def etag_coincide(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    # If-None-Match usa comparación débil: se ignora el prefijo W/
+    candidatos = [c.strip() for c in if_none_match.split(',')]
+    return any((c[2:] if c.startswith('W/') else c) == etag for c in candidatos)
+
+
+class CachePublico:
+    """
+    Caché en memoria por token de la vista resuelta (sesión+ocurrencia), su payload público
+    (SesionPublicResponse) y el ETag. Se invalida desde las operaciones que modifican la sesión
+    o sus ocurrencias; el TTL (PUBLIC_INFO_CACHE_TTL) acota la desactualización entre réplicas, que no comparten invalidaciones.
+    Solo se guardan tokens válidos: inexistentes/inactivos/expirados siguen el camino normal.
+    Solo sirve la lectura pública (GET con ETag): los registros validan el token contra la base.
+    Quien lee la sesión antes de guardar toma una `marca()`; si la sesión se invalidó después,
+    guardar(..., desde=marca) descarta la entrada en lugar de reponer la versión vieja.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._entradas: Dict[str, EntradaPublica] = {}
+        # Aciertos por sesión precalentada: sesion_id -> {"hits", "misses"}; token -> sesion_id
+        self._uso: Dict[str, Dict[str, int]] = {}
+        self._tokens_precalentados: Dict[str, str] = {}
+        # Contador de invalidaciones y última invalidación de cada sesión (ver marca())
+        self._generacion = 0
+        self._invalidada_en: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _anotar(self, token: str, acierto: bool):
+        metricas.incr("cache_publico.hits" if acierto else "cache_publico.misses")
+        sesion_id = self._tokens_precalentados.get(token)
+        if sesion_id and sesion_id in self._uso:
+            self._uso[sesion_id]["hits" if acierto else "misses"] += 1
+
+    def obtener(self, token: str) -> Optional[EntradaPublica]:
+        entrada = self._entradas.get(token)
+        if entrada is not None and time.monotonic() > entrada.expira:
+            with self._lock:
+                self._entradas.pop(token, None)
+            entrada = None
+        self._anotar(token, entrada is not None)
+        return entrada
+
+    def marca(self) -> int:
+        """Generación de invalidaciones actual; se toma antes de leer la sesión que se va a guardar."""
+        return self._generacion
+
+    def guardar(self, token: str, sesion: dict, ttl: Optional[float] = None, desde: Optional[int] = None) -> EntradaPublica:
+        """
+        Construye y guarda la entrada a partir de la sesión combinada que devuelve get_sesion_by_token.
+        Con `desde` (marca tomada antes de la lectura) no se guarda si la sesión se invalidó después;
+        la entrada se devuelve igual para responder esta petición.
+        """
+        payload = {c: sesion.get(c) for c in CAMPOS_PUBLICOS}
+        expiry_token = _parsear_expiry(sesion.get('token_expiry'))
+        expira = time.monotonic() + (ttl or self.ttl)
+        if expiry_token:
+            restante = (expiry_token - datetime.now(expiry_token.tzinfo)).total_seconds()
+            expira = min(expira, time.monotonic() + max(0.0, restante))
+        entrada = EntradaPublica(
+            sesion=sesion,
+            payload=payload,
+            etag=calcular_etag(token, sesion.get('_version') or sesion.get('updated_at') or ''),
+            sesion_id=sesion.get('_actividad_id', sesion.get('id')),
+            expira=expira,
+            expiry_token=expiry_token
+        )
+        with self._lock:
+            if desde is not None and self._invalidada_en.get(entrada.sesion_id, 0) > desde:
+                metricas.incr("cache_publico.descartadas")
+                return entrada
+            self._entradas[token] = entrada
+        return entrada
+
+    def olvidar_invalidaciones(self, hasta: int):
+        """Descarta las invalidaciones anteriores a `hasta` (ninguna lectura en curso las necesita)."""
+        with self._lock:
+            self._invalidada_en = {s: g for s, g in self._invalidada_en.items() if g > hasta}
+
+    def invalidar_sesion(self, sesion_id: str):
+        with self._lock:
+            self._generacion += 1
+            self._invalidada_en[sesion_id] = self._generacion
+            for token in [t for t, e in self._entradas.items() if e.sesion_id == sesion_id]:
+                self._entradas.pop(token, None)
+
+    def invalidar_token(self, token: Optional[str]):
+        if not token:
+            return
+        with self._lock:
+            self._entradas.pop(token, None)
+
+    def marcar_precalentada(self, sesion_id: str, token: str):
+        with self._lock:
+            self._uso.setdefault(sesion_id, {"hits": 0, "misses": 0})
+            self._tokens_precalentados[token] = sesion_id
+
+    def olvidar_precalentadas(self, vigentes: set):
+        """Deja de seguir las sesiones que salieron de la ventana de precalentamiento."""
+        with self._lock:
+            self._uso = {s: u for s, u in self._uso.items() if s in vigentes}
+            self._tokens_precalentados = {t: s for t, s in self._tokens_precalentados.items() if s in vigentes}
+
+    def uso_precalentadas(self) -> Dict[str, dict]:
+        resultado = {}
+        for sesion_id, uso in list(self._uso.items()):
+            total = uso["hits"] + uso["misses"]
+            resultado[sesion_id] = {**uso, "hit_rate": round(uso["hits"] / total, 4) if total else None}
+        return resultado
+
+    def stats(self) -> dict:
+        return {"entradas": len(self._entradas), "ttl_s": self.ttl}
+
+
+cache_publico = CachePublico(ttl=settings.PUBLIC_INFO_CACHE_TTL)
@@ -1,27 +0,0 @@
-import json
-import os
-from pathlib import Path
-from typing import List
-
-BASE_DIR = Path(__file__).parent.parent.parent
-DATA_DIR = BASE_DIR / "data"
-DATA_FILE = DATA_DIR / "sesiones.json"
-
-def ensure_data_file():
-    os.makedirs(DATA_DIR, exist_ok=True)
-    if not os.path.exists(DATA_FILE):
-        with open(DATA_FILE, 'w', encoding='utf-8') as f:
-            json.dump([], f)
-
-def load_sesiones() -> List[dict]:
-    ensure_data_file()
-    try:
-        with open(DATA_FILE, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    except:
-        return []
-
-def save_sesiones(sesiones: List[dict]):
-    ensure_data_file()
-    with open(DATA_FILE, 'w', encoding='utf-8') as f:
-        json.dump(sesiones, f, ensure_ascii=False, indent=2)
@@ -0,0 +1,113 @@
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from core.config import settings
+from db.repositorio import get_repositorio
+
+repositorio = get_repositorio()
+
+# Límite de entradas negativas para que un escaneo masivo de tokens aleatorios no crezca sin control
+MAX_NEGATIVOS = 10000
+
+
+class TokenIndex:
+    """
+    Índice en memoria token -> (sesion_id, ocurrencia_id).
+    Se construye de forma perezosa en la primera búsqueda y se mantiene al día
+    desde las operaciones de sesiones/ocurrencias. Guarda también entradas
+    negativas con TTL corto para tokens que no existen.
+    """
+
+    def __init__(self, negative_ttl: float):
+        self.negative_ttl = negative_ttl
+        self._entradas: Dict[str, Tuple[str, str]] = {}
+        self._negativos: Dict[str, float] = {}
+        self._construido = False
+        self._lock = threading.Lock()
+
+    def _cargar(self):
+        return repositorio.listar_tokens()
+
+    @property
+    def construido(self) -> bool:
+        return self._construido
+
+    def asegurar_construido(self):
+        if self._construido:
+            return
+        with self._lock:
+            if self._construido:
+                return
+            t0 = time.time()
+            filas = self._cargar()
+            for f in filas:
+                if f.get('token'):
+                    self._entradas[f['token']] = (f['sesion_id'], f['ocurrencia_id'])
+            self._construido = True
+            print(f"✅ Índice de tokens construido: {len(self._entradas)} tokens en {time.time()-t0:.4f}s")
+
+    def buscar(self, token: str) -> Optional[Tuple[str, str]]:
+        return self._entradas.get(token)
+
+    def es_negativo(self, token: str) -> bool:
+        expira = self._negativos.get(token)
+        if expira is None:
+            return False
+        if time.monotonic() > expira:
+            self._negativos.pop(token, None)
+            return False
+        return True
+
+    def marcar_negativo(self, token: str):
+        with self._lock:
+            if len(self._negativos) >= MAX_NEGATIVOS:
+                ahora = time.monotonic()
+                self._negativos = {t: e for t, e in self._negativos.items() if e > ahora}
+                if len(self._negativos) >= MAX_NEGATIVOS:
+                    self._negativos.clear()
+            self._negativos[token] = time.monotonic() + self.negative_ttl
+
+    def registrar(self, token: str, sesion_id: str, ocurrencia_id: str):
+        if not token:
+            return
+        with self._lock:
+            self._entradas[token] = (sesion_id, ocurrencia_id)
+            self._negativos.pop(token, None)
+
+    def registrar_sesion(self, sesion: dict):
+        for oc in sesion.get('ocurrencias', []):
+            self.registrar(oc.get('token'), sesion['id'], oc.get('id'))
+
+    def eliminar(self, token: str):
+        if not token:
+            return
+        with self._lock:
+            self._entradas.pop(token, None)
+
+    def eliminar_sesion(self, sesion: dict):
+        for oc in sesion.get('ocurrencias', []):
+            self.eliminar(oc.get('token'))
+
+    def stats(self) -> dict:
+        return {"tokens": len(self._entradas), "negativos": len(self._negativos), "construido": self._construido}
+
+
+token_index = TokenIndex(negative_ttl=settings.TOKEN_NEGATIVE_CACHE_TTL)
+
+
+def persistir_tokens(sesion_id: str, ocurrencias: list):
+    """Escribe/actualiza los documentos del contenedor de tokens (solo CosmosDB; en el resto no hace nada)."""
+    try:
+        repositorio.guardar_tokens(sesion_id, ocurrencias)
+    except Exception as e:
+        # La resolución cae a la consulta completa si falta el documento, así que no bloqueamos la operación
+        print(f"⚠️ No se pudo persistir tokens de la sesión {sesion_id}: {e}")
+
+
+def eliminar_tokens(ocurrencias: list):
+    """Elimina los documentos del contenedor de tokens de las ocurrencias dadas (solo CosmosDB)."""
+    try:
+        repositorio.eliminar_tokens(ocurrencias)
+    except Exception as e:
+        print(f"⚠️ No se pudo eliminar tokens: {e}")
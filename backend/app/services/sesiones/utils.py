@@ -1,4 +1,5 @@
 import qrcode
+from functools import lru_cache
 from io import BytesIO
 from datetime import datetime, timedelta, timezone
 from core.config import settings
@@ -7,9 +8,11 @@ def get_colombia_now() -> datetime:
     """Retorna la fecha y hora actual en Colombia (UTC-5)"""
     return datetime.now(timezone(timedelta(hours=-5)))
 
+@lru_cache(maxsize=settings.QR_CACHE_SIZE)
 def generar_qr_dinamico(link: str) -> bytes:
     """
     Genera un código QR dinámicamente y retorna los bytes de la imagen.
+    El resultado depende solo del link, así que se cachea (LRU) y el precalentamiento lo deja listo.
     """
     qr = qrcode.QRCode(
         version=1,
@@ -2,13 +2,13 @@ import sys
 from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent))
 
-from db.cosmos_client import get_cosmos_db
+from db.repositorio import get_repositorio
 from datetime import datetime
 import uuid
 
 class UsuarioService:
     def __init__(self):
-        self.cosmos_db = get_cosmos_db()
+        self.repositorio = get_repositorio()
     
     def registrar_o_actualizar_usuario(self, user_id: str, nombre: str):
         """Registrar un usuario nuevo o actualizar su última sesión"""
@@ -26,7 +26,7 @@ class UsuarioService:
                 "fecha_ingreso": datetime.utcnow().isoformat(),
                 "formularios_creados": 0
             }
-            return self.cosmos_db.crear_usuario(usuario_data)
+            return self.repositorio.crear_usuario(usuario_data)
     
     def crear_usuario(self, nombre: str, rol: str = "Usuario"):
         """Crear un nuevo usuario del sistema manualmente"""
@@ -38,30 +38,30 @@ class UsuarioService:
             "fecha_ingreso": datetime.utcnow().isoformat(),
             "formularios_creados": 0
         }
-        return self.cosmos_db.crear_usuario(usuario_data)
+        return self.repositorio.crear_usuario(usuario_data)
     
     def listar_usuarios(self):
         """Listar todos los usuarios del sistema"""
-        return self.cosmos_db.listar_usuarios()
+        return self.repositorio.listar_usuarios()
     
     def obtener_usuario_por_id(self, usuario_id: str):
         """Obtener un usuario por ID"""
-        return self.cosmos_db.obtener_usuario_por_id(usuario_id)
+        return self.repositorio.obtener_usuario_por_id(usuario_id)
     
     def obtener_usuario_por_email(self, email: str):
         """Obtener un usuario por email (mantener por compatibilidad)"""
-        return self.cosmos_db.obtener_usuario_por_email(email)
+        return self.repositorio.obtener_usuario_por_email(email)
     
     def actualizar_usuario(self, usuario_id: str, **kwargs):
         """Actualizar un usuario del sistema"""
         update_data = {k: v for k, v in kwargs.items() if v is not None}
         if update_data:
-            return self.cosmos_db.actualizar_usuario(usuario_id, update_data)
+            return self.repositorio.actualizar_usuario(usuario_id, update_data)
         return None
     
     def eliminar_usuario(self, usuario_id: str):
         """Eliminar un usuario del sistema"""
-        return self.cosmos_db.eliminar_usuario(usuario_id)
+        return self.repositorio.eliminar_usuario(usuario_id)
     
     def obtener_rol_usuario(self, usuario_id: str):
         """Obtener el rol de un usuario"""
@@ -82,6 +82,9 @@ class UsuarioService:
     
     def incrementar_formularios_creados(self, usuario_id: str):
         """Incrementar el contador de formularios creados por un usuario"""
+        if self.repositorio.contadores_derivados:
+            # Lo calcula el consumidor del change feed de sesiones
+            return 0
         usuario = self.obtener_usuario_por_id(usuario_id)
         if usuario:
             contador_actual = usuario.get('formularios_creados', 0)
@@ -91,6 +94,8 @@ class UsuarioService:
     
     def decrementar_formularios_creados(self, usuario_id: str):
         """Decrementar el contador de formularios creados por un usuario"""
+        if self.repositorio.contadores_derivados:
+            return 0
         usuario = self.obtener_usuario_por_id(usuario_id)
         if usuario:
             contador_actual = usuario.get('formularios_creados', 0)
@@ -0,0 +1,39 @@
+"""
+Pasa a formato anual (ASISTENCIAS_POR_ANIO) a todas las personas del contenedor asistentes que aún
+guardan la lista completa de asistencias en su documento: las asistencias se escriben en un documento
+por año ("<cédula>:<año>") y la persona queda con sus datos de contacto y el resumen.
+
+Con el flag activo las personas también se migran solas al registrarles una asistencia; este script
+migra las demás. Es idempotente: si se interrumpe, al volver a correrlo sigue con las que falten.
+Conviene aplicar antes la indexación (python aplicar_indexacion.py --aplicar) para /tipo y /cedula.
+
+Uso:
+    python migrar_asistencias_por_anio.py
+"""
+
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / "app"))
+
+from core.config import settings
+from db.cosmos_client import get_cosmos_db
+
+if settings.STORAGE_MODE != "cosmosdb":
+    print("❌ Error: las asistencias por año solo aplican con STORAGE_MODE=cosmosdb")
+    exit(1)
+
+if not settings.ASISTENCIAS_POR_ANIO:
+    print("❌ Error: activar ASISTENCIAS_POR_ANIO=true antes de migrar (la aplicación debe leer el formato anual)")
+    exit(1)
+
+cosmos_db = get_cosmos_db()
+if cosmos_db is None:
+    print("❌ Error: no se pudo conectar a CosmosDB")
+    exit(1)
+
+t0 = time.time()
+print("🔄 Migrando asistencias a documentos por año...")
+total = cosmos_db.asistentes.migrar_a_formato_anual()
+print(f"✅ {total} personas migradas en {time.time()-t0:.1f}s")
@@ -0,0 +1,93 @@
+"""
+Migra el contenedor asistentes para que cada persona esté en la partición de su cédula (id).
+
+Los repositorios leen a una persona con read_item(cedula, partition_key=cedula); si el contenedor
+se creó con otra partition key, los documentos cuyo valor no coincide con la cédula solo se
+encuentran con una consulta cross-partition de respaldo. Este script los reescribe en la partición
+correcta (fusionando asistencias si ya existe un documento ahí) y borra el original.
+
+Avanza por páginas y guarda un checkpoint en el contenedor configuracion después de cada una:
+si se interrumpe, al volver a correrlo continúa donde quedó. Al terminar se puede poner
+ASISTENTES_FALLBACK_CONSULTA=false para que un 404 cueste una sola lectura puntual.
+
+Uso:
+    python migrar_particion_asistentes.py [--simular] [--lote 100] [--reiniciar]
+"""
+
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / "app"))
+
+from core.config import settings
+from db.cosmos_client import get_cosmos_db
+
+CHECKPOINT_ID = "migracion_particion_asistentes"
+
+
+def argumento(nombre, defecto):
+    if nombre in sys.argv and sys.argv.index(nombre) + 1 < len(sys.argv):
+        return sys.argv[sys.argv.index(nombre) + 1]
+    return defecto
+
+
+if settings.STORAGE_MODE != "cosmosdb":
+    print("❌ Error: la migración de partition key solo aplica con STORAGE_MODE=cosmosdb")
+    exit(1)
+
+cosmos_db = get_cosmos_db()
+if cosmos_db is None:
+    print("❌ Error: no se pudo conectar a CosmosDB")
+    exit(1)
+
+simular = "--simular" in sys.argv
+lote = int(argumento("--lote", 100))
+
+particion = cosmos_db.asistentes.definicion_particion()
+rutas = particion.get("paths", [])
+if rutas == ["/id"]:
+    print("✅ El contenedor asistentes ya está particionado por /id: cada persona está en la partición de su cédula")
+    print("ℹ️ Se puede usar ASISTENTES_FALLBACK_CONSULTA=false")
+    exit(0)
+if len(rutas) != 1 or particion.get("kind", "Hash") != "Hash" or rutas[0].count("/") != 1:
+    print(f"❌ Error: partition key {rutas} ({particion.get('kind')}) no se puede migrar en el lugar; hay que copiar a un contenedor nuevo particionado por /id")
+    exit(1)
+campo = rutas[0][1:]
+
+checkpoint = None if "--reiniciar" in sys.argv else cosmos_db.configuracion.obtener_por_id(CHECKPOINT_ID)
+if checkpoint and checkpoint.get("completada"):
+    print(f"✅ Migración ya completada el {checkpoint.get('actualizado')} ({checkpoint.get('migrados', 0)} migrados). Usar --reiniciar para verificar de nuevo")
+    exit(0)
+checkpoint = checkpoint or {"continuation": None, "encontrados": 0, "migrados": 0, "fusionados": 0, "inicio": datetime.now(timezone.utc).isoformat()}
+if checkpoint.get("continuation"):
+    print(f"🔄 Continuando desde el checkpoint ({checkpoint['migrados']} migrados hasta ahora)")
+
+t0 = time.time()
+print(f"🔄 {'Simulando migración' if simular else 'Migrando'} de asistentes (partition key /{campo} -> cédula), lotes de {lote}...")
+while True:
+    conteo, continuation = cosmos_db.asistentes.migrar_particion(campo, checkpoint.get("continuation"), lote, simular=simular)
+    for clave in ("encontrados", "migrados", "fusionados"):
+        checkpoint[clave] = checkpoint.get(clave, 0) + conteo[clave]
+    checkpoint["migrados_pasada"] = checkpoint.get("migrados_pasada", 0) + conteo["migrados"]
+    # Mover documentos durante la consulta puede hacer que el continuation salte alguno:
+    # la migración termina con una pasada completa que ya no encuentra nada
+    terminada = continuation is None and checkpoint["migrados_pasada"] == 0
+    checkpoint["continuation"] = continuation
+    checkpoint["completada"] = terminada
+    checkpoint["actualizado"] = datetime.now(timezone.utc).isoformat()
+    if not simular:
+        cosmos_db.configuracion.actualizar(CHECKPOINT_ID, checkpoint)
+    print(f"   {checkpoint['encontrados']} fuera de partición, {checkpoint['migrados']} migrados ({checkpoint['fusionados']} fusionados) - {time.time()-t0:.1f}s")
+    if terminada or (continuation is None and simular):
+        break
+    if continuation is None:
+        print("🔁 Pasada completa; verificando que no quede ninguno...")
+        checkpoint["migrados_pasada"] = 0
+
+if simular:
+    print(f"📋 {checkpoint['encontrados']} personas por migrar (simulación, sin cambios)")
+else:
+    print(f"✅ Migración completada: {checkpoint['migrados']} personas reubicadas en {time.time()-t0:.1f}s")
+    print("ℹ️ Ya se puede usar ASISTENTES_FALLBACK_CONSULTA=false")
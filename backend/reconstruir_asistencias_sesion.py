@@ -0,0 +1,37 @@
+"""
+Materializa en el contenedor asistencias_sesion (vista por sesión, partición /actividad_id)
+todas las asistencias existentes en el contenedor asistentes.
+
+Se corre una vez al desplegar la vista y cada vez que haga falta repararla
+(es idempotente: cada entrada se escribe con upsert). Las asistencias nuevas se escriben en la vista
+desde el arranque; la aplicación la consulta recién con ASISTENCIAS_SESION_VISTA=true, que se activa
+después de correr este script.
+
+Uso:
+    python reconstruir_asistencias_sesion.py
+"""
+
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / "app"))
+
+from core.config import settings
+from db.cosmos_client import get_cosmos_db
+
+if settings.STORAGE_MODE != "cosmosdb":
+    print("❌ Error: la vista asistencias_sesion solo existe con STORAGE_MODE=cosmosdb")
+    exit(1)
+
+cosmos_db = get_cosmos_db()
+if cosmos_db is None:
+    print("❌ Error: no se pudo conectar a CosmosDB")
+    exit(1)
+
+t0 = time.time()
+print("🔄 Reconstruyendo vista asistencias_sesion...")
+total = cosmos_db.asistentes.reconstruir_vista()
+print(f"✅ {total} asistencias materializadas en {time.time()-t0:.1f}s")
+if not settings.ASISTENCIAS_SESION_VISTA:
+    print("ℹ️ Vista completa: activar ASISTENCIAS_SESION_VISTA=true para listar, contar y eliminar desde ella")
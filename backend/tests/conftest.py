@@ -0,0 +1,21 @@
+"""
+Configuración común de las pruebas: el paquete de la aplicación (app/) va en sys.path, como en los
+scripts de backend/, SESSION_SECRET tiene un valor de prueba y los modos JSON/SQLite escriben en un
+directorio temporal en lugar de app/data.
+
+Uso (desde backend/):
+    pip install -r requirements-dev.txt
+    python -m pytest
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "app"))
+
+_datos = tempfile.mkdtemp(prefix="formaciones-pruebas-")
+os.environ.setdefault("SESSION_SECRET", "pruebas-" + "x" * 40)
+os.environ.setdefault("JSON_DATA_DIR", _datos)
+os.environ.setdefault("SQLITE_PATH", os.path.join(_datos, "formaciones.db"))
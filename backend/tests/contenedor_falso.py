@@ -0,0 +1,80 @@
+"""Contenedor de CosmosDB en memoria para las pruebas de repositorios (sin Azure)."""
+
+import copy
+import uuid
+
+from azure.cosmos import exceptions
+
+ESCRITURAS = {"create", "upsert", "replace", "patch", "delete"}
+
+
+class ContenedorFalso:
+    """
+    Contenedor en memoria con la semántica de Cosmos que usan los repositorios (ETag, 404/409/412, patch).
+    `fallas` asocia una operación ("upsert", "patch", ...) a la lista de excepciones que lanzarán sus
+    próximas llamadas, una por llamada. Las consultas se registran y no devuelven nada.
+    """
+
+    def __init__(self, id: str = "asistentes"):
+        self.id = id
+        self.docs = {}
+        self.ops = []
+        self.fallas = {}
+
+    def _registrar(self, op, item):
+        self.ops.append((op, item))
+        pendientes = self.fallas.get(op)
+        if pendientes:
+            raise pendientes.pop(0)
+
+    def _guardar(self, body):
+        doc = copy.deepcopy(body)
+        doc["_etag"] = uuid.uuid4().hex
+        self.docs[doc["id"]] = doc
+        return copy.deepcopy(doc)
+
+    def read_item(self, item, partition_key, **kwargs):
+        self._registrar("read", item)
+        if item not in self.docs:
+            raise exceptions.CosmosResourceNotFoundError(status_code=404, message=item)
+        return copy.deepcopy(self.docs[item])
+
+    def create_item(self, body, **kwargs):
+        self._registrar("create", body["id"])
+        if body["id"] in self.docs:
+            raise exceptions.CosmosResourceExistsError(status_code=409, message=body["id"])
+        return self._guardar(body)
+
+    def upsert_item(self, body, **kwargs):
+        self._registrar("upsert", body["id"])
+        return self._guardar(body)
+
+    def replace_item(self, item, body, etag=None, match_condition=None, **kwargs):
+        self._registrar("replace", item)
+        if etag and self.docs[item]["_etag"] != etag:
+            raise exceptions.CosmosAccessConditionFailedError(status_code=412, message=item)
+        return self._guardar(body)
+
+    def patch_item(self, item, partition_key, patch_operations, **kwargs):
+        self._registrar("patch", item)
+        doc = copy.deepcopy(self.docs[item])
+        for op in patch_operations:
+            *ruta, campo = op["path"].strip("/").split("/")
+            destino = doc
+            for parte in ruta:
+                destino = destino.setdefault(parte, {})
+            destino[campo] = destino.get(campo, 0) + op["value"] if op["op"] == "incr" else op["value"]
+        return self._guardar(doc)
+
+    def delete_item(self, item, partition_key, **kwargs):
+        self._registrar("delete", item)
+        if item not in self.docs:
+            raise exceptions.CosmosResourceNotFoundError(status_code=404, message=item)
+        del self.docs[item]
+
+    def escrituras(self):
+        return [op for op in self.ops if op[0] in ESCRITURAS]
+
+    def query_items(self, query, parameters=None, **kwargs):
+        self.ops.append(("query", query.strip()))
+        return []
@@ -0,0 +1,198 @@
+import copy
+
+import pytest
+from azure.cosmos import exceptions
+
+from core.config import settings
+from core.exceptions import StorageUnavailableException
+from db.repositories.asistencias_anuales import (
+    TIPO_ASISTENCIAS, agrupar_por_anio, anio_actual, anio_de, anios_a_leer, componer_persona, es_formato_anual, id_anio,
+    resumen_anios
+)
+from db.repositories.asistentes_repo import AsistentesRepository
+
+from contenedor_falso import ContenedorFalso
+
+
+@pytest.fixture
+def contenedor(monkeypatch):
+    monkeypatch.setattr(settings, "ASISTENCIAS_POR_ANIO", True)
+    monkeypatch.setattr(settings, "ASISTENTES_FALLBACK_CONSULTA", False)
+    return ContenedorFalso()
+
+
+@pytest.fixture
+def repo(contenedor):
+    return AsistentesRepository(contenedor)
+
+
+def asistencia(sesion_id: str, fecha: str, actividad_id: str = None) -> dict:
+    return {"actividad_id": actividad_id or sesion_id, "sesion_id": sesion_id, "fecha_registro": fecha}
+
+
+def verificar_resumen(contenedor: ContenedorFalso, cedula: str):
+    """El resumen de la persona coincide con sus documentos por año."""
+    persona = contenedor.docs[cedula]
+    anios = {d["anio"]: d["asistencias"] for d in contenedor.docs.values() if d.get("tipo") == TIPO_ASISTENCIAS and d["cedula"] == cedula}
+    assert "asistencias" not in persona
+    assert persona["anios"] == {anio: len(lista) for anio, lista in anios.items()}
+    assert persona["total_asistencias"] == sum(persona["anios"].values())
+    assert persona["ultima_asistencia"] == max(a["fecha_registro"] for lista in anios.values() for a in lista)
+
+
+# ---------- funciones puras ----------
+
+def test_anio_de():
+    assert anio_de("2025-12-31T23:59:59") == "2025"
+    assert anio_de("") == "0000"
+    assert anio_de(None) == "0000"
+
+
+def test_anios_a_leer_incluye_el_actual_y_el_anterior():
+    actual = anio_actual()
+    anterior = str(int(actual) - 1)
+    assert anios_a_leer({"anios": {"2019": 2}}) == ["2019", anterior, actual]
+    assert anios_a_leer({"anios": {actual: 1}}) == [anterior, actual]
+
+
+def test_componer_persona_entre_anios():
+    persona = {"id": "10", "nombre": "Ana", "anios": {"2024": 1, "2025": 2, "2026": 1}}
+    anios = [
+        {"anio": "2026", "asistencias": [asistencia("D", "2026-01-02T09:00:00")]},
+        {"anio": "2024", "asistencias": [asistencia("A", "2024-05-01T10:00:00")]},
+        {"anio": "2025", "asistencias": [asistencia("C", "2025-12-31T10:00:00"), asistencia("B", "2025-03-01T10:00:00")]},
+    ]
+    compuesta = componer_persona(persona, anios)
+    assert [a["sesion_id"] for a in compuesta["asistencias"]] == ["A", "B", "C", "D"]
+    assert compuesta["nombre"] == "Ana" and compuesta["anios"] == persona["anios"]
+    # La persona original no se modifica y sigue reconociéndose como formato anual
+    assert "asistencias" not in persona
+    assert es_formato_anual(compuesta)
+
+
+def test_resumen_consistente_con_la_agrupacion():
+    asistencias = [asistencia("A", "2024-05-01"), asistencia("B", "2025-01-01"), asistencia("C", "2025-06-01")]
+    anios = agrupar_por_anio(asistencias)
+    assert {anio: [a["sesion_id"] for a in lista] for anio, lista in anios.items()} == {"2024": ["A"], "2025": ["B", "C"]}
+    assert resumen_anios(anios) == {"anios": {"2024": 1, "2025": 2}, "total_asistencias": 3, "ultima_asistencia": "2025-06-01"}
+    assert resumen_anios({}) == {"anios": {}, "total_asistencias": 0, "ultima_asistencia": ""}
+
+
+# ---------- repositorio ----------
+
+def test_duplicado_en_el_mismo_anio_no_escribe(repo, contenedor):
+    _, registrada = repo.registrar_asistencia({"cedula": "10", "nombre": "Ana", "fecha_registro": "2026-02-01T09:00:00"}, "S1")
+    assert registrada
+    contenedor.ops.clear()
+
+    persona, registrada = repo.registrar_asistencia({"cedula": "10", "fecha_registro": "2026-03-01T09:00:00"}, "S1")
+    assert not registrada
+    assert contenedor.escrituras() == []
+    assert [a["sesion_id"] for a in persona["asistencias"]] == ["S1"]
+    assert contenedor.docs["10"]["total_asistencias"] == 1
+    verificar_resumen(contenedor, "10")
+
+
+def test_duplicado_de_ocurrencia_del_anio_anterior(repo, contenedor):
+    """Una sesión que cruza el cambio de año ya tiene la asistencia en el documento del año anterior."""
+    datos = {"cedula": "10", "ocurrencia_id": "S1-oc1"}
+    assert repo.registrar_asistencia({**datos, "fecha_registro": "2025-12-31T22:00:00"}, "S1")[1]
+    contenedor.ops.clear()
+
+    _, registrada = repo.registrar_asistencia({**datos, "fecha_registro": "2026-01-01T01:00:00"}, "S1")
+    assert not registrada
+    assert contenedor.escrituras() == []
+    assert "10:2026" not in contenedor.docs
+
+
+def test_misma_sesion_otra_ocurrencia_se_registra(repo, contenedor):
+    repo.registrar_asistencia({"cedula": "10", "ocurrencia_id": "oc1", "fecha_registro": "2026-02-01T09:00:00"}, "S1")
+    _, registrada = repo.registrar_asistencia({"cedula": "10", "ocurrencia_id": "oc2", "fecha_registro": "2026-02-08T09:00:00"}, "S1")
+    assert registrada
+    assert contenedor.docs["10"]["anios"] == {"2026": 2}
+    verificar_resumen(contenedor, "10")
+
+
+def test_resumen_consistente_tras_pasar_a_formato_anual(repo, contenedor):
+    contenedor.docs["10"] = {"id": "10", "nombre": "Ana", "_etag": "e0", "asistencias": [
+        asistencia("A", "2024-05-01T10:00:00"),
+        asistencia("B", "2025-03-01T10:00:00"),
+        asistencia("b1", "2025-12-31T10:00:00", actividad_id="B"),
+    ]}
+    migrada = repo.pasar_a_formato_anual(copy.deepcopy(contenedor.docs["10"]))
+    assert migrada["nombre"] == "Ana" and es_formato_anual(migrada)
+    assert sorted(contenedor.docs) == ["10", "10:2024", "10:2025"]
+    verificar_resumen(contenedor, "10")
+    assert [a["sesion_id"] for a in repo.obtener_por_cedula("10")["asistencias"]] == ["A", "B", "b1"]
+
+    # Registrar después de migrar mantiene el resumen al día (incr + set de su año)
+    assert repo.registrar_asistencia({"cedula": "10", "fecha_registro": "2026-01-02T09:00:00"}, "C")[1]
+    verificar_resumen(contenedor, "10")
+    assert contenedor.docs["10"]["total_asistencias"] == 4
+
+    # Eliminar una asistencia recalcula el resumen desde los años
+    repo.eliminar_asistencia_sesion("10", "B")
+    verificar_resumen(contenedor, "10")
+    assert contenedor.docs["10"]["anios"] == {"2024": 1, "2025": 0, "2026": 1}
+
+
+def test_pasar_a_formato_anual_repetida_no_duplica(repo, contenedor):
+    """Si una migración se interrumpió tras escribir un año, repetirla fusiona sin duplicar."""
+    legado = {"id": "10", "_etag": "e0", "asistencias": [asistencia("A", "2024-05-01"), asistencia("B", "2025-03-01")]}
+    contenedor.docs["10"] = copy.deepcopy(legado)
+    contenedor.docs["10:2024"] = {"id": "10:2024", "tipo": TIPO_ASISTENCIAS, "cedula": "10", "anio": "2024",
+                                  "asistencias": [asistencia("A", "2024-05-01")]}
+
+    repo.pasar_a_formato_anual(copy.deepcopy(legado))
+    assert [a["sesion_id"] for a in contenedor.docs["10:2024"]["asistencias"]] == ["A"]
+    verificar_resumen(contenedor, "10")
+    assert contenedor.docs["10"]["total_asistencias"] == 2
+
+
+def test_registrar_migra_a_la_persona_en_formato_anterior(repo, contenedor):
+    contenedor.docs["10"] = {"id": "10", "nombre": "Ana", "_etag": "e0", "asistencias": [asistencia("A", "2025-05-01T10:00:00")]}
+    persona, registrada = repo.registrar_asistencia({"cedula": "10", "nombre": "Ana M", "fecha_registro": "2026-01-02T09:00:00"}, "C")
+    assert registrada
+    # Devuelve solo las asistencias del año del registro
+    assert [a["sesion_id"] for a in persona["asistencias"]] == ["C"]
+    assert contenedor.docs["10"]["nombre"] == "Ana M"
+    verificar_resumen(contenedor, "10")
+    # Ya migrada: la asistencia del formato anterior no se puede volver a registrar
+    assert not repo.registrar_asistencia({"cedula": "10", "fecha_registro": "2025-06-01T09:00:00"}, "A")[1]
+
+
+def test_falla_del_resumen_tras_escribir_el_anio(repo, contenedor):
+    """Si el patch del resumen falla, la asistencia ya escrita en su año se sigue leyendo."""
+    anio = anio_actual()
+    anterior = str(int(anio) - 3)
+    assert repo.registrar_asistencia({"cedula": "10", "nombre": "Ana", "fecha_registro": f"{anterior}-05-01T09:00:00"}, "A")[1]
+    # 503 en un patch con incr: no se sabe si se aplicó, así que no se reintenta
+    contenedor.fallas["patch"] = [exceptions.CosmosHttpResponseError(status_code=503, message="HTTP 503")]
+    with pytest.raises(StorageUnavailableException):
+        repo.registrar_asistencia({"cedula": "10", "fecha_registro": f"{anio}-02-01T09:00:00"}, "B")
+    assert id_anio("10", anio) in contenedor.docs
+    assert contenedor.docs["10"]["anios"] == {anterior: 1}
+
+    assert [a["sesion_id"] for a in repo.obtener_por_cedula("10")["asistencias"]] == ["A", "B"]
+    # Y repetirlo lo detecta como duplicado en lugar de registrarlo dos veces
+    assert not repo.registrar_asistencia({"cedula": "10", "fecha_registro": f"{anio}-02-01T10:00:00"}, "B")[1]
+
+
+def test_registros_concurrentes_del_mismo_anio_no_pisan_el_conteo(repo, contenedor, monkeypatch):
+    """Un patch del resumen que llega tarde (con un documento del año más viejo) no achica `anios`."""
+    anio = anio_actual()
+    assert repo.registrar_asistencia({"cedula": "10", "fecha_registro": f"{anio}-01-01T09:00:00"}, "A")[1]
+    actualizar_resumen = repo._actualizar_resumen
+    demorado = []
+
+    def lento(*args):
+        if not demorado:
+            # B ya escribió su año; C registra completo antes de que B aplique su patch
+            demorado.append(True)
+            assert repo.registrar_asistencia({"cedula": "10", "fecha_registro": f"{anio}-01-01T11:00:00"}, "C")[1]
+        return actualizar_resumen(*args)
+
+    monkeypatch.setattr(repo, "_actualizar_resumen", lento)
+    assert repo.registrar_asistencia({"cedula": "10", "fecha_registro": f"{anio}-01-01T10:00:00"}, "B")[1]
+    assert contenedor.docs["10"]["anios"] == {anio: 3}
+    assert contenedor.docs["10"]["total_asistencias"] == 3
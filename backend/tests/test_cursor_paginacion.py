@@ -0,0 +1,120 @@
+import base64
+import json
+
+import pytest
+
+from core.config import settings
+from db.json_client import JSONDB
+from db.memoria import MemoriaDB
+from db.repositorio import ACTIVIDADES_ADMIN
+from db.sqlite.client import SQLiteDB
+from services.sesiones.crud import codificar_cursor, decodificar_cursor
+
+TOTAL_SESIONES = 23
+OWNER = "docente@ejemplo.edu"
+
+
+# ---------- cursor opaco ----------
+
+def test_cursor_ida_y_vuelta():
+    for token in ("0", "20", '{"token":"+RID:~abc==#RT:1","range":{"min":"","max":"FF"}}'):
+        cursor = codificar_cursor(token)
+        assert decodificar_cursor(cursor) == token
+
+
+def test_cursor_vacio_es_primera_pagina():
+    assert codificar_cursor(None) is None
+    assert decodificar_cursor(None) is None
+    assert decodificar_cursor("") is None
+
+
+def test_cursor_de_otro_modo_se_rechaza(monkeypatch):
+    monkeypatch.setattr(settings, "STORAGE_MODE", "cosmosdb")
+    cursor = codificar_cursor("token-cosmos")
+    monkeypatch.setattr(settings, "STORAGE_MODE", "sqlite")
+    with pytest.raises(ValueError):
+        decodificar_cursor(cursor)
+
+
+@pytest.mark.parametrize("cursor", [
+    "no-es-base64!!",
+    base64.urlsafe_b64encode(b"no es json").decode(),
+    base64.urlsafe_b64encode(json.dumps(["20"]).encode()).decode(),
+    base64.urlsafe_b64encode(json.dumps({"m": settings.STORAGE_MODE, "t": 20}).encode()).decode(),
+    base64.urlsafe_b64encode(json.dumps({"t": "20"}).encode()).decode(),
+])
+def test_cursor_alterado_se_rechaza(cursor):
+    with pytest.raises(ValueError):
+        decodificar_cursor(cursor)
+
+
+# ---------- paginación por offset en los modos locales ----------
+
+def sesion(i: int, owner: str = OWNER, actividad: str = "Curso") -> dict:
+    return {
+        "id": f"s{i:03d}",
+        "created_by": owner,
+        "created_at": f"2026-01-{1 + i // 24:02d}T{i % 24:02d}:00:00",
+        "actividad": actividad,
+        "ocurrencias": [],
+    }
+
+
+@pytest.fixture(params=["json", "sqlite", "memory"])
+def repositorio(request, tmp_path):
+    if request.param == "json":
+        db = JSONDB(tmp_path / "json")
+    elif request.param == "sqlite":
+        db = SQLiteDB(tmp_path / "formaciones.db")
+    else:
+        db = MemoriaDB()
+    for i in range(TOTAL_SESIONES):
+        db.crear_sesion(sesion(i))
+    # Sesiones de otro docente: no deben aparecer en el listado filtrado por owner
+    db.crear_sesion(sesion(100, owner="otro@ejemplo.edu"))
+    db.crear_sesion(sesion(101, owner="otro@ejemplo.edu", actividad=sorted(ACTIVIDADES_ADMIN)[0]))
+    yield db
+    if request.param == "sqlite":
+        db.cerrar()
+
+
+def recorrer(pagina, limite: int):
+    ids, cursor, paginas = [], None, 0
+    while True:
+        sesiones, cursor = pagina(limite, cursor)
+        assert len(sesiones) <= limite
+        ids.extend(s["id"] for s in sesiones)
+        paginas += 1
+        if cursor is None:
+            return ids, paginas
+
+
+@pytest.mark.parametrize("limite", [1, 5, 10, TOTAL_SESIONES, 50])
+def test_paginas_sin_solapamiento_ni_huecos(repositorio, limite):
+    completo = [s["id"] for s in repositorio.listar_sesiones(OWNER)]
+    assert len(completo) == TOTAL_SESIONES
+    ids, paginas = recorrer(lambda n, c: repositorio.listar_sesiones_pagina(OWNER, None, n, c), limite)
+    assert ids == completo
+    assert paginas == max(1, -(-TOTAL_SESIONES // limite))
+
+
+def test_paginas_admin_sin_solapamiento_ni_huecos(repositorio):
+    completo = [s["id"] for s in repositorio.listar_sesiones_admin(OWNER)]
+    assert len(completo) == TOTAL_SESIONES + 1
+    ids, _ = recorrer(lambda n, c: repositorio.listar_sesiones_admin_pagina(OWNER, n, c), 4)
+    assert ids == completo
+
+
+def test_paginas_en_resumen(repositorio):
+    ids, _ = recorrer(lambda n, c: repositorio.listar_sesiones_pagina(OWNER, None, n, c, resumen=True), 7)
+    assert ids == [s["id"] for s in repositorio.listar_sesiones(OWNER)]
+
+
+def test_paginas_a_traves_del_cursor_opaco(repositorio):
+    """El token del repositorio sobrevive codificar/decodificar sin correr el inicio de la página."""
+    def pagina(limite, cursor):
+        sesiones, siguiente = repositorio.listar_sesiones_pagina(OWNER, None, limite, decodificar_cursor(cursor))
+        return sesiones, codificar_cursor(siguiente)
+
+    ids, _ = recorrer(pagina, 6)
+    assert ids == [s["id"] for s in repositorio.listar_sesiones(OWNER)]
@@ -0,0 +1,122 @@
+import json
+import shutil
+
+import pytest
+
+from db.json_journal import AlmacenJournal
+
+
+@pytest.fixture(autouse=True)
+def compactacion_sincronica(monkeypatch):
+    """La compactación de fondo corre en el mismo hilo para que las pruebas sean deterministas."""
+    monkeypatch.setattr(AlmacenJournal, "compactar_en_fondo", lambda self: self.compactar())
+
+
+def almacen(tmp_path) -> AlmacenJournal:
+    return AlmacenJournal(tmp_path / "sesiones.json", compactar_cada=10_000, indices={"curso": lambda d: [d.get("curso")]})
+
+
+def estado(a: AlmacenJournal) -> dict:
+    return {d["id"]: d for d in a.listar()}
+
+
+def lineas(ruta) -> list:
+    if not ruta.exists():
+        return []
+    return [json.loads(l) for l in ruta.read_text(encoding="utf-8").splitlines() if l.strip()]
+
+
+def poblar(a: AlmacenJournal):
+    a.guardar_varios([{"id": f"d{i}", "curso": "A", "v": i} for i in range(5)])
+    a.guardar({"id": "d1", "curso": "B", "v": 10})
+    a.eliminar("d4")
+
+
+def test_reproduce_snapshot_mas_log(tmp_path):
+    a = almacen(tmp_path)
+    poblar(a)
+    a.compactar()
+    a.guardar({"id": "d5", "curso": "A", "v": 5})
+    esperado = estado(a)
+    assert estado(almacen(tmp_path)) == esperado
+
+
+def test_caida_tras_rotar_el_log_conserva_el_ultimo_estado(tmp_path, monkeypatch):
+    a = almacen(tmp_path)
+    poblar(a)
+
+    def caida(_serializados):
+        raise OSError("disco lleno")
+
+    monkeypatch.setattr(a, "_escribir_snapshot", caida)
+    with pytest.raises(OSError):
+        a.compactar()
+    # El log quedó rotado y el snapshot sin publicar
+    assert a.log_compactando.exists() and not a.snapshot.exists()
+    # Escrituras posteriores van al log nuevo
+    a.guardar({"id": "d0", "curso": "C", "v": 20})
+    a.eliminar("d2")
+    esperado = estado(a)
+
+    recuperado = almacen(tmp_path)
+    assert estado(recuperado) == esperado
+    assert [d["id"] for d in recuperado.buscar("curso", "C")] == ["d0"]
+    # Al recargar se termina la compactación interrumpida
+    assert not recuperado.log_compactando.exists() and not recuperado.log.exists()
+    assert {d["id"]: d for d in json.loads(recuperado.snapshot.read_text(encoding="utf-8"))} == esperado
+    assert estado(almacen(tmp_path)) == esperado
+
+
+def test_caida_tras_publicar_el_snapshot_conserva_el_ultimo_estado(tmp_path):
+    """Si el log rotado sobrevive al snapshot que ya lo incluye, reproducirlo de nuevo es inocuo."""
+    a = almacen(tmp_path)
+    poblar(a)
+    copia = tmp_path / "log.copia"
+    shutil.copy(a.log, copia)
+    a.compactar()
+    a.guardar({"id": "d3", "curso": "A", "v": 30})
+    esperado = estado(a)
+    # Simula que el proceso murió antes de borrar el log rotado
+    shutil.copy(copia, a.log_compactando)
+
+    assert estado(almacen(tmp_path)) == esperado
+
+
+def test_compactacion_solo_trunca_lo_aplicado(tmp_path, monkeypatch):
+    """Lo escrito mientras se arma el snapshot queda en el log nuevo y no se pierde."""
+    a = almacen(tmp_path)
+    poblar(a)
+    antes = estado(a)
+    escribir_snapshot = a._escribir_snapshot
+
+    def con_escrituras_concurrentes(serializados):
+        a.guardar({"id": "d9", "curso": "A", "v": 9})
+        a.guardar({"id": "d0", "curso": "B", "v": 90})
+        a.eliminar("d3")
+        return escribir_snapshot(serializados)
+
+    monkeypatch.setattr(a, "_escribir_snapshot", con_escrituras_concurrentes)
+    a.compactar()
+
+    snapshot = {d["id"]: d for d in json.loads(a.snapshot.read_text(encoding="utf-8"))}
+    assert snapshot == antes
+    assert not a.log_compactando.exists()
+    assert [(r["op"], r["id"]) for r in lineas(a.log)] == [("put", "d9"), ("put", "d0"), ("del", "d3")]
+
+    esperado = estado(a)
+    assert esperado["d0"]["v"] == 90 and "d9" in esperado and "d3" not in esperado
+    assert estado(almacen(tmp_path)) == esperado
+
+
+def test_linea_cortada_al_final_se_descarta(tmp_path):
+    a = almacen(tmp_path)
+    poblar(a)
+    esperado = estado(a)
+    with open(a.log, "ab") as f:
+        f.write(b'{"op": "put", "id": "d7", "doc": {"id": "d7"')
+
+    b = almacen(tmp_path)
+    assert estado(b) == esperado
+    # La siguiente escritura no se pega a la línea cortada
+    b.guardar({"id": "d8", "curso": "A", "v": 8})
+    assert "d8" in estado(almacen(tmp_path))
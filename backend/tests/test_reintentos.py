@@ -0,0 +1,244 @@
+import asyncio
+
+import pytest
+from azure.core.exceptions import ServiceRequestError
+from azure.cosmos import exceptions
+
+from core.exceptions import StorageUnavailableException
+from db import reintentos
+from db.reintentos import (
+    CircuitoCosmos, PoliticaReintentos, _en_reintento, es_transitorio, no_ejecutada, operacion_idempotente
+)
+
+
+def error_cosmos(codigo: int) -> exceptions.CosmosHttpResponseError:
+    return exceptions.CosmosHttpResponseError(status_code=codigo, message=f"HTTP {codigo}")
+
+
+class Reloj:
+    """time.monotonic controlable para recorrer los estados del circuito sin esperar."""
+
+    def __init__(self):
+        self.ahora = 1000.0
+
+    def __call__(self):
+        return self.ahora
+
+
+@pytest.fixture
+def reloj(monkeypatch):
+    r = Reloj()
+    monkeypatch.setattr(reintentos.time, "monotonic", r)
+    return r
+
+
+def politica(circuito=None, max_intentos=3, presupuesto_s=10.0):
+    # Sin espera entre intentos: base y máximo en 0
+    return PoliticaReintentos(max_intentos, 0.0, 0.0, presupuesto_s, circuito or CircuitoCosmos(100, 5.0))
+
+
+# ---------- clasificación de errores ----------
+
+@pytest.mark.parametrize("codigo", [408, 429, 449, 500, 502, 503])
+def test_codigos_transitorios(codigo):
+    assert es_transitorio(error_cosmos(codigo))
+
+
+@pytest.mark.parametrize("codigo", [400, 404, 409, 412, 413])
+def test_codigos_no_transitorios(codigo):
+    assert not es_transitorio(error_cosmos(codigo))
+
+
+def test_errores_de_red_son_transitorios():
+    assert es_transitorio(ServiceRequestError("sin conexión"))
+    assert es_transitorio(RuntimeError("Connection reset by peer"))
+    assert not es_transitorio(ValueError("dato inválido"))
+
+
+def test_no_ejecutada_solo_429_y_449():
+    assert no_ejecutada(error_cosmos(429))
+    assert no_ejecutada(error_cosmos(449))
+    assert not no_ejecutada(error_cosmos(408))
+    assert not no_ejecutada(error_cosmos(503))
+    assert not no_ejecutada(RuntimeError("timeout"))
+
+
+def test_operacion_idempotente():
+    assert operacion_idempotente("read_item", (), {})
+    assert operacion_idempotente("replace_item", (), {})
+    assert not operacion_idempotente("create_item", (), {})
+    incr = [{"op": "incr", "path": "/total", "value": 1}]
+    assert not operacion_idempotente("patch_item", (), {"patch_operations": incr})
+    assert not operacion_idempotente("patch_item", ("id", "pk", incr), {})
+    assert operacion_idempotente("patch_item", (), {"patch_operations": [{"op": "set", "path": "/nombre", "value": "x"}]})
+    # Condicional: repetir algo ya aplicado da 412 en lugar de duplicarlo
+    assert operacion_idempotente("patch_item", (), {"patch_operations": incr, "etag": "e", "match_condition": object()})
+
+
+# ---------- circuito ----------
+
+def test_circuito_se_abre_tras_umbral(reloj):
+    circuito = CircuitoCosmos(umbral=3, enfriamiento_s=5.0)
+    for _ in range(2):
+        circuito.falla()
+    assert circuito.estado == "cerrado"
+    assert circuito.permitir() is False
+    circuito.falla()
+    assert circuito.estado == "abierto"
+    with pytest.raises(StorageUnavailableException):
+        circuito.permitir()
+
+
+def test_exito_reinicia_el_conteo_de_fallas(reloj):
+    circuito = CircuitoCosmos(umbral=2, enfriamiento_s=5.0)
+    circuito.falla()
+    circuito.exito()
+    circuito.falla()
+    assert circuito.estado == "cerrado"
+
+
+def test_semiabierto_deja_pasar_una_sola_prueba(reloj):
+    circuito = CircuitoCosmos(umbral=1, enfriamiento_s=5.0)
+    circuito.falla()
+    reloj.ahora += 5.0
+    assert circuito.estado == "semiabierto"
+    assert circuito.permitir() is True
+    with pytest.raises(StorageUnavailableException):
+        circuito.permitir()
+    circuito.exito()
+    assert circuito.estado == "cerrado"
+    assert circuito.permitir() is False
+
+
+def test_prueba_fallida_reabre_el_circuito(reloj):
+    circuito = CircuitoCosmos(umbral=1, enfriamiento_s=5.0)
+    circuito.falla()
+    reloj.ahora += 5.0
+    assert circuito.permitir() is True
+    circuito.falla()
+    assert circuito.estado == "abierto"
+    assert circuito.aperturas == 2
+
+
+def test_fin_prueba_libera_el_semiabierto(reloj):
+    circuito = CircuitoCosmos(umbral=1, enfriamiento_s=5.0)
+    circuito.falla()
+    reloj.ahora += 5.0
+    assert circuito.permitir() is True
+    circuito.fin_prueba()
+    assert circuito.permitir() is True
+
+
+# ---------- política de reintentos ----------
+
+def test_reintenta_transitorios_hasta_exito():
+    llamadas = []
+
+    def fn():
+        llamadas.append(1)
+        if len(llamadas) < 3:
+            raise error_cosmos(503)
+        return "ok"
+
+    assert politica().ejecutar(fn) == "ok"
+    assert len(llamadas) == 3
+
+
+def test_no_reintenta_errores_del_cliente():
+    llamadas = []
+    circuito = CircuitoCosmos(1, 5.0)
+
+    def fn():
+        llamadas.append(1)
+        raise error_cosmos(404)
+
+    with pytest.raises(exceptions.CosmosHttpResponseError):
+        politica(circuito).ejecutar(fn)
+    assert len(llamadas) == 1
+    # Un 404 es una respuesta del servicio: no abre el circuito
+    assert circuito.estado == "cerrado"
+
+
+def test_agotar_intentos_lanza_storage_unavailable():
+    with pytest.raises(StorageUnavailableException):
+        politica(max_intentos=2).ejecutar(lambda: (_ for _ in ()).throw(error_cosmos(503)))
+
+
+def test_no_idempotente_sin_confirmar_no_se_reintenta():
+    llamadas = []
+
+    def fn():
+        llamadas.append(1)
+        raise error_cosmos(408)
+
+    with pytest.raises(StorageUnavailableException) as info:
+        politica().ejecutar(fn, idempotente=False)
+    assert len(llamadas) == 1
+    assert info.value.sin_confirmar is True
+
+
+def test_no_idempotente_se_reintenta_si_no_se_ejecuto():
+    llamadas = []
+
+    def fn():
+        llamadas.append(1)
+        if len(llamadas) == 1:
+            raise error_cosmos(429)
+        return "ok"
+
+    assert politica().ejecutar(fn, idempotente=False) == "ok"
+    assert len(llamadas) == 2
+
+
+def test_anidado_no_reintenta_por_su_cuenta():
+    """Dentro de ejecutar() la operación anidada falla de inmediato y reintenta la externa completa."""
+    p = politica()
+    internas, externas = [], []
+
+    def interna():
+        internas.append(1)
+        if len(internas) == 1:
+            raise error_cosmos(503)
+        return "ok"
+
+    def externa():
+        externas.append(1)
+        assert _en_reintento.get() is True
+        return p.ejecutar(interna)
+
+    assert p.ejecutar(externa) == "ok"
+    assert len(internas) == 2 and len(externas) == 2
+    assert _en_reintento.get() is False
+
+
+def test_en_reintento_se_restablece_tras_error():
+    with pytest.raises(exceptions.CosmosHttpResponseError):
+        politica().ejecutar(lambda: (_ for _ in ()).throw(error_cosmos(400)))
+    assert _en_reintento.get() is False
+
+
+def test_cancelacion_de_la_prueba_libera_el_circuito(reloj):
+    circuito = CircuitoCosmos(umbral=1, enfriamiento_s=5.0)
+    p = politica(circuito)
+    circuito.falla()
+    reloj.ahora += 5.0
+
+    async def escenario():
+        bloqueo = asyncio.Event()
+
+        async def cuelga():
+            await bloqueo.wait()
+
+        tarea = asyncio.create_task(p.ejecutar_async(cuelga))
+        await asyncio.sleep(0)
+        tarea.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await tarea
+
+        async def responde():
+            return "ok"
+
+        return await p.ejecutar_async(responde)
+
+    assert asyncio.run(escenario()) == "ok"
+    assert circuito.estado == "cerrado"
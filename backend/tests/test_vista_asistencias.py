@@ -0,0 +1,79 @@
+import pytest
+from azure.cosmos import exceptions
+
+from core.config import settings
+from core.metrics import metricas
+from db.repositories.asistencias_sesion_repo import AsistenciasSesionRepository
+from db.repositories.asistentes_repo import AsistentesRepository
+
+from contenedor_falso import ContenedorFalso
+
+
+def error_cosmos(codigo: int) -> exceptions.CosmosHttpResponseError:
+    return exceptions.CosmosHttpResponseError(status_code=codigo, message=f"HTTP {codigo}")
+
+
+@pytest.fixture
+def vista(monkeypatch):
+    monkeypatch.setattr(settings, "ASISTENCIAS_POR_ANIO", False)
+    monkeypatch.setattr(settings, "ASISTENTES_FALLBACK_CONSULTA", False)
+    monkeypatch.setattr(settings, "ASISTENCIAS_SESION_VISTA", False)
+    return ContenedorFalso("asistencias_sesion")
+
+
+@pytest.fixture
+def asistentes():
+    return ContenedorFalso()
+
+
+@pytest.fixture
+def repo(asistentes, vista):
+    return AsistentesRepository(asistentes, vista=AsistenciasSesionRepository(vista))
+
+
+def registrar(repo, cedula="10", sesion="S1"):
+    return repo.registrar_asistencia({"cedula": cedula, "nombre": "Ana", "fecha_registro": "2026-02-01T09:00:00"}, sesion)
+
+
+def test_la_vista_se_escribe_aunque_no_se_consulte(repo, vista):
+    assert registrar(repo)[1]
+    assert vista.docs["S1:10"]["cedula"] == "10" and vista.docs["S1:10"]["nombre"] == "Ana"
+
+
+def test_sin_flag_listar_contar_y_eliminar_no_usan_la_vista(repo, asistentes, vista):
+    repo.listar_por_sesion("S1")
+    repo.contar_por_sesion("S1")
+    repo.eliminar_por_sesion("S1")
+    assert [op for op in vista.ops if op[0] == "query"] == []
+    assert len([op for op in asistentes.ops if op[0] == "query"]) == 3
+
+
+def test_con_flag_listar_y_contar_usan_la_vista(repo, asistentes, vista, monkeypatch):
+    monkeypatch.setattr(settings, "ASISTENCIAS_SESION_VISTA", True)
+    repo.listar_por_sesion("S1")
+    repo.contar_por_sesion("S1")
+    assert len([op for op in vista.ops if op[0] == "query"]) == 2
+    assert [op for op in asistentes.ops if op[0] == "query"] == []
+
+
+def test_falla_transitoria_de_la_vista_se_reintenta(repo, vista):
+    vista.fallas["upsert"] = [error_cosmos(503)]
+    assert registrar(repo)[1]
+    assert [op for op in vista.ops if op[0] == "upsert"] == [("upsert", "S1:10"), ("upsert", "S1:10")]
+    assert "S1:10" in vista.docs
+
+
+def test_falla_de_la_vista_se_propaga_y_el_reintento_la_repara(repo, asistentes, vista):
+    errores = metricas.snapshot()["contadores"].get("vista_asistencias.errores", 0)
+    vista.fallas["upsert"] = [error_cosmos(400)]
+    with pytest.raises(exceptions.CosmosHttpResponseError):
+        registrar(repo)
+    # La persona quedó escrita pero la vista no
+    assert [a["sesion_id"] for a in asistentes.docs["10"]["asistencias"]] == ["S1"]
+    assert "S1:10" not in vista.docs
+    assert metricas.snapshot()["contadores"]["vista_asistencias.errores"] == errores + 1
+
+    # Repetir el registro lo detecta como duplicado y vuelve a escribir la entrada
+    persona, registrada = registrar(repo)
+    assert not registrada
+    assert "S1:10" in vista.docs
@@ -0,0 +1,298 @@
+"""
+Generador de carga para el flujo de registro por QR.
+
+Simula N teléfonos escaneando el QR al mismo tiempo: cada usuario virtual entra
+durante la rampa y repite una mezcla de operaciones (info pública, registro
+interno, registro externo, reintento duplicado y token expirado) hasta agotar
+la duración. Al final reporta p50/p95/p99, throughput, errores por código y la
+consistencia de contadores contra el listado de asistentes de la sesión.
+
+Por defecto corre EN PROCESO (httpx + ASGITransport) en modo JSON (o SQLite / memoria con
+--storage sqlite|memory) sobre un directorio temporal, así que no necesita red ni CosmosDB. Cada usuario virtual
+usa una IP distinta para que el rate limit por IP se comporte como en producción.
+
+Uso:
+    python tmp/loadtest_registro.py
+    python tmp/loadtest_registro.py --usuarios 200 --rampa 5 --duracion 20
+    python tmp/loadtest_registro.py --storage sqlite
+    python tmp/loadtest_registro.py --storage memory     # solo la capa de servicios, sin I/O
+    python tmp/loadtest_registro.py --mezcla info=3,interna=4,externa=1,duplicado=1,expirado=1
+    python tmp/loadtest_registro.py --url http://localhost:8000 --token ABCD1234   # servidor en marcha
+"""
+import argparse
+import asyncio
+import contextlib
+import itertools
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+
+import httpx
+
+APP_DIR = Path(__file__).resolve().parent.parent / "app"
+
+OPERACIONES = ("info", "interna", "externa", "duplicado", "expirado")
+MEZCLA_DEFECTO = "info=3,interna=4,externa=1,duplicado=1,expirado=1"
+CODIGOS_REPORTADOS = (409, 410, 429, 500)
+
+
+def parsear_mezcla(texto: str) -> dict:
+    mezcla = {}
+    for parte in texto.split(","):
+        nombre, _, peso = parte.partition("=")
+        nombre = nombre.strip()
+        if nombre not in OPERACIONES:
+            raise SystemExit(f"❌ Operación desconocida en --mezcla: {nombre} (válidas: {', '.join(OPERACIONES)})")
+        mezcla[nombre] = float(peso or 1)
+    return mezcla
+
+
+def percentil(valores: list, p: float) -> float:
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    k = min(len(ordenados) - 1, max(0, int(round(p / 100 * len(ordenados) + 0.5)) - 1))
+    return ordenados[k]
+
+
+class Resultados:
+    def __init__(self):
+        self.latencias = defaultdict(list)
+        self.codigos = defaultdict(Counter)
+        self.excepciones = Counter()
+        self.registrados = 0
+
+    def anotar(self, operacion: str, latencia: float, codigo: int):
+        self.latencias[operacion].append(latencia)
+        self.codigos[operacion][codigo] += 1
+        if operacion in ("interna", "externa") and codigo == 201:
+            self.registrados += 1
+
+    def total(self) -> int:
+        return sum(len(v) for v in self.latencias.values())
+
+
+class Escenario:
+    """Datos compartidos por los usuarios virtuales: tokens y generador de cédulas."""
+
+    def __init__(self, token: str, token_expirado: str = None):
+        self.token = token
+        self.token_expirado = token_expirado
+        self._cedulas = itertools.count(1_000_000_000 + random.randint(0, 10_000_000))
+
+    def nueva_cedula(self) -> str:
+        return str(next(self._cedulas))
+
+
+def payload_interno(token: str, cedula: str) -> dict:
+    return {"token": token, "cedula": cedula, "nombre": f"Usuario {cedula[-4:]}", "cargo": "Analista",
+            "unidad": "Operaciones", "correo": f"u{cedula}@example.org"}
+
+
+def payload_externo(token: str, cedula: str) -> dict:
+    return {"token": token, "cedula": cedula, "nombre": f"Externo {cedula[-4:]}", "empresa": "Empresa Aliada",
+            "cargo": "Coordinador", "telefono": "3001234567", "correo": f"e{cedula}@example.org"}
+
+
+async def usuario_virtual(cliente: httpx.AsyncClient, escenario: Escenario, mezcla: dict, resultados: Resultados,
+                          inicio: float, fin: float):
+    await asyncio.sleep(max(0.0, inicio - time.perf_counter()))
+    nombres, pesos = list(mezcla), list(mezcla.values())
+    propias = []  # (ruta, payload) ya registrados por este usuario, para reintentos duplicados
+
+    while time.perf_counter() < fin:
+        operacion = random.choices(nombres, pesos)[0]
+        if operacion == "duplicado" and not propias:
+            operacion = "interna"
+        if operacion == "expirado" and not escenario.token_expirado:
+            operacion = "info"
+
+        if operacion == "info":
+            metodo, ruta, cuerpo = "GET", f"/api/sesion/{escenario.token}", None
+        elif operacion == "expirado":
+            metodo, ruta, cuerpo = "GET", f"/api/sesion/{escenario.token_expirado}", None
+        elif operacion == "duplicado":
+            metodo, (ruta, cuerpo) = "POST", random.choice(propias)
+        elif operacion == "interna":
+            metodo, ruta, cuerpo = "POST", "/api/asistencia/interna", payload_interno(escenario.token, escenario.nueva_cedula())
+        else:
+            metodo, ruta, cuerpo = "POST", "/api/asistencia/externa", payload_externo(escenario.token, escenario.nueva_cedula())
+
+        t0 = time.perf_counter()
+        try:
+            respuesta = await cliente.request(metodo, ruta, json=cuerpo)
+        except Exception as e:
+            resultados.excepciones[type(e).__name__] += 1
+            continue
+        resultados.anotar(operacion, time.perf_counter() - t0, respuesta.status_code)
+        if operacion in ("interna", "externa") and respuesta.status_code == 201:
+            propias.append((ruta, cuerpo))
+
+
+async def ejecutar_carga(fabrica_cliente, escenario: Escenario, args, resultados: Resultados) -> float:
+    mezcla = parsear_mezcla(args.mezcla)
+    t0 = time.perf_counter()
+    fin = t0 + args.rampa + args.duracion
+    clientes = [fabrica_cliente(i) for i in range(args.usuarios)]
+    try:
+        await asyncio.gather(*(
+            usuario_virtual(c, escenario, mezcla, resultados, t0 + args.rampa * i / max(1, args.usuarios), fin)
+            for i, c in enumerate(clientes)
+        ))
+    finally:
+        for c in clientes:
+            await c.aclose()
+    return time.perf_counter() - t0
+
+
+def imprimir_reporte(resultados: Resultados, duracion: float):
+    total = resultados.total()
+    print("\n📈 Resultados")
+    print(f"   Solicitudes: {total} en {duracion:.2f}s  →  {total / duracion if duracion else 0:.1f} req/s")
+    print(f"   {'operación':<10} {'n':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'máx ms':>9}  códigos")
+    todas = []
+    for operacion in OPERACIONES:
+        lat = resultados.latencias.get(operacion)
+        if not lat:
+            continue
+        todas.extend(lat)
+        codigos = ", ".join(f"{c}×{n}" for c, n in sorted(resultados.codigos[operacion].items()))
+        print(f"   {operacion:<10} {len(lat):>7} {percentil(lat, 50) * 1000:>9.1f} {percentil(lat, 95) * 1000:>9.1f} "
+              f"{percentil(lat, 99) * 1000:>9.1f} {max(lat) * 1000:>9.1f}  {codigos}")
+    if todas:
+        print(f"   {'TOTAL':<10} {len(todas):>7} {percentil(todas, 50) * 1000:>9.1f} {percentil(todas, 95) * 1000:>9.1f} "
+              f"{percentil(todas, 99) * 1000:>9.1f} {max(todas) * 1000:>9.1f}")
+
+    por_codigo = Counter()
+    for c in resultados.codigos.values():
+        por_codigo.update(c)
+    print("\n🧾 Errores por código")
+    for codigo in CODIGOS_REPORTADOS:
+        print(f"   {codigo}: {por_codigo.get(codigo, 0)}")
+    otros = {c: n for c, n in por_codigo.items() if c >= 400 and c not in CODIGOS_REPORTADOS}
+    if otros:
+        print(f"   otros: {otros}")
+    if resultados.excepciones:
+        print(f"   excepciones de cliente: {dict(resultados.excepciones)}")
+
+
+# ========== MODO EN PROCESO (almacenamiento local sobre directorio temporal) ==========
+
+def preparar_entorno(directorio: str, storage: str = "json"):
+    """Fuerza el modo local (JSON, SQLite o memoria) y redirige los archivos de datos al directorio temporal antes de cargar la app."""
+    os.environ["STORAGE_MODE"] = storage
+    os.environ["JSON_DATA_DIR"] = directorio
+    os.environ["SQLITE_PATH"] = str(Path(directorio) / "formaciones.db")
+    os.environ.setdefault("SESSION_SECRET", "loadtest-" + "x" * 40)
+    sys.path.insert(0, str(APP_DIR))
+
+
+def crear_sesiones_prueba():
+    from services import sesiones as sesion_service
+
+    base = dict(tema="Prueba de carga", actividad="Capacitación", facilitador_entidad="Equipo QA",
+                tipo_actividad="Interno", responsable="Responsable QA", cargo_responsable="Coordinador",
+                contenido="Sesión generada por loadtest_registro.py", hora_inicio="08:00", hora_fin="10:00",
+                dirigido_a="Personal", modalidad="Presencial", created_by="loadtest@fundacionsantodomingo.org")
+    hoy = time.strftime("%Y-%m-%d")
+    sesion = sesion_service.crear_sesion({**base, "fecha": hoy})
+    vencida = sesion_service.crear_sesion({**base, "fecha": hoy, "tema": "Prueba de carga (token vencido)"})
+
+    from db.repositorio import get_repositorio
+    repositorio = get_repositorio()
+    cruda = repositorio.obtener_sesion(vencida['id'])
+    for oc in cruda.get('ocurrencias', []):
+        oc['token_expiry'] = "2020-01-01T00:00:00-05:00"
+    repositorio.actualizar_sesion(cruda['id'], cruda)
+    return sesion, vencida
+
+
+def verificar_contadores(sesion_id: str, resultados: Resultados) -> bool:
+    from services import sesiones as sesion_service
+    from services import asistentes as asistente_service
+
+    sesion = sesion_service.get_sesion_by_id(sesion_id)
+    contador = sesion.get('total_asistentes') or 0
+    listados = len(asistente_service.get_asistentes_by_sesion(sesion_id))
+    ok = contador == listados == resultados.registrados
+    print("\n🔢 Consistencia de contadores")
+    print(f"   201 recibidos: {resultados.registrados}  |  total_asistentes: {contador}  |  listar_por_sesion: {listados}")
+    print(f"   {'✅ Consistente' if ok else '❌ INCONSISTENTE'}")
+    return ok
+
+
+async def main_en_proceso(args) -> int:
+    directorio = tempfile.mkdtemp(prefix="loadtest_registro_")
+    preparar_entorno(directorio, args.storage)
+    from main import app
+
+    salida = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(open(os.devnull, "w"))
+    resultados = Resultados()
+    with salida:
+        # El lifespan arranca el agregador de contadores igual que en el servidor
+        async with app.router.lifespan_context(app):
+            sesion, vencida = crear_sesiones_prueba()
+            escenario = Escenario(sesion['token'], vencida['token'])
+
+            def fabrica_cliente(i: int) -> httpx.AsyncClient:
+                ip = f"10.{(i >> 16) & 255}.{(i >> 8) & 255}.{i & 255}"
+                transporte = httpx.ASGITransport(app=app, client=(ip, 40000 + i % 20000))
+                return httpx.AsyncClient(transport=transporte, base_url="http://loadtest")
+
+            duracion = await ejecutar_carga(fabrica_cliente, escenario, args, resultados)
+        # Al salir del lifespan se vacían los contadores pendientes
+
+    print(f"🚀 En proceso ({args.storage.upper()} en {directorio}): {args.usuarios} usuarios, rampa {args.rampa}s, duración {args.duracion}s")
+    imprimir_reporte(resultados, duracion)
+    ok = verificar_contadores(sesion['id'], resultados)
+    if args.conservar_datos:
+        print(f"📁 Datos conservados en {directorio}")
+    else:
+        shutil.rmtree(directorio, ignore_errors=True)
+    return 0 if ok else 1
+
+
+async def main_remoto(args) -> int:
+    if not args.token:
+        raise SystemExit("❌ --token es obligatorio con --url")
+    escenario = Escenario(args.token, args.token_expirado)
+    resultados = Resultados()
+
+    def fabrica_cliente(i: int) -> httpx.AsyncClient:
+        return httpx.AsyncClient(base_url=args.url.rstrip("/"), timeout=30)
+
+    print(f"🚀 Contra {args.url}: {args.usuarios} usuarios, rampa {args.rampa}s, duración {args.duracion}s")
+    duracion = await ejecutar_carga(fabrica_cliente, escenario, args, resultados)
+    imprimir_reporte(resultados, duracion)
+    print("\nℹ️ La verificación de contadores solo está disponible en modo en proceso")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga del registro de asistencia por QR")
+    parser.add_argument("--usuarios", type=int, default=200, help="usuarios virtuales simultáneos")
+    parser.add_argument("--rampa", type=float, default=2.0, help="segundos para que entren todos los usuarios")
+    parser.add_argument("--duracion", type=float, default=10.0, help="segundos de carga sostenida tras la rampa")
+    parser.add_argument("--mezcla", default=MEZCLA_DEFECTO, help=f"pesos por operación (defecto: {MEZCLA_DEFECTO})")
+    parser.add_argument("--semilla", type=int, default=None, help="semilla aleatoria para repetir una corrida")
+    parser.add_argument("--url", default=None, help="URL de un servidor en marcha (por defecto: en proceso)")
+    parser.add_argument("--token", default=None, help="token válido (solo con --url)")
+    parser.add_argument("--token-expirado", default=None, help="token vencido para la operación 'expirado' (solo con --url)")
+    parser.add_argument("--storage", choices=["json", "sqlite", "memory"], default="json", help="almacenamiento local en modo en proceso")
+    parser.add_argument("--conservar-datos", action="store_true", help="no borrar el directorio temporal de datos (modo en proceso)")
+    parser.add_argument("--verbose", action="store_true", help="mostrar los logs de la aplicación durante la carga")
+    args = parser.parse_args()
+
+    if args.semilla is not None:
+        random.seed(args.semilla)
+    codigo = asyncio.run(main_remoto(args) if args.url else main_en_proceso(args))
+    sys.exit(codigo)
+
+
+if __name__ == "__main__":
+    main()
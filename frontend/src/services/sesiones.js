@@ -55,6 +55,16 @@ export const sesionesService = {
     return _pendingRequest;
   },
 
+  // Listar una página de capacitaciones (más recientes primero); nextCursor es null en la última.
+  // Con resumen=true cada elemento trae solo los datos de la tabla (sin contenido ni ocurrencias)
+  listarPagina: async ({ pageSize = 50, cursor = null, resumen = false } = {}) => {
+    const params = { page_size: pageSize };
+    if (cursor) params.cursor = cursor;
+    if (resumen) params.resumen = true;
+    const response = await api.get('/api/sesiones/', { params });
+    return { items: response.data.items, nextCursor: response.data.next_cursor };
+  },
+
   // Obtener una capacitación por ID
   obtenerPorId: async (id) => {
     const response = await api.get(`/api/sesiones/${id}/`);